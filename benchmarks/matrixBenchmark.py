@@ -0,0 +1,230 @@
+# coding=utf-8
+from __future__ import division, print_function
+
+'''
+Headless benchmarks of the interpolation matrix engine.
+
+Times glyph previews (placeGlyphMasters + makeGlyphInstances) over a range of grid sizes,
+a full ‘*’ generation and a compatibility report (from scratch, and again on unchanged masters), on synthetic masters.
+Results are written as JSON, and can be compared with a previous run:
+
+    python benchmarks/matrixBenchmark.py --output results.json
+    python benchmarks/matrixBenchmark.py --compare results.json
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source', 'lib'))
+
+from fontParts.world import OpenFont
+from matrixEngine import MatrixEngine
+from syntheticMasters import buildSyntheticMasters
+
+defaultGrids = ['3x1', '3x3', '5x5', '7x7', '10x10', '15x15']
+
+def parseGrid(grid):
+    h, v = grid.lower().split('x')
+    return int(h), int(v)
+
+def masterSpotsForGrid(axesGrid, mastersCount):
+    h, v = axesGrid
+    spots = [(0, 0), (h-1, 0)]
+    if v > 1:
+        spots.append((0, v-1))
+        spots.append((h-1, v-1))
+    return spots[:mastersCount]
+
+def buildEngine(axesGrid, fonts):
+    engine = MatrixEngine(axesGrid)
+    for spot, font in zip(masterSpotsForGrid(axesGrid, len(fonts)), fonts):
+        engine.addMaster(spot, font)
+    engine.reallocateWeights()
+    return engine
+
+def timeRuns(function, repeat):
+    timings = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def summarize(name, grid, timings, **extra):
+    result = {
+        'benchmark': name,
+        'grid': grid,
+        'runs': len(timings),
+        'minMs': round(min(timings), 3),
+        'medianMs': round(median(timings), 3),
+        'meanMs': round(sum(timings)/len(timings), 3),
+    }
+    result.update(extra)
+    return result
+
+def benchPreview(fonts, grids, glyphNames, repeat, windowSize=(950, 350)):
+    results = []
+    for grid in grids:
+        axesGrid = parseGrid(grid)
+        engine = buildEngine(axesGrid, fonts)
+        def refresh():
+            # previews are timed as computed, not as found in the instance cache
+            engine.instanceCache.clear()
+            for glyphName in glyphNames:
+                engine.placeGlyphMasters(glyphName)
+                engine.makeGlyphInstances()
+        timings = [t/len(glyphNames) for t in timeRuns(refresh, repeat)]
+        results.append(summarize('preview', grid, timings, cells=axesGrid[0]*axesGrid[1], glyphs=len(glyphNames)))
+        # same refresh with cells sized as in a window of windowSize, where small enough for simplified masters
+        engine.setPreviewCellSize((windowSize[0]/axesGrid[0], windowSize[1]/axesGrid[1]))
+        if engine.getDetailTolerance() is not None:
+            timings = [t/len(glyphNames) for t in timeRuns(refresh, repeat)]
+            results.append(summarize('previewLOD', grid, timings, cells=axesGrid[0]*axesGrid[1], glyphs=len(glyphNames)))
+    return results
+
+def benchGeneration(fonts, grid, repeat, outputFolder=None):
+    axesGrid = parseGrid(grid)
+    engine = buildEngine(axesGrid, fonts)
+    spots = engine.parseSpotsList('*')
+    generationInfos = {
+        'sourceFont': [fonts[0]],
+        'interpolateGlyphs': True,
+        'interpolateKerning': True,
+        'interpolateFontInfos': True,
+        'addGroups': True,
+        'openFonts': False,
+        'report': False
+    }
+    def generate():
+        for i, j in spots:
+            path = None
+            if outputFolder is not None:
+                path = os.path.join(outputFolder, 'Synthetic-%s%s.ufo'%(i, j))
+            engine.generateInstanceFont((i, j), generationInfos, path)
+    timings = timeRuns(generate, repeat)
+    return [summarize('generation', grid, timings, instances=len(spots))]
+
+def benchReport(fonts, repeat):
+    engine = buildEngine((3, 1), fonts[:2])
+    reportInfo = {
+        'markGlyphs': False,
+        'compatibleColor': None,
+        'incompatibleColor': None,
+        'mixedColor': None
+    }
+    def coldReport():
+        # every glyph checked again, not found in the compatibility cache or index of a previous run
+        engine.compatibilityCache.clear()
+        engine.compatibilityIndex = None
+        engine.generateCompatibilityReport(reportInfo)
+    timings = timeRuns(coldReport, repeat)
+    # and with the results of the previous run at hand, as when reporting again on unchanged masters
+    warmTimings = timeRuns(lambda: engine.generateCompatibilityReport(reportInfo), repeat)
+    return [summarize('report', '3x1', timings), summarize('reportWarm', '3x1', warmTimings)]
+
+def gitRevision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def compareResults(previous, current):
+    lines = []
+    previousResults = dict(((r['benchmark'], r['grid']), r) for r in previous['results'])
+    for result in current['results']:
+        key = (result['benchmark'], result['grid'])
+        if key in previousResults:
+            before = previousResults[key]['medianMs']
+            after = result['medianMs']
+            change = ((after - before) / before * 100) if before else 0
+            lines.append('%-12s %-6s %10.2fms -> %10.2fms  %+6.1f%%'%(key[0], key[1], before, after, change))
+    return '\n'.join(lines)
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the interpolation matrix engine on synthetic masters.')
+    parser.add_argument('--masters', type=int, default=4, help='number of synthetic masters (2 to 4)')
+    parser.add_argument('--glyphs', type=int, default=200, help='glyphs per master')
+    parser.add_argument('--points', type=int, default=40, help='points per glyph')
+    parser.add_argument('--component-depth', type=int, default=2, help='nesting depth of composite glyphs')
+    parser.add_argument('--kerning-pairs', type=int, default=1000, help='kerning pairs per master')
+    parser.add_argument('--grids', default=','.join(defaultGrids), help='comma separated grid sizes for previews, e.g. 3x1,7x7')
+    parser.add_argument('--generation-grid', default='3x3', help='grid size for the full ‘*’ generation')
+    parser.add_argument('--window-size', default='950x350', help='size of the matrix in the window, for level of detail previews')
+    parser.add_argument('--preview-glyphs', type=int, default=10, help='glyphs refreshed per preview run')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark')
+    parser.add_argument('--skip', default='', help='comma separated benchmarks to skip: preview, generation, report')
+    parser.add_argument('--save-instances', action='store_true', help='write generated instances to disk')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON results file (printed to stdout otherwise)')
+    parser.add_argument('--compare', help='previous JSON results to compare against')
+    options = parser.parse_args(args)
+
+    skip = set(name.strip() for name in options.skip.split(',') if name.strip())
+    workFolder = tempfile.mkdtemp(prefix='matrixBenchmark-')
+
+    try:
+        paths = buildSyntheticMasters(os.path.join(workFolder, 'masters'),
+            mastersCount=max(2, min(options.masters, 4)),
+            glyphCount=options.glyphs,
+            pointsPerGlyph=options.points,
+            componentDepth=options.component_depth,
+            kerningPairs=options.kerning_pairs,
+            seed=options.seed)
+        fonts = [OpenFont(path, showInterface=False) for path in paths]
+        glyphOrder = fonts[0].glyphOrder
+        step = max(1, len(glyphOrder) // options.preview_glyphs)
+        previewGlyphs = glyphOrder[::step][:options.preview_glyphs]
+
+        results = []
+        if 'preview' not in skip:
+            results += benchPreview(fonts, options.grids.split(','), previewGlyphs, options.repeat, parseGrid(options.window_size))
+        if 'generation' not in skip:
+            outputFolder = os.path.join(workFolder, 'instances') if options.save_instances else None
+            results += benchGeneration(fonts, options.generation_grid, options.repeat, outputFolder)
+        if 'report' not in skip:
+            results += benchReport(fonts, options.repeat)
+    finally:
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'revision': gitRevision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'masters': options.masters,
+                'glyphs': options.glyphs,
+                'points': options.points,
+                'componentDepth': options.component_depth,
+                'kerningPairs': options.kerning_pairs,
+                'previewGlyphs': len(previewGlyphs),
+                'repeat': options.repeat,
+                'seed': options.seed
+            }
+        },
+        'results': results
+    }
+
+    text = json.dumps(output, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if options.compare:
+        with open(options.compare) as f:
+            previous = json.load(f)
+        print(compareResults(previous, output), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
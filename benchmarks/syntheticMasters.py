@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Builds compatible synthetic master UFOs of a configurable size,
+so the matrix can be measured without any real font at hand.
+'''
+
+from fontParts.world import NewFont
+from math import cos, sin, pi
+import random
+import os
+
+def drawSyntheticContour(pen, center, radius, pointsCount, wobble=0):
+    # one closed contour made of cubic segments (on, off, off),
+    # pointsCount is rounded down to a multiple of 3 (at least two segments)
+    segments = max(2, pointsCount // 3)
+    cx, cy = center
+    step = 2*pi / segments
+    def onCurve(k):
+        a = k*step
+        r = radius + (wobble if k%2 else 0)
+        return cx + r*cos(a), cy + r*sin(a)
+    def handle(k, t):
+        a = (k+t)*step
+        r = radius*1.05
+        return cx + r*cos(a), cy + r*sin(a)
+    pen.moveTo(onCurve(0))
+    for k in range(segments):
+        pen.curveTo(handle(k, 1/3), handle(k, 2/3), onCurve(k+1))
+    pen.closePath()
+
+def buildSyntheticMasters(folder, mastersCount=4, glyphCount=100, pointsPerGlyph=40, componentDepth=1, kerningPairs=500, seed=0):
+    '''
+    Writes mastersCount UFOs to folder and returns their paths.
+    Glyphs are built out of two contours sharing pointsPerGlyph points;
+    a quarter of them are composites nested componentDepth levels deep.
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    rng = random.Random(seed)
+    compositesCount = glyphCount // 4 if componentDepth > 0 else 0
+    baseNames = ['base%04d'%(k) for k in range(glyphCount - compositesCount)]
+    compositeNames = ['comp%04d'%(k) for k in range(compositesCount)]
+    glyphNames = baseNames + compositeNames
+
+    pairs = set()
+    maxPairs = len(glyphNames)**2
+    while len(pairs) < min(kerningPairs, maxPairs):
+        pairs.add((rng.choice(glyphNames), rng.choice(glyphNames)))
+    pairs = sorted(pairs)
+    kerningValues = [rng.randint(-80, 40) for pair in pairs]
+
+    paths = []
+    for m in range(mastersCount):
+        weight = 1 + m*.5
+        font = NewFont(showInterface=False)
+        font.info.familyName = 'Synthetic'
+        font.info.styleName = 'Master%s'%(m)
+        font.info.unitsPerEm = 1000
+        font.info.ascender = 750
+        font.info.descender = -250
+        font.info.xHeight = 500 + m*10
+        font.info.capHeight = 700 + m*5
+
+        for k, glyphName in enumerate(baseNames):
+            glyph = font.newGlyph(glyphName)
+            glyph.width = 500 + 40*m + (k%7)*10
+            glyph.unicode = 0xE000 + k
+            pen = glyph.getPen()
+            outerPoints = pointsPerGlyph - pointsPerGlyph//3
+            drawSyntheticContour(pen, (250 + 20*m, 350), 200 + 10*m, outerPoints, wobble=5*m)
+            drawSyntheticContour(pen, (250 + 20*m, 350), 100 - 15*weight, pointsPerGlyph - outerPoints)
+
+        for k, glyphName in enumerate(compositeNames):
+            glyph = font.newGlyph(glyphName)
+            glyph.width = 600 + 40*m
+            glyph.unicode = 0xE000 + len(baseNames) + k
+            pen = glyph.getPen()
+            # nest composites: each level points at the composite one level below
+            if k % componentDepth > 0:
+                baseGlyph = compositeNames[k-1]
+            else:
+                baseGlyph = baseNames[k % len(baseNames)]
+            pen.addComponent(baseGlyph, (1, 0, 0, 1, 0, 0))
+            pen.addComponent(baseNames[(k+1) % len(baseNames)], (.5, 0, 0, .5, 100 + 10*m, 600))
+
+        font.glyphOrder = glyphNames
+        for (first, second), value in zip(pairs, kerningValues):
+            font.kerning[(first, second)] = value + m*10
+        font.groups['public.kern1.synthetic'] = baseNames[:10]
+
+        path = os.path.join(folder, 'Synthetic-Master%s.ufo'%(m))
+        font.save(path)
+        font.close()
+        paths.append(path)
+
+    return paths
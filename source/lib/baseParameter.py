@@ -1,6 +1,7 @@
 # coding=utf-8
 # Loïc Sander — 2014
 from __future__ import division
+from contextlib import contextmanager
 import re
 
 class ParameterModeError(Exception):
@@ -20,17 +21,106 @@ def valueToRatio(referenceValue, value, rounding=8):
 def ratioToValue(reference, ratio, rounding=8):
     return round(reference * ratio, rounding)
 
+def formatValue(value, numType):
+    if numType == 'int':
+        value = int(round(value))
+    elif numType == 'float':
+        value = round(value, 2)
+    return value
+
+def constrainValue(value, limits, numType):
+    if limits is not None:
+        minValue, maxValue = limits
+        if value < minValue: value = minValue
+        elif value > maxValue: value = maxValue
+    return formatValue(value, numType)
+
+class ParameterGraph(object):
+
+    '''
+    Parameters connected through their masters. A change is propagated to the dependents
+    of the changed parameter once each, masters before slaves; within a batch, propagation
+    waits for the end of the batch, so that many changes only update each dependent once:
+
+        with graph.batch():
+            for parameter in parameters:
+                parameter.set(value)
+    '''
+
+    def __init__(self):
+        self.batchDepth = 0
+        self.pending = []
+        self.pendingIds = set()
+
+    @contextmanager
+    def batch(self):
+        self.batchDepth += 1
+        try:
+            yield self
+        finally:
+            self.batchDepth -= 1
+            if not self.batchDepth:
+                self.flush()
+
+    def changed(self, parameter):
+        parameter.invalidate()
+        if id(parameter) not in self.pendingIds:
+            self.pendingIds.add(id(parameter))
+            self.pending.append(parameter)
+        if not self.batchDepth:
+            self.flush()
+
+    def flush(self):
+        while self.pending:
+            changed, self.pending, self.pendingIds = self.pending, [], set()
+            for parameter in self.getDependents(changed):
+                parameter.recompute()
+
+    def getDependents(self, parameters):
+        '''
+        Slaves of parameters (and their own slaves), each once, in topological order.
+        '''
+        affected = set()
+        stack = [slave for parameter in parameters for slave in parameter.slaves]
+        while stack:
+            parameter = stack.pop()
+            if id(parameter) not in affected:
+                affected.add(id(parameter))
+                stack.extend(parameter.slaves)
+        # every parameter has a single master: going down from the topmost affected parameters
+        # reaches each of them after its master
+        order = []
+        for parameter in parameters:
+            for slave in parameter.slaves:
+                if id(slave) in affected and id(parameter) not in affected:
+                    affected.discard(id(slave))
+                    order.append(slave)
+        index = 0
+        while index < len(order):
+            for slave in order[index].slaves:
+                if id(slave) in affected:
+                    affected.discard(id(slave))
+                    order.append(slave)
+            index += 1
+        return order
+
 class SingleValueParameter(object):
 
     '''
     Base parameter object built to connect numerical values
     on a _ratio_ or _offset_ basis, dynamically.
+    Values are cached until the parameter or one of its masters changes,
+    changes are propagated through the graph of the master (see ParameterGraph).
     '''
 
-    def __init__(self, name, defaultValue, limits=None, numType='float', master=None, mode=None):
+    def __init__(self, name, defaultValue, limits=None, numType='float', master=None, mode=None, graph=None):
         self.name = name
         self.value = defaultValue
         self.master = master
+        self._cachedValue = None
+        if graph is None:
+            graph = master.graph if master is not None else ParameterGraph()
+        self.graph = graph
         self.mode = mode
         self.numType = numType
         self.validModes = ['ratio', 'offset']
@@ -99,7 +189,7 @@ class SingleValueParameter(object):
 
 
     def clone(self):
-        return self.__class__(self.name, self.defaultValue, self.limits, self.numType, self.master, self.mode)
+        return self.__class__(self.name, self.defaultValue, self.limits, self.numType, self.master, self.mode, self.graph)
 
     def asDict(self):
         return dict(
@@ -149,8 +239,14 @@ class SingleValueParameter(object):
         if mode in self.validModes:
             self.mode = mode
             self.relationValue = self._getRelationValue()
+            self.invalidate()
 
     def get(self):
+        if self._cachedValue is None:
+            self._cachedValue = self._computeValue()
+        return self._cachedValue
+
+    def _computeValue(self):
         master = self.master
         mode = self.mode
         if (master is not None) and (mode is not None):
@@ -195,9 +291,29 @@ class SingleValueParameter(object):
         self.propagate()
 
     def propagate(self):
-        for slave in self.slaves:
-            slave.value = slave.get()
-            slave.update()
+        self.graph.changed(self)
+
+    def setGraph(self, graph):
+        stack = [self]
+        while stack:
+            parameter = stack.pop()
+            parameter.graph = graph
+            stack.extend(parameter.slaves)
+
+    def invalidate(self):
+        # cached values of this parameter and everything depending on it
+        stack = [self]
+        while stack:
+            parameter = stack.pop()
+            parameter._cachedValue = None
+            stack.extend(parameter.slaves)
+
+    def recompute(self):
+        # a master changed: value follows the relation, then the relation is taken again from the (constrained) value
+        self._cachedValue = None
+        self.value = self.get()
+        self.relationValue = self._getRelationValue()
+        self._cachedValue = None
 
     def reset(self):
         master = self.master
@@ -206,6 +322,7 @@ class SingleValueParameter(object):
         elif master is not None:
             self.value = master.get()
         self.relationValue = self._getRelationValue()
+        self.invalidate()
 
     def setDefault(self, value):
         value = self._checkValue(value)
@@ -223,8 +340,10 @@ class SingleValueParameter(object):
             if parameter.mode in ['ratio', 'offset']:
                 self.slaves.append(parameter)
                 parameter.master = self
+                parameter.setGraph(self.graph)
                 parameter.relationValue = parameter._getRelationValue()
                 parameter.limits = self.limits
+                parameter.invalidate()
                 parameter.value = parameter.get()
                 parameter.update()
             else:
@@ -243,14 +362,14 @@ class SingleValueParameter(object):
             master.enslave(self)
         elif master is None:
             self.master = None
+            self.invalidate()
 
     def setLimits(self, minMax):
         (minValue, maxValue) = minMax
         self.limits = (minValue, maxValue)
         for slave in self.slaves:
             slave.limits = (minValue, maxValue)
-            slave.value = slave.get()
-            slave.update()
+        self.propagate()
 
     def _checkValue(self, value):
         if value == 'R':
@@ -272,19 +391,10 @@ class SingleValueParameter(object):
         return
 
     def _constrainValue(self, value):
-        limits = self.limits
-        if limits is not None:
-            minValue, maxValue = limits
-            if value < minValue: value = minValue
-            elif value > maxValue: value = maxValue
-        return self._formatValue(value)
+        return constrainValue(value, self.limits, self.numType)
 
     def _formatValue(self, value):
-        if self.numType == 'int':
-            value = int(round(value))
-        elif self.numType == 'float':
-            value = round(value, 2)
-        return value
+        return formatValue(value, self.numType)
 
 # Testing stuff
 # fontWeight = SingleValueParameter('fontWeight', 80, (1,500), 'int')
@@ -0,0 +1,228 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Compatibility index of a matrix’s masters: per glyph, its status (compatible, incompatible or mixed),
+the master pairs it’s incompatible in and why, along with the content hashes of the glyph in every master
+(see glyphHashes), so that results saved next to the matrix are reused for glyphs that didn’t change.
+
+Checking masters doesn’t touch them, mark colors are only written on request, in one batch,
+and only to glyphs whose status changed since they were last marked:
+
+    index = CompatibilityIndex.read(getIndexPath(matrixPath))
+    index.getGlyphs(INCOMPATIBLE)
+    index.applyMarks(masterFonts, {COMPATIBLE: green, INCOMPATIBLE: red, MIXED: orange})
+'''
+
+from glyphCompatibility import COMPATIBLE, INCOMPATIBLE
+import json
+import os
+
+MIXED = 'mixed'
+STATUSES = [COMPATIBLE, MIXED, INCOMPATIBLE]
+INDEX_SUFFIX = '.compatibility.json'
+
+def getIndexPath(matrixPath):
+    '''
+    Index file saved next to a matrix file: matrix.txt -> matrix.compatibility.json
+    '''
+    return os.path.splitext(matrixPath)[0] + INDEX_SUFFIX
+
+def _sameColor(first, second):
+    if first is None or second is None:
+        return first is None and second is None
+    return len(first) == len(second) and all(abs(a - b) < 1e-4 for a, b in zip(first, second))
+
+
+class CompatibilityIndex(object):
+
+    '''
+    Results of checking glyphs of masters (labels, in order) against the first master.
+    Entries are {'status', 'pairs': [[0, masterIndex], …], 'reasons': [report, …], 'hashes': [hash, …]},
+    a reason per incompatible pair.
+    '''
+
+    def __init__(self, masters=(), strayGlyphs=()):
+        self.masters = list(masters)
+        self.strayGlyphs = sorted(strayGlyphs)
+        self.entries = {}
+        self.glyphList = []
+        # status signatures of glyphs as they were last marked, and the colors they were marked with
+        self.marked = {}
+        self.markColors = None
+        # whether the check that built the index stopped before every glyph was checked (not saved)
+        self.stopped = False
+
+    def __repr__(self):
+        return '<CompatibilityIndex %s glyphs, %s masters>'%(len(self.glyphList), len(self.masters))
+
+    def __len__(self):
+        return len(self.glyphList)
+
+    def __contains__(self, glyphName):
+        return glyphName in self.entries
+
+    def setEntry(self, glyphName, hashes, failures):
+        '''
+        Records a glyph out of its hashes in every master and [(masterIndex, report)] of the pairs it failed in.
+        '''
+        if not failures:
+            status = COMPATIBLE
+        elif len(failures) < len(hashes) - 1:
+            status = MIXED
+        else:
+            status = INCOMPATIBLE
+        if glyphName not in self.entries:
+            self.glyphList.append(glyphName)
+        self.entries[glyphName] = {
+            'status': status,
+            'pairs': [[0, masterIndex] for masterIndex, report in failures],
+            'reasons': [report for masterIndex, report in failures],
+            'hashes': list(hashes)
+        }
+
+    def getEntry(self, glyphName):
+        return self.entries.get(glyphName)
+
+    def getStatus(self, glyphName):
+        '''
+        Status of a glyph, None if it isn’t indexed (stray or unchecked).
+        '''
+        entry = self.entries.get(glyphName)
+        if entry is not None:
+            return entry['status']
+
+    def getGlyphs(self, status=None):
+        '''
+        Indexed glyphs with status (any status if None), in order.
+        '''
+        if status is None:
+            return list(self.glyphList)
+        return [glyphName for glyphName in self.glyphList if self.entries[glyphName]['status'] == status]
+
+    def getCounts(self):
+        counts = dict((status, 0) for status in STATUSES)
+        for entry in self.entries.values():
+            counts[entry['status']] += 1
+        return counts
+
+    def getFailures(self, glyphName):
+        '''
+        [(masterIndex, report)] of the pairs a glyph is incompatible in.
+        '''
+        entry = self.entries.get(glyphName)
+        if entry is None:
+            return []
+        return [(pair[1], report) for pair, report in zip(entry['pairs'], entry['reasons'])]
+
+    def getMasterStatus(self, glyphName, masterIndex):
+        '''
+        Status a glyph is marked with in a master: the glyph’s own status in the first master,
+        incompatible in masters it fails against, mixed or compatible in others.
+        '''
+        status = self.entries[glyphName]['status']
+        if masterIndex == 0 or status == COMPATIBLE:
+            return status
+        if any(pair[1] == masterIndex for pair in self.entries[glyphName]['pairs']):
+            return INCOMPATIBLE
+        return MIXED
+
+    def getPairResults(self):
+        '''
+        Yields ((glyphName, hash0, hashK), (compatible, report)) per indexed master pair,
+        as kept by the matrix engine’s compatibility cache.
+        '''
+        for glyphName in self.glyphList:
+            entry = self.entries[glyphName]
+            hashes = entry['hashes']
+            failures = dict(self.getFailures(glyphName))
+            for masterIndex in range(1, len(hashes)):
+                compatible = masterIndex not in failures
+                yield (glyphName, hashes[0], hashes[masterIndex]), (compatible, failures.get(masterIndex, ''))
+
+    def inheritMarks(self, other):
+        '''
+        Takes over what other (an earlier index of the same masters) marked, so that only changes get marked again.
+        '''
+        if other is not None and other.masters == self.masters:
+            self.marked = dict(other.marked)
+            self.markColors = other.markColors
+
+    def applyMarks(self, fonts, colors):
+        '''
+        Sets the mark color of indexed glyphs in fonts (fontParts, in master order) out of colors {status: color},
+        for glyphs whose status changed since they were last marked (all of them if colors changed).
+        Font notifications are held until every mark is written, marks already right aren’t written again.
+        Returns the number of glyphs whose marks were checked.
+        '''
+        colors = dict((status, tuple(color) if color is not None else None) for status, color in colors.items())
+        if colors != self.markColors:
+            self.marked = {}
+            self.markColors = colors
+        changedGlyphs = []
+        for glyphName in self.glyphList:
+            entry = self.entries[glyphName]
+            signature = (entry['status'], tuple(pair[1] for pair in entry['pairs']))
+            if self.marked.get(glyphName) != signature:
+                changedGlyphs.append((glyphName, signature))
+        if not changedGlyphs:
+            return 0
+
+        dispatchers = []
+        for font in fonts:
+            dispatcher = getattr(font.naked(), 'dispatcher', None) if hasattr(font, 'naked') else None
+            if dispatcher is not None:
+                dispatcher.holdNotifications(note='Interpolation matrix compatibility marks')
+                dispatchers.append(dispatcher)
+        try:
+            for glyphName, signature in changedGlyphs:
+                for masterIndex, font in enumerate(fonts):
+                    glyph = font[glyphName]
+                    color = colors.get(self.getMasterStatus(glyphName, masterIndex))
+                    if not _sameColor(glyph.markColor, color):
+                        glyph.markColor = color
+                self.marked[glyphName] = signature
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.releaseHeldNotifications()
+        return len(changedGlyphs)
+
+    def toDict(self):
+        return {
+            'masters': self.masters,
+            'strayGlyphs': self.strayGlyphs,
+            'glyphs': [dict(name=glyphName, **self.entries[glyphName]) for glyphName in self.glyphList]
+        }
+
+    @classmethod
+    def fromDict(cls, data):
+        index = cls(data.get('masters', []), data.get('strayGlyphs', []))
+        for entry in data.get('glyphs', []):
+            entry = dict(entry)
+            glyphName = entry.pop('name')
+            index.glyphList.append(glyphName)
+            index.entries[glyphName] = entry
+        return index
+
+    def write(self, path):
+        '''
+        Saves the index as JSON, in one go.
+        '''
+        temporaryPath = path + '.tmp'
+        with open(temporaryPath, 'w') as f:
+            json.dump(self.toDict(), f, indent=1)
+        os.replace(temporaryPath, path)
+        return path
+
+    @classmethod
+    def read(cls, path):
+        '''
+        Index saved at path, None if there’s none or it can’t be read.
+        '''
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                return cls.fromDict(json.load(f))
+        except (ValueError, KeyError, TypeError):
+            return
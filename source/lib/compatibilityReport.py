@@ -0,0 +1,173 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Streamed compatibility reports: records are written out as glyphs are checked,
+instead of a digest put together and printed once the whole check is done.
+
+Records are dicts, by type:
+
+    {'type': 'start', 'matrix', 'masters': [label, …], 'glyphCount'}
+    {'type': 'glyph', 'glyph', 'status', 'reasons': [reason, …], 'pairs': [[0, masterIndex], …]}   (glyphs that aren’t compatible, pairs optional)
+    {'type': 'progress', 'checked', 'glyphCount'}
+    {'type': 'stray', 'glyphs': [glyphName, …]}
+    {'type': 'summary', 'checked', 'counts': {status: count}, 'stray', 'stopped', 'seconds'}
+
+Writers take records one at a time and flush them, a ReportStream hands records to several writers:
+
+    with ReportStream([JSONLinesWriter('-'), HTMLReportWriter('report.html')]) as stream:
+        stream.write({'type': 'glyph', 'glyph': 'a', 'status': 'incompatible', 'reasons': [...]})
+'''
+
+from html import escape
+import json
+import sys
+
+class JSONLinesWriter(object):
+
+    '''
+    Writes records as JSON lines to path ('-' for the standard output) or to an open stream.
+    '''
+
+    def __init__(self, path):
+        self.ownsStream = not hasattr(path, 'write') and path != '-'
+        if self.ownsStream:
+            self.stream = open(path, 'w')
+        else:
+            self.stream = sys.stdout if path == '-' else path
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        if self.ownsStream:
+            self.stream.close()
+
+
+class HTMLReportWriter(object):
+
+    '''
+    Writes records as an HTML page at path, flushed row by row so that it can be looked at while the check runs.
+    Progress records aren’t written.
+    '''
+
+    STYLE = '''body { font: 13px -apple-system, Helvetica, sans-serif; margin: 2em; }
+table { border-collapse: collapse; width: 100%; }
+td, th { border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left; vertical-align: top; }
+.incompatible td.status { color: #c00; }
+.mixed td.status, .fixable td.status { color: #d80; }
+pre { margin: 0; white-space: pre-wrap; }'''
+
+    def __init__(self, path, title='Compatibility report'):
+        self.stream = open(path, 'w')
+        self.masters = []
+        self.tableOpen = False
+        self.closed = False
+        self._write(u'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>%s</title>\n<style>\n%s\n</style>\n</head>\n<body>\n<h1>%s</h1>\n'%(escape(title), self.STYLE, escape(title)))
+
+    def _write(self, text):
+        self.stream.write(text)
+        self.stream.flush()
+
+    def _closeTable(self):
+        if self.tableOpen:
+            self._write(u'</table>\n')
+            self.tableOpen = False
+
+    def write(self, record):
+        kind = record['type']
+        if kind == 'start':
+            self.masters = record.get('masters', [])
+            self._write(u'<p>%s — %s glyphs, masters: %s</p>\n'%(escape(record.get('matrix') or ''), record['glyphCount'], escape(', '.join(self.masters))))
+        elif kind == 'glyph':
+            if not self.tableOpen:
+                self._write(u'<table>\n<tr><th>Glyph</th><th>Status</th><th>Masters</th><th>Reasons</th></tr>\n')
+                self.tableOpen = True
+            pairs = record.get('pairs') or []
+            masters = ', '.join(self._pairName(pair) for pair in pairs)
+            reasons = ''.join(u'<pre>%s</pre>'%(escape(reason)) for reason in record['reasons'])
+            self._write(u'<tr class="%s"><td>%s</td><td class="status">%s</td><td>%s</td><td>%s</td></tr>\n'%(record['status'], escape(record['glyph']), record['status'], escape(masters), reasons))
+        elif kind == 'stray':
+            self._closeTable()
+            if record['glyphs']:
+                self._write(u'<h2>Stray glyphs (%s)</h2>\n<p>%s</p>\n'%(len(record['glyphs']), escape(' '.join(record['glyphs']))))
+        elif kind == 'summary':
+            self._closeTable()
+            counts = ', '.join('%s %s'%(count, status) for status, count in sorted(record['counts'].items()))
+            stopped = u' (stopped at the first incompatible glyph)' if record.get('stopped') else u''
+            self._write(u'<h2>Summary</h2>\n<p>%s glyphs checked%s: %s, %s stray, %0.2fs</p>\n'%(record['checked'], stopped, counts, record['stray'], record.get('seconds', 0)))
+
+    def _pairName(self, pair):
+        if all(index < len(self.masters) for index in pair):
+            return u'%s <X> %s'%(self.masters[pair[0]], self.masters[pair[1]])
+        return u'%s <X> %s'%tuple(pair)
+
+    def close(self):
+        if not self.closed:
+            self._closeTable()
+            self._write(u'</body>\n</html>\n')
+            self.stream.close()
+            self.closed = True
+
+
+class TextDigestWriter(object):
+
+    '''
+    Prints records as the text digest of the window’s compatibility report (one block per master pair & reason),
+    to stream (the standard output by default), as they come.
+    '''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.masters = []
+        self.reportIDs = set()
+
+    def _print(self, text):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text + '\n')
+
+    def write(self, record):
+        kind = record['type']
+        if kind == 'start':
+            self.masters = record.get('masters', [])
+        elif kind == 'glyph':
+            pairs = record.get('pairs') or [None] * len(record['reasons'])
+            for pair, reason in zip(pairs, record['reasons']):
+                names = '%s <X> %s'%(self.masters[pair[0]], self.masters[pair[1]]) if pair is not None else record['glyph']
+                reportID = (names, reason)
+                if reportID not in self.reportIDs:
+                    self.reportIDs.add(reportID)
+                    lines = [names] + [u'– %s'%(reportLine) for reportLine in reason.split('\n')] + ['\n']
+                    self._print('\n'.join(lines))
+        elif kind == 'stray':
+            self._print(u'*** Stray glyphs: %s'%(len(record['glyphs'])))
+            for glyphName in record['glyphs']:
+                self._print(u'– %s'%(glyphName))
+
+    def close(self):
+        pass
+
+
+class ReportStream(object):
+
+    '''
+    Hands records to every writer, closes them once done.
+    '''
+
+    def __init__(self, writers=()):
+        self.writers = list(writers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record):
+        for writer in self.writers:
+            writer.write(record)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
@@ -0,0 +1,208 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Job pipeline for generation work (instances, glyph sets), running in background threads.
+
+Jobs are submitted as target(job, *args), targets report progress through job.progress(done, total),
+which is also where cancellation is picked up. Subscribers receive every event as a dict:
+
+    {'type': 'queued' | 'started' | 'progress' | 'finished' | 'failed' | 'cancelled', 'job': job, …}
+    {'type': 'done', 'job': None, 'summary': {…}}   once every submitted job is over
+
+Subscribers are called from the worker threads, a UI has to hand events over to its main thread.
+'''
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import traceback
+import time
+
+QUEUED = 'queued'
+STARTED = 'started'
+PROGRESS = 'progress'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+DONE = 'done'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobFailed(Exception):
+
+    '''
+    Raised by targets that caught and described their own error, recorded as is.
+    '''
+
+    pass
+
+
+class GenerationJob(object):
+
+    '''
+    A unit of work in a GenerationPipeline, holding its status, progress, result or error.
+    '''
+
+    # minimum delay between two progress events of a job
+    progressInterval = .1
+
+    def __init__(self, pipeline, name, target, args, kwargs):
+        self.pipeline = pipeline
+        self.name = name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.startTime = None
+        self.endTime = None
+        self.future = None
+        self._cancelled = threading.Event()
+        self._lastProgress = 0
+
+    def __repr__(self):
+        return '<GenerationJob %s %s>' % (self.name, self.status)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def checkCancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled(self.name)
+
+    def progress(self, done, total=None, message=None):
+        '''
+        Called by job targets as they go, raises JobCancelled if the job was cancelled.
+        '''
+        self.checkCancelled()
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        now = time.time()
+        if now - self._lastProgress >= self.progressInterval or (self.total is not None and done >= self.total):
+            self._lastProgress = now
+            self.pipeline._emit(PROGRESS, self)
+
+    def getSeconds(self):
+        if self.startTime is None:
+            return 0
+        return (self.endTime or time.time()) - self.startTime
+
+
+class GenerationPipeline(object):
+
+    '''
+    Runs jobs on a pool of background threads and broadcasts their events to subscribers.
+    '''
+
+    def __init__(self, workers=1):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.jobs = []
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._startTime = None
+
+    def subscribe(self, callback):
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _emit(self, eventType, job=None, **info):
+        event = dict(type=eventType, job=job, **info)
+        for callback in list(self.subscribers):
+            try:
+                callback(event)
+            except Exception:
+                traceback.print_exc()
+
+    def submit(self, name, target, *args, **kwargs):
+        job = GenerationJob(self, name, target, args, kwargs)
+        with self._lock:
+            if self._pending == 0:
+                # a new batch
+                self.jobs = []
+                self._startTime = time.time()
+            self.jobs.append(job)
+            self._pending += 1
+        self._emit(QUEUED, job)
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = STARTED
+        job.startTime = time.time()
+        self._emit(STARTED, job)
+        try:
+            job.result = job.target(job, *job.args, **job.kwargs)
+            status = FINISHED
+        except JobCancelled:
+            status = CANCELLED
+        except JobFailed as e:
+            job.error = str(e)
+            status = FAILED
+        except Exception as e:
+            job.error = '%s: %s' % (e.__class__.__name__, e)
+            job.traceback = traceback.format_exc()
+            status = FAILED
+        self._finish(job, status)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.endTime = time.time()
+        self._emit(status, job)
+        with self._lock:
+            self._pending -= 1
+            batchDone = self._pending == 0
+        if batchDone:
+            self._emit(DONE, summary=self.getSummary())
+
+    def isRunning(self):
+        return self._pending > 0
+
+    def cancel(self, job=None):
+        '''
+        Cancels a job, or every job of the current batch. Running jobs stop at their next progress call.
+        '''
+        jobs = [job] if job is not None else list(self.jobs)
+        for job in jobs:
+            job.cancel()
+
+    def getSummary(self):
+        jobs = list(self.jobs)
+        summary = dict((status, 0) for status in [QUEUED, STARTED, FINISHED, FAILED, CANCELLED])
+        for job in jobs:
+            summary[job.status] += 1
+        summary['jobs'] = len(jobs)
+        summary['errors'] = [(job.name, job.error) for job in jobs if job.status == FAILED]
+        summary['seconds'] = time.time() - self._startTime if self._startTime is not None else 0
+        return summary
+
+    def wait(self, timeout=None):
+        wait([job.future for job in list(self.jobs)], timeout)
+        return self.getSummary()
+
+    def shutdown(self, cancel=False):
+        if cancel:
+            self.cancel()
+        self.executor.shutdown(wait=True)
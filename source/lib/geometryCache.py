@@ -0,0 +1,220 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Persistent cache of packed master geometry (see masterGeometry), one memory-mapped file per UFO.
+
+Cached files are keyed by UFO path and validated against the modification time and size
+of every .glif (and of kerning.plist & groups.plist). When a master changed, only the glyphs
+whose .glif changed are parsed again, everything else is copied over from the previous file.
+'''
+
+from fontTools.pens.recordingPen import RecordingPointPen
+from fontTools.ufoLib import UFOReader
+from masterGeometry import FontGeometry, MasterGeometry, PackedAnchor, packFont, MAGIC
+import hashlib
+import mmap
+import os
+
+def getDefaultCacheFolder():
+    cacheHome = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cacheHome, 'interpolation-matrix')
+
+def _fileStamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class _GlifGlyph(object):
+
+    '''
+    Glyph read straight from a .glif, to be packed.
+    '''
+
+    def __init__(self, glyphSet, glyphName):
+        self.name = glyphName
+        self.width = 0
+        self.height = 0
+        self.unicodes = []
+        self.anchors = []
+        self.guidelines = []
+        self.lib = {}
+        self.note = None
+        self.recording = RecordingPointPen()
+        glyphSet.readGlyph(glyphName, self, self.recording)
+        self.anchors = [PackedAnchor(anchor) for anchor in self.anchors]
+
+    def drawPoints(self, pen):
+        self.recording.replay(pen)
+
+
+class _UFOSource(object):
+
+    '''
+    Font-like source for packFont: unchanged glyphs, kerning and groups come from
+    the previously cached geometry, changed ones are read from the UFO.
+    '''
+
+    def __init__(self, path, reader, glyphSet, previous, stamps):
+        self.path = path
+        self.reader = reader
+        self.glyphSet = glyphSet
+        self.previous = previous
+        self.stamps = stamps
+        self.parsedGlyphs = 0
+
+    def _isUnchanged(self, key, glyphName=None):
+        previous = self.previous
+        if previous is None or previous.stamps is None:
+            return False
+        if glyphName is None:
+            return previous.stamps[key] == self.stamps[key]
+        return glyphName in previous and previous.stamps['glyphs'].get(glyphName) == self.stamps['glyphs'][glyphName]
+
+    def keys(self):
+        return list(self.glyphSet.keys())
+
+    def __contains__(self, glyphName):
+        return glyphName in self.glyphSet
+
+    def __getitem__(self, glyphName):
+        if self._isUnchanged('glyphs', glyphName):
+            return self.previous[glyphName]
+        self.parsedGlyphs += 1
+        return _GlifGlyph(self.glyphSet, glyphName)
+
+    @property
+    def kerning(self):
+        if self._isUnchanged('kerning'):
+            return self.previous.kerning
+        return self.reader.readKerning()
+
+    @property
+    def groups(self):
+        if self._isUnchanged('groups'):
+            return self.previous.groups
+        return self.reader.readGroups()
+
+
+class GeometryCache(object):
+
+    '''
+    Folder of packed master geometry files, memory-mapped when read.
+
+        cache = GeometryCache()
+        geometry = cache.getMasterGeometry([master.getFont().path for master in engine.masters])
+        engine.setGeometry(geometry)
+
+    Only UFOs saved as folders on disk are cached, the cache reflects what’s on disk (not unsaved changes).
+    '''
+
+    def __init__(self, folder=None):
+        if folder is None:
+            folder = getDefaultCacheFolder()
+        self.folder = folder
+        self.stats = {'hits': 0, 'updates': 0, 'parsedGlyphs': 0}
+
+    def getCachePath(self, ufoPath):
+        key = hashlib.sha1(os.path.abspath(ufoPath).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.folder, '%s.geom' % (key))
+
+    def getStamps(self, ufoPath, glyphSet):
+        glyphsFolder = os.path.join(ufoPath, glyphSet.dirName)
+        return {
+            'glyphs': dict((glyphName, _fileStamp(os.path.join(glyphsFolder, fileName))) for glyphName, fileName in glyphSet.contents.items()),
+            'kerning': _fileStamp(os.path.join(ufoPath, 'kerning.plist')),
+            'groups': _fileStamp(os.path.join(ufoPath, 'groups.plist'))
+        }
+
+    def _map(self, cachePath):
+        try:
+            with open(cachePath, 'rb') as f:
+                fileMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None, None
+        if fileMap[:len(MAGIC)] != MAGIC:
+            fileMap.close()
+            return None, None
+        try:
+            return FontGeometry(fileMap), fileMap
+        except ValueError:
+            fileMap.close()
+            return None, None
+
+    def getFontGeometry(self, ufoPath):
+        '''
+        Returns (fontGeometry, fileMap) for a UFO, updating its cached file first if the UFO changed.
+        Returns (None, None) if the UFO can’t be cached. fontGeometry must be released before fileMap is closed.
+        '''
+        if ufoPath is None or not os.path.isdir(ufoPath):
+            return None, None
+        reader = UFOReader(ufoPath, validate=False)
+        glyphSet = reader.getGlyphSet(validateRead=False)
+        stamps = self.getStamps(ufoPath, glyphSet)
+        cachePath = self.getCachePath(ufoPath)
+        previous, previousMap = self._map(cachePath)
+
+        ufoPath = os.path.abspath(ufoPath)
+        sameUFO = previous is not None and previous.path == ufoPath
+        if sameUFO and previous.stamps == stamps:
+            self.stats['hits'] += 1
+            return previous, previousMap
+
+        # glyphs of a file written for another UFO can’t be reused
+        source = _UFOSource(ufoPath, reader, glyphSet, previous if sameUFO else None, stamps)
+        data = packFont(source, stamps=stamps)
+        if previous is not None:
+            previous.release()
+            previousMap.close()
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        # mapped copies of the previous file (other processes) remain valid after the replace
+        tempPath = '%s.%s.tmp' % (cachePath, os.getpid())
+        with open(tempPath, 'wb') as f:
+            f.write(data)
+        os.replace(tempPath, cachePath)
+        self.stats['updates'] += 1
+        self.stats['parsedGlyphs'] += source.parsedGlyphs
+        return self._map(cachePath)
+
+    def updatePaths(self, ufoPaths):
+        '''
+        Brings cached files up to date, returns their paths (None for UFOs that can’t be cached).
+        '''
+        cachePaths = []
+        for ufoPath in ufoPaths:
+            geometry, fileMap = self.getFontGeometry(ufoPath)
+            if geometry is None:
+                cachePaths.append(None)
+                continue
+            geometry.release()
+            fileMap.close()
+            cachePaths.append(self.getCachePath(ufoPath))
+        return cachePaths
+
+    def getMasterGeometry(self, ufoPaths):
+        '''
+        Memory-mapped MasterGeometry for ufoPaths, None if one of them can’t be cached.
+        '''
+        geometries = []
+        fileMaps = []
+        for ufoPath in ufoPaths:
+            geometry, fileMap = self.getFontGeometry(ufoPath)
+            if geometry is None:
+                for geometry in geometries:
+                    geometry.release()
+                for fileMap in fileMaps:
+                    fileMap.close()
+                return None
+            geometries.append(geometry)
+            fileMaps.append(fileMap)
+        return MasterGeometry(geometries, fileMaps)
+
+    def clear(self):
+        if os.path.isdir(self.folder):
+            for fileName in os.listdir(self.folder):
+                if fileName.endswith('.geom'):
+                    os.remove(os.path.join(self.folder, fileName))
@@ -0,0 +1,189 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Structural compatibility of master glyphs, checked before any interpolation math.
+
+Each master glyph is reduced to a signature (point structure of its contours, component bases, anchor names),
+comparing signatures classifies a glyph as:
+
+    compatible      same structure in every master
+    fixable         interpolable once fixed (contour order) or with minor losses (point types, anchors)
+    incompatible    can’t be interpolated (contour/point counts, components)
+'''
+
+from fontTools.pens.pointPen import AbstractPointPen
+from glyphDiagnostics import QUESTIONABLE
+
+COMPATIBLE = 'compatible'
+FIXABLE = 'fixable'
+INCOMPATIBLE = 'incompatible'
+
+
+class SignaturePointPen(AbstractPointPen):
+
+    def __init__(self):
+        self.contours = []
+        self.components = []
+        self._current = None
+
+    def beginPath(self, identifier=None, **kwargs):
+        self._current = []
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self._current.append(segmentType)
+
+    def endPath(self):
+        self.contours.append(tuple(self._current))
+        self._current = None
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.components.append(baseGlyphName)
+
+
+class GlyphSignature(object):
+
+    '''
+    Point structure of a glyph: segment types per contour, component bases and anchor names.
+    '''
+
+    __slots__ = ['contours', 'components', 'anchors']
+
+    def __init__(self, contours, components, anchors):
+        self.contours = contours
+        self.components = components
+        self.anchors = anchors
+
+    @classmethod
+    def fromGlyph(cls, glyph):
+        pen = SignaturePointPen()
+        glyph.drawPoints(pen)
+        anchors = tuple(sorted(anchor.name for anchor in glyph.anchors))
+        return cls(tuple(pen.contours), tuple(sorted(pen.components)), anchors)
+
+    def __eq__(self, other):
+        return self.contours == other.contours and self.components == other.components and self.anchors == other.anchors
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.contours, self.components, self.anchors))
+
+    def pointCounts(self):
+        return tuple(len(contour) for contour in self.contours)
+
+
+def getContourOrder(reference, other):
+    '''
+    Order in which other’s contours should be read to match reference’s point structure,
+    None if no such order exists.
+    '''
+    available = list(range(len(other.contours)))
+    order = []
+    for contour in reference.contours:
+        match = None
+        for index in available:
+            if other.contours[index] == contour:
+                match = index
+                break
+        if match is None:
+            # fall back on point counts only (point types differ)
+            for index in available:
+                if len(other.contours[index]) == len(contour):
+                    match = index
+                    break
+        if match is None:
+            return
+        available.remove(match)
+        order.append(match)
+    return order
+
+def compareSignatures(signatures, labels=None):
+    '''
+    Classifies a glyph from its master signatures (the first one being the reference).
+    Returns (status, reasons, contourOrders), contourOrders listing, per master,
+    the contour order to apply before interpolating (None when unchanged).
+    '''
+    if labels is None:
+        labels = ['master %s'%(index) for index in range(len(signatures))]
+    status = COMPATIBLE
+    reasons = []
+    contourOrders = [None] * len(signatures)
+    reference = signatures[0]
+
+    def degrade(newStatus, reason):
+        reasons.append(reason)
+        return INCOMPATIBLE if INCOMPATIBLE in (status, newStatus) else newStatus
+
+    for index, signature in enumerate(signatures[1:], 1):
+        label = '%s / %s'%(labels[0], labels[index])
+        if signature == reference:
+            continue
+        if signature.components != reference.components:
+            status = degrade(INCOMPATIBLE, 'components differ (%s)'%(label))
+        if len(signature.contours) != len(reference.contours):
+            status = degrade(INCOMPATIBLE, 'contour count differs: %s vs %s (%s)'%(len(reference.contours), len(signature.contours), label))
+        elif signature.contours != reference.contours:
+            if signature.pointCounts() == reference.pointCounts():
+                status = degrade(FIXABLE, 'point types differ, %s’s are used (%s)'%(labels[0], label))
+            else:
+                order = getContourOrder(reference, signature)
+                if order is None:
+                    status = degrade(INCOMPATIBLE, 'point counts differ: %s vs %s (%s)'%(reference.pointCounts(), signature.pointCounts(), label))
+                else:
+                    contourOrders[index] = order
+                    status = degrade(FIXABLE, 'contour order differs, reordered (%s)'%(label))
+        if signature.anchors != reference.anchors:
+            status = degrade(FIXABLE, 'anchors differ, unmatched anchors are dropped (%s)'%(label))
+
+    return status, reasons, contourOrders
+
+def classifyGlyph(glyphs, labels=None):
+    '''
+    Classifies master glyphs, see compareSignatures.
+    '''
+    return compareSignatures([GlyphSignature.fromGlyph(glyph) for glyph in glyphs], labels)
+
+def reorderContours(mathGlyph, order):
+    '''
+    Reads a glyph’s own contours in order. They’re its last ones: previews have decomposed components first.
+    '''
+    if order is not None:
+        offset = len(mathGlyph.contours) - len(order)
+        mathGlyph.contours = mathGlyph.contours[:offset] + [mathGlyph.contours[offset + index] for index in order]
+    return mathGlyph
+
+def classifyGlyphSet(glyphSet, masterFonts, labels=None):
+    '''
+    Classifies every glyph of glyphSet across masterFonts,
+    returns {glyphName: (status, reasons, contourOrders)}.
+    '''
+    classification = {}
+    for glyphName in glyphSet:
+        classification[glyphName] = classifyGlyph([masterFont[glyphName] for masterFont in masterFonts], labels)
+    return classification
+
+def summarizeReasons(report):
+    '''
+    Groups glyph names by reason, from a {glyphName: {'status', 'reasons'}} report.
+    Geometry issues of interpolated glyphs (an optional 'issues' list, see glyphDiagnostics) are grouped as questionable.
+    Returns [(status, reason, [glyphNames])], incompatible reasons first.
+    '''
+    groups = {}
+    for glyphName, item in report.items():
+        for reason in item['reasons']:
+            groups.setdefault((item['status'], reason), []).append(glyphName)
+        for issue in item.get('issues', []):
+            groups.setdefault((QUESTIONABLE, issue), []).append(glyphName)
+    ordered = sorted(groups.items(), key=lambda group: (group[0][0] != INCOMPATIBLE, group[0][1]))
+    return [(status, reason, sorted(glyphNames)) for (status, reason), glyphNames in ordered]
+
+def reportLines(report):
+    '''
+    Report lines of summarizeReasons, one per reason.
+    '''
+    lines = []
+    for status, reason, glyphNames in summarizeReasons(report):
+        lines.append(u'  – [%s] %s: %s'%(status, reason, ' '.join(glyphNames)))
+    return lines
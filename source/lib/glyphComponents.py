@@ -0,0 +1,137 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Component preserving preview instances: a composite glyph is interpolated as its own contours and
+component transformations only, its base glyphs being interpolated once per location and shared by every
+glyph that uses them (accented glyphs of a run reuse the same base letter and accent instances),
+then drawn in place by their (interpolated) transformation.
+
+    instancer = ComponentInstancer(masterGlyphs, buildMutator)
+    glyph = instancer.makeInstance('eacute', location)    # decomposed math glyph, None if it can’t be interpolated
+
+masterGlyphs is {glyphName: (mutatorMasters, rawMasters)}, as collected by collectComponentMasters,
+buildMutator(mutatorMasters, rawMasters) returns a mutator (MutatorMath or glyphVariations), None if masters aren’t compatible.
+'''
+
+MAX_DEPTH = 16
+
+def scaleMathGlyph(glyph, factor):
+    '''
+    Math glyph scaled by factor, component offsets but not their scale being scaled,
+    so that a base glyph scaled by the same factor lands where it should.
+    '''
+    if factor == 1:
+        return glyph
+    scaled = glyph.copyWithoutMathSubObjects()
+    scaled.width = glyph.width * factor
+    scaled.height = glyph.height * factor
+    for contour in glyph.contours:
+        points = [(segmentType, (x * factor, y * factor), smooth, name, identifier) for segmentType, (x, y), smooth, name, identifier in contour['points']]
+        scaled.contours.append(dict(identifier=contour.get('identifier'), points=points))
+    for component in glyph.components:
+        xx, xy, yx, yy, dx, dy = component['transformation']
+        scaled.components.append(dict(baseGlyph=component['baseGlyph'], transformation=(xx, xy, yx, yy, dx * factor, dy * factor), identifier=component.get('identifier')))
+    for anchor in glyph.anchors:
+        anchor = dict(anchor)
+        anchor['x'], anchor['y'] = anchor['x'] * factor, anchor['y'] * factor
+        scaled.anchors.append(anchor)
+    scaled.guidelines = [dict(guideline) for guideline in glyph.guidelines]
+    return scaled
+
+def transformContours(contours, transformation):
+    '''
+    Copies of math glyph contours transformed by a component’s (xx, xy, yx, yy, dx, dy) transformation.
+    '''
+    xx, xy, yx, yy, dx, dy = transformation
+    if (xx, xy, yx, yy) == (1, 0, 0, 1):
+        if dx == dy == 0:
+            # instances aren’t modified once made, contours can be shared
+            return list(contours)
+        point = lambda x, y: (x + dx, y + dy)
+    else:
+        point = lambda x, y: (xx * x + yx * y + dx, xy * x + yy * y + dy)
+    transformed = []
+    for contour in contours:
+        points = [(segmentType, point(x, y), smooth, name, identifier) for segmentType, (x, y), smooth, name, identifier in contour['points']]
+        transformed.append(dict(identifier=contour.get('identifier'), points=points))
+    return transformed
+
+def collectComponentMasters(glyphNames, masterFonts):
+    '''
+    Gathers glyphs and the base glyphs of their components (all the way down) in every master,
+    returns {glyphName: (mutatorMasters, rawMasters)} of math glyphs scaled to a 1000 units em.
+    masterFonts is [(location, font)], glyphs missing from a master are left out.
+    '''
+    masterGlyphs = {}
+    pending = list(glyphNames)
+    while pending:
+        glyphName = pending.pop()
+        if glyphName in masterGlyphs:
+            continue
+        if not all(glyphName in font for location, font in masterFonts):
+            continue
+        mutatorMasters, rawMasters = masterGlyphs[glyphName] = [], []
+        for location, font in masterFonts:
+            glyph = font[glyphName]
+            mutatorMasters.append((location, scaleMathGlyph(glyph.toMathGlyph(), 1000.0 / font.info.unitsPerEm)))
+            rawMasters.append(glyph)
+            pending.extend(component.baseGlyph for component in glyph.components)
+    return masterGlyphs
+
+
+class ComponentInstancer(object):
+
+    '''
+    Interpolates glyphs at a location, base glyphs being interpolated once per location.
+    Mutators are built once per glyph and kept, instances are kept until another location is asked for.
+    '''
+
+    def __init__(self, masterGlyphs, buildMutator):
+        self.masterGlyphs = masterGlyphs
+        self.buildMutator = buildMutator
+        self.mutators = {}
+        self.locationKey = None
+        self.instances = {}
+
+    def getMutator(self, glyphName):
+        if glyphName not in self.mutators:
+            mutator = None
+            if glyphName in self.masterGlyphs:
+                mutatorMasters, rawMasters = self.masterGlyphs[glyphName]
+                mutator = self.buildMutator(mutatorMasters, rawMasters)
+            self.mutators[glyphName] = mutator
+        return self.mutators[glyphName]
+
+    def makeInstance(self, glyphName, location):
+        '''
+        Decomposed math glyph of glyphName at location (base glyphs first, then its own contours, as previews are drawn),
+        None if the glyph or one of its base glyphs can’t be interpolated.
+        '''
+        locationKey = tuple(sorted(location.items()))
+        if locationKey != self.locationKey:
+            self.locationKey = locationKey
+            self.instances = {}
+        return self._makeInstance(glyphName, location, 0)
+
+    def _makeInstance(self, glyphName, location, depth):
+        if glyphName in self.instances:
+            return self.instances[glyphName]
+        instance = None
+        mutator = self.getMutator(glyphName)
+        if mutator is not None and depth < MAX_DEPTH:
+            # instances are fresh math glyphs, composites are decomposed in place
+            instance = mutator.makeInstance(location)
+            if instance.components:
+                contours = []
+                for component in instance.components:
+                    base = self._makeInstance(component['baseGlyph'], location, depth+1)
+                    if base is None:
+                        instance = None
+                        break
+                    contours += transformContours(base.contours, component['transformation'])
+                if instance is not None:
+                    instance.contours = contours + instance.contours
+                    instance.components = []
+        self.instances[glyphName] = instance
+        return instance
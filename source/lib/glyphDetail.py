@@ -0,0 +1,106 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Simplified master outlines for low detail previews (small cells).
+
+Curves that stay within a tolerance of their chord become lines, and points lying on a straight run
+are dropped, in the same way in every master: a point is only removed if it can be removed from all masters,
+so that simplified masters remain compatible and can be interpolated together.
+'''
+
+from math import hypot
+
+def _segmentDistance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    length = dx * dx + dy * dy
+    if length == 0:
+        return hypot(x - x1, y - y1)
+    t = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / length))
+    return hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+def _between(start, end, count):
+    # indices strictly between start and end, going forward around a closed contour
+    if start < end:
+        return list(range(start + 1, end))
+    return list(range(start + 1, count)) + list(range(0, end))
+
+def _simplifyContour(contours, tolerance):
+    '''
+    Returns (dropped point indices, {index: new segment type}) for the same contour in every master,
+    or None if the contour isn’t structured the same way in all of them.
+    '''
+    pointLists = [contour['points'] for contour in contours]
+    points = pointLists[0]
+    count = len(points)
+    if any(len(other) != count or [p[0] for p in other] != [p[0] for p in points] for other in pointLists[1:]):
+        return
+    onCurves = [index for index, point in enumerate(points) if point[0] is not None]
+    if len(onCurves) < 2:
+        return
+    isOpen = points[0][0] == 'move'
+    dropped = set()
+    segmentTypes = dict((index, points[index][0]) for index in onCurves)
+
+    def withinTolerance(indices, start, end):
+        for pointList in pointLists:
+            for index in indices:
+                if _segmentDistance(pointList[index][1], pointList[start][1], pointList[end][1]) > tolerance:
+                    return False
+        return True
+
+    # flat curves become lines
+    for position, index in enumerate(onCurves):
+        if isOpen and position == 0:
+            continue
+        previous = onCurves[position - 1]
+        if segmentTypes[index] in ('curve', 'qcurve'):
+            offCurves = _between(previous, index, count)
+            if withinTolerance(offCurves, previous, index):
+                dropped.update(offCurves)
+                segmentTypes[index] = 'line'
+
+    # points on straight runs are dropped, keeping at least a triangle
+    remaining = len(onCurves)
+    anchor = onCurves[0]
+    for position, index in enumerate(onCurves[1:], 1):
+        if position == len(onCurves) - 1:
+            if isOpen:
+                break
+            following = onCurves[0]
+        else:
+            following = onCurves[position + 1]
+        removable = (segmentTypes[index] == 'line' and segmentTypes[following] == 'line' and remaining > 3)
+        if removable and withinTolerance([index], anchor, following):
+            dropped.add(index)
+            remaining -= 1
+        else:
+            anchor = index
+
+    return dropped, segmentTypes
+
+def simplifyMasters(glyphs, tolerance):
+    '''
+    Returns copies of glyphs (compatible math glyphs, one per master) with simplified contours,
+    no point of any master moving away from its outline by more than tolerance.
+    '''
+    simplified = [glyph.copy() for glyph in glyphs]
+    if not glyphs or any(len(glyph.contours) != len(glyphs[0].contours) for glyph in glyphs):
+        return simplified
+    for contourIndex in range(len(glyphs[0].contours)):
+        result = _simplifyContour([glyph.contours[contourIndex] for glyph in glyphs], tolerance)
+        if result is None:
+            continue
+        dropped, segmentTypes = result
+        for glyph in simplified:
+            contour = glyph.contours[contourIndex]
+            points = []
+            for index, (segmentType, pt, smooth, name, identifier) in enumerate(contour['points']):
+                if index in dropped:
+                    continue
+                if segmentType is not None and segmentTypes[index] != segmentType:
+                    segmentType, smooth = segmentTypes[index], False
+                points.append((segmentType, pt, smooth, name, identifier))
+            contour['points'] = points
+    return simplified
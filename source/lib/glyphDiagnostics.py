@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Geometry checks of interpolated (and mostly extrapolated) glyphs.
+
+Instances are measured in a single pass over their points: bounding box and signed area of every contour
+(shoelace over the control polygon), from which inverted or collapsed contours, negative widths
+and coordinates out of the range fonts can store are flagged:
+
+    diagnostics = GlyphDiagnostics(masterMathGlyphs)
+    bounds, issues = diagnostics.check(instanceMathGlyph)
+'''
+
+QUESTIONABLE = 'questionable'
+
+NEGATIVE_WIDTH = 'negative width'
+INVERTED_CONTOUR = 'inverted contour'
+DEGENERATE_CONTOUR = 'collapsed contour'
+COORDINATE_OVERFLOW = 'coordinates out of range'
+
+# coordinates have to fit in 16 bits once compiled
+MAX_COORDINATE = 32767
+# contours whose area falls under this fraction of their smallest master area are considered collapsed
+DEGENERATE_RATIO = .01
+
+def measureGlyph(glyph):
+    '''
+    Returns (bounds, areas) of a math glyph’s contours, bounds being None for a glyph without points.
+    Areas are signed, positive for counter-clockwise contours.
+    '''
+    xMin = yMin = xMax = yMax = None
+    areas = []
+    for contour in glyph.contours:
+        points = contour['points']
+        if not points:
+            areas.append(0)
+            continue
+        area = 0
+        px, py = points[-1][1]
+        cxMin = cxMax = px
+        cyMin = cyMax = py
+        for segmentType, (x, y), smooth, name, identifier in points:
+            area += px * y - x * py
+            if x < cxMin: cxMin = x
+            elif x > cxMax: cxMax = x
+            if y < cyMin: cyMin = y
+            elif y > cyMax: cyMax = y
+            px, py = x, y
+        areas.append(area / 2)
+        if xMin is None:
+            xMin, yMin, xMax, yMax = cxMin, cyMin, cxMax, cyMax
+        else:
+            xMin, yMin, xMax, yMax = min(xMin, cxMin), min(yMin, cyMin), max(xMax, cxMax), max(yMax, cyMax)
+    bounds = None
+    if xMin is not None:
+        bounds = (xMin, yMin, xMax, yMax)
+    return bounds, areas
+
+
+class GlyphDiagnostics(object):
+
+    '''
+    Contour directions and areas of a glyph’s masters, instances are checked against them.
+    Contours whose direction differs between masters aren’t checked for inversion.
+    '''
+
+    def __init__(self, masterGlyphs):
+        self.directions = []
+        self.minimumAreas = []
+        masterAreas = [measureGlyph(glyph)[1] for glyph in masterGlyphs]
+        if masterAreas and all(len(areas) == len(masterAreas[0]) for areas in masterAreas):
+            for contourAreas in zip(*masterAreas):
+                signs = set((area > 0) - (area < 0) for area in contourAreas)
+                self.directions.append(signs.pop() if len(signs) == 1 else 0)
+                self.minimumAreas.append(min(abs(area) for area in contourAreas))
+
+    def check(self, glyph):
+        '''
+        Returns (bounds, issues) for an instance math glyph, issues being a list of the problems found.
+        '''
+        bounds, areas = measureGlyph(glyph)
+        issues = []
+        if glyph.width < 0:
+            issues.append(NEGATIVE_WIDTH)
+        if len(areas) == len(self.directions):
+            inverted = degenerate = False
+            for area, direction, minimumArea in zip(areas, self.directions, self.minimumAreas):
+                if minimumArea and abs(area) < minimumArea * DEGENERATE_RATIO:
+                    degenerate = True
+                elif direction and (area > 0) - (area < 0) != direction:
+                    inverted = True
+            if inverted:
+                issues.append(INVERTED_CONTOUR)
+            if degenerate:
+                issues.append(DEGENERATE_CONTOUR)
+        if abs(glyph.width) > MAX_COORDINATE or (bounds is not None and max(abs(value) for value in bounds) > MAX_COORDINATE):
+            issues.append(COORDINATE_OVERFLOW)
+        return bounds, issues
@@ -0,0 +1,267 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Content hashes of master glyphs, and what changed since when.
+
+A glyph’s hash covers what matters to interpolation: width, unicodes, contours, components and anchors
+(not its mark color, lib or notes). Hashes are kept up to date lazily: open fonts report which glyphs
+were touched through their change notifications, UFOs on disk (headless) through .glif modification times,
+and touched glyphs are hashed again when a query comes. A change is only recorded if the hash differs.
+
+Queries are made against tokens, which grow with every recorded change:
+
+    hashes = GlyphHashes()
+    hashes.setMasters(fonts)
+    token = hashes.getToken()
+    …
+    if hashes.changedSince(token, ['a', 'b']):
+        …
+'''
+
+from geometryCache import _GlifGlyph, _fileStamp
+from fontTools.ufoLib import UFOReader
+import hashlib
+import os
+
+def _number(value):
+    return repr(float(value))
+
+
+class _HashingPointPen(object):
+
+    def __init__(self, sha):
+        self.sha = sha
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.sha.update(b'(')
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        x, y = pt
+        self.sha.update(('%s %s %s %d;' % (_number(x), _number(y), segmentType, bool(smooth))).encode('utf-8'))
+
+    def endPath(self):
+        self.sha.update(b')')
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        values = ' '.join(_number(value) for value in transformation)
+        self.sha.update(('[%s %s]' % (baseGlyphName, values)).encode('utf-8'))
+
+
+def hashGlyph(glyph):
+    '''
+    Content hash of a glyph (fontParts, defcon, packed or read from a .glif), as a hex string.
+    '''
+    sha = hashlib.sha1()
+    sha.update(('%s|%s|' % (_number(glyph.width), ','.join('%d' % value for value in glyph.unicodes))).encode('utf-8'))
+    glyph.drawPoints(_HashingPointPen(sha))
+    sha.update(b'|')
+    for anchor in glyph.anchors:
+        if isinstance(anchor, dict):
+            name, x, y = anchor.get('name'), anchor['x'], anchor['y']
+        else:
+            name, x, y = anchor.name, anchor.x, anchor.y
+        sha.update(('<%s %s %s>' % (name, _number(x), _number(y))).encode('utf-8'))
+    return sha.hexdigest()
+
+
+class _HashSource(object):
+
+    '''
+    Hashes of the glyphs of one master, and the token at which each of them last changed.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+        self.hashes = {}
+        self.changes = {}
+        self.stale = None
+
+    def _store(self, service, glyphName, glyphHash):
+        if self.hashes.get(glyphName) != glyphHash:
+            if glyphHash is None:
+                self.hashes.pop(glyphName, None)
+            else:
+                self.hashes[glyphName] = glyphHash
+            self.changes[glyphName] = service._nextToken()
+
+    def refresh(self, service):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _FontHashSource(_HashSource):
+
+    '''
+    Master open as a font, glyphs of its default layer are hashed again after they posted a change.
+    '''
+
+    def __init__(self, font):
+        super(_FontHashSource, self).__init__(id(font.naked()))
+        self.font = font
+        self.dispatcher = font.naked().dispatcher
+        if self.dispatcher is not None:
+            for notification, methodName in [
+                ('Glyph.Changed', '_glyphChanged'),
+                ('Layer.GlyphAdded', '_layerGlyphsChanged'),
+                ('Layer.GlyphDeleted', '_layerGlyphsChanged'),
+                ('Layer.GlyphNameChanged', '_layerGlyphsChanged')
+                ]:
+                self.dispatcher.addObserver(self, methodName, notification, None)
+
+    def _getLayer(self):
+        return self.font.naked().layers.defaultLayer
+
+    def _touch(self, glyphName):
+        if self.stale is not None:
+            self.stale.add(glyphName)
+
+    def _glyphChanged(self, notification):
+        glyph = notification.object
+        if glyph.layer is self._getLayer():
+            self._touch(glyph.name)
+
+    def _layerGlyphsChanged(self, notification):
+        if notification.object is not self._getLayer():
+            return
+        data = notification.data
+        if 'name' in data:
+            self._touch(data['name'])
+        else:
+            self._touch(data['oldValue'])
+            self._touch(data['newValue'])
+
+    def refresh(self, service):
+        layer = self._getLayer()
+        if self.stale is None or self.dispatcher is None:
+            # first pass (or no notifications to rely on), every glyph is hashed
+            glyphNames = set(layer.keys()) | set(self.hashes)
+        else:
+            glyphNames = self.stale
+        self.stale = set()
+        for glyphName in glyphNames:
+            glyphHash = hashGlyph(layer[glyphName]) if glyphName in layer else None
+            self._store(service, glyphName, glyphHash)
+
+    def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.removeObserver(self, None, None)
+            self.dispatcher = None
+
+
+class _UFOHashSource(_HashSource):
+
+    '''
+    Master saved as a UFO on disk, glyphs whose .glif changed (modification time or size) are hashed again.
+    '''
+
+    def __init__(self, path):
+        path = os.path.abspath(path)
+        super(_UFOHashSource, self).__init__(path)
+        self.path = path
+        self.stamps = {}
+
+    def refresh(self, service):
+        glyphSet = UFOReader(self.path, validate=False).getGlyphSet(validateRead=False)
+        glyphsFolder = os.path.join(self.path, glyphSet.dirName)
+        stamps = dict((glyphName, _fileStamp(os.path.join(glyphsFolder, fileName))) for glyphName, fileName in glyphSet.contents.items())
+        for glyphName, stamp in stamps.items():
+            if self.stamps.get(glyphName) != stamp:
+                self._store(service, glyphName, hashGlyph(_GlifGlyph(glyphSet, glyphName)))
+        for glyphName in set(self.stamps) - set(stamps):
+            self._store(service, glyphName, None)
+        self.stamps = stamps
+
+
+def _getSourceKey(master):
+    if isinstance(master, str):
+        return os.path.abspath(master)
+    return id(master.naked())
+
+
+class GlyphHashes(object):
+
+    '''
+    Content hashes of the glyphs of a set of masters, given as fonts or UFO paths, with change tracking.
+    '''
+
+    def __init__(self, masters=()):
+        self.token = 0
+        self.sources = []
+        self._masterChange = 0
+        self.setMasters(masters)
+
+    def _nextToken(self):
+        self.token += 1
+        return self.token
+
+    def setMasters(self, masters):
+        '''
+        Tracks masters (fonts or UFO paths), in that order. Masters tracked already keep their history,
+        glyphs of new masters count as changed, masters left out aren’t tracked anymore.
+        '''
+        previousSources = dict((source.key, source) for source in self.sources)
+        sources = []
+        for master in masters:
+            key = _getSourceKey(master)
+            source = previousSources.pop(key, None)
+            if source is None:
+                source = _UFOHashSource(master) if isinstance(master, str) else _FontHashSource(master)
+            sources.append(source)
+        for source in previousSources.values():
+            source.close()
+        if [source.key for source in sources] != [source.key for source in self.sources]:
+            # the master set itself changed
+            self._masterChange = self._nextToken()
+        self.sources = sources
+
+    def refresh(self):
+        for source in self.sources:
+            source.refresh(self)
+
+    def getToken(self):
+        '''
+        Token standing for the current state of the masters, to pass to changedSince later on.
+        '''
+        self.refresh()
+        return self.token
+
+    def changedSince(self, token, glyphNames=None):
+        '''
+        Names of the glyphs (among glyphNames if provided) that changed in any master since token.
+        Every glyph counts as changed if masters were added, removed or reordered since.
+        '''
+        self.refresh()
+        masterChanged = token is None or self._masterChange > token
+        changed = set()
+        for source in self.sources:
+            if masterChanged:
+                changed.update(source.hashes)
+                changed.update(source.changes)
+            else:
+                changed.update(glyphName for glyphName, changeToken in source.changes.items() if changeToken > token)
+        if glyphNames is not None:
+            if masterChanged:
+                return set(glyphNames)
+            changed &= set(glyphNames)
+        return changed
+
+    def getHash(self, glyphName, index=0):
+        '''
+        Hash of a glyph in one master (by index), None if the master doesn’t have it.
+        Hashes are those of the last refresh (getToken and changedSince refresh).
+        '''
+        return self.sources[index].hashes.get(glyphName)
+
+    def getGlyphHashes(self, glyphName):
+        '''
+        Hashes of a glyph across all masters (as of the last refresh), a key for anything computed out of them.
+        '''
+        return tuple(source.hashes.get(glyphName) for source in self.sources)
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+        self.sources = []
@@ -0,0 +1,314 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Glyph thumbnails, to draw matrix cells as bitmaps instead of live vector previews
+and to export contact sheets from the headless engine.
+
+In the window, thumbnails are drawn by AppKit into NSImages (ImageThumbnailCache).
+Headless, a small pure-python rasterizer and PNG writer (ThumbnailCache, makeContactSheet) do without it.
+'''
+
+from fontTools.pens.basePen import BasePen
+from fontTools.pens.recordingPen import RecordingPen
+from collections import OrderedDict
+import hashlib
+import struct
+import zlib
+
+try:
+    from AppKit import NSImage, NSColor, NSAffineTransform
+    from fontTools.pens.cocoaPen import CocoaPen
+except ImportError:
+    # headless, thumbnails are rasterized in python
+    NSImage = None
+
+# vertical frame drawn in a thumbnail, in preview glyph units (see makePreviewGlyph)
+defaultFrame = (-250, 750)
+
+def glyphFingerprint(glyph):
+    if glyph is None:
+        return None
+    pen = RecordingPen()
+    glyph.draw(pen)
+    return hashlib.md5(repr((glyph.width, pen.value)).encode('utf-8')).hexdigest()
+
+
+class FlatteningPen(BasePen):
+
+    '''
+    Collects a glyph’s outlines as closed polygons (lists of edges),
+    curves being flattened in a fixed number of steps.
+    '''
+
+    def __init__(self, transform, curveSteps=8):
+        BasePen.__init__(self, None)
+        self.transform = transform
+        self.curveSteps = curveSteps
+        self.edges = []
+        self.start = None
+
+    def _point(self, pt):
+        return self.transform(pt)
+
+    def _addEdge(self, p0, p1):
+        if p0[1] != p1[1]:
+            self.edges.append((p0, p1))
+
+    def _moveTo(self, pt):
+        self.start = pt
+
+    def _lineTo(self, pt):
+        self._addEdge(self._point(self._getCurrentPoint()), self._point(pt))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        x0, y0 = self._getCurrentPoint()
+        (x1, y1), (x2, y2), (x3, y3) = pt1, pt2, pt3
+        previous = self._point((x0, y0))
+        steps = self.curveSteps
+        for k in range(1, steps+1):
+            t = k / steps
+            mt = 1 - t
+            a, b, c, d = mt*mt*mt, 3*mt*mt*t, 3*mt*t*t, t*t*t
+            point = self._point((a*x0 + b*x1 + c*x2 + d*x3, a*y0 + b*y1 + c*y2 + d*y3))
+            self._addEdge(previous, point)
+            previous = point
+
+    def _qCurveToOne(self, pt1, pt2):
+        x0, y0 = self._getCurrentPoint()
+        (x1, y1), (x2, y2) = pt1, pt2
+        previous = self._point((x0, y0))
+        steps = self.curveSteps
+        for k in range(1, steps+1):
+            t = k / steps
+            mt = 1 - t
+            a, b, c = mt*mt, 2*mt*t, t*t
+            point = self._point((a*x0 + b*x1 + c*x2, a*y0 + b*y1 + c*y2))
+            self._addEdge(previous, point)
+            previous = point
+
+    def _closePath(self):
+        current = self._getCurrentPoint()
+        if self.start is not None and current != self.start:
+            self._addEdge(self._point(current), self._point(self.start))
+
+    _endPath = _closePath
+
+
+def rasterizeGlyph(glyph, size, frame=defaultFrame, subSamples=4):
+    '''
+    Returns the coverage of glyph in a width*height bytearray (0-255, top row first),
+    the glyph being scaled to fit the vertical frame and centered horizontally.
+    '''
+    width, height = size
+    coverage = [0.0] * (width * height)
+    if glyph is None or width <= 0 or height <= 0:
+        return bytearray(width * height)
+
+    yMin, yMax = frame
+    scale = height / (yMax - yMin)
+    xOffset = (width - glyph.width * scale) / 2
+
+    def transform(pt):
+        x, y = pt
+        return (x * scale + xOffset, (yMax - y) * scale)
+
+    pen = FlatteningPen(transform, curveSteps=max(4, min(16, height // 8)))
+    glyph.draw(pen)
+    edges = pen.edges
+    sampleWeight = 1 / subSamples
+
+    for row in range(height):
+        rowOffset = row * width
+        for sample in range(subSamples):
+            y = row + (sample + .5) * sampleWeight
+            crossings = []
+            for (x0, y0), (x1, y1) in edges:
+                if (y0 <= y < y1) or (y1 <= y < y0):
+                    x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+                    crossings.append((x, 1 if y1 > y0 else -1))
+            if not crossings:
+                continue
+            crossings.sort()
+            winding = 0
+            spanStart = None
+            for x, direction in crossings:
+                previousWinding = winding
+                winding += direction
+                if previousWinding == 0 and winding != 0:
+                    spanStart = x
+                elif previousWinding != 0 and winding == 0 and spanStart is not None:
+                    _fillSpan(coverage, rowOffset, width, spanStart, x, sampleWeight)
+                    spanStart = None
+
+    return bytearray(min(255, int(value * 255 + .5)) for value in coverage)
+
+def _fillSpan(coverage, rowOffset, width, x0, x1, weight):
+    x0 = max(0.0, x0)
+    x1 = min(float(width), x1)
+    if x1 <= x0:
+        return
+    first = int(x0)
+    last = int(x1)
+    if first == last:
+        coverage[rowOffset + first] += (x1 - x0) * weight
+        return
+    coverage[rowOffset + first] += (first + 1 - x0) * weight
+    for x in range(first + 1, min(last, width)):
+        coverage[rowOffset + x] += weight
+    if last < width:
+        coverage[rowOffset + last] += (x1 - last) * weight
+
+def coverageToRGBA(coverage, color=(0, 0, 0, 1), background=None):
+    '''
+    Turns coverage into RGBA bytes, ink of color over background (transparent if None).
+    '''
+    r, g, b, a = [int(value * 255) for value in color]
+    pixels = bytearray(len(coverage) * 4)
+    if background is None:
+        for k, value in enumerate(coverage):
+            pixels[k*4:k*4+4] = (r, g, b, value * a // 255)
+    else:
+        br, bg, bb, ba = [int(value * 255) for value in background]
+        for k, value in enumerate(coverage):
+            alpha = value * a // 255
+            pixels[k*4:k*4+4] = (
+                (r * alpha + br * (255 - alpha)) // 255,
+                (g * alpha + bg * (255 - alpha)) // 255,
+                (b * alpha + bb * (255 - alpha)) // 255,
+                ba)
+    return pixels
+
+def makePNG(size, pixels):
+    '''
+    Encodes RGBA pixels (top row first) as PNG data.
+    '''
+    width, height = size
+    rowLength = width * 4
+    raw = b''.join(b'\x00' + bytes(pixels[row*rowLength:(row+1)*rowLength]) for row in range(height))
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+
+class ThumbnailCache(object):
+
+    '''
+    PNG thumbnails of glyphs, keyed by glyph fingerprint, size and color.
+    A glyph is only rasterized again when its outlines or the requested size change.
+    '''
+
+    def __init__(self, maxItems=2000):
+        self.maxItems = maxItems
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def getCoverage(self, glyph, size, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = glyphFingerprint(glyph)
+        key = (fingerprint, tuple(size), None)
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key]
+        coverage = rasterizeGlyph(glyph, size)
+        self._store(key, coverage)
+        return coverage
+
+    def getThumbnail(self, glyph, size, color=(0, 0, 0, 1), fingerprint=None):
+        if fingerprint is None:
+            fingerprint = glyphFingerprint(glyph)
+        key = (fingerprint, tuple(size), tuple(color))
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key]
+        coverage = self.getCoverage(glyph, size, fingerprint)
+        thumbnail = makePNG(size, coverageToRGBA(coverage, color))
+        self._store(key, thumbnail)
+        return thumbnail
+
+    def _store(self, key, value):
+        self.items[key] = value
+        while len(self.items) > self.maxItems:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+
+def drawGlyphImage(glyph, size, color=(0, 0, 0, 1), frame=defaultFrame):
+    '''
+    Draws glyph into an NSImage of size with AppKit, placed as rasterizeGlyph places it (main thread only).
+    '''
+    width, height = size
+    image = NSImage.alloc().initWithSize_((width, height))
+    if glyph is None or width <= 0 or height <= 0:
+        return image
+
+    yMin, yMax = frame
+    scale = height / (yMax - yMin)
+    pen = CocoaPen(None)
+    glyph.draw(pen)
+    transform = NSAffineTransform.transform()
+    # points are scaled first, then moved
+    transform.translateXBy_yBy_((width - glyph.width * scale) / 2, -yMin * scale)
+    transform.scaleBy_(scale)
+    pen.path.transformUsingAffineTransform_(transform)
+
+    image.lockFocus()
+    try:
+        NSColor.colorWithCalibratedRed_green_blue_alpha_(*color).set()
+        pen.path.fill()
+    finally:
+        image.unlockFocus()
+    return image
+
+
+class ImageThumbnailCache(ThumbnailCache):
+
+    '''
+    Thumbnails of glyphs as NSImages drawn by AppKit (see drawGlyphImage), keyed like ThumbnailCache’s.
+    For the window only, on the main thread.
+    '''
+
+    def getThumbnail(self, glyph, size, color=(0, 0, 0, 1), fingerprint=None):
+        if fingerprint is None:
+            fingerprint = glyphFingerprint(glyph)
+        key = (fingerprint, tuple(size), tuple(color))
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key]
+        thumbnail = drawGlyphImage(glyph, size, color)
+        self._store(key, thumbnail)
+        return thumbnail
+
+
+def makeContactSheet(cells, gridSize, cellSize, cache=None, colors=None, gap=2):
+    '''
+    Draws {(i, j): glyph} on a single PNG, one cell per spot of a gridSize grid.
+    colors optionally maps spots to ink colors.
+    '''
+    if cache is None:
+        cache = ThumbnailCache()
+    if colors is None:
+        colors = {}
+    columns, lines = gridSize
+    cellWidth, cellHeight = cellSize
+    sheetWidth = columns * (cellWidth + gap) + gap
+    sheetHeight = lines * (cellHeight + gap) + gap
+    pixels = bytearray(b'\xdd\xcc\xcc\xff' * (sheetWidth * sheetHeight))
+
+    for (i, j), glyph in cells.items():
+        if not (0 <= i < columns and 0 <= j < lines):
+            continue
+        coverage = cache.getCoverage(glyph, cellSize)
+        cellPixels = coverageToRGBA(coverage, colors.get((i, j), (0, 0, 0, 1)), background=(1, 1, 1, 1))
+        left = gap + i * (cellWidth + gap)
+        top = gap + j * (cellHeight + gap)
+        for row in range(cellHeight):
+            start = ((top + row) * sheetWidth + left) * 4
+            pixels[start:start + cellWidth*4] = cellPixels[row*cellWidth*4:(row+1)*cellWidth*4]
+
+    return makePNG((sheetWidth, sheetHeight), pixels)
@@ -0,0 +1,165 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Glyph subsets for proofing instances: unicode ranges, glyph name patterns and text samples,
+closed over component base glyphs so that composites are generated along with what they’re made of.
+Kerning and groups are cut down to the subset as well (pairs between glyphs of the subset only).
+
+    subset = GlyphSubset.fromExpression('U+0020-007E, *.sc, "Hamburgefonstiv"')
+    glyphNames = subset.resolve(masterGlyphSets)
+
+In expressions, U+XXXX or U+XXXX-YYYY are unicode ranges, quoted text is a text sample (/glyphName for glyphs
+without unicodes, as in the preview’s text field) and anything else is a glyph name pattern (* and ? wildcards).
+Glyph sets are fonts or packed master geometry (see masterGeometry), anything with glyphs, kerning and groups.
+'''
+
+from fnmatch import fnmatchcase
+import re
+
+SUBSET_TOKEN = re.compile(r'"([^"]*)"|((?i:U\+)[0-9A-Fa-f]{1,6}(?:-(?i:U\+)?[0-9A-Fa-f]{1,6})?)(?=[\s,]|$)|([^\s,"]+)')
+UNICODE_RANGE = re.compile(r'(?i:U\+)?([0-9A-Fa-f]{1,6})(?:-(?i:U\+)?([0-9A-Fa-f]{1,6}))?$')
+
+def parseUnicodeRanges(expression):
+    '''
+    [(first, last)] unicode ranges out of 'U+0020-007E, U+00E9, 20AC'. Raises ValueError on anything else.
+    '''
+    ranges = []
+    for item in re.split(r'[\s,]+', expression.strip()):
+        if not item:
+            continue
+        match = UNICODE_RANGE.match(item)
+        if match is None:
+            raise ValueError('invalid unicode range: %s'%(item))
+        first = int(match.group(1), 16)
+        last = int(match.group(2), 16) if match.group(2) else first
+        if last < first:
+            raise ValueError('invalid unicode range: %s'%(item))
+        ranges.append((first, last))
+    return ranges
+
+def getCharacterMapping(glyphSet):
+    '''
+    {unicode: [glyphName, …]} of a glyph set.
+    '''
+    cmap = {}
+    for glyphName in sorted(glyphSet.keys()):
+        for value in glyphSet[glyphName].unicodes:
+            cmap.setdefault(value, []).append(glyphName)
+    return cmap
+
+def textToGlyphNames(text, cmap):
+    '''
+    Glyph names of a text sample, /glyphName standing for a glyph by name (ended by a space or another /).
+    Characters without a glyph are left out.
+    '''
+    glyphNames = []
+    for name, character in re.findall(r'/([^\s/]+) ?|(.)', text, re.S):
+        if name:
+            glyphNames.append(name)
+        elif ord(character) in cmap:
+            glyphNames.append(cmap[ord(character)][0])
+    return glyphNames
+
+def componentClosure(glyphNames, glyphSets):
+    '''
+    glyphNames and the base glyphs of their components, all the way down, in any of the glyph sets.
+    '''
+    closure = set()
+    pending = list(glyphNames)
+    while pending:
+        glyphName = pending.pop()
+        if glyphName in closure:
+            continue
+        closure.add(glyphName)
+        for glyphSet in glyphSets:
+            if glyphName in glyphSet:
+                pending.extend(component.baseGlyph for component in glyphSet[glyphName].components)
+    return closure
+
+def subsetKerning(kerning, groups, glyphNames):
+    '''
+    Kerning pairs between glyphs of glyphNames (a set), sides being glyphs or groups with a member in glyphNames.
+    '''
+    inSubset = {}
+    def sideInSubset(side):
+        if side not in inSubset:
+            if side in groups:
+                inSubset[side] = any(member in glyphNames for member in groups[side])
+            else:
+                inSubset[side] = side in glyphNames
+        return inSubset[side]
+    return dict((pair, value) for pair, value in kerning.items() if sideInSubset(pair[0]) and sideInSubset(pair[1]))
+
+def subsetGroups(groups, glyphNames):
+    '''
+    Groups cut down to the members in glyphNames (a set), empty groups left out.
+    '''
+    subset = {}
+    for groupName, members in groups.items():
+        members = [member for member in members if member in glyphNames]
+        if members:
+            subset[groupName] = members
+    return subset
+
+
+class GlyphSubset(object):
+
+    '''
+    Glyphs picked by unicode ranges [(first, last)], glyph name patterns and a text sample.
+    '''
+
+    def __init__(self, unicodeRanges=(), namePatterns=(), text=''):
+        self.unicodeRanges = list(unicodeRanges)
+        self.namePatterns = list(namePatterns)
+        self.text = text
+
+    def __repr__(self):
+        return '<GlyphSubset unicodes:%s patterns:%s text:%r>'%(len(self.unicodeRanges), ', '.join(self.namePatterns), self.text)
+
+    @classmethod
+    def fromExpression(cls, expression):
+        '''
+        Subset out of an expression such as 'U+0020-007E, *.sc, "Hamburgefonstiv"', None if it’s empty.
+        '''
+        unicodeRanges, namePatterns, texts = [], [], []
+        for text, unicodes, pattern in SUBSET_TOKEN.findall(expression or ''):
+            if unicodes:
+                unicodeRanges += parseUnicodeRanges(unicodes)
+            elif pattern:
+                namePatterns.append(pattern)
+            else:
+                texts.append(text)
+        subset = cls(unicodeRanges, namePatterns, ''.join(texts))
+        if subset.isEmpty():
+            return
+        return subset
+
+    def isEmpty(self):
+        return not (self.unicodeRanges or self.namePatterns or self.text)
+
+    def getSeedNames(self, glyphSet):
+        '''
+        Glyphs of glyphSet picked by the subset, before closure.
+        '''
+        seeds = set()
+        if self.unicodeRanges or self.text:
+            cmap = getCharacterMapping(glyphSet)
+            for first, last in self.unicodeRanges:
+                for value, glyphNames in cmap.items():
+                    if first <= value <= last:
+                        seeds.update(glyphNames)
+            seeds.update(glyphName for glyphName in textToGlyphNames(self.text, cmap) if glyphName in glyphSet)
+        if self.namePatterns:
+            for glyphName in glyphSet.keys():
+                if any(fnmatchcase(glyphName, pattern) for pattern in self.namePatterns):
+                    seeds.add(glyphName)
+        return seeds
+
+    def resolve(self, glyphSets):
+        '''
+        Sorted glyph names of the subset, picked in the first glyph set and closed over component base glyphs in all of them.
+        '''
+        if not glyphSets:
+            return []
+        return sorted(componentClosure(self.getSeedNames(glyphSets[0]), glyphSets))
@@ -0,0 +1,151 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Weighted-sum preview backend: masters are compiled once into lists of numbers, and every instance
+is a weighted sum of those, the weights (scalars) of every master at a location being
+computed once and cached as long as masters keep their locations.
+
+    model = VariationPreviewModel(masterLocations)     # kept across glyphs
+    mutator = model.buildMutator(masterMathGlyphs)     # None if the glyphs can’t be compiled
+    instance = mutator.makeInstance(location)          # as a MutatorMath mutator would
+
+Instances are linear in the masters, so the weights of each master are those MutatorMath gives it at a location,
+found once with a mutator of numbers (1 for that master, 0 for the others) built around the same bias as
+glyph mutators (see getOrigin): both backends interpolate, and extrapolate, the same way whatever the master layout.
+Components pair by base glyph and anchors by name, as in fontMath. Glyphs whose structure differs between masters aren’t compiled.
+'''
+
+from mutatorMath.objects.location import Location, biasFromLocations
+from mutatorMath.objects.mutator import buildMutator
+
+def getOrigin(locations):
+    '''
+    Bias of master locations as MutatorMath’s buildMutator determines it (the origin if a master sits there).
+    '''
+    return dict(biasFromLocations(sorted(Location(location) for location in locations), True))
+
+
+def flattenGlyph(glyph):
+    '''
+    Returns (structure, values) for a math glyph: structure describes what values stand for,
+    values are its numbers (width, height, point, component & anchor coordinates) in one list.
+    '''
+    values = [glyph.width, glyph.height]
+    contourStructure = []
+    for contour in glyph.contours:
+        points = contour['points']
+        contourStructure.append(len(points))
+        for segmentType, (x, y), smooth, name, identifier in points:
+            values.append(x)
+            values.append(y)
+    components = sorted(glyph.components, key=lambda component: component['baseGlyph'])
+    for component in components:
+        values.extend(component['transformation'])
+    anchors = sorted(glyph.anchors, key=lambda anchor: anchor.get('name') or '')
+    for anchor in anchors:
+        values.append(anchor['x'])
+        values.append(anchor['y'])
+    structure = (
+        tuple(contourStructure),
+        tuple(component['baseGlyph'] for component in components),
+        tuple(anchor.get('name') for anchor in anchors)
+    )
+    return structure, values
+
+def unflattenGlyph(template, values):
+    '''
+    Math glyph shaped as template (a master math glyph), with values as numbers (see flattenGlyph).
+    '''
+    glyph = template.copyWithoutMathSubObjects()
+    glyph.width, glyph.height = values[0], values[1]
+    index = 2
+    for contour in template.contours:
+        points = []
+        for segmentType, pt, smooth, name, identifier in contour['points']:
+            points.append((segmentType, (values[index], values[index+1]), smooth, name, identifier))
+            index += 2
+        glyph.contours.append(dict(identifier=contour.get('identifier'), points=points))
+    # components pair by base glyph but keep the template’s order
+    components = list(template.components)
+    for position in sorted(range(len(components)), key=lambda position: components[position]['baseGlyph']):
+        component = components[position]
+        components[position] = dict(baseGlyph=component['baseGlyph'], transformation=tuple(values[index:index+6]), identifier=component.get('identifier'))
+        index += 6
+    glyph.components = components
+    for anchor in sorted(template.anchors, key=lambda anchor: anchor.get('name') or ''):
+        anchor = dict(anchor)
+        anchor['x'], anchor['y'] = values[index], values[index+1]
+        glyph.anchors.append(anchor)
+        index += 2
+    glyph.guidelines = [dict(guideline) for guideline in template.guidelines]
+    return glyph
+
+
+class VariationPreviewModel(object):
+
+    '''
+    Weights of a set of master locations (Location or dicts of axis values),
+    around origin (the masters’ bias by default, see getOrigin). Raises an error if MutatorMath can’t build them.
+    '''
+
+    def __init__(self, locations, origin=None):
+        if origin is None:
+            origin = getOrigin(locations)
+        self.origin = origin
+        self.locations = [Location(location) for location in locations]
+        self.mutators = []
+        for index in range(len(self.locations)):
+            items = [(location, 1.0 if otherIndex == index else 0.0) for otherIndex, location in enumerate(self.locations)]
+            bias, mutator = buildMutator(items, bias=Location(origin))
+            self.mutators.append(mutator)
+        self.scalars = {}
+
+    def getScalars(self, location):
+        '''
+        Weights of every master at location, cached per location.
+        '''
+        key = tuple(sorted(location.items()))
+        scalars = self.scalars.get(key)
+        if scalars is None:
+            location = Location(location)
+            scalars = self.scalars[key] = [mutator.makeInstance(location) for mutator in self.mutators]
+        return scalars
+
+    def buildMutator(self, glyphs):
+        '''
+        Mutator of master math glyphs (one per location, in the same order), None if their structures differ.
+        '''
+        flattened = [flattenGlyph(glyph) for glyph in glyphs]
+        structure = flattened[0][0]
+        if any(otherStructure != structure for otherStructure, values in flattened[1:]):
+            return
+        return CompiledGlyph(self, glyphs[0], [values for otherStructure, values in flattened])
+
+
+class CompiledGlyph(object):
+
+    '''
+    Compiled glyph: values of its masters (see flattenGlyph, in the model’s order),
+    instances being their sum weighted by the scalar of each master at a location (see VariationPreviewModel).
+    '''
+
+    def __init__(self, model, template, masterValues):
+        self.model = model
+        self.template = template
+        self.masterValues = masterValues
+
+    def makeInstance(self, location):
+        values = None
+        for scalar, masterValues in zip(self.model.getScalars(location), self.masterValues):
+            if not scalar:
+                continue
+            if values is None:
+                values = [scalar * value for value in masterValues] if scalar != 1 else list(masterValues)
+            elif scalar == 1:
+                values = [value + masterValue for value, masterValue in zip(values, masterValues)]
+            else:
+                values = [value + scalar * masterValue for value, masterValue in zip(values, masterValues)]
+        if values is None:
+            values = [0] * len(self.masterValues[0])
+        return unflattenGlyph(self.template, values)
@@ -0,0 +1,178 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Bulk writing of interpolated glyphs into a font.
+
+Glyphs are extracted from math glyphs straight into the font’s default layer (no intermediate RGlyph,
+no insertGlyph copy), rounded and given their unicodes as they’re written.
+Fonts nobody but defcon itself observes (headless fonts) are written without holding notifications.
+Fonts observed from the outside (open in the UI) have them held a chunk of glyphs at a time,
+so that they refresh once per chunk rather than once per glyph, without piling up a batch’s worth of held notifications.
+
+    with BulkGlyphWriter(font, roundGeometry=True) as writer:
+        for glyphName, mathGlyph, unicodes in glyphs:
+            writer.writeGlyph(glyphName, mathGlyph, unicodes)
+
+Background work, which mustn’t touch fonts, writes into a GlyphBatch instead, written into a font later on the main thread.
+'''
+
+from fontTools.pens.roundingPen import RoundingPointPen
+from fontTools.misc.roundTools import otRound
+from fontTools import agl
+from fontParts.base import BaseGlyph
+
+# glyphs written between releases of held notifications
+HOLD_CHUNK_SIZE = 100
+
+def unicodesForName(glyphName):
+    '''
+    Unicode of a glyph name following the AGL (uniXXXX, uXXXXX, AGLFN names), [] if there’s none.
+    Names with a suffix (a.alt) or standing for several characters (f_i) get none.
+    '''
+    if '.' in glyphName:
+        return []
+    characters = agl.toUnicode(glyphName)
+    if len(characters) == 1:
+        return [ord(characters)]
+    return []
+
+
+class BulkGlyphWriter(object):
+
+    '''
+    Writes glyphs from math glyphs into font (a fontParts font) in one batch.
+    roundGeometry rounds coordinates and widths as glyphs are written,
+    autoUnicodes has glyphs given unicodes by the font’s own autoUnicodes() as they’re written,
+    the way font.autoUnicodes() would after the batch. Fonts that don’t implement it (headless fontParts)
+    give glyphs written without unicodes the one their AGL name stands for instead.
+    '''
+
+    def __init__(self, font, roundGeometry=False, autoUnicodes=False, chunkSize=HOLD_CHUNK_SIZE):
+        self.font = font
+        self.roundGeometry = roundGeometry
+        self.autoUnicodes = autoUnicodes
+        self.chunkSize = chunkSize
+        self.written = []
+        self._dispatcher = None
+        self._layer = None
+        self._held = 0
+        self._fontAutoUnicodes = False
+
+    def begin(self):
+        defconFont = self.font.naked()
+        self._layer = defconFont.layers.defaultLayer
+        self._fontAutoUnicodes = self.autoUnicodes and implementsAutoUnicodes(self.font)
+        self._dispatcher = None
+        if hasOutsideObservers(defconFont):
+            # every notification posted for this font (glyphs, layer, font) is held, not just the font’s own
+            self._dispatcher = defconFont.dispatcher
+            self._hold()
+
+    def _hold(self):
+        self._dispatcher.holdNotifications(note='Interpolation matrix bulk glyph writing')
+        self._held = 0
+
+    def end(self):
+        if self._dispatcher is not None:
+            self._dispatcher.releaseHeldNotifications()
+            self._dispatcher = None
+        self._layer = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *args):
+        self.end()
+
+    def writeGlyph(self, glyphName, mathGlyph, unicodes=None):
+        if self._layer is None:
+            raise RuntimeError('BulkGlyphWriter.writeGlyph called outside of a batch')
+        if self._dispatcher is not None and self._held >= self.chunkSize:
+            self._dispatcher.releaseHeldNotifications()
+            self._hold()
+        glyph = self._layer.newGlyph(glyphName)
+        if not unicodes and self.autoUnicodes and not self._fontAutoUnicodes:
+            unicodes = unicodesForName(glyphName)
+        unicodes = list(unicodes or [])
+        # the glyph is built silently, then announced once (changed & unicodes), see end()
+        glyph.disableNotifications()
+        try:
+            if self.roundGeometry:
+                # rounded the way font.round() does (otRound), while points are drawn in
+                mathGlyph.extractGlyph(glyph, RoundingPointPen(glyph.getPointPen()), onlyGeometry=True)
+                glyph.width = otRound(glyph.width)
+                for anchor in glyph.anchors:
+                    anchor.x, anchor.y = otRound(anchor.x), otRound(anchor.y)
+            else:
+                mathGlyph.extractGlyph(glyph, onlyGeometry=True)
+            glyph.unicodes = unicodes
+        finally:
+            glyph.enableNotifications()
+        glyph.dirty = True
+        glyph.postNotification('Glyph.UnicodesChanged', data=dict(oldValue=[], newValue=unicodes))
+        if self._fontAutoUnicodes:
+            self.font[glyphName].autoUnicodes()
+        self.written.append(glyphName)
+        self._held += 1
+        return glyph
+
+
+class GlyphBatch(object):
+
+    '''
+    Glyphs written as math glyphs, kept to be written into a font later (see writeTo).
+    Takes the place of a BulkGlyphWriter where no font may be touched.
+    '''
+
+    def __init__(self):
+        self.glyphs = []
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    def __iter__(self):
+        return iter(self.glyphs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def writeGlyph(self, glyphName, mathGlyph, unicodes=None):
+        self.glyphs.append((glyphName, mathGlyph, list(unicodes) if unicodes else None))
+        return mathGlyph
+
+    def writeTo(self, font, roundGeometry=False, autoUnicodes=False):
+        '''
+        Writes the glyphs into font (see BulkGlyphWriter), returns their names.
+        '''
+        with BulkGlyphWriter(font, roundGeometry, autoUnicodes) as writer:
+            for glyphName, mathGlyph, unicodes in self.glyphs:
+                writer.writeGlyph(glyphName, mathGlyph, unicodes)
+        return writer.written
+
+
+def implementsAutoUnicodes(font):
+    '''
+    Whether glyphs of font (a fontParts font) implement autoUnicodes(), headless fontParts glyphs don’t.
+    '''
+    glyphClass = getattr(font.defaultLayer, 'glyphClass', None)
+    return glyphClass is not None and glyphClass._autoUnicodes is not BaseGlyph._autoUnicodes
+
+def hasOutsideObservers(defconFont):
+    '''
+    Whether anything besides defcon’s own objects (a font window, an observer) observes defconFont,
+    its layers or its default layer, where new glyphs are announced.
+    '''
+    dispatcher = defconFont.dispatcher
+    if dispatcher is None:
+        return False
+    for observable in (defconFont, defconFont.layers, defconFont.layers.defaultLayer):
+        for observation in dispatcher.findObservations(observable=observable):
+            observer = observation['observer']
+            if observer is not None and not type(observer).__module__.startswith('defcon.'):
+                return True
+    return False
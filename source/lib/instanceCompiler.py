@@ -0,0 +1,112 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Compiles generated instances straight to binary fonts (OTF and/or TTF) with ufo2ft, from the instance in memory.
+
+Instances of a matrix share their feature code (it comes from the source master), only the kerning and mark features
+generated out of each instance’s kerning and anchors differ. Substitutions (GSUB) compiled out of the feature code
+are kept per feature text & glyph order, and grafted into each instance’s binary, ufo2ft only compiling generated features:
+
+    cache = FeatureCache()
+    paths = compileInstance(instanceFont, 'instances/Family-B2', ['otf', 'ttf'], featureText, cache)
+
+Feature code that can’t be split that way (positioning rules, GDEF or name records) is compiled with each instance.
+Requires ufo2ft, imported on first use (ImportError otherwise). Glyphs keep their names (no production names).
+'''
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont, newTable
+import threading
+import hashlib
+import re
+
+COMPILE_FORMATS = ['otf', 'ttf']
+LANGUAGE_SYSTEM = re.compile(r'^\s*languagesystem\s+[^;]+;', re.M)
+
+def compileSubstitutions(featureText, glyphOrder):
+    '''
+    GSUB table data compiled out of featureText for glyphOrder, b'' if it has no substitutions,
+    None if it builds anything else (or can’t be compiled on its own).
+    '''
+    font = TTFont()
+    font.setGlyphOrder(glyphOrder)
+    try:
+        addOpenTypeFeaturesFromString(font, featureText)
+    except Exception:
+        return None
+    if set(font.keys()) - set(['GlyphOrder', 'GSUB']):
+        return None
+    if 'GSUB' not in font:
+        return b''
+    return font['GSUB'].compile(font)
+
+
+class FeatureCache(object):
+
+    '''
+    Compiled substitutions per (feature text, glyph order), shared by the instances compiled in a process.
+    '''
+
+    def __init__(self):
+        self.substitutions = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def getSubstitutions(self, featureText, glyphOrder):
+        '''
+        See compileSubstitutions, compiled once per feature text & glyph order.
+        '''
+        key = hashlib.sha1((featureText + '\0' + '\n'.join(glyphOrder)).encode('utf-8')).hexdigest()
+        with self.lock:
+            if key in self.substitutions:
+                self.hits += 1
+                return self.substitutions[key]
+        substitutions = compileSubstitutions(featureText, glyphOrder)
+        with self.lock:
+            self.substitutions[key] = substitutions
+        return substitutions
+
+
+def _compileFont(ufo, fileFormat, featureText):
+    from ufo2ft import compileOTF, compileTTF
+    compiler = compileOTF if fileFormat == 'otf' else compileTTF
+    ufo.features.text = featureText
+    return compiler(ufo, useProductionNames=False)
+
+def compileInstance(font, basePath, formats=('otf',), featureText=None, featureCache=None):
+    '''
+    Compiles font (a generated instance, fontParts or defcon) to basePath.otf and/or basePath.ttf, returns the paths.
+    Feature code is featureText (the font’s own features by default), its substitutions are taken from featureCache if provided.
+    '''
+    from ufo2ft.util import makeOfficialGlyphOrder
+    ufo = font.naked() if hasattr(font, 'naked') else font
+    originalText = ufo.features.text
+    if featureText is None:
+        featureText = originalText or ''
+    paths = []
+    try:
+        for fileFormat in formats:
+            if fileFormat not in COMPILE_FORMATS:
+                raise ValueError('unknown binary format: %s'%(fileFormat))
+            binaryFont = None
+            if featureCache is not None and featureText.strip():
+                glyphOrder = makeOfficialGlyphOrder(ufo)
+                substitutions = featureCache.getSubstitutions(featureText, glyphOrder)
+                if substitutions is not None:
+                    # generated features still need the language systems of the feature code
+                    binaryFont = _compileFont(ufo, fileFormat, '\n'.join(LANGUAGE_SYSTEM.findall(featureText)))
+                    if binaryFont.getGlyphOrder() != glyphOrder or 'GSUB' in binaryFont:
+                        binaryFont = None
+                    elif substitutions:
+                        table = newTable('GSUB')
+                        table.decompile(substitutions, binaryFont)
+                        binaryFont['GSUB'] = table
+            if binaryFont is None:
+                binaryFont = _compileFont(ufo, fileFormat, featureText)
+            path = '%s.%s'%(basePath, fileFormat)
+            binaryFont.save(path)
+            paths.append(path)
+    finally:
+        ufo.features.text = originalText
+    return paths
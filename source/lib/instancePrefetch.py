@@ -0,0 +1,191 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Preview instances kept across glyphs, and prefetched while the matrix sits idle.
+
+The engine keeps what it computes for a glyph’s previews (preview masters, mutators and cell instances)
+in an InstanceCache, least recently used glyphs being dropped beyond a memory budget.
+Entries stand for as long as the glyph and its components don’t change in any master (see glyphHashes).
+
+A GlyphPrefetcher fills the cache ahead of time with the glyphs likely to come next:
+neighbours in the glyph order, glyphs sharing components with the current one and recently viewed glyphs.
+Work is done one glyph per step, so that it can be spread over idle time and dropped as soon as real work comes:
+
+    prefetcher.viewed('a', font, spots)
+    while prefetcher.step():
+        …    # anything else waiting goes first, cancel() drops what’s left
+'''
+
+from collections import OrderedDict, deque
+
+# rough memory cost of preview glyphs, in bytes
+GLYPH_COST = 2048
+POINT_COST = 320
+
+def estimateGlyphSize(mathGlyph):
+    '''
+    Rough memory footprint in bytes of a preview glyph kept as a math glyph and an RGlyph.
+    '''
+    if mathGlyph is None:
+        return 0
+    return GLYPH_COST + POINT_COST * sum(len(contour['points']) for contour in mathGlyph.contours)
+
+
+class InstanceCache(object):
+
+    '''
+    Glyph entries of the engine’s previews, by key, within a memory budget (bytes) of their estimated sizes.
+    Least recently used entries are dropped first.
+    '''
+
+    def __init__(self, budget=64*1024*1024):
+        self.budget = budget
+        self.items = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key):
+        if key in self.items:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+    def peek(self, key):
+        '''
+        Entry of key without counting as a use.
+        '''
+        return self.items.get(key)
+
+    def put(self, key, entry, size=0):
+        self.discard(key)
+        self.items[key] = entry
+        self.sizes[key] = 0
+        self.grow(key, size)
+
+    def grow(self, key, size):
+        '''
+        Accounts for size more bytes in the entry of key (instances added to it), dropping old entries if needed.
+        '''
+        if key not in self.items:
+            return
+        self.sizes[key] += size
+        self.size += size
+        while self.size > self.budget and len(self.items) > 1:
+            oldestKey = next(iter(self.items))
+            if oldestKey == key:
+                break
+            self.discard(oldestKey)
+
+    def isFull(self):
+        return self.size >= self.budget
+
+    def discard(self, key):
+        if key in self.items:
+            del self.items[key]
+            self.size -= self.sizes.pop(key)
+
+    def clear(self):
+        self.items.clear()
+        self.sizes.clear()
+        self.size = 0
+
+
+def getNeighbourGlyphs(glyphName, glyphOrder, radius=2):
+    '''
+    Glyphs around glyphName in glyphOrder, closest first, next before previous.
+    '''
+    if glyphName not in glyphOrder:
+        return []
+    index = glyphOrder.index(glyphName)
+    neighbours = []
+    for distance in range(1, radius+1):
+        for neighbourIndex in (index + distance, index - distance):
+            if 0 <= neighbourIndex < len(glyphOrder):
+                neighbours.append(glyphOrder[neighbourIndex])
+    return neighbours
+
+def getComponentRelatives(glyphName, font, limit=8):
+    '''
+    Base glyphs of glyphName’s components and other glyphs made of the same base glyphs (at most limit of them).
+    '''
+    if glyphName not in font:
+        return []
+    baseGlyphs = [component.baseGlyph for component in font[glyphName].components]
+    defconFont = font.naked() if hasattr(font, 'naked') else font
+    references = getattr(defconFont, 'componentReferences', None)
+    relatives = []
+    for baseGlyph in baseGlyphs:
+        if baseGlyph not in relatives:
+            relatives.append(baseGlyph)
+    if references is not None:
+        for baseGlyph in baseGlyphs + [glyphName]:
+            for composite in sorted(references.get(baseGlyph, ())):
+                if composite != glyphName and composite not in relatives:
+                    relatives.append(composite)
+    return relatives[:limit]
+
+
+class GlyphPrefetcher(object):
+
+    '''
+    Prefetches preview instances of glyphs likely to come next into the engine’s instance cache (see MatrixEngine.prefetchGlyph),
+    one glyph per step. Stops once the cache is full.
+    '''
+
+    def __init__(self, engine, radius=2, relatives=8, recentCount=8):
+        self.engine = engine
+        self.radius = radius
+        self.relatives = relatives
+        self.recent = deque(maxlen=recentCount)
+        self.queue = []
+        self.spots = []
+        self.prefetched = 0
+
+    def getCandidates(self, glyphName, font):
+        '''
+        Glyphs likely to be viewed after glyphName, in order: glyph order neighbours, component relatives, recent glyphs.
+        '''
+        candidates = []
+        for candidate in getNeighbourGlyphs(glyphName, list(font.glyphOrder), self.radius) + getComponentRelatives(glyphName, font, self.relatives) + list(reversed(self.recent)):
+            if candidate != glyphName and candidate in font and candidate not in candidates:
+                candidates.append(candidate)
+        return candidates
+
+    def viewed(self, glyphName, font, spots):
+        '''
+        Notes glyphName as shown for spots, and plans the glyphs to prefetch around it in font.
+        '''
+        self.queue = []
+        if glyphName is None or font is None:
+            return
+        if glyphName in self.recent:
+            self.recent.remove(glyphName)
+        self.queue = self.getCandidates(glyphName, font)
+        self.recent.append(glyphName)
+        self.spots = list(spots)
+
+    def cancel(self):
+        self.queue = []
+
+    def isIdle(self):
+        return not self.queue
+
+    def step(self):
+        '''
+        Prefetches the next planned glyph, returns False once there’s nothing left to do.
+        '''
+        if not self.queue or self.engine.instanceCache.isFull():
+            self.queue = []
+            return False
+        glyphName = self.queue.pop(0)
+        if self.engine.prefetchGlyph(glyphName, self.spots):
+            self.prefetched += 1
+        return bool(self.queue)
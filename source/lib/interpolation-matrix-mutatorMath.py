@@ -16,10 +16,18 @@ Loïc Sander
 '''
 
 from mutatorMath.objects.location import Location
-from mutatorMath.objects.mutator import buildMutator
-from fontMath.mathKerning import MathKerning
 
-from matrixSpot import MatrixMaster, MatrixSpot, getKeyForValue, getValueForKey, splitSpotKey
+from matrixSpot import getKeyForValue, getValueForKey
+from matrixEngine import MatrixEngine, readMatrixFile, writeMatrixFile, errorGlyph, fontName, interpolateGlyphSet, makeInstanceFont, getInstancesFolder
+from glyphRaster import ImageThumbnailCache
+from glyphWriter import GlyphBatch
+from masterGeometry import FontData
+from matrixDesignSpace import writeDesignSpace
+from glyphSubset import GlyphSubset
+from spotExpression import SpotExpressionError
+from compatibilityReport import ReportStream, TextDigestWriter
+from instancePrefetch import GlyphPrefetcher
+from generationJobs import GenerationPipeline, QUEUED, STARTED, PROGRESS, FINISHED, FAILED, CANCELLED, DONE
 
 from vanilla import *
 from vanilla.dialogs import putFile, getFile
@@ -29,92 +37,24 @@ from defconAppKit.windows.progressWindow import ProgressWindow
 from mojo.glyphPreview import GlyphPreview
 from mojo.events import addObserver, removeObserver
 from mojo.extensions import getExtensionDefaultColor, setExtensionDefaultColor
+from PyObjCTools.AppHelper import callAfter, callLater
 from AppKit import NSColor, NSThickSquareBezelStyle, NSFocusRingTypeNone, NSBoxCustom, NSBezelBorder, NSLineBorder
-from math import cos, sin, pi
-from time import time
-import os
-import re
+from math import ceil
 
 MasterColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.4, 0.1, 0.2, 1)
 BlackColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 0, 0, 1)
 GlyphBoxFillColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.5, 0.4, 0.4, .1)
 GlyphBoxTextColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.5, 0.4, 0.4, 1)
 GlyphBoxBorderColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(1, 1, 1, 1)
+WarningColor = NSColor.colorWithCalibratedRed_green_blue_alpha_(0.85, 0.35, 0, 1)
 Transparent = NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 0, 0, 0)
-
-def makePreviewGlyph(glyph, fixedWidth=True):
-    if glyph is not None:
-        components = glyph.components
-        font = glyph.getParent()
-        previewGlyph = RGlyph()
-
-        if font is not None:
-            for component in components:
-                base = font[component.baseGlyph]
-                if len(base.components) > 0:
-                    base = makePreviewGlyph(base, False)
-                decomponent = RGlyph()
-                decomponent.appendGlyph(base)
-                decomponent.scaleBy((component.scale[0], component.scale[1]))
-                decomponent.moveBy((component.offset[0], component.offset[1]))
-                previewGlyph.appendGlyph(decomponent)
-            for contour in glyph.contours:
-                previewGlyph.appendContour(contour)
-
-            if fixedWidth:
-                previewGlyph.width = 1000
-                previewGlyph.leftMargin = previewGlyph.rightMargin = (previewGlyph.leftMargin + previewGlyph.rightMargin)/2
-                previewGlyph.scaleBy((.75, .75), (previewGlyph.width/2, 0))
-                previewGlyph.moveBy((0, -50))
-
-            scaleFactor = 1000.0 / font.info.unitsPerEm
-            previewGlyph.scaleBy((scaleFactor, scaleFactor), (previewGlyph.width/2, 0))
-
-            previewGlyph.name = glyph.name
-
-        return previewGlyph
-    return
-
-def errorGlyph():
-    glyph = RGlyph()
-    glyph.width = 500
-    pen = glyph.getPen()
-
-    l = 50
-    p = (220, 150)
-    a = pi/4
-    pen.moveTo(p)
-    px, py = p
-    for i in range(12):
-        x = px+(l*cos(a))
-        y = py+(l*sin(a))
-        pen.lineTo((x, y))
-        px = x
-        py = y
-        if i%3 == 0:
-            a -= pi/2
-        elif i%3 != 0:
-            a += pi/2
-    pen.closePath()
-
-    return glyph
-
-def fontName(font):
-    familyName = font.info.familyName
-    styleName = font.info.styleName
-    if familyName is None:
-        familyName = font.info.familyName = 'Unnamed'
-    if styleName is None:
-        styleName = font.info.styleName = 'Unnamed'
-    return ' > '.join([familyName, styleName])
+# seconds before prefetching starts once a glyph is shown, and between prefetched glyphs
+PREFETCH_DELAY = .3
+PREFETCH_INTERVAL = .02
 
 def colorToTuple(color): # convert NSColor to rgba tuple
     return color.redComponent(), color.greenComponent(), color.blueComponent(), color.alphaComponent()
 
-def areComponentsCompatible(glyphs):
-    componentCombinations = set(tuple(sorted(c.baseGlyph for c in g.components)) for g in glyphs)
-    return len(componentCombinations) == 1
-
 class InterpolationMatrixController:
 
     def __init__(self):
@@ -128,26 +68,55 @@ class InterpolationMatrixController:
         glyphEdit.setBordered_(False)
         glyphEdit.setBackgroundColor_(Transparent)
         glyphEdit.setFocusRingType_(NSFocusRingTypeNone)
-        self.axesGrid = {'horizontal': 3, 'vertical': 1}
-        self.gridMax = 15
-        self.masters = []
-        self.mutatorMasters = []
-        self.rawMasters = []
-        self.matrixSpots = {}
+        self.engine = MatrixEngine((3, 1))
+        self.axesGrid = self.engine.axesGrid
+        self.gridMax = 52
+        self.viewportMax = 15
+        self.viewportOrigin = [0, 0]
         self.mutator = None
         self.currentGlyph = None
+        self.currentText = None
+        self.previewGlyphs = None
+        self.previewToken = None
+        self.selectedSpot = None
         self.errorGlyph = errorGlyph()
+        self.rasterMode = False
+        self.thumbnails = ImageThumbnailCache()
+        # glyphs likely to come next are interpolated in idle time, one per tick, see instancePrefetch
+        self.prefetcher = GlyphPrefetcher(self.engine)
+        self.prefetchRun = 0
+        self.pipeline = GenerationPipeline()
+        self.pipeline.subscribe(self.jobEventReceived)
         self.buildMatrix((self.axesGrid['horizontal'], self.axesGrid['vertical']))
         self.w.addColumn = SquareButton((-80, 10, 30, 30), u'+', callback=self.addColumn)
         self.w.removeColumn = SquareButton((-115, 10, 30, 30), u'-', callback=self.removeColumn)
         self.w.addLine = SquareButton((-40, -40, 30, 30), u'+', callback=self.addLine)
         self.w.removeLine = SquareButton((-40, -72, 30, 30), u'-', callback=self.removeLine)
-        for button in [self.w.addColumn, self.w.removeColumn, self.w.addLine, self.w.removeLine]:
+        self.w.scrollLeft = SquareButton((-190, 10, 30, 30), u'◀', callback=self.scrollMatrix)
+        self.w.scrollLeft.direction = (-1, 0)
+        self.w.scrollRight = SquareButton((-155, 10, 30, 30), u'▶', callback=self.scrollMatrix)
+        self.w.scrollRight.direction = (1, 0)
+        self.w.scrollUp = SquareButton((-40, 50, 30, 30), u'▲', callback=self.scrollMatrix)
+        self.w.scrollUp.direction = (0, -1)
+        self.w.scrollDown = SquareButton((-40, 82, 30, 30), u'▼', callback=self.scrollMatrix)
+        self.w.scrollDown.direction = (0, 1)
+        for button in [self.w.addColumn, self.w.removeColumn, self.w.addLine, self.w.removeLine, self.w.scrollLeft, self.w.scrollRight, self.w.scrollUp, self.w.scrollDown]:
             button.getNSButton().setBezelStyle_(10)
+        self.updateScrollButtons()
         self.w.generate = GradientButton((225, 10, 100, 30), title=u'Generate…', callback=self.generationSheet)
+        # extra axes (beyond the grid), the first one is scrubbed through slices of the design space
+        self.w.sliceTitle = TextBox((335, 8, 90, 12), '', sizeStyle='mini')
+        self.w.slice = Slider((335, 22, 90, 15), minValue=0, maxValue=1, value=0, tickMarkCount=2, stopOnTickMarks=True, sizeStyle='mini', callback=self.changeSlice)
+        self.updateSliceControls()
         self.w.loadMatrix = GradientButton((430, 10, 70, 30), title='Load', callback=self.loadMatrixFile)
         self.w.saveMatrix = GradientButton((505, 10, 70, 30), title='Save', callback=self.saveMatrix)
         self.w.clearMatrix = GradientButton((580, 10, 70, 30), title='Clear', callback=self.clearMatrix)
+        self.w.rasterMode = CheckBox((665, 15, 70, 22), 'Raster', value=self.rasterMode, sizeStyle='small', callback=self.toggleRasterMode)
+        self.w.deltaMode = CheckBox((735, 15, 70, 22), 'Deltas', value=self.engine.previewBackend == 'variations', sizeStyle='small', callback=self.toggleDeltaMode)
+        self.w.jobStatus = TextBox((810, 18, -235, 17), '', sizeStyle='small')
+        self.w.cancelJobs = SquareButton((-225, 10, 30, 30), u'✕', callback=self.cancelJobs)
+        self.w.cancelJobs.getNSButton().setBezelStyle_(10)
+        self.w.cancelJobs.show(False)
         addObserver(self, 'updateMatrix', 'currentGlyphChanged')
         addObserver(self, 'updateMatrix', 'fontDidClose')
         addObserver(self, 'updateMatrix', 'mouseUp')
@@ -156,184 +125,307 @@ class InterpolationMatrixController:
         self.w.bind('resize', self.windowResize)
         self.w.open()
 
+    def _getMasters(self):
+        return self.engine.masters
+
+    def _setMasters(self, masters):
+        self.engine.masters = masters
+
+    masters = property(_getMasters, _setMasters)
+
+    def _getMatrixSpots(self):
+        return self.engine.matrixSpots
+
+    def _setMatrixSpots(self, matrixSpots):
+        self.engine.matrixSpots = matrixSpots
+
+    matrixSpots = property(_getMatrixSpots, _setMatrixSpots)
+
     def defineWeight(self, axesGrid):
         nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
         pass
 
+    def getViewport(self):
+        # only the cells within the viewport are built and rendered,
+        # the rest of the grid is reached by scrolling
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
+        width = min(nCellsOnHorizontalAxis, self.viewportMax)
+        height = min(nCellsOnVerticalAxis, self.viewportMax)
+        oi, oj = self.viewportOrigin
+        oi = max(0, min(oi, nCellsOnHorizontalAxis-width))
+        oj = max(0, min(oj, nCellsOnVerticalAxis-height))
+        self.viewportOrigin = [oi, oj]
+        return (oi, oj), (width, height)
+
+    def getVisibleSpots(self):
+        origin, size = self.getViewport()
+        return self.engine.getSpots(origin, size)
+
+    def getCell(self, spot):
+        ch, j = spot
+        if isinstance(ch, int):
+            ch = getKeyForValue(ch)
+        return getattr(self.w.matrix, '%s%s'%(ch, j), None)
+
     def buildMatrix(self, axesGrid):
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+        self.engine.setAxesGrid(axesGrid)
         if hasattr(self.w, 'matrix'):
             delattr(self.w, 'matrix')
         self.w.matrix = Group((0, 50, -50, -0))
         matrix = self.w.matrix
+        (oi, oj), viewportSize = self.getViewport()
+        nVisibleOnHorizontalAxis, nVisibleOnVerticalAxis = viewportSize
         windowPosSize = self.w.getPosSize()
-        cellXSize, cellYSize = self.glyphPreviewCellSize(windowPosSize, axesGrid)
-
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-
-            for j in range(nCellsOnVerticalAxis):
-
-                spotKey = '%s%s'%(ch, j)
+        cellXSize, cellYSize = self.glyphPreviewCellSize(windowPosSize, viewportSize)
+        self.engine.setPreviewCellSize((cellXSize, cellYSize))
+        visibleSpots = self.getVisibleSpots()
+        self.engine.releaseSpots(visibleSpots)
 
-                if not spotKey in self.matrixSpots:
-                    matrixSpot = MatrixSpot((i, j))
-                    matrixSpot.setWeights(((i+1)*100, (j+1)*100))
-                    self.matrixSpots[spotKey] = matrixSpot
+        for i, j in visibleSpots:
 
-                elif spotKey in self.matrixSpots:
-                    matrixSpot = self.matrixSpots[spotKey]
-
-                setattr(matrix, spotKey, Group(((i*cellXSize)-i, (j*cellYSize), cellXSize, cellYSize)))
-                xEnd = yEnd = -2
-                if i == nCellsOnHorizontalAxis-1:
-                    xEnd = -3
-                if j == nCellsOnVerticalAxis-1:
-                    yEnd = -3
-                bSize = (2, 2, xEnd, yEnd)
-
-                cell = getattr(matrix, spotKey)
-                cell.background = Box(bSize)
-                cell.selectionMask = Box(bSize)
-                cell.selectionMask.show(False)
-                cell.masterMask = Box(bSize)
-                cell.masterMask.show(False)
-                for box in [cell.background, cell.selectionMask, cell.masterMask]:
-                    box = box.getNSBox()
-                    box.setBoxType_(NSBoxCustom)
-                    box.setFillColor_(GlyphBoxFillColor)
-                    box.setBorderWidth_(2)
-                    box.setBorderColor_(GlyphBoxBorderColor)
-                cell.glyphView = GlyphPreview(bSize)
-                cell.button = SquareButton((0, 0, -0, -0), None, callback=self.pickSpot)
-                cell.button.spot = matrixSpot.get()
-                # cell.button.getNSButton().setBordered_(False)
-                cell.button.getNSButton().setTransparent_(True)
-                cell.coordinate = TextBox((5, -17, 30, 12), matrixSpot.getReadableSpot(), sizeStyle='mini')
-                cell.coordinate.getNSTextField().setTextColor_(GlyphBoxTextColor)
-                hWeight, vWeight = matrixSpot.getWeights()
-                cell.locationHvalue = EditText((-40, (cellYSize/2)-8, 36, 16), str(hWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
-                if nCellsOnHorizontalAxis <= 1:
-                    cell.locationHvalue.show(False)
-                cell.locationVvalue = EditText(((cellXSize/2)-18, -18, 36, 16), str(vWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
-                if nCellsOnVerticalAxis <= 1:
-                    cell.locationVvalue.show(False)
-                for editInput in [cell.locationVvalue, cell.locationHvalue]:
-                    e = editInput.getNSTextField()
-                    e.setBordered_(False)
-                    e.setBackgroundColor_(Transparent)
-                    e.setFocusRingType_(NSFocusRingTypeNone)
-                    editInput.spot = matrixSpot.get()
-                cell.name = TextBox((7, 7, -5, 12), '', sizeStyle='mini', alignment='left')
-                cell.name.getNSTextField().setTextColor_(MasterColor)
+            ch = getKeyForValue(i)
+            spotKey = '%s%s'%(ch, j)
+            matrixSpot = self.matrixSpots[spotKey]
+            vi, vj = i-oi, j-oj
+
+            setattr(matrix, spotKey, Group(((vi*cellXSize)-vi, (vj*cellYSize), cellXSize, cellYSize)))
+            xEnd = yEnd = -2
+            if vi == nVisibleOnHorizontalAxis-1:
+                xEnd = -3
+            if vj == nVisibleOnVerticalAxis-1:
+                yEnd = -3
+            bSize = (2, 2, xEnd, yEnd)
+
+            cell = getattr(matrix, spotKey)
+            cell.background = Box(bSize)
+            cell.selectionMask = Box(bSize)
+            cell.selectionMask.show(False)
+            cell.masterMask = Box(bSize)
+            cell.masterMask.show(False)
+            for box in [cell.background, cell.selectionMask, cell.masterMask]:
+                box = box.getNSBox()
+                box.setBoxType_(NSBoxCustom)
+                box.setFillColor_(GlyphBoxFillColor)
+                box.setBorderWidth_(2)
+                box.setBorderColor_(GlyphBoxBorderColor)
+            cell.glyphView = GlyphPreview(bSize)
+            cell.glyphView.show(not self.rasterMode)
+            cell.imageView = ImageView(bSize, scale='proportional')
+            cell.imageView.show(self.rasterMode)
+            cell.button = SquareButton((0, 0, -0, -0), None, callback=self.pickSpot)
+            cell.button.spot = matrixSpot.get()
+            # cell.button.getNSButton().setBordered_(False)
+            cell.button.getNSButton().setTransparent_(True)
+            cell.coordinate = TextBox((5, -17, 30, 12), matrixSpot.getReadableSpot(), sizeStyle='mini')
+            cell.coordinate.getNSTextField().setTextColor_(GlyphBoxTextColor)
+            hWeight, vWeight = matrixSpot.getWeights()
+            cell.locationHvalue = EditText((-40, (cellYSize/2)-8, 36, 16), str(hWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
+            if axesGrid[0] <= 1:
+                cell.locationHvalue.show(False)
+            cell.locationVvalue = EditText(((cellXSize/2)-18, -18, 36, 16), str(vWeight), sizeStyle='mini', callback=self.setSpotRatio, continuous=False)
+            if axesGrid[1] <= 1:
+                cell.locationVvalue.show(False)
+            for editInput in [cell.locationVvalue, cell.locationHvalue]:
+                e = editInput.getNSTextField()
+                e.setBordered_(False)
+                e.setBackgroundColor_(Transparent)
+                e.setFocusRingType_(NSFocusRingTypeNone)
+                editInput.spot = matrixSpot.get()
+            cell.name = TextBox((7, 7, -5, 12), '', sizeStyle='mini', alignment='left')
+            cell.name.getNSTextField().setTextColor_(MasterColor)
+            cell.issues = TextBox((7, 7, -5, 12), '', sizeStyle='mini', alignment='left')
+            cell.issues.getNSTextField().setTextColor_(WarningColor)
+
+        if hasattr(self.w, 'scrollLeft'):
+            self.updateScrollButtons()
+
+    def updateScrollButtons(self):
+        (oi, oj), (width, height) = self.getViewport()
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
+        self.w.scrollLeft.enable(oi > 0)
+        self.w.scrollRight.enable(oi+width < nCellsOnHorizontalAxis)
+        self.w.scrollUp.enable(oj > 0)
+        self.w.scrollDown.enable(oj+height < nCellsOnVerticalAxis)
+
+    def scrollMatrix(self, sender):
+        di, dj = sender.direction
+        origin = list(self.getViewport()[0])
+        self.viewportOrigin = [origin[0]+di, origin[1]+dj]
+        if self.getViewport()[0] != tuple(origin):
+            self.buildMatrix((self.axesGrid['horizontal'], self.axesGrid['vertical']))
+            self.updateMatrix()
 
     def updateMatrix(self, notification=None):
         axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        self.currentGlyph = currentGlyph = self.getCurrentGlyph(notification)
+        if self.currentText is not None:
+            previewGlyphs = list(self.currentText)
+        else:
+            previewGlyphs = [self.getCurrentGlyph(notification)]
+        if notification is not None and notification.get('notificationName') in ['keyUp', 'mouseUp'] and self.isPreviewCurrent(previewGlyphs):
+            # key strokes & clicks that didn’t change any glyph shown
+            return
+        self.cancelPrefetch()
+        glyphHashes = self.engine.getGlyphHashes()
+        self.previewGlyphs, self.previewToken = previewGlyphs, glyphHashes.getToken()
+        if self.currentText is not None:
+            # string mode, every cell shows the whole glyph run
+            self.placeTextMasters(self.currentText, axesGrid)
+            self.makeTextInstances(axesGrid)
+            return
+        self.currentGlyph = currentGlyph = previewGlyphs[0]
         if currentGlyph is not None:
             self.w.glyphTitle.name.set(currentGlyph)
         elif currentGlyph is None:
             self.w.glyphTitle.name.set('No current glyph')
         self.placeGlyphMasters(currentGlyph, axesGrid)
         self.makeGlyphInstances(axesGrid)
+        self.startPrefetch(currentGlyph)
 
-    def placeGlyphMasters(self, glyphName, axesGrid):
-        availableFonts = AllFonts()
-        masters = self.masters
-        mutatorMasters = []
-        rawMasters = []
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        matrix = self.w.matrix
-        masterGlyph = None
-
-        for matrixMaster in masters:
-            spot = matrixMaster
-            masterFont = spot.getFont()
-            ch, j = spot
-            i = getValueForKey(ch)
-            matrixSpot = self.matrixSpots[spot.getSpotKey()]
-
-            if (masterFont in availableFonts) and (glyphName is not None) and (glyphName in masterFont):
-                if i <= nCellsOnHorizontalAxis and j <= nCellsOnVerticalAxis:
-                    l = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-                    masterGlyph = makePreviewGlyph(masterFont[glyphName])
-                    if masterGlyph is not None:
-                        mutatorMasters.append((l, masterGlyph.toMathGlyph()))
-                        rawMasters.append(masterFont[glyphName])
-            elif (masterFont not in availableFonts):
-                masters.remove(matrixMaster)
-
-            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis:
-                cell = getattr(matrix, spot.getSpotKey())
-                cell.glyphView.setGlyph(masterGlyph)
-                if masterGlyph is not None:
-                    cell.glyphView.getNSView().setContourColor_(MasterColor)
-                    cell.masterMask.show(True)
-                    fontName = ' '.join([masterFont.info.familyName, masterFont.info.styleName])
-                    cell.name.set(fontName)
-                elif masterGlyph is None:
-                    cell.glyphView.getNSView().setContourColor_(BlackColor)
-                    cell.masterMask.show(False)
-                    cell.name.set('')
-
-        self.mutatorMasters = mutatorMasters
-        self.rawMasters = rawMasters
-
-    def makeGlyphInstances(self, axesGrid):
+    def startPrefetch(self, glyphName):
+        if glyphName is None:
+            return
+        fonts = [master.getFont() for master in self.masters if glyphName in master.getFont()]
+        if not fonts:
+            return
+        self.prefetcher.viewed(glyphName, fonts[0], self.getVisibleSpots())
+        self.prefetchRun += 1
+        callLater(PREFETCH_DELAY, self.prefetchStep, self.prefetchRun)
 
-        instanceTime = []
+    def prefetchStep(self, run):
+        # a newer run, or anything shown meanwhile, makes this one obsolete
+        if run != self.prefetchRun:
+            return
+        if self.prefetcher.step():
+            callLater(PREFETCH_INTERVAL, self.prefetchStep, run)
 
-        mutatorMasters = self.mutatorMasters
-        masterSpots = [master.get() for master in self.masters]
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        matrix = self.w.matrix
-        instanceGlyphs = None
+    def cancelPrefetch(self):
+        self.prefetchRun += 1
+        self.prefetcher.cancel()
 
-        # start = time()
-        # count = 0
+    def isPreviewCurrent(self, glyphNames):
+        if self.previewToken is None or glyphNames != self.previewGlyphs:
+            return False
+        return not self.engine.getGlyphHashes().changedSince(self.previewToken, glyphNames)
 
-        if mutatorMasters:
+    def placeGlyphMasters(self, glyphName, axesGrid):
+        placedMasters = self.engine.placeGlyphMasters(glyphName, AllFonts())
+        self.setMasterCells(placedMasters)
 
-            try:
-                if areComponentsCompatible(self.rawMasters):
-                    bias, mutator = buildMutator(mutatorMasters)
-                else:
-                    # components are not compatible
-                    mutator = None
-            except:
-                # import traceback
-                # traceback.print_exc()
-                mutator = None
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
+    def placeTextMasters(self, glyphNames, axesGrid):
+        placedMasters = self.engine.placeTextMasters(glyphNames, AllFonts())
+        self.setMasterCells(placedMasters)
 
-                for j in range(nCellsOnVerticalAxis):
+    def setMasterCells(self, placedMasters):
+        matrix = self.w.matrix
 
-                    if (ch, j) not in masterSpots:
+        for spotKey, (masterFont, masterGlyph) in placedMasters.items():
+            cell = getattr(matrix, spotKey, None)
+            if cell is None:
+                continue
+            if masterGlyph is not None:
+                self.setCellGlyph(cell, masterGlyph, MasterColor)
+                cell.masterMask.show(True)
+                cell.issues.set('')
+                fontName = ' '.join([masterFont.info.familyName, masterFont.info.styleName])
+                cell.name.set(fontName)
+            elif masterGlyph is None:
+                self.setCellGlyph(cell, masterGlyph)
+                cell.masterMask.show(False)
+                cell.name.set('')
 
-                        matrixSpot = self.matrixSpots['%s%s'%(ch, j)]
+    def updateSliceControls(self):
+        extraAxes = self.engine.extraAxes
+        self.w.sliceTitle.show(bool(extraAxes))
+        self.w.slice.show(bool(extraAxes))
+        if extraAxes:
+            axisName = extraAxes[0]
+            cellCount = self.axesGrid[axisName]
+            slider = self.w.slice.getNSSlider()
+            slider.setMaxValue_(max(1, cellCount-1))
+            slider.setNumberOfTickMarks_(max(2, cellCount))
+            self.w.slice.set(self.engine.getSlice()[0])
+            self.w.sliceTitle.set(self.engine.getSliceName())
+
+    def changeSlice(self, sender):
+        # the first extra axis only, masters are already placed for every slice
+        depth = list(self.engine.getSlice())
+        depth[0] = min(int(round(sender.get())), self.axesGrid[self.engine.extraAxes[0]]-1)
+        if tuple(depth) == self.engine.getSlice():
+            return
+        self.engine.setSlice(depth)
+        self.w.sliceTitle.set(self.engine.getSliceName())
+        if self.engine.placedMasters:
+            self.setMasterCells(self.engine.getPlacedMasters())
+            if self.currentText is not None:
+                self.makeTextInstances(None)
+            else:
+                self.makeGlyphInstances(None)
+        else:
+            self.updateMatrix()
 
-                        if mutator is not None:
-                            instanceLocation = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-                            instanceStart = time()
-                            instanceGlyph = RGlyph()
-                            iGlyph = mutator.makeInstance(instanceLocation)
-                            instanceGlyph = RGlyph()
-                            instanceGlyph.fromMathGlyph(iGlyph)
-                            instanceStop = time()
-                            instanceTime.append((instanceStop-instanceStart)*1000)
-                        else:
-                            instanceGlyph = self.errorGlyph
+    def makeGlyphInstances(self, axesGrid):
+        detailSpots = []
+        if self.selectedSpot is not None:
+            ch, j = self.selectedSpot
+            detailSpots.append((getValueForKey(ch), j))
+        instances = self.engine.makeGlyphInstances(self.getVisibleSpots(), detailSpots)
+        self.setInstanceCells(instances)
+
+    def makeTextInstances(self, axesGrid):
+        # a single pass for the whole run in every visible cell
+        instances = self.engine.makeTextInstances(self.getVisibleSpots())
+        self.setInstanceCells(instances)
+
+    def setInstanceCells(self, instances):
+        matrix = self.w.matrix
 
-                        cell = getattr(matrix, '%s%s'%(ch, j))
-                        cell.glyphView.setGlyph(instanceGlyph)
-    #                     count += 1
+        for spotKey, instanceGlyph in instances.items():
+            if instanceGlyph is None:
+                instanceGlyph = self.errorGlyph
+            cell = getattr(matrix, spotKey)
+            self.setCellGlyph(cell, instanceGlyph)
+            # a master in another slice may have been shown here
+            cell.masterMask.show(False)
+            cell.name.set('')
+            # questionable geometry (mostly extrapolation), see glyphDiagnostics
+            issues = self.engine.instanceIssues.get(spotKey)
+            if instances[spotKey] is None and self.currentGlyph in self.engine.mutatorReport:
+                # the glyph’s mutator couldn’t be built
+                issues = self.engine.mutatorReport[self.currentGlyph]['reasons']
+            cell.issues.set(u'⚠ %s'%(', '.join(issues)) if issues else '')
+
+    def setCellGlyph(self, cell, glyph, color=BlackColor):
+        if self.rasterMode:
+            if glyph is None:
+                cell.imageView.setImage(imageObject=None)
+                return
+            # drawn by AppKit, the python rasterizer is left to headless contact sheets
+            image = self.thumbnails.getThumbnail(glyph, self.getThumbnailSize(), colorToTuple(color))
+            cell.imageView.setImage(imageObject=image)
+        else:
+            cell.glyphView.setGlyph(glyph)
+            cell.glyphView.getNSView().setContourColor_(color)
+
+    def getThumbnailSize(self):
+        # cell sizes are rounded up to steps of 32px so that thumbnails survive small resizes,
+        # the image views scale them to the actual cell size
+        origin, viewportSize = self.getViewport()
+        cellXSize, cellYSize = self.glyphPreviewCellSize(self.w.getPosSize(), viewportSize)
+        return int(ceil(cellXSize/32)*32), int(ceil(cellYSize/32)*32)
+
+    def toggleRasterMode(self, sender):
+        self.rasterMode = bool(sender.get())
+        matrix = self.w.matrix
+        for i, j in self.getVisibleSpots():
+            cell = getattr(matrix, '%s%s'%(getKeyForValue(i), j))
+            cell.glyphView.show(not self.rasterMode)
+            cell.imageView.show(self.rasterMode)
+        self.updateMatrix()
 
-        # stop = time()
-        # if count:
-        #     wholeTime = (stop-start)*1000
-        #     print('made %s instances in %0.3fms, average: %0.3fms' % (count, wholeTime, wholeTime/count))
+    def toggleDeltaMode(self, sender):
+        # previews as weighted sums of compiled masters (see glyphVariations), generation still goes through MutatorMath
+        self.engine.setPreviewBackend('variations' if sender.get() else 'mutatorMath')
+        self.updateMatrix()
 
     def generationSheet(self, sender):
 
@@ -357,13 +449,15 @@ class InterpolationMatrixController:
         report = generateSheet.tabs[2]
 
         font.guide = TextBox((10, 7, -10, 22),
-            u'A1, B2, C4 — A, C (whole columns) — 1, 5 (whole lines) — * (everything)',
+            u'A1, A1:C3 — B, B:D (columns) — 1, 2-5 (lines) — * — /2 (step) — h>300 — !B2',
             sizeStyle='small')
         font.headerBar = HorizontalLine((10, 25, -10, 1))
         font.spotsListTitle = TextBox((10, 40, 70, 17), 'Locations')
         font.spots = EditText((100, 40, -10, 22))
         if readableCoord is not None:
             font.spots.set(readableCoord)
+        font.subsetTitle = TextBox((10, 66, 70, 17), 'Subset')
+        font.subset = EditText((100, 64, -10, 22), placeholder=u'all glyphs — U+0020-007E, *.sc, "Hamburgefonstiv"', sizeStyle='small')
 
         font.sourceFontTitle = TextBox((10, 90, -280, 17), 'Source font (naming & groups)', sizeStyle='small')
         font.sourceFontBar = HorizontalLine((10, 110, -280, 1))
@@ -428,6 +522,7 @@ class InterpolationMatrixController:
         report.markColors.mixedColor = ColorWell(
             (170, 85, -0, 20),
             color=getExtensionDefaultColor('interpolationMatrix.mixedColor', fallback=NSColor.colorWithCalibratedRed_green_blue_alpha_(.6,.7,.3,.5)))
+        report.failFast = CheckBox((10, -30, -260, 20), 'Stop at first incompatible glyph', value=False, sizeStyle='small')
         report.yes = Button((-170, -30, 160, 20), 'Generate Report', self.getGenerationInfo)
         report.yes.id = 'report'
         report.no = Button((-250, -30, 75, 20), 'Cancel', callback=self.cancelGeneration)
@@ -454,18 +549,29 @@ class InterpolationMatrixController:
                 sourceFontName = mastersList[sourceFontIndex]
                 sourceFont = [master.getFont() for master in self.masters if fontName(master.getFont()) == sourceFontName and master.getFont() in availableFonts]
 
+                try:
+                    subset = GlyphSubset.fromExpression(fontTab.subset.get())
+                except ValueError as e:
+                    print('Interpolation matrix — invalid subset: %s' % (e))
+                    return
+
                 generationInfos = {
                     'sourceFont': sourceFont,
                     'interpolateGlyphs': fontTab.glyphs.get(),
                     'interpolateKerning': fontTab.kerning.get(),
                     'interpolateFontInfos': fontTab.fontInfos.get(),
                     'addGroups': fontTab.groups.get(),
+                    'subset': subset,
                     'openFonts': fontTab.openUI.get(),
                     'report': fontTab.report.get()
                 }
 
                 spotsInput = fontTab.spots.get()
-                spotsList = self.parseSpotsList(spotsInput)
+                try:
+                    spotsList = self.parseSpotsList(spotsInput)
+                except SpotExpressionError as e:
+                    print('Interpolation matrix — invalid locations: %s' % (e))
+                    return
 
                 if (spotsList is None):
                     print('Interpolation matrix — at least one location is required.')
@@ -473,14 +579,17 @@ class InterpolationMatrixController:
 
                 # print(['%s%s'%(getKeyForValue(i).upper(), j+1) for i, j in spotsList])
 
-            masterLocations = self.getMasterLocations()
+                # the batch works on a copy of the matrix & masters, fonts can be edited meanwhile
+                engine = self.engine.snapshot(bool(generationInfos['interpolateGlyphs'] or generationInfos['interpolateKerning']))
 
             for spot in spotsList:
                 i, j = spot
                 ch = getKeyForValue(i)
-                pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-                pickedCell.selectionMask.show(False)
-                self.generateInstanceFont(spot, masterLocations, generationInfos)
+                self.selectedSpot = None
+                pickedCell = self.getCell((ch, j))
+                if pickedCell is not None:
+                    pickedCell.selectionMask.show(False)
+                self.generateInstanceFont(spot, generationInfos, engine)
 
         elif _ID == 'report':
             reportTab = generateSheet.tabs[2]
@@ -495,6 +604,7 @@ class InterpolationMatrixController:
 
             reportInfos = {
                 'markGlyphs': bool(reportTab.options.get()),
+                'failFast': bool(reportTab.failFast.get()),
                 'compatibleColor': colorToTuple(compatibleColor),
                 'incompatibleColor': colorToTuple(incompatibleColor),
                 'mixedColor': colorToTuple(mixedColor)
@@ -505,214 +615,43 @@ class InterpolationMatrixController:
         delattr(self.w, 'generateSheet')
 
     def parseSpotsList(self, inputSpots):
-
-        axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        inputSpots = inputSpots.split(',')
-        masterSpots = [master.getRaw() for master in self.masters]
-        spotsToGenerate = []
-
-        if inputSpots[0] == '':
-            return
-        elif inputSpots[0] == '*':
-            return [(i, j) for i in range(nCellsOnHorizontalAxis) for j in range(nCellsOnVerticalAxis) if (i,j) not in masterSpots]
-        else:
-            for item in inputSpots:
-                parsedSpot = self.parseSpot(item, axesGrid)
-                if parsedSpot is not None:
-                    parsedSpot = list(set(parsedSpot) - set(masterSpots))
-                    spotsToGenerate += parsedSpot
-            return spotsToGenerate
+        return self.engine.parseSpotsList(inputSpots)
 
     def parseSpot(self, spotName, axesGrid):
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
-        s = re.search('([a-zA-Z](?![0-9]))|([a-zA-Z][0-9][0-9]?)|([0-9][0-9]?)', spotName)
-        if s:
-            letterOnly = s.group(1)
-            letterNumber = s.group(2)
-            numberOnly = s.group(3)
-
-            if numberOnly is not None:
-                lineNumber = int(numberOnly) - 1
-                if lineNumber < nCellsOnVerticalAxis:
-                    return [(i, lineNumber) for i in range(nCellsOnHorizontalAxis)]
-
-            elif letterOnly is not None:
-                columnNumber = getValueForKey(letterOnly.lower())
-                if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis:
-                    return [(columnNumber, j) for j in range(nCellsOnVerticalAxis)]
-
-            elif letterNumber is not None:
-                letter = letterNumber[:1]
-                number = letterNumber[1:]
-                columnNumber = getValueForKey(letter.lower())
-                try:
-                    lineNumber = int(number) - 1
-                except:
-                    return
-                if columnNumber is not None and columnNumber < nCellsOnHorizontalAxis and lineNumber < nCellsOnVerticalAxis:
-                    return [(columnNumber, lineNumber)]
-        return
+        return self.engine.parseSpot(spotName)
 
     def cancelGeneration(self, sender):
         self.w.generateSheet.close()
         delattr(self.w, 'generateSheet')
 
     def getMasterLocations(self):
-        masters = self.masters
-        matrixSpots = self.matrixSpots
-        masterLocations = []
-        for matrixMaster in masters:
-            spotKey = matrixMaster.getSpotKey()
-            masterFont = matrixMaster.getFont()
-            masterMatrixSpot = matrixSpots[spotKey]
-            l = Location(**masterMatrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-            masterLocations.append((l, masterFont))
-        return masterLocations
-
-    def generateInstanceFont(self, spot, masterLocations, generationInfos):
+        return self.engine.getMasterLocations()
+
+    def generateInstanceFont(self, spot, generationInfos, engine=None):
 
         if generationInfos['sourceFont']:
 
-            start = time()
-            report = []
+            if engine is None:
+                engine = self.engine.snapshot()
 
-            doGlyphs = bool(generationInfos['interpolateGlyphs'])
-            doKerning = bool(generationInfos['interpolateKerning'])
-            doFontInfos = bool(generationInfos['interpolateFontInfos'])
-            addGroups = bool(generationInfos['addGroups'])
-            doReport = bool(generationInfos['report'])
-            UI = bool(generationInfos['openFonts'])
+            instanceName = engine.getInstanceName(spot)
 
-            try:
-                masters = self.masters
-                baseFont = generationInfos['sourceFont'][0]
-                newFont = None
-                folderPath = None
-                s = re.search('(.*)/(.*)(.ufo)', baseFont.path)
-                if s is not None:
-                    folderPath = s.group(1)
+            baseFont = generationInfos['sourceFont'][0]
+            path = None
+            folderPath = getInstancesFolder(baseFont)
+            if folderPath is not None:
+                path = '%s/%s-%s%s'%(folderPath, baseFont.info.familyName, instanceName.replace(' ', '-'), '.ufo')
 
-                masterFonts = [master.getFont() for master in masters]
+            # the job reads a copy of the source font’s names, groups & glyph order, the instance font is made in jobEvent
+            jobInfos = dict(generationInfos, sourceFont=[FontData(baseFont)])
+            job = self.pipeline.submit(instanceName, self.generateInstanceJob, engine, spot, jobInfos, path)
+            job.kind = 'font'
+            job.generationInfos = generationInfos
 
-                i, j = spot
-                ch = getKeyForValue(i)
-                spotKey = '%s%s'%(ch, j)
-                matrixSpot = self.matrixSpots[spotKey]
-                instanceLocation = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-                instanceName = '%s%s'%(ch.upper(), j+1)
-
-                progress = ProgressWindow('Generating instance %s%s'%(ch.upper(), j+1), parentWindow=self.w)
-                report.append(u'\n*** Generating instance %s ***\n'%(instanceName))
-
-                # Build fontx
-                if (doGlyphs == True) or (doKerning == True) or (doFontInfos == True) or (addGroups == True):
-
-                    if hasattr(RFont, 'showUI') or (not hasattr(RFont, 'showUI') and (folderPath is not None)):
-                        newFont = RFont(showUI=False)
-                    elif not hasattr(RFont, 'showUI') and (folderPath is None):
-                        newFont = RFont()
-                    newFont.info.familyName = baseFont.info.familyName
-                    newFont.info.styleName = '%s%s'%(ch.upper(), j+1)
-                    try:
-                        newFont.glyphOrder = baseFont.glyphOrder
-                    except:
-                        try:
-                            newFont.glyphOrder = baseFont.lib['public.glyphOrder']
-                        except:
-                            try:
-                                newFont.lib['public.glyphOrder'] = baseFont.lib['public.glyphOrder']
-                            except:
-                                try:
-                                    newFont.lib['public.glyphOrder'] = baseFont.glyphOrder
-                                except:
-                                    pass
-                    if folderPath is not None:
-                        instancesFolder = u'%s%s'%(folderPath, '/matrix-instances')
-                        if not os.path.isdir(instancesFolder):
-                            os.makedirs(instancesFolder)
-                        folderPath = instancesFolder
-                        path = '%s/%s-%s%s'%(folderPath, newFont.info.familyName, newFont.info.styleName, '.ufo')
-                    interpolatedGlyphs = []
-                    interpolatedInfo = None
-                    interpolatedKerning = None
-                    interpolationReports = []
-
-                    report.append(u'+ Created new font')
-
-                # interpolate font infos
-
-                if doFontInfos == True:
-                    infoMasters = [(infoLocation, masterFont.info.toMathInfo()) for infoLocation, masterFont in masterLocations]
-                    try:
-                        bias, iM = buildMutator(infoMasters)
-                        instanceInfo = iM.makeInstance(instanceLocation)
-                        newFont.info.fromMathInfo(instanceInfo)
-                        report.append(u'+ Successfully interpolated font info')
-                    except:
-                        report.append(u'+ Couldn’t interpolate font info')
-
-                # interpolate kerning
-
-                if doKerning == True:
-                    kerningMasters = [(kerningLocation, MathKerning(masterFont.kerning)) for kerningLocation, masterFont in masterLocations]
-                    try:
-                        bias, kM = buildMutator(kerningMasters)
-                        instanceKerning = kM.makeInstance(instanceLocation)
-                        instanceKerning.extractKerning(newFont)
-                        report.append(u'+ Successfully interpolated kerning')
-                        if addGroups == True:
-                            for key, value in baseFont.groups.items():
-                                newFont.groups[key] = value
-                            report.append(u'+ Successfully transferred groups')
-                    except:
-                        report.append(u'+ Couldn’t interpolate kerning')
-
-                # filter compatible glyphs
-
-                glyphList, strayGlyphs = self.compareGlyphSets(masterFonts)
-
-                if doGlyphs == True:
-
-                    incompatibleGlyphs = self.interpolateGlyphSet(instanceLocation, glyphList, masterLocations, newFont)
-
-                    report.append(u'+ Successfully interpolated %s glyphs'%(len(newFont)))
-                    report.append(u'+ Couldn’t interpolate %s glyphs'%(len(incompatibleGlyphs)))
-
-                if (newFont is not None) and hasattr(RFont, 'showUI') and (folderPath is None) and UI:
-                    newFont.autoUnicodes()
-                    try:
-                        newFont.round()
-                    except TypeError:
-                        # font.round() is broken in RF Version 3.2b (built 1808302356)
-                        pass
-                    newFont.showUI()
-                elif (newFont is not None) and (folderPath is not None):
-                    newFont.autoUnicodes()
-                    try:
-                        newFont.round()
-                    except TypeError:
-                        # font.round() is broken in RF Version 3.2b (built 1808302356)
-                        pass
-                    newFont.save(path)
-                    report.append(u'\n—> Saved font to UFO at %s\n'%(path))
-                    if UI:
-                        f = RFont(path)
-                elif (newFont is not None):
-                    print('Couldn’t save font to UFO.')
-            except:
-                import traceback
-                traceback.print_exc()
-                print('Couldn’t finish generating, something happened…')
-                return
-            finally:
-                progress.close()
-
-                if doReport:
-                    print('\n'.join(report))
-
-            # stop = time()
-            # print('generated in %0.3f' % ((stop-start)*1000))
+    def generateInstanceJob(self, job, engine, spot, generationInfos, path):
+        # runs in the background on packed data only, fonts are made and UI work done in jobEvent
+        instance = engine.interpolateInstance(spot, generationInfos, progress=job.progress)
+        return instance, path
 
     def generateGlyphSet(self, sender):
 
@@ -738,144 +677,123 @@ class InterpolationMatrixController:
         suffix = glyphTab.suffix.get()
 
         if spot is not None:
-            progress = ProgressWindow('Generating glyphs', parentWindow=self.w)
             i, j = spot
             ch = getKeyForValue(i)
             spotKey = '%s%s'%(ch, j)
             matrixSpot = self.matrixSpots[spotKey]
-            instanceLocation = Location(**matrixSpot.getWeightsAsDict('horizontal', 'vertical'))
-            masterLocations = self.getMasterLocations()
-            if targetFontName == 'New font':
-                targetFont = RFont(showUI=False)
-            else:
-                targetFont = AllFonts().getFontsByFamilyNameStyleName(*targetFontName.split(' > '))
-            self.interpolateGlyphSet(instanceLocation, glyphList, masterLocations, targetFont, suffix)
-            targetFont.showUI()
-            progress.close()
+            instanceLocation = self.engine.getSpotLocation((ch, j))
+            engine = self.engine.snapshot()
+            job = self.pipeline.submit('%s glyphs'%(matrixSpot.getReadableSpot()), self.generateGlyphSetJob, engine, instanceLocation, glyphList, suffix)
+            job.kind = 'glyphs'
+            job.targetFontName = targetFontName
 
         if incomingSpot is not None:
             ch, j = incomingSpot
-            pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-            pickedCell.selectionMask.show(False)
-
-    def interpolateGlyphSet(self, instanceLocation, glyphSet, masters, targetFont, suffix=None):
-
-        incompatibleGlyphs = []
-
-        for glyphName in glyphSet:
-            masterGlyphs = [(masterLocation, masterFont[glyphName].toMathGlyph()) for masterLocation, masterFont in masters]
-            masterUnicodes = set(masterFont[glyphName].unicode for masterLocation, masterFont in masters)
-            masterRawGlyphs = [masterFont[glyphName] for masterLocation, masterFont in masters]
-
-            if len(masterUnicodes) == 1:
-                masterUnicode = masterUnicodes.pop()
-            else:
-                masterUnicode = None
-            if areComponentsCompatible(masterRawGlyphs):
-                try:
-                    bias, gM = buildMutator(masterGlyphs)
-                    newGlyph = RGlyph()
-                    instanceGlyph = gM.makeInstance(instanceLocation)
-                    if suffix is not None:
-                        glyphName += suffix
-                    newGlyph.fromMathGlyph(instanceGlyph)
-                    assert glyphName is not None
-                    newGlyph.name = glyphName
-                    newGlyph = targetFont.insertGlyph(newGlyph, glyphName)
-                    targetFont[glyphName].unicode = masterUnicode
-                except:
-                    incompatibleGlyphs.append(glyphName)
-            else:
-                incompatibleGlyphs.append(glyphName)
-
-        return incompatibleGlyphs
+            self.selectedSpot = None
+            pickedCell = self.getCell((ch, j))
+            if pickedCell is not None:
+                pickedCell.selectionMask.show(False)
 
-    def compareGlyphSets(self, fonts):
+    def generateGlyphSetJob(self, job, engine, instanceLocation, glyphList, suffix):
+        # glyphs are interpolated as math glyphs, written into the target font on the main thread
+        glyphs = GlyphBatch()
+        interpolateGlyphSet(instanceLocation, glyphList, engine.getMasterGlyphSets(), glyphs, suffix, progress=job.progress)
+        return glyphs
+
+    def jobEventReceived(self, event):
+        # called from the pipeline’s threads
+        callAfter(self.jobEvent, event)
+
+    def jobEvent(self, event):
+        eventType = event['type']
+        job = event['job']
+
+        if eventType in [STARTED, PROGRESS]:
+            status = u'Generating %s'%(job.name)
+            if job.total:
+                status += u' — %s/%s glyphs'%(job.done, job.total)
+            queued = len([otherJob for otherJob in self.pipeline.jobs if otherJob.status == QUEUED])
+            if queued:
+                status += u' (%s more queued)'%(queued)
+            self.w.jobStatus.set(status)
+            self.w.cancelJobs.show(True)
+
+        elif eventType == FINISHED:
+            if job.kind == 'font':
+                self.instanceGenerated(job)
+            elif job.kind == 'glyphs':
+                self.glyphSetGenerated(job)
+
+        elif eventType == FAILED:
+            print('Interpolation matrix — couldn’t generate %s: %s'%(job.name, job.error))
+            print(job.traceback)
+
+        elif eventType == CANCELLED:
+            print('Interpolation matrix — cancelled %s'%(job.name))
+
+        elif eventType == DONE:
+            summary = event['summary']
+            status = u'Done: %s generated, %s failed, %s cancelled (%0.1fs)'%(summary[FINISHED], summary[FAILED], summary[CANCELLED], summary['seconds'])
+            self.w.jobStatus.set(status)
+            self.w.cancelJobs.show(False)
+            for name, error in summary['errors']:
+                print('✗ %s: %s'%(name, error))
+
+    def instanceGenerated(self, job):
+        instance, path = job.result
+        newFont, report = makeInstanceFont(instance, path)
+        UI = bool(job.generationInfos['openFonts'])
+        if (newFont is not None) and (path is None) and UI:
+            newFont.showUI()
+        elif (newFont is not None) and (path is not None) and UI:
+            OpenFont(path)
+        elif (newFont is not None) and (path is None):
+            print('Couldn’t save font to UFO.')
+        if job.generationInfos['report']:
+            print('\n'.join(report))
+
+    def glyphSetGenerated(self, job):
+        glyphs = job.result
+        if job.targetFontName == 'New font':
+            glyphFont = RFont(showUI=False)
+            glyphs.writeTo(glyphFont)
+            glyphFont.showUI()
+            return
+        targetFont = AllFonts().getFontsByFamilyNameStyleName(*job.targetFontName.split(' > '))
+        if targetFont is None:
+            print('Interpolation matrix — %s isn’t open anymore'%(job.targetFontName))
+            return
+        glyphs.writeTo(targetFont)
+        targetFont.showUI()
 
-        fontKeys = [set(font.keys()) for font in fonts]
-        commonGlyphsList = set()
-        strayGlyphs = set()
-        for i, keys in enumerate(fontKeys):
-            if i == 0:
-                commonGlyphsList = keys
-                strayGlyphs = keys
-            elif i > 0:
-                commonGlyphsList = commonGlyphsList & keys
-                strayGlyphs = strayGlyphs - keys
-        return list(commonGlyphsList), list(strayGlyphs)
+    def cancelJobs(self, sender):
+        self.pipeline.cancel()
 
     def generateCompatibilityReport(self, reportInfo):
 
-        markGlyphs = reportInfo['markGlyphs']
-        compatibleColor = reportInfo['compatibleColor']
-        incompatibleColor = reportInfo['incompatibleColor']
-        mixedCompatibilityColor = reportInfo['mixedColor']
-
         title = 'Generating report'
-        if markGlyphs:
+        if reportInfo['markGlyphs']:
             title += ' & marking glyphs'
         progress = ProgressWindow(title, parentWindow=self.w)
 
+        # the digest is printed as glyphs are checked
+        reportInfo = dict(reportInfo, reportStream=ReportStream([TextDigestWriter()]))
         try:
-
-            masterFonts = [master.getFont() for master in self.masters]
-            glyphList, strayGlyphs = self.compareGlyphSets(masterFonts)
-            digest = []
-            interpolationReports = []
-            incompatibleGlyphs = 0
-
-            for glyphName in glyphList:
-
-                refMasterFont = masterFonts[0]
-                refMasterGlyph = refMasterFont[glyphName]
-
-                for masterFont in masterFonts[1:]:
-
-                    firstGlyph = refMasterFont[glyphName]
-                    secondGlyph = masterFont[glyphName]
-                    firstGlyph.mark = None
-                    secondGlyph.mark = None
-                    try:
-                        compatible, report = firstGlyph.isCompatible(secondGlyph)
-                    except:
-                        report = u'Compatibility check error'
-                        compatible == False
-
-                    if compatible == False:
-
-                        names = '%s <X> %s'%(fontName(refMasterFont), fontName(masterFont))
-                        reportID = (names, report)
-                        if reportID not in interpolationReports:
-                            digest.append(names)
-                            digest += [u'– %s'%(reportLine) for reportLine in report]
-                            digest.append('\n')
-                            interpolationReports.append(reportID)
-                            incompatibleGlyphs += 1
-
-                        if markGlyphs:
-                            if firstGlyph.mark == compatibleColor:
-                               firstGlyph.mark = mixedCompatibilityColor
-                            elif firstGlyph.mark != compatibleColor and firstGlyph.mark != mixedCompatibilityColor:
-                                firstGlyph.mark = incompatibleColor
-                            secondGlyph.mark = incompatibleColor
-
-                    elif compatible == True:
-
-                        if markGlyphs:
-                            if firstGlyph.mark == incompatibleColor or firstGlyph.mark == mixedCompatibilityColor:
-                               firstGlyph.mark = mixedCompatibilityColor
-                               secondGlyph.mark = mixedCompatibilityColor
-                            else:
-                                firstGlyph.mark = compatibleColor
-                                secondGlyph.mark = compatibleColor
-
+            results = self.engine.generateCompatibilityReport(reportInfo)
         finally:
             progress.close()
 
+        glyphList = results['glyphList']
+        incompatibleGlyphs = results['incompatibleGlyphs']
         print('\n*   Compatible glyphs: %s'%(len(glyphList) - incompatibleGlyphs))
         print('**  Incompatible glyphs: %s'%(incompatibleGlyphs))
-        print('*** Stray glyphs: %s\n– %s\n'%(len(strayGlyphs),u'\n– '.join(list(strayGlyphs))))
-        print('\n'.join(digest))
+        print('*** Stray glyphs: %s'%(len(results['strayGlyphs'])))
+        if results['stopped']:
+            print('*** Stopped at the first incompatible glyph, %s glyphs checked'%(len(glyphList)))
+            return
+        indexPath = self.engine.getCompatibilityIndexPath()
+        if indexPath is not None:
+            print('—> Compatibility index saved to %s'%(indexPath))
 
     def glyphPreviewCellSize(self, posSize, axesGrid):
         x, y, w, h = posSize
@@ -903,68 +821,18 @@ class InterpolationMatrixController:
             matrixSpot.setWeights((hWeight, vWeight))
             self.reallocateWeights()
         elif spotKey not in masterSpotKeys:
-            matrixSpot.shiftWeights((hWeight, vWeight))
+            self.engine.shiftSpotWeights((ch, j), (hWeight, vWeight))
         self.updateMatrix()
 
     def reallocateWeights(self, masterSpotKeys=None):
+        self.engine.reallocateWeights(masterSpotKeys)
 
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
-        matrixSpots = self.matrixSpots
-        masters = self.masters
-
-        if len(masters) <= 1:
-
-            self.matrixSpots = {}
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
-
-                for j in range(nCellsOnVerticalAxis):
-                    spotKey = '%s%s'%(ch, j)
-                    cell = getattr(self.w.matrix, spotKey)
-                    matrixSpot = MatrixSpot((i, j))
-                    matrixSpot.setWeights(((i+1)*100, (j+1)*100))
-                    weights = matrixSpot.getWeights()
-                    cell.locationHvalue.set('%0.0f'%(weights[0]))
-                    cell.locationVvalue.set('%0.0f'%(weights[1]))
-                    self.matrixSpots[spotKey] = matrixSpot
-
-        elif len(masters) > 1:
-
-            if masterSpotKeys is None:
-                masterSpotKeys = [master.getSpotKey() for master in masters]
-            hMutatorMasters = []
-            vMutatorMasters = []
-            for master in masters:
-                masterSpotKey = master.getSpotKey()
-                mi, mj = master.getRaw()
-                mhl = Location(horizontal=mi)
-                mvl = Location(vertical=mj)
-                hWeight, vWeight = matrixSpots[masterSpotKey].getWeights()
-                hMutatorMasters.append((mhl, hWeight))
-                vMutatorMasters.append((mvl, vWeight))
-
-            for i in range(nCellsOnHorizontalAxis):
-                ch = getKeyForValue(i)
-                hb, hm = buildMutator(hMutatorMasters)
-                vb, vm = buildMutator(vMutatorMasters)
-
-                for j in range(nCellsOnVerticalAxis):
-                    spotKey = '%s%s'%(ch, j)
-                    if spotKey not in masterSpotKeys:
-                        cell = getattr(self.w.matrix, spotKey)
-                        spot = matrixSpots[spotKey]
-                        if hm is not None:
-                            lh = Location(horizontal=i)
-                            instanceHweight = hm.makeInstance(lh)
-                        if vm is not None:
-                            lv = Location(vertical=j)
-                            instanceVweight = vm.makeInstance(lv)
-                        spot.setWeights((instanceHweight, instanceVweight))
-                        weights = spot.getWeights()
-                        cell.locationHvalue.set('%0.0f'%(weights[0]))
-                        cell.locationVvalue.set('%0.0f'%(weights[1]))
-            self.matrixSpots = matrixSpots
+        for i, j in self.getVisibleSpots():
+            spotKey = '%s%s'%(getKeyForValue(i), j)
+            cell = getattr(self.w.matrix, spotKey)
+            weights = self.matrixSpots[spotKey].getWeights()
+            cell.locationHvalue.set('%0.0f'%(weights[0]))
+            cell.locationVvalue.set('%0.0f'%(weights[1]))
 
     def parseWeightValue(self, value):
         try: value = float(value)
@@ -975,7 +843,7 @@ class InterpolationMatrixController:
         spot = sender.spot
         ch, j = spot
         masters = self.masters
-        masterSpots = [master.get() for master in masters]
+        masterSpots = [master.get() for master in self.engine.getSliceMasters()]
         axesGrid = self.axesGrid['horizontal'], self.axesGrid['vertical']
         matrix = self.w.matrix
         font = None
@@ -1012,27 +880,25 @@ class InterpolationMatrixController:
         font = fontsList[selectedFontIndex]
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
-        i = getValueForKey(ch)
-        l = MatrixMaster(spot, font)
-        self.masters.append(l)
+        self.selectedSpot = None
+        pickedCell = self.getCell(spot)
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
+        self.engine.addMaster(spot, font)
         self.updateMatrix()
 
     def clearSpot(self, sender):
         spot = (ch, j) = sender.spot
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
-        pickedCell.masterMask.show(False)
-        pickedCell.glyphView.getNSView().setContourColor_(BlackColor)
-        pickedCell.name.set('')
-        for matrixMaster in self.masters:
-            masterSpot = matrixMaster.get()
-            if spot == masterSpot:
-                self.masters.remove(matrixMaster)
-                break
+        self.selectedSpot = None
+        pickedCell = self.getCell(spot)
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
+            pickedCell.masterMask.show(False)
+            pickedCell.glyphView.getNSView().setContourColor_(BlackColor)
+            pickedCell.name.set('')
+        self.engine.removeMaster(spot)
         if not len(self.masters):
             self.clearMatrix()
         self.mutator = None
@@ -1040,21 +906,28 @@ class InterpolationMatrixController:
         self.updateMatrix()
 
     def setSpotSelection(self, matrix, spot, axesGrid):
-        for i in range(axesGrid[0]):
+        for i, j in self.getVisibleSpots():
             ch = getKeyForValue(i)
-            for j in range(axesGrid[1]):
-                cell = getattr(matrix, '%s%s'%(ch, j))
-                if (ch,j) == spot:
-                    cell.selectionMask.show(True)
-                else:
-                    cell.selectionMask.show(False)
+            cell = getattr(matrix, '%s%s'%(ch, j))
+            if (ch,j) == spot:
+                cell.selectionMask.show(True)
+            else:
+                cell.selectionMask.show(False)
+        self.selectedSpot = spot
+        if self.currentText is None and self.engine.getDetailTolerance() is not None:
+            # the selected cell switches to full detail
+            ch, j = spot
+            instances = self.engine.makeGlyphInstances([(getValueForKey(ch), j)], [(getValueForKey(ch), j)])
+            self.setInstanceCells(instances)
 
     def keepSpot(self, sender):
         ch, j = sender.spot
         self.w.spotSheet.close()
         delattr(self.w, 'spotSheet')
-        pickedCell = getattr(self.w.matrix, '%s%s'%(ch, j))
-        pickedCell.selectionMask.show(False)
+        self.selectedSpot = None
+        pickedCell = self.getCell((ch, j))
+        if pickedCell is not None:
+            pickedCell.selectionMask.show(False)
 
     def addColumn(self, sender):
         gridMax = self.gridMax
@@ -1122,90 +995,62 @@ class InterpolationMatrixController:
         self.updateMatrix()
 
     def clearMatrix(self, sender=None):
-        self.masters = []
-        self.matrixSpots = {}
+        self.engine.clear()
         self.mutator = None
+        self.selectedSpot = None
         matrix = self.w.matrix
-        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.axesGrid['horizontal'], self.axesGrid['vertical']
 
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-            for j in range(nCellsOnVerticalAxis):
-                cell = getattr(matrix, '%s%s'%(ch, j))
-                cell.glyphView.setGlyph(None)
-                cell.glyphView.getNSView().setContourColor_(BlackColor)
-                cell.selectionMask.show(False)
-                cell.masterMask.show(False)
-                cell.name.set('')
+        for i, j in self.getVisibleSpots():
+            cell = getattr(matrix, '%s%s'%(getKeyForValue(i), j))
+            self.setCellGlyph(cell, None)
+            cell.selectionMask.show(False)
+            cell.masterMask.show(False)
+            cell.name.set('')
+            cell.issues.set('')
 
     def saveMatrix(self, sender):
-        pathToSave = putFile(title='Save interpolation matrix', fileName='matrix.txt', fileTypes=['txt'])
+        pathToSave = putFile(title='Save interpolation matrix', fileName='matrix.txt', fileTypes=['txt', 'designspace'])
         if pathToSave is not None:
-            masters = self.masters
-            matrixSpots = self.matrixSpots
-            axesGrid = self.axesGrid
-            matrixTextValues = []
-            for master in masters:
-                masterSpotKey = master.getSpotKey()
-                matrixSpot = matrixSpots[masterSpotKey]
-                matrixTextValues.append(':'.join([masterSpotKey, matrixSpot.getWeightsAsString(), master.getFontPath()]))
-            posSize = self.w.getPosSize()
-            matrixTextValues = ['Matrix Interpolation File\n','%s,%s\n'%(axesGrid['horizontal'], axesGrid['vertical']), ','.join([str(value) for value in posSize]),'\n', str(self.currentGlyph),'\n',','.join(matrixTextValues)]
-            matrixTextForm = ''.join(matrixTextValues)
-            with open(pathToSave, 'w') as f:
-                f.write(matrixTextForm)
+            if pathToSave.lower().endswith('.designspace'):
+                # every spot of the grid (current slice) as an instance
+                writeDesignSpace(pathToSave, self.engine, self.engine.getSpots(), posSize=self.w.getPosSize(), currentGlyph=self.currentGlyph)
+            else:
+                writeMatrixFile(pathToSave, self.engine, self.w.getPosSize(), self.currentGlyph)
+                self.engine.matrixPath = pathToSave
 
     def loadMatrixFile(self, sender):
-        pathToLoad = getFile(fileTypes=['txt'], allowsMultipleSelection=False, resultCallback=self.loadMatrix, parentWindow=self.w)
+        pathToLoad = getFile(fileTypes=['txt', 'designspace'], allowsMultipleSelection=False, resultCallback=self.loadMatrix, parentWindow=self.w)
 
     def loadMatrix(self, pathToLoad):
         if pathToLoad is not None:
-            self.matrixSpots = {}
-            self.reallocateWeights()
-            with open(pathToLoad[0], 'r') as f:
-                matrixTextForm = f.read()
-            matrixValues = matrixTextForm.split('\n')
-            if matrixValues and matrixValues[0] == 'Matrix Interpolation File':
-                limits = tuple(matrixValues[1].split(','))
-                axesGrid = int(limits[0]), int(limits[1])
-                posSize = tuple([float(value) for value in matrixValues[2].split(',')])
-                self.w.resize(posSize[2], posSize[3])
+            try:
+                matrixInfo = readMatrixFile(pathToLoad[0])
+            except ValueError:
+                matrixInfo = None
+            if matrixInfo is not None:
+                axesGrid = matrixInfo['axesGrid']
+                posSize = matrixInfo['posSize']
+                if posSize is not None:
+                    self.w.resize(posSize[2], posSize[3])
                 self.axesGrid['horizontal'], self.axesGrid['vertical'] = axesGrid
+                self.viewportOrigin = [0, 0]
+                self.engine.setExtraAxes(matrixInfo['extraAxes'])
+                self.engine.loadMasters(matrixInfo['masters'], self.openMasterFont)
+                self.engine.matrixPath = pathToLoad[0]
+                self.engine.compatibilityIndex = None
+                self.updateSliceControls()
+                self.currentGlyph = matrixInfo['currentGlyph'] or self.currentGlyph
                 self.buildMatrix(axesGrid)
-                self.currentGlyph = matrixValues[3]
-                masterSpots = [value.split(':') for value in matrixValues[4].split(',')]
-                if len(masterSpots):
-                    masters = []
-                    matrixSpots = self.matrixSpots
-                    fontsToOpen = []
-                    for masterSpot in masterSpots:
-                        if len(masterSpot) > 1:
-                            spotKey = masterSpot[0]
-                            fontPath = masterSpot[-1]
-                            spot = splitSpotKey(spotKey)
-                            if (spot is not None) and (fontPath is not None):
-                                f = [font for font in AllFonts() if font.path == fontPath]
-                                if not len(f):
-                                    f = RFont(fontPath)
-                                elif len(f):
-                                    f = f[0]
-                                if len(masterSpot) > 2:
-                                    cell = getattr(self.w.matrix, spotKey)
-                                    weights = masterSpot[1].split('/')
-                                    matrixSpot = MatrixSpot(spot)
-                                    hWeight, vWeight = float(weights[0]), float(weights[1])
-                                    matrixSpot.setWeights((hWeight, vWeight))
-                                    matrixSpots[spotKey] = matrixSpot
-                                    cell.locationHvalue.set(str(int(hWeight)))
-                                    cell.locationVvalue.set(str(int(vWeight)))
-                                masters.append(MatrixMaster(spot, f))
-                    self.matrixSpots = matrixSpots
-                    self.masters = masters
                 self.reallocateWeights()
                 self.updateMatrix()
             else:
                 print('not a valid matrix file')
 
+    def openMasterFont(self, fontPath):
+        f = [font for font in AllFonts() if font.path == fontPath]
+        if not len(f):
+            return RFont(fontPath)
+        return f[0]
 
     def changeGlyph(self, sender):
         inputText = sender.get()
@@ -1214,6 +1059,9 @@ class InterpolationMatrixController:
             glyphs = splitText(inputText, charMap)
             if len(glyphs):
                 self.currentGlyph = glyphs[0]
+                self.currentText = None
+                if len(glyphs) > 1:
+                    self.currentText = glyphs
                 self.updateMatrix()
         except:
             return
@@ -1229,18 +1077,22 @@ class InterpolationMatrixController:
         return self.currentGlyph
 
     def windowResize(self, info):
-        axesGrid = (nCellsOnHorizontalAxis, nCellsOnVerticalAxis) = (self.axesGrid['horizontal'], self.axesGrid['vertical'])
+        (oi, oj), viewportSize = self.getViewport()
         posSize = info.getPosSize()
-        cellXSize, cellYSize = self.glyphPreviewCellSize(posSize, axesGrid)
+        cellXSize, cellYSize = self.glyphPreviewCellSize(posSize, viewportSize)
         matrix = self.w.matrix
 
-        for i in range(nCellsOnHorizontalAxis):
-            ch = getKeyForValue(i)
-            for j in range(nCellsOnVerticalAxis):
-                cell = getattr(matrix, '%s%s'%(ch,j))
-                cell.setPosSize((i*cellXSize, j*cellYSize, cellXSize, cellYSize))
-                cell.locationHvalue.setPosSize((-40, (cellYSize/2)-8, 36, 16))
-                cell.locationVvalue.setPosSize(((cellXSize/2)-18, -18, 36, 16))
+        for i, j in self.getVisibleSpots():
+            cell = getattr(matrix, '%s%s'%(getKeyForValue(i), j))
+            cell.setPosSize(((i-oi)*cellXSize, (j-oj)*cellYSize, cellXSize, cellYSize))
+            cell.locationHvalue.setPosSize((-40, (cellYSize/2)-8, 36, 16))
+            cell.locationVvalue.setPosSize(((cellXSize/2)-18, -18, 36, 16))
+
+        previousTolerance = self.engine.getDetailTolerance()
+        self.engine.setPreviewCellSize((cellXSize, cellYSize))
+        if (previousTolerance is None) != (self.engine.getDetailTolerance() is None):
+            # cells crossed the level of detail threshold
+            self.updateMatrix()
 
     def windowClose(self, notification):
         self.w.unbind('close', self.windowClose)
@@ -1249,5 +1101,10 @@ class InterpolationMatrixController:
         removeObserver(self, "mouseUp")
         removeObserver(self, "keyUp")
         removeObserver(self, "fontDidClose")
+        if self.engine.glyphHashes is not None:
+            self.engine.glyphHashes.close()
+        self.pipeline.unsubscribe(self.jobEventReceived)
+        self.pipeline.cancel()
+        self.cancelPrefetch()
 
 InterpolationMatrixController()
@@ -0,0 +1,571 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Packed, read-only master geometry.
+
+A master font is packed once into a flat buffer (point coordinates and types, contour ends,
+components, anchors, widths and heights, kerning) that worker processes attach to through shared memory
+or an mmap’d file instead of opening and parsing every glyph of the masters themselves.
+
+Packed fonts behave as glyph sets: FontGeometry[glyphName] returns a read-only glyph
+with drawPoints(), anchors, components, width and toMathGlyph(), enough for interpolateGlyphSet,
+compareGlyphSets and the compatibility checks of glyphCompatibility. What isn’t numbers (glyph lib, note,
+guidelines, names and identifiers of points, contours, components and anchors) is kept in the header,
+only for the glyphs that have any, so that instances generated from packed glyphs lose nothing.
+
+Buffer layout: magic, header length, JSON header (names, unicodes, groups, section table), then
+8-byte aligned arrays read through memoryviews, without copies.
+
+What isn’t geometry (info, groups, feature code, glyph order) is copied into a FontData,
+to be read away from the font, off the main thread.
+'''
+
+from fontMath.mathGlyph import MathGlyph
+from fontTools.pens.pointPen import PointToSegmentPen
+from fontTools.misc import plistlib
+from array import array
+import struct
+import json
+import mmap
+import os
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8, packed fonts can still be stored in files
+    shared_memory = None
+
+MAGIC = b'IMGEOM02'
+_prefix = struct.Struct('<8sI')
+
+_pointTypes = [None, 'move', 'line', 'curve', 'qcurve']
+_pointTypeCodes = dict((pointType, code) for code, pointType in enumerate(_pointTypes))
+_smoothFlag = 0x80
+
+# glyph table columns
+_EXISTS, _POINTS, _CONTOURS, _CONTOURCOUNT, _COMPONENTS, _COMPONENTCOUNT, _ANCHORS, _ANCHORCOUNT = range(8)
+_glyphColumns = 8
+
+_sections = [
+    ('glyphs', 'q'),
+    ('widths', 'd'),
+    ('heights', 'd'),
+    ('points', 'd'),
+    ('pointTypes', 'B'),
+    ('contourEnds', 'q'),
+    ('components', 'q'),
+    ('componentTransforms', 'd'),
+    ('anchors', 'q'),
+    ('anchorPoints', 'd'),
+    ('kerningPairs', 'q'),
+    ('kerningValues', 'd'),
+]
+
+
+class _PackingPen(object):
+
+    '''
+    Packs a glyph’s outline into the arrays, names and identifiers into glyphData
+    (indices relative to the glyph’s first point, contour and component), see reset().
+    '''
+
+    def __init__(self, arrays, nameIndex):
+        self.arrays = arrays
+        self.nameIndex = nameIndex
+        self.reset()
+
+    def reset(self):
+        self.glyphData = {}
+        self._starts = dict((section, len(self.arrays[section])) for section in ('pointTypes', 'contourEnds', 'components'))
+
+    def _addData(self, key, section, *values):
+        self.glyphData.setdefault(key, []).append([len(self.arrays[section]) - self._starts[section]] + list(values))
+
+    def beginPath(self, identifier=None, **kwargs):
+        if identifier is not None:
+            self._addData('contours', 'contourEnds', identifier)
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        if name is not None or identifier is not None:
+            self._addData('points', 'pointTypes', name, identifier)
+        code = _pointTypeCodes[segmentType]
+        if smooth:
+            code |= _smoothFlag
+        self.arrays['points'].extend(pt)
+        self.arrays['pointTypes'].append(code)
+
+    def endPath(self):
+        self.arrays['contourEnds'].append(len(self.arrays['pointTypes']))
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        if identifier is not None:
+            self._addData('components', 'components', identifier)
+        self.arrays['components'].append(self.nameIndex(baseGlyphName))
+        self.arrays['componentTransforms'].extend(transformation)
+
+
+def _packColor(color):
+    # fontParts colors are tuples, defcon & .glif ones strings
+    if color is None or isinstance(color, str):
+        return color
+    return list(color)
+
+def _packGuideline(guideline):
+    get = guideline.get if isinstance(guideline, dict) else lambda key: getattr(guideline, key, None)
+    data = dict((key, get(key)) for key in ('x', 'y', 'angle', 'name', 'identifier'))
+    data['color'] = _packColor(get('color'))
+    return data
+
+
+def packFont(font, glyphNames=None, stamps=None):
+    '''
+    Packs the geometry, kerning and groups of a font (or of glyphNames only) into bytes.
+    stamps (any JSON data) are stored along, to tell whether the packed data is still up to date (see geometryCache).
+    '''
+    if glyphNames is None:
+        glyphNames = list(font.keys())
+    names = []
+    nameIndices = {}
+
+    def nameIndex(name):
+        if name not in nameIndices:
+            nameIndices[name] = len(names)
+            names.append(name)
+        return nameIndices[name]
+
+    arrays = dict((section, array(typecode)) for section, typecode in _sections)
+    pen = _PackingPen(arrays, nameIndex)
+    unicodes = []
+    glyphData = {}
+
+    for glyphName in glyphNames:
+        row = [0] * _glyphColumns
+        width = height = 0
+        glyphUnicodes = []
+        if glyphName in font:
+            glyph = font[glyphName]
+            row[_EXISTS] = 1
+            row[_POINTS] = len(arrays['pointTypes'])
+            row[_CONTOURS] = len(arrays['contourEnds'])
+            row[_COMPONENTS] = len(arrays['components'])
+            pen.reset()
+            glyph.drawPoints(pen)
+            row[_CONTOURCOUNT] = len(arrays['contourEnds']) - row[_CONTOURS]
+            row[_COMPONENTCOUNT] = len(arrays['components']) - row[_COMPONENTS]
+            row[_ANCHORS] = len(arrays['anchors'])
+            anchorData = []
+            for k, anchor in enumerate(glyph.anchors):
+                arrays['anchors'].append(nameIndex(anchor.name))
+                arrays['anchorPoints'].extend((anchor.x, anchor.y))
+                if anchor.identifier is not None or anchor.color is not None:
+                    anchorData.append([k, anchor.identifier, _packColor(anchor.color)])
+            row[_ANCHORCOUNT] = len(arrays['anchors']) - row[_ANCHORS]
+            width = glyph.width
+            height = glyph.height
+            glyphUnicodes = list(glyph.unicodes)
+            data = pen.glyphData
+            if anchorData:
+                data['anchors'] = anchorData
+            if len(glyph.lib):
+                data['lib'] = plistlib.dumps(dict(glyph.lib)).decode('utf-8')
+            if glyph.note is not None:
+                data['note'] = glyph.note
+            if len(glyph.guidelines):
+                data['guidelines'] = [_packGuideline(guideline) for guideline in glyph.guidelines]
+            if data:
+                glyphData[str(len(unicodes))] = data
+        arrays['glyphs'].extend(row)
+        arrays['widths'].append(width)
+        arrays['heights'].append(height)
+        unicodes.append(glyphUnicodes)
+
+    for (first, second), value in font.kerning.items():
+        arrays['kerningPairs'].extend((nameIndex(first), nameIndex(second)))
+        arrays['kerningValues'].append(value)
+
+    header = {
+        'path': font.path,
+        'glyphNames': list(glyphNames),
+        'names': names,
+        'unicodes': unicodes,
+        'glyphData': glyphData,
+        'groups': dict((groupName, list(members)) for groupName, members in font.groups.items()),
+        'stamps': stamps,
+        'sections': {}
+    }
+    # section offsets are relative to the end of the header, which can then be sized independently
+    offset = 0
+    chunks = []
+    for section, typecode in _sections:
+        data = arrays[section].tobytes()
+        header['sections'][section] = [offset, len(arrays[section]), typecode]
+        padding = -len(data) % 8
+        chunks.append(data + b'\0' * padding)
+        offset += len(data) + padding
+
+    headerData = json.dumps(header).encode('utf-8')
+    headerData += b' ' * (-(len(headerData) + _prefix.size) % 8)
+    return _prefix.pack(MAGIC, len(headerData)) + headerData + b''.join(chunks)
+
+
+class PackedAnchor(dict):
+
+    '''
+    Anchor as a dict (for fontMath) with attribute access (for fontParts-style code).
+    '''
+
+    name = property(lambda self: self['name'])
+    x = property(lambda self: self['x'])
+    y = property(lambda self: self['y'])
+    identifier = property(lambda self: self.get('identifier'))
+    color = property(lambda self: self.get('color'))
+
+
+class PackedComponent(object):
+
+    __slots__ = ['baseGlyph', 'transformation']
+
+    def __init__(self, baseGlyph, transformation):
+        self.baseGlyph = baseGlyph
+        self.transformation = transformation
+
+    @property
+    def offset(self):
+        return self.transformation[4:]
+
+    @property
+    def scale(self):
+        return self.transformation[0], self.transformation[3]
+
+
+class PackedGlyph(object):
+
+    '''
+    Read-only view on a glyph of a FontGeometry.
+    '''
+
+    image = None
+
+    def __init__(self, geometry, index, name):
+        self.geometry = geometry
+        self.index = index
+        self.name = name
+        self._data = geometry.glyphData.get(str(index), {})
+
+    def __repr__(self):
+        return '<PackedGlyph %s>' % (self.name)
+
+    def _row(self):
+        row = self.index * _glyphColumns
+        return self.geometry.sections['glyphs'][row:row+_glyphColumns]
+
+    @property
+    def width(self):
+        return self.geometry.sections['widths'][self.index]
+
+    @property
+    def height(self):
+        return self.geometry.sections['heights'][self.index]
+
+    @property
+    def lib(self):
+        if 'lib' not in self._data:
+            return {}
+        return plistlib.loads(self._data['lib'].encode('utf-8'))
+
+    @property
+    def note(self):
+        return self._data.get('note')
+
+    @property
+    def guidelines(self):
+        return [dict(guideline) for guideline in self._data.get('guidelines', [])]
+
+    @property
+    def unicodes(self):
+        return self.geometry.unicodes[self.index]
+
+    @property
+    def unicode(self):
+        unicodes = self.unicodes
+        if len(unicodes):
+            return unicodes[0]
+
+    @property
+    def contourCount(self):
+        return self._row()[_CONTOURCOUNT]
+
+    @property
+    def anchors(self):
+        sections = self.geometry.sections
+        names = self.geometry.names
+        row = self._row()
+        anchors = []
+        for k in range(row[_ANCHORS], row[_ANCHORS] + row[_ANCHORCOUNT]):
+            x, y = sections['anchorPoints'][k*2:k*2+2]
+            anchors.append(PackedAnchor(name=names[sections['anchors'][k]], x=x, y=y))
+        for k, identifier, color in self._data.get('anchors', []):
+            anchors[k].update(identifier=identifier, color=color)
+        return anchors
+
+    @property
+    def components(self):
+        sections = self.geometry.sections
+        names = self.geometry.names
+        row = self._row()
+        components = []
+        for k in range(row[_COMPONENTS], row[_COMPONENTS] + row[_COMPONENTCOUNT]):
+            components.append(PackedComponent(names[sections['components'][k]], tuple(sections['componentTransforms'][k*6:k*6+6])))
+        return components
+
+    def drawPoints(self, pen):
+        sections = self.geometry.sections
+        points = sections['points']
+        pointTypes = sections['pointTypes']
+        contourEnds = sections['contourEnds']
+        row = self._row()
+        data = self._data
+        pointData = dict((k, (name, identifier)) for k, name, identifier in data.get('points', []))
+        contourIdentifiers = dict(data.get('contours', []))
+        componentIdentifiers = dict(data.get('components', []))
+        start = row[_POINTS]
+        for contour in range(row[_CONTOURS], row[_CONTOURS] + row[_CONTOURCOUNT]):
+            end = contourEnds[contour]
+            pen.beginPath(identifier=contourIdentifiers.get(contour - row[_CONTOURS]))
+            for k in range(start, end):
+                code = pointTypes[k]
+                name, identifier = pointData.get(k - row[_POINTS], (None, None))
+                pen.addPoint((points[k*2], points[k*2+1]), _pointTypes[code & ~_smoothFlag], bool(code & _smoothFlag), name=name, identifier=identifier)
+            pen.endPath()
+            start = end
+        for k, component in enumerate(self.components):
+            pen.addComponent(component.baseGlyph, component.transformation, identifier=componentIdentifiers.get(k))
+
+    def draw(self, pen):
+        self.drawPoints(PointToSegmentPen(pen))
+
+    def toMathGlyph(self):
+        return MathGlyph(self)
+
+
+class FontGeometry(object):
+
+    '''
+    A packed font, read from any buffer (bytes, shared memory, mmap).
+    Behaves as a read-only glyph set with kerning and groups.
+    '''
+
+    def __init__(self, buffer):
+        self._views = []
+        try:
+            self._read(self._view(memoryview(buffer)))
+        except (ValueError, TypeError, KeyError, struct.error) as e:
+            # views on a truncated or foreign buffer are released, for it to be closed
+            self.release()
+            raise ValueError('not a packed master geometry buffer (%s)' % (e))
+        self._kerning = None
+
+    def _read(self, view):
+        magic, headerLength = _prefix.unpack(bytes(view[:_prefix.size]))
+        if magic != MAGIC:
+            raise ValueError('wrong magic')
+        dataStart = _prefix.size + headerLength
+        header = json.loads(bytes(view[_prefix.size:dataStart]).decode('utf-8'))
+        self.path = header['path']
+        self.glyphNames = header['glyphNames']
+        self.names = header['names']
+        self.unicodes = header['unicodes']
+        self.glyphData = header['glyphData']
+        self.groups = header['groups']
+        self.stamps = header.get('stamps')
+        self.sections = {}
+        for section, (offset, count, typecode) in header['sections'].items():
+            start = dataStart + offset
+            size = count * array(typecode).itemsize
+            self.sections[section] = self._view(self._view(view[start:start+size]).cast(typecode))
+        glyphs = self.sections['glyphs']
+        self._glyphIndex = dict((glyphName, index) for index, glyphName in enumerate(self.glyphNames) if glyphs[index*_glyphColumns + _EXISTS])
+
+    def _view(self, view):
+        self._views.append(view)
+        return view
+
+    def __repr__(self):
+        return '<FontGeometry %s (%s glyphs)>' % (self.path, len(self))
+
+    def __len__(self):
+        return len(self._glyphIndex)
+
+    def __contains__(self, glyphName):
+        return glyphName in self._glyphIndex
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [glyphName for glyphName in self.glyphNames if glyphName in self._glyphIndex]
+
+    def __getitem__(self, glyphName):
+        return PackedGlyph(self, self._glyphIndex[glyphName], glyphName)
+
+    @property
+    def kerning(self):
+        if self._kerning is None:
+            names = self.names
+            pairs = self.sections['kerningPairs']
+            values = self.sections['kerningValues']
+            self._kerning = dict(((names[pairs[k*2]], names[pairs[k*2+1]]), values[k]) for k in range(len(values)))
+        return self._kerning
+
+    def release(self):
+        # views must be released before the underlying shared memory or mmap can be closed
+        self.sections = {}
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+
+
+def _attachSharedMemory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13: workers share their parent’s resource tracker, which only unlinks segments once
+        return shared_memory.SharedMemory(name=name)
+
+
+class MasterGeometry(object):
+
+    '''
+    Packed geometry of a list of master fonts, one FontGeometry per master (same order).
+
+    MasterGeometry.fromFonts(fonts) packs the masters into shared memory segments (or keeps
+    the packed bytes in memory if shared memory isn’t available); workers attach to them with
+    MasterGeometry.attach(geometry.getNames()). Only the process that created the segments unlinks them.
+    '''
+
+    def __init__(self, fonts, handles=None, owner=False):
+        self.fonts = fonts
+        self.handles = handles or []
+        self.owner = owner
+
+    def __len__(self):
+        return len(self.fonts)
+
+    def __getitem__(self, index):
+        return self.fonts[index]
+
+    def __iter__(self):
+        return iter(self.fonts)
+
+    @classmethod
+    def fromFonts(cls, fonts, glyphNames=None, shared=True):
+        geometries = []
+        handles = []
+        for font in fonts:
+            data = packFont(font, glyphNames)
+            if shared and shared_memory is not None:
+                sharedMemory = shared_memory.SharedMemory(create=True, size=len(data))
+                sharedMemory.buf[:len(data)] = data
+                handles.append(sharedMemory)
+                geometries.append(FontGeometry(sharedMemory.buf))
+            else:
+                geometries.append(FontGeometry(data))
+        return cls(geometries, handles, owner=True)
+
+    @classmethod
+    def attach(cls, names):
+        if shared_memory is None:
+            raise RuntimeError('shared memory isn’t available')
+        geometries = []
+        handles = []
+        for name in names:
+            sharedMemory = _attachSharedMemory(name)
+            handles.append(sharedMemory)
+            geometries.append(FontGeometry(sharedMemory.buf))
+        return cls(geometries, handles)
+
+    @classmethod
+    def fromFiles(cls, paths):
+        geometries = []
+        handles = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                fileMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            handles.append(fileMap)
+            geometries.append(FontGeometry(fileMap))
+        return cls(geometries, handles)
+
+    def getNames(self):
+        '''
+        Names of the shared memory segments, to be passed to worker processes.
+        '''
+        return [handle.name for handle in self.handles]
+
+    def close(self):
+        for geometry in self.fonts:
+            geometry.release()
+        for handle in self.handles:
+            handle.close()
+            if self.owner and shared_memory is not None and isinstance(handle, shared_memory.SharedMemory):
+                handle.unlink()
+        self.fonts = []
+        self.handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _InfoData(object):
+
+    '''
+    Copy of a font’s info: names, and what fontMath interpolates.
+    '''
+
+    def __init__(self, info):
+        self.familyName = info.familyName
+        self.styleName = info.styleName
+        self._mathInfo = info.toMathInfo()
+
+    def toMathInfo(self):
+        return self._mathInfo.copy()
+
+
+class _FeaturesData(object):
+
+    def __init__(self, features):
+        self.text = features.text
+
+
+class FontData(object):
+
+    '''
+    Copy of a font’s info, groups, feature code and glyph order, read as the font’s own attributes
+    (font.info.familyName, font.info.toMathInfo(), font.groups, font.features.text, font.glyphOrder).
+    Taken on the main thread, read by background work while the font can keep being edited.
+    '''
+
+    def __init__(self, font):
+        self.path = font.path
+        self.info = _InfoData(font.info)
+        self.groups = dict((groupName, list(members)) for groupName, members in font.groups.items())
+        self.features = _FeaturesData(font.features)
+        self.glyphOrder = list(font.glyphOrder)
+
+    def __repr__(self):
+        return '<FontData %s>' % (self.path)
+
+
+def saveFontGeometry(font, path, glyphNames=None):
+    '''
+    Writes a packed font to path, to be mapped with MasterGeometry.fromFiles.
+    '''
+    data = packFont(font, glyphNames)
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as f:
+        f.write(data)
+    os.replace(tempPath, path)
+    return path
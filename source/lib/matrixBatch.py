@@ -0,0 +1,635 @@
+# coding=utf-8
+from __future__ import division, print_function
+
+'''
+Headless batch generation of matrix instances from a saved matrix file,
+running one process per worker (each worker opens the masters once):
+
+    python matrixBatch.py matrix.txt --spots "A1:C3, !B2" --output instances --workers 4
+    python matrixBatch.py matrix.txt --spots B2 --subset 'U+0020-007E, "Hamburgefonstiv"' --output proofs
+    python matrixBatch.py matrix.txt --compile otf,ttf --no-ufo --workers 4
+    python matrixBatch.py matrix.txt --check --workers 4
+    python matrixBatch.py matrix.txt --check --report-jsonl - --report-html report.html --fail-fast
+    python matrixBatch.py matrix.txt --backend designspace --workers 4
+    python matrixBatch.py matrix.txt --output instances --shard-index 0 --shard-count 3    # on each machine, 0 to 2
+    python matrixBatch.py matrix.txt --output instances --merge                            # once shards are gathered
+
+Spots use the same expressions as the Generate sheet (see spotExpression).
+Master glyphs are read from memory-mapped cached files (see geometryCache), only glyphs
+changed since the last run are parsed again. Without the cache (--no-cache) and several workers,
+master glyphs are packed once into shared memory (see masterGeometry) and read from there by every worker.
+The matrix can also be exported as a designspace document (--export-designspace), or generated
+through one by a designspace builder (--backend designspace, see matrixDesignSpace).
+Instances can be compiled to OTF/TTF as they’re generated, in their worker (--compile, requires ufo2ft, see instanceCompiler).
+Large runs can be split in shards of (spot × glyph chunk) units, run independently and merged afterwards (see matrixShards).
+Exits with 0 if every instance was generated, 1 if some failed, 2 on invalid input.
+'''
+
+from matrixEngine import MatrixEngine, getInstancesFolder, compareGlyphSets
+from matrixDesignSpace import writeDesignSpace, buildInstances, compileVariableFont
+from glyphSubset import GlyphSubset
+from instanceCompiler import FeatureCache, compileInstance, COMPILE_FORMATS
+from matrixShards import ShardError, planUnits, getShardUnits, getPlanKey, getShardFolder, getPartPath, writeManifest, mergeShards
+from matrixSpot import getKeyForValue
+from masterGeometry import MasterGeometry, shared_memory
+from geometryCache import GeometryCache, getDefaultCacheFolder
+from glyphCompatibility import classifyGlyph, classifyGlyphSet, summarizeReasons, COMPATIBLE, FIXABLE, INCOMPATIBLE
+from compatibilityReport import ReportStream, JSONLinesWriter, HTMLReportWriter
+from spotExpression import SpotExpressionError
+from generationJobs import GenerationPipeline, JobCancelled, JobFailed, PROGRESS, FINISHED, FAILED, CANCELLED
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+import argparse
+import json
+import time
+import sys
+import os
+
+_workerEngine = None
+# glyphs per job of a parallel check stopping at the first incompatible glyph
+FAIL_FAST_CHUNK_SIZE = 8
+# compiled feature code, kept across the instances a process compiles
+_featureCache = FeatureCache()
+
+def _initWorker(matrixPath, geometrySource=None):
+    global _workerEngine
+    _workerEngine = MatrixEngine.fromMatrixFile(matrixPath)
+    if geometrySource is not None:
+        kind, names = geometrySource
+        if kind == 'files':
+            _workerEngine.setGeometry(MasterGeometry.fromFiles(names))
+        else:
+            _workerEngine.setGeometry(MasterGeometry.attach(names))
+
+def _prepareGeometry(engine, workers, cacheFolder=None):
+    '''
+    Sets packed master geometry on engine, returns the geometry (to be closed after the run)
+    and how workers should attach to it, both None if the masters are read as usual.
+    '''
+    fontPaths = [master.getFont().path for master in engine.masters]
+    if cacheFolder is not None:
+        cache = GeometryCache(cacheFolder)
+        geometry = cache.getMasterGeometry(fontPaths)
+        if geometry is not None:
+            engine.setGeometry(geometry)
+            return geometry, ('files', [cache.getCachePath(fontPath) for fontPath in fontPaths])
+    # only worth it when several processes would otherwise parse the masters
+    if workers > 1 and shared_memory is not None:
+        geometry = MasterGeometry.fromFonts([master.getFont() for master in engine.masters])
+        engine.setGeometry(geometry)
+        return geometry, ('shared', geometry.getNames())
+    return None, None
+
+def findSourceMaster(engine, sourceMaster=None):
+    '''
+    Master used for naming and groups, given by its readable spot (A1) or index, the first master by default.
+    '''
+    masters = engine.masters
+    if not masters:
+        return
+    if sourceMaster is None:
+        return masters[0]
+    for master in masters:
+        if master.getReadableSpot().lower() == str(sourceMaster).lower():
+            return master
+    try:
+        return masters[int(sourceMaster)]
+    except (ValueError, IndexError):
+        return
+
+def getInstancePath(outputFolder, baseFont, spot, sliceName=''):
+    i, j = spot
+    instanceName = '%s%s'%(getKeyForValue(i).upper(), j+1)
+    if sliceName:
+        instanceName += '-%s'%(sliceName.replace(' ', '-'))
+    return os.path.join(outputFolder, '%s-%s.ufo'%(baseFont.info.familyName, instanceName))
+
+def getGenerationInfos(options, baseFont):
+    return {
+        'sourceFont': [baseFont],
+        'interpolateGlyphs': options['glyphs'],
+        'interpolateKerning': options['kerning'],
+        'interpolateFontInfos': options['fontInfos'],
+        'addGroups': options['groups'],
+        'subset': GlyphSubset.fromExpression(options.get('subset')),
+        'openFonts': False,
+        'report': True
+    }
+
+def generateSpot(spot, options, outputFolder, engine=None, progress=None):
+    if engine is None:
+        engine = _workerEngine
+    start = time.time()
+    # spots are generated in the slice given in options (see MatrixEngine.setSlice)
+    engine.setSlice(options.get('slice'))
+    result = {
+        'spot': engine.getInstanceName(spot),
+        'path': None,
+        'report': [],
+        'error': None
+    }
+    try:
+        baseFont = findSourceMaster(engine, options['sourceMaster']).getFont()
+        generationInfos = getGenerationInfos(options, baseFont)
+        folder = outputFolder or getInstancesFolder(baseFont)
+        path = getInstancePath(folder, baseFont, spot, engine.getSliceName())
+        formats = options.get('compile') or []
+        saveUFO = options.get('ufo', True) or not formats
+        newFont, report = engine.generateInstanceFont(spot, generationInfos, path if saveUFO else None, progress)
+        if formats and newFont is not None:
+            # straight from the instance in memory, feature code being the source master’s
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            binaryPaths = compileInstance(newFont, os.path.splitext(path)[0], formats, baseFont.features.text or '', _featureCache)
+            report += [u'—> Compiled %s'%(binaryPath) for binaryPath in binaryPaths]
+            result['binaries'] = binaryPaths
+        result['path'] = path if saveUFO else None
+        result['report'] = report
+    except JobCancelled:
+        raise
+    except Exception as e:
+        result['error'] = '%s: %s'%(e.__class__.__name__, e)
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+def generateSpots(matrixPath, spots, options, outputFolder=None, workers=1, callback=None, cacheFolder=None, pipeline=None):
+    '''
+    Generates spots [(i, j), …] of the matrix saved at matrixPath, in parallel if workers > 1.
+    callback(result) is called as each instance is done. Returns the results in completion order.
+    Each instance is a job of pipeline (see generationJobs), pass one to subscribe to its events or cancel jobs;
+    per-glyph progress is only reported when generating in this process (workers <= 1).
+    '''
+    results = []
+    engine = MatrixEngine.fromMatrixFile(matrixPath)
+    geometry, geometrySource = _prepareGeometry(engine, workers, cacheFolder)
+    if pipeline is None:
+        pipeline = GenerationPipeline(workers)
+    processes = None
+    if workers > 1:
+        processes = ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(matrixPath, geometrySource))
+
+    def generateJob(job, spot):
+        if processes is None:
+            result = generateSpot(spot, options, outputFolder, engine, job.progress)
+        else:
+            future = processes.submit(generateSpot, spot, options, outputFolder)
+            while True:
+                try:
+                    result = future.result(timeout=.2)
+                    break
+                except TimeoutError:
+                    if job.cancelled:
+                        # an instance already being generated by a process is left to finish
+                        future.cancel()
+                        job.checkCancelled()
+        results.append(result)
+        if callback is not None:
+            callback(result)
+        if result['error'] is not None:
+            raise JobFailed(result['error'])
+        return result
+
+    try:
+        engine.setSlice(options.get('slice'))
+        for spot in spots:
+            pipeline.submit(engine.getInstanceName(spot), generateJob, spot)
+        try:
+            pipeline.wait()
+        except KeyboardInterrupt:
+            pipeline.cancel()
+            pipeline.wait()
+    finally:
+        if processes is not None:
+            processes.shutdown(wait=True)
+        if geometry is not None:
+            geometry.close()
+    return results
+
+def generatePart(unit, options, outputFolder, shardFolder, engine=None):
+    '''
+    Generates a unit of a sharded run (see matrixShards) as a partial UFO in shardFolder.
+    Returns a result with the unit’s index, chunk, partial UFO (path) and instance (target) file names.
+    '''
+    if engine is None:
+        engine = _workerEngine
+    start = time.time()
+    engine.setSlice(options.get('slice'))
+    spot = tuple(unit['spot'])
+    result = {
+        'index': unit['index'],
+        'spot': engine.getInstanceName(spot),
+        'chunk': unit['chunk'],
+        'path': None,
+        'target': None,
+        'report': [],
+        'error': None
+    }
+    try:
+        baseFont = findSourceMaster(engine, options['sourceMaster']).getFont()
+        generationInfos = getGenerationInfos(options, baseFont)
+        generationInfos['glyphNames'] = unit['glyphNames']
+        if unit['chunk'] > 0:
+            generationInfos['interpolateKerning'] = generationInfos['interpolateFontInfos'] = generationInfos['addGroups'] = False
+        target = getInstancePath(outputFolder, baseFont, spot, engine.getSliceName())
+        path = getPartPath(shardFolder, target, unit['chunk'])
+        newFont, report = engine.generateInstanceFont(spot, generationInfos, path)
+        result['path'] = os.path.basename(path)
+        result['target'] = os.path.basename(target)
+        result['report'] = report
+    except Exception as e:
+        result['error'] = '%s: %s'%(e.__class__.__name__, e)
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+def classifyGlyphs(glyphNames, engine=None):
+    if engine is None:
+        engine = _workerEngine
+    glyphSets = [glyphSet for location, glyphSet in engine.getMasterGlyphSets()]
+    labels = [master.getReadableSpot() for master in engine.masters]
+    return classifyGlyphSet(glyphNames, glyphSets, labels)
+
+def checkCompatibility(matrixPath, workers=1, chunkSize=200, cacheFolder=None, reportStream=None, failFast=False):
+    '''
+    Classifies every glyph common to the masters (see glyphCompatibility), glyph by glyph with one worker,
+    in chunks spread over workers otherwise.
+    Returns the glyph list, stray glyphs and {glyphName: {'status', 'reasons'}} for glyphs that aren’t compatible.
+    Records are written to reportStream as glyphs are classified, in glyph order, with progress every chunkSize glyphs (see compatibilityReport).
+    With failFast, the check stops at the first incompatible glyph (chunks are kept small, pending ones cancelled),
+    the glyph list only has the glyphs checked.
+    '''
+    start = time.time()
+    engine = MatrixEngine.fromMatrixFile(matrixPath)
+    glyphList, strayGlyphs = compareGlyphSets([master.getFont() for master in engine.masters])
+    glyphList.sort()
+    strayGlyphs = sorted(strayGlyphs)
+    progressInterval = chunkSize
+    if failFast:
+        chunkSize = min(chunkSize, FAIL_FAST_CHUNK_SIZE)
+    chunks = [glyphList[k:k+chunkSize] for k in range(0, len(glyphList), chunkSize)]
+    report = {}
+    counts = dict((status, 0) for status in (COMPATIBLE, FIXABLE, INCOMPATIBLE))
+    checkedGlyphs = []
+    if reportStream is not None:
+        reportStream.write({'type': 'start', 'matrix': matrixPath, 'masters': [master.getReadableSpot() for master in engine.masters], 'glyphCount': len(glyphList)})
+
+    def writeProgress():
+        reportStream.write({'type': 'progress', 'checked': len(checkedGlyphs), 'glyphCount': len(glyphList)})
+
+    def addGlyph(glyphName, classification):
+        # returns True once the check should stop
+        status, reasons, contourOrders = classification
+        counts[status] += 1
+        if status != COMPATIBLE:
+            report[glyphName] = {'status': status, 'reasons': reasons}
+            if reportStream is not None:
+                reportStream.write({'type': 'glyph', 'glyph': glyphName, 'status': status, 'reasons': reasons})
+        checkedGlyphs.append(glyphName)
+        if reportStream is not None and len(checkedGlyphs) % progressInterval == 0:
+            writeProgress()
+        return failFast and status == INCOMPATIBLE
+
+    geometry, geometrySource = _prepareGeometry(engine, workers, cacheFolder)
+    try:
+        if workers <= 1:
+            glyphSets = [glyphSet for location, glyphSet in engine.getMasterGlyphSets()]
+            labels = [master.getReadableSpot() for master in engine.masters]
+            for glyphName in glyphList:
+                if addGlyph(glyphName, classifyGlyph([glyphSet[glyphName] for glyphSet in glyphSets], labels)):
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(matrixPath, geometrySource)) as executor:
+                futures = [executor.submit(classifyGlyphs, chunk) for chunk in chunks]
+                stopped = False
+                for chunk, future in zip(chunks, futures):
+                    chunkClassification = future.result()
+                    for glyphName in chunk:
+                        stopped = addGlyph(glyphName, chunkClassification[glyphName])
+                        if stopped:
+                            break
+                    if stopped:
+                        for pending in futures:
+                            pending.cancel()
+                        break
+    finally:
+        if geometry is not None:
+            geometry.close()
+    stopped = len(checkedGlyphs) < len(glyphList)
+    if reportStream is not None:
+        if len(checkedGlyphs) % progressInterval:
+            writeProgress()
+        reportStream.write({'type': 'stray', 'glyphs': strayGlyphs})
+        reportStream.write({'type': 'summary', 'checked': len(checkedGlyphs), 'counts': counts, 'stray': len(strayGlyphs), 'stopped': stopped, 'seconds': round(time.time() - start, 3)})
+    return checkedGlyphs, strayGlyphs, report
+
+def getReportStream(options):
+    '''
+    Streamed report writers of a compatibility check (--report-jsonl, --report-html), see compatibilityReport.
+    '''
+    writers = []
+    if options.report_jsonl:
+        writers.append(JSONLinesWriter(options.report_jsonl))
+    if options.report_html:
+        writers.append(HTMLReportWriter(options.report_html, 'Compatibility report — %s'%(os.path.basename(options.matrix))))
+    if writers:
+        return ReportStream(writers)
+
+def runCompatibilityCheck(options):
+    start = time.time()
+    reportStream = getReportStream(options)
+    try:
+        glyphList, strayGlyphs, report = checkCompatibility(options.matrix, max(1, options.workers), cacheFolder=options.cache_dir, reportStream=reportStream, failFast=options.fail_fast)
+    finally:
+        if reportStream is not None:
+            reportStream.close()
+    incompatible = [glyphName for glyphName, item in report.items() if item['status'] == INCOMPATIBLE]
+    # JSON lines on the standard output aren’t mixed with the summary
+    output = sys.stderr if options.report_jsonl == '-' else sys.stdout
+
+    if not options.quiet:
+        for status, reason, glyphNames in summarizeReasons(report):
+            print('[%s] %s\n– %s'%(status, reason, ' '.join(glyphNames)), file=output)
+    if options.fail_fast:
+        print('\n*** Glyphs checked: %s'%(len(glyphList)), file=output)
+    print('\n*   Compatible glyphs: %s'%(len(glyphList) - len(report)), file=output)
+    print('**  Fixable glyphs: %s'%(len(report) - len(incompatible)), file=output)
+    print('**  Incompatible glyphs: %s'%(len(incompatible)), file=output)
+    print('*** Stray glyphs: %s'%(len(strayGlyphs)), file=output)
+    print('*** Done in %0.2fs'%(time.time() - start), file=output)
+
+    if options.report_file:
+        with open(options.report_file, 'w') as f:
+            json.dump({'matrix': options.matrix, 'strayGlyphs': sorted(strayGlyphs), 'glyphs': report}, f, indent=2)
+
+    return 1 if incompatible else 0
+
+def runDesignSpaceBackend(options, engine, spots, workers):
+    '''
+    Generates spots through a designspace document saved in the output folder, built one instance per job.
+    '''
+    start = time.time()
+    sourceMaster = findSourceMaster(engine, options.source_master)
+    folder = os.path.abspath(options.output or getInstancesFolder(sourceMaster.getFont()))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    documentPath = os.path.join(folder, '%s.designspace'%(os.path.splitext(os.path.basename(options.matrix))[0]))
+    writeDesignSpace(documentPath, engine, spots, outputFolder=folder, sourceMaster=sourceMaster, kerning=options.kerning, info=options.fontInfos, groups=options.groups)
+
+    def printResult(result):
+        if result['error'] is not None:
+            print('✗ %s failed: %s'%(result['spot'], result['error']))
+        elif not options.quiet:
+            print('\n'.join(result['report']))
+
+    results = buildInstances(documentPath, workers, printResult)
+    failed = len([result for result in results if result['error'] is not None])
+
+    print('\n*   Generated instances: %s'%(len(results) - failed))
+    print('**  Failed instances: %s'%(failed))
+    print('*** Done in %0.2fs with %s worker(s), through %s'%(time.time() - start, workers, documentPath))
+
+    if options.report_file:
+        with open(options.report_file, 'w') as f:
+            json.dump({'matrix': options.matrix, 'spots': options.spots, 'designspace': documentPath, 'results': results}, f, indent=2)
+
+    return 1 if failed else 0
+
+def runShard(options, engine, spots, generationOptions, workers):
+    '''
+    Generates the units of one shard of the run (see matrixShards) and writes its manifest.
+    '''
+    start = time.time()
+    baseFont = findSourceMaster(engine, options.source_master).getFont()
+    outputFolder = os.path.abspath(options.output or getInstancesFolder(baseFont))
+    shardFolder = getShardFolder(outputFolder)
+    if not os.path.exists(shardFolder):
+        os.makedirs(shardFolder)
+    glyphNames = None
+    if options.glyphs:
+        glyphSets = [glyphSet for location, glyphSet in engine.getMasterGlyphSets()]
+        glyphNames, strayGlyphs = compareGlyphSets(glyphSets)
+        subset = GlyphSubset.fromExpression(options.subset)
+        if subset is not None:
+            subsetNames = set(subset.resolve(glyphSets))
+            glyphNames = [glyphName for glyphName in glyphNames if glyphName in subsetNames]
+    units = planUnits(spots, glyphNames, options.chunk_size)
+    shardUnits = getShardUnits(units, options.shard_index, options.shard_count)
+    settings = dict(generationOptions, slice=list(generationOptions['slice']), shardCount=options.shard_count)
+    results = []
+
+    def printResult(result):
+        results.append(result)
+        if result['error'] is not None:
+            print('✗ %s (part %s) failed: %s'%(result['spot'], result['chunk'], result['error']))
+        elif not options.quiet:
+            print('\n'.join(result['report']))
+
+    workers = max(1, min(workers, len(shardUnits)))
+    geometry, geometrySource = _prepareGeometry(engine, workers, options.cache_dir)
+    try:
+        if workers <= 1:
+            for unit in shardUnits:
+                printResult(generatePart(unit, generationOptions, outputFolder, shardFolder, engine))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(options.matrix, geometrySource)) as executor:
+                futures = [executor.submit(generatePart, unit, generationOptions, outputFolder, shardFolder) for unit in shardUnits]
+                for future in as_completed(futures):
+                    printResult(future.result())
+    finally:
+        if geometry is not None:
+            geometry.close()
+
+    results.sort(key=lambda result: result['index'])
+    manifestPath = writeManifest(shardFolder, {
+        'matrix': options.matrix,
+        'plan': getPlanKey(units, settings),
+        'shardIndex': options.shard_index,
+        'shardCount': options.shard_count,
+        'unitCount': len(units),
+        'units': results
+    })
+    failed = len([result for result in results if result['error'] is not None])
+
+    print('\n*   Generated parts: %s of %s'%(len(results) - failed, len(units)))
+    print('**  Failed parts: %s'%(failed))
+    print('*** Done in %0.2fs with %s worker(s), shard %s of %s, manifest at %s'%(time.time() - start, workers, options.shard_index, options.shard_count, manifestPath))
+
+    if options.report_file:
+        with open(options.report_file, 'w') as f:
+            json.dump({'matrix': options.matrix, 'spots': options.spots, 'manifest': manifestPath, 'results': results}, f, indent=2)
+
+    return 1 if failed else 0
+
+def runMerge(options, engine):
+    '''
+    Assembles the instances of a sharded run, see matrixShards.mergeShards.
+    '''
+    start = time.time()
+    baseFont = findSourceMaster(engine, options.source_master).getFont()
+    shardFolder = getShardFolder(os.path.abspath(options.output or getInstancesFolder(baseFont)))
+
+    def printResult(result):
+        if result['error'] is not None:
+            print('✗ %s failed: %s'%(result['spot'], result['error']))
+        elif not options.quiet:
+            print('\n'.join(result['report']))
+
+    try:
+        results = mergeShards(shardFolder, printResult)
+    except ShardError as e:
+        print('Interpolation matrix — can’t merge shards in %s: %s'%(shardFolder, e), file=sys.stderr)
+        return 2
+    failed = len([result for result in results if result['error'] is not None])
+
+    print('\n*   Merged instances: %s'%(len(results) - failed))
+    print('**  Failed instances: %s'%(failed))
+    print('*** Done in %0.2fs'%(time.time() - start))
+
+    if options.report_file:
+        with open(options.report_file, 'w') as f:
+            json.dump({'matrix': options.matrix, 'shards': shardFolder, 'results': results}, f, indent=2)
+
+    return 1 if failed else 0
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Generate interpolation matrix instances from a saved matrix file.')
+    parser.add_argument('matrix', help='saved matrix file (.txt) or designspace document')
+    parser.add_argument('-s', '--spots', default='*', help='spots to generate, e.g. "A1:C3, !B2" (default: *)')
+    parser.add_argument('--slice', default='', help='slice of a matrix with extra axes, e.g. "opsz=2" (default: first position of each axis)')
+    parser.add_argument('-o', '--output', help='output folder (default: matrix-instances next to the source master)')
+    parser.add_argument('--source-master', help='master used for naming & groups, as a spot (A1) or index (default: first master)')
+    parser.add_argument('--no-glyphs', dest='glyphs', action='store_false', help='don’t interpolate glyphs')
+    parser.add_argument('--no-kerning', dest='kerning', action='store_false', help='don’t interpolate kerning')
+    parser.add_argument('--no-info', dest='fontInfos', action='store_false', help='don’t interpolate font info')
+    parser.add_argument('--no-groups', dest='groups', action='store_false', help='don’t copy groups')
+    parser.add_argument('--compile', metavar='FORMATS', help='also compile each instance to binary fonts, e.g. "otf,ttf" (requires ufo2ft)')
+    parser.add_argument('--no-ufo', dest='ufo', action='store_false', help='with --compile, don’t save instances as UFOs')
+    parser.add_argument('--subset', help='only generate a subset of glyphs (with their components, kerning & groups), e.g. \'U+0020-007E, *.sc, "Hamburgefonstiv"\'')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='parallel processes (default: cpu count)')
+    parser.add_argument('--report-file', help='write a JSON report of the run')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print the summary')
+    parser.add_argument('--check', action='store_true', help='check master compatibility instead of generating instances')
+    parser.add_argument('--report-jsonl', metavar='PATH', help='with --check, stream records (one JSON object per line) to PATH as glyphs are checked, - for the standard output')
+    parser.add_argument('--report-html', metavar='PATH', help='with --check, write an HTML report to PATH as glyphs are checked')
+    parser.add_argument('--fail-fast', action='store_true', help='with --check, stop at the first incompatible glyph')
+    parser.add_argument('--cache-dir', default=getDefaultCacheFolder(), help='cache of parsed master glyphs (default: %(default)s)')
+    parser.add_argument('--backend', choices=['matrix', 'designspace'], default='matrix', help='generate with the matrix engine, or through a designspace document and its builder (glyphs are always interpolated)')
+    parser.add_argument('--export-designspace', metavar='PATH', help='only save the masters & spots as a designspace document (instances in --output, default: instances)')
+    parser.add_argument('--variable-font', metavar='PATH', help='only compile the masters into a variable TTF for proofing (requires ufo2ft)')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None, help='parse the masters instead of using the cache')
+    parser.add_argument('--shard-index', type=int, help='only generate this shard (0 based) of the run, as partial UFOs and a manifest in OUTPUT/shards')
+    parser.add_argument('--shard-count', type=int, help='number of shards the run is split into')
+    parser.add_argument('--chunk-size', type=int, default=500, help='glyphs per unit of a sharded run (default: %(default)s)')
+    parser.add_argument('--merge', action='store_true', help='only assemble the instances of a sharded run out of OUTPUT/shards')
+    options = parser.parse_args(args)
+
+    if (options.shard_index is None) != (options.shard_count is None) or (options.shard_count is not None and not 0 <= options.shard_index < options.shard_count):
+        print('Interpolation matrix — --shard-index and --shard-count go together, with 0 <= index < count.', file=sys.stderr)
+        return 2
+
+    try:
+        engine = MatrixEngine.fromMatrixFile(options.matrix)
+        engine.setSlice(engine.parseSlice(options.slice))
+        spots = engine.parseSpotsList(options.spots)
+        GlyphSubset.fromExpression(options.subset)
+    except (IOError, ValueError, SpotExpressionError) as e:
+        print('Interpolation matrix — %s'%(e), file=sys.stderr)
+        return 2
+    if not spots:
+        print('Interpolation matrix — at least one location is required.', file=sys.stderr)
+        return 2
+    if len(engine.masters) < 2 or findSourceMaster(engine, options.source_master) is None:
+        print('Interpolation matrix — at least two masters and a valid source master are required.', file=sys.stderr)
+        return 2
+
+    if options.check:
+        return runCompatibilityCheck(options)
+
+    if options.merge:
+        return runMerge(options, engine)
+
+    if options.variable_font:
+        try:
+            compileVariableFont(options.variable_font, engine, findSourceMaster(engine, options.source_master))
+        except ImportError as e:
+            print('Interpolation matrix — compiling a variable font requires ufo2ft (%s)'%(e), file=sys.stderr)
+            return 2
+        print('*** Saved variable font to %s'%(options.variable_font))
+        return 0
+
+    compileFormats = [fileFormat.strip().lower() for fileFormat in (options.compile or '').split(',') if fileFormat.strip()]
+    if compileFormats:
+        if any(fileFormat not in COMPILE_FORMATS for fileFormat in compileFormats):
+            print('Interpolation matrix — binary formats are %s.'%(', '.join(COMPILE_FORMATS)), file=sys.stderr)
+            return 2
+        if options.backend == 'designspace' or options.shard_count is not None or options.merge:
+            print('Interpolation matrix — --compile only applies to the matrix backend, without shards.', file=sys.stderr)
+            return 2
+        try:
+            import ufo2ft
+        except ImportError as e:
+            print('Interpolation matrix — compiling binary fonts requires ufo2ft (%s)'%(e), file=sys.stderr)
+            return 2
+
+    if options.subset and (options.backend == 'designspace' or options.export_designspace):
+        print('Interpolation matrix — subsets aren’t supported through designspace documents.', file=sys.stderr)
+        return 2
+
+    if options.export_designspace:
+        sourceMaster = findSourceMaster(engine, options.source_master)
+        writeDesignSpace(options.export_designspace, engine, spots, outputFolder=options.output or 'instances', sourceMaster=sourceMaster, kerning=options.kerning, info=options.fontInfos, groups=options.groups)
+        print('*** Saved %s instance(s) to %s'%(len(spots), options.export_designspace))
+        return 0
+
+    generationOptions = {
+        'sourceMaster': options.source_master,
+        'glyphs': options.glyphs,
+        'kerning': options.kerning,
+        'fontInfos': options.fontInfos,
+        'groups': options.groups,
+        'subset': options.subset,
+        'compile': compileFormats,
+        'ufo': options.ufo,
+        'slice': engine.getSlice()
+    }
+
+    showProgress = not options.quiet and sys.stderr.isatty()
+
+    def printEvent(event):
+        job = event['job']
+        if event['type'] == PROGRESS and showProgress and job.total:
+            sys.stderr.write('\r%s: %s/%s glyphs '%(job.name, job.done, job.total))
+            sys.stderr.flush()
+        elif event['type'] == FINISHED and not options.quiet:
+            print('\n'.join(job.result['report']))
+        elif event['type'] == FAILED:
+            print('✗ %s failed: %s'%(job.name, job.error))
+        elif event['type'] == CANCELLED:
+            print('– %s cancelled'%(job.name))
+
+    if options.shard_count is not None:
+        return runShard(options, engine, spots, generationOptions, max(1, options.workers))
+
+    workers = max(1, min(options.workers, len(spots)))
+    if options.backend == 'designspace':
+        return runDesignSpaceBackend(options, engine, spots, workers)
+
+    start = time.time()
+    pipeline = GenerationPipeline(workers)
+    pipeline.subscribe(printEvent)
+    results = generateSpots(options.matrix, spots, generationOptions, options.output, workers, None, options.cache_dir, pipeline)
+    summary = pipeline.getSummary()
+    pipeline.shutdown()
+
+    print('\n*   Generated instances: %s'%(summary[FINISHED]))
+    print('**  Failed instances: %s'%(summary[FAILED]))
+    if summary[CANCELLED]:
+        print('**  Cancelled instances: %s'%(summary[CANCELLED]))
+    print('*** Done in %0.2fs with %s worker(s)'%(time.time() - start, workers))
+
+    if options.report_file:
+        with open(options.report_file, 'w') as f:
+            json.dump({'matrix': options.matrix, 'spots': options.spots, 'results': results}, f, indent=2)
+
+    return 1 if summary[FAILED] or summary[CANCELLED] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
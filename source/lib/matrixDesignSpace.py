@@ -0,0 +1,277 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Matrices as designspace documents, and generation of their instances by a designspace builder.
+
+The grid’s horizontal & vertical axes (and extra axes, if any) become designspace axes, masters become sources
+located at their spot’s weights, and the spots to generate become instances. Spots & grid size are kept
+in the document’s lib, so that an exported matrix reads back as it was; other designspaces are laid out
+on a grid made of the distinct locations of their sources on their first two axes:
+
+    writeDesignSpace('matrix.designspace', engine, spots)
+    matrixInfo = readDesignSpace('matrix.designspace')    # same form as matrixEngine.readMatrixFile
+
+Instances are built with ufoProcessor if it’s installed (MutatorMath’s own builder otherwise),
+one process per job, so that the matrix can feed any designspace based build pipeline as well.
+Glyphs that can’t be interpolated as they are (see glyphCompatibility) are muted in instances and reported,
+instead of coming out of the builder empty.
+Masters can also be compiled into a variable TrueType font for proofing (compileVariableFont, requires ufo2ft).
+'''
+
+from matrixSpot import getKeyForValue, splitSpotKey
+from glyphCompatibility import classifyGlyph, reportLines, INCOMPATIBLE
+from fontTools.designspaceLib import DesignSpaceDocument, AxisDescriptor, SourceDescriptor, InstanceDescriptor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import tempfile
+import shutil
+import time
+import os
+
+try:
+    from ufoProcessor import build as buildDesignSpace
+except ImportError:
+    from mutatorMath.ufo import build as buildDesignSpace
+
+SPOT_KEY = 'interpolationMatrix.spot'
+DEPTH_KEY = 'interpolationMatrix.depth'
+GRID_KEY = 'interpolationMatrix.axesGrid'
+AXIS_WEIGHTS_KEY = 'interpolationMatrix.axisWeights'
+POSSIZE_KEY = 'interpolationMatrix.posSize'
+CURRENT_GLYPH_KEY = 'interpolationMatrix.currentGlyph'
+
+AXIS_TAGS = {'horizontal': 'HORZ', 'vertical': 'VERT'}
+REGISTERED_AXES = ['wght', 'wdth', 'opsz', 'slnt', 'ital']
+
+def getAxisTag(axisName):
+    if axisName in AXIS_TAGS:
+        return AXIS_TAGS[axisName]
+    if axisName in REGISTERED_AXES:
+        return axisName
+    return (axisName.upper() + 'XXXX')[:4]
+
+def _gridAxisWeights(engine, axisName):
+    weights = [engine.getAxisWeight(axisName, index) for index in range(engine.axesGrid[axisName])]
+    if axisName in ['horizontal', 'vertical']:
+        for spotKey in set(engine.shiftedSpotKeys) | set(master.getSpotKey() for master in engine.masters):
+            weights.append(engine.matrixSpots[spotKey].getWeightsAsDict('horizontal', 'vertical')[axisName])
+    return weights
+
+def buildDesignSpaceDocument(engine, spots=(), outputFolder='instances', sourceMaster=None, kerning=True, info=True, groups=True, posSize=None, currentGlyph=None):
+    '''
+    Designspace document of the engine’s masters, with an instance per spot (i, j) of the current slice,
+    saved in outputFolder (relative to the document unless absolute) as familyName-B2.ufo.
+    Names, info and groups come from sourceMaster (the first master by default), which is also the default location.
+    '''
+    document = DesignSpaceDocument()
+    document.formatVersion = '4.1'
+    axisNames = ['horizontal', 'vertical'] + list(engine.extraAxes)
+    masters = engine.masters
+    if sourceMaster is None and masters:
+        sourceMaster = masters[0]
+    sourceLocations = [engine.getMasterLocation(master) for master in masters]
+    sourceLocation = engine.getMasterLocation(sourceMaster) if sourceMaster is not None else None
+    for axisName in axisNames:
+        weights = _gridAxisWeights(engine, axisName)
+        axis = AxisDescriptor()
+        axis.name = axisName
+        axis.tag = getAxisTag(axisName)
+        axis.minimum = min(weights)
+        axis.maximum = max(weights)
+        default = sourceLocation[axisName] if sourceLocation is not None else weights[0]
+        axis.default = min(max(default, axis.minimum), axis.maximum)
+        document.addAxis(axis)
+
+    for index, (master, location) in enumerate(zip(masters, sourceLocations)):
+        source = SourceDescriptor()
+        source.path = os.path.abspath(master.getFont().path)
+        source.name = 'master.%s'%(index)
+        source.location = dict(location)
+        if master is sourceMaster:
+            source.copyInfo = source.copyLib = source.copyFeatures = True
+            source.copyGroups = groups
+        document.addSource(source)
+
+    familyName = sourceMaster.getFont().info.familyName if sourceMaster is not None else None
+    for spot in spots:
+        i, j = spot
+        instanceName = engine.getInstanceName(spot)
+        instance = InstanceDescriptor()
+        instance.familyName = familyName
+        instance.styleName = instanceName
+        instance.name = 'instance.%s'%(instanceName.replace(' ', '-'))
+        fileName = '%s-%s.ufo'%(familyName, instanceName.replace(' ', '-'))
+        if os.path.isabs(outputFolder):
+            instance.path = os.path.join(outputFolder, fileName)
+        else:
+            instance.filename = '%s/%s'%(outputFolder, fileName)
+        instance.location = dict(engine.getSpotLocation((getKeyForValue(i), j)))
+        instance.kerning = kerning
+        instance.info = info
+        instance.lib[SPOT_KEY] = '%s%s'%(getKeyForValue(i), j)
+        document.addInstance(instance)
+
+    # spots are kept in the document’s lib, sources only have one from format 5 on
+    document.lib[GRID_KEY] = dict((axisName, engine.axesGrid[axisName]) for axisName in axisNames)
+    document.lib[SPOT_KEY] = [master.getSpotKey() for master in masters]
+    if engine.extraAxes:
+        document.lib[DEPTH_KEY] = [list(master.getDepth()) for master in masters]
+        document.lib[AXIS_WEIGHTS_KEY] = dict((axisName, [engine.getAxisWeight(axisName, index) for index in range(engine.axesGrid[axisName])]) for axisName in engine.extraAxes)
+    if posSize is not None:
+        document.lib[POSSIZE_KEY] = list(posSize)
+    if currentGlyph is not None:
+        document.lib[CURRENT_GLYPH_KEY] = currentGlyph
+    return document
+
+def writeDesignSpace(path, engine, spots=(), **kwargs):
+    '''
+    Saves the matrix as a designspace document, see buildDesignSpaceDocument.
+    '''
+    document = buildDesignSpaceDocument(engine, spots, **kwargs)
+    document.write(path)
+    return document
+
+def _gridPositions(values):
+    return dict((value, index) for index, value in enumerate(sorted(set(values))))
+
+def readDesignSpace(path):
+    '''
+    Reads a designspace document as a matrix, returns a dict with axesGrid, extraAxes, posSize, currentGlyph and masters,
+    like matrixEngine.readMatrixFile. Raises ValueError if the document has no axis or sources.
+    '''
+    document = DesignSpaceDocument.fromfile(path)
+    if not document.axes or not document.sources:
+        raise ValueError('no axes or sources in designspace: %s'%(path))
+    axisNames = [axis.name for axis in document.axes]
+    defaults = dict((axis.name, axis.default) for axis in document.axes)
+    locations = [dict(defaults, **source.location) for source in document.sources]
+    gridNames = (axisNames + [None])[:2]
+    extraNames = axisNames[2:]
+    lib = document.lib
+    spotKeys = lib.get(SPOT_KEY)
+    depths = lib.get(DEPTH_KEY)
+
+    if spotKeys is not None and len(spotKeys) == len(document.sources):
+        # written by buildDesignSpaceDocument
+        axesGrid = lib[GRID_KEY]
+        axisWeights = lib.get(AXIS_WEIGHTS_KEY, {})
+        depths = [tuple(depth) for depth in depths] if depths is not None else [()] * len(spotKeys)
+        extraAxes = [(axisName, axesGrid[axisName], axisWeights.get(axisName)) for axisName in extraNames]
+        axesGrid = (axesGrid['horizontal'], axesGrid['vertical'])
+    else:
+        # masters are laid out by the order of their distinct locations along each axis
+        gridPositions = [_gridPositions([location[axisName] for location in locations]) if axisName else {None: 0} for axisName in gridNames]
+        spots = [tuple(positions[location.get(axisName)] for axisName, positions in zip(gridNames, gridPositions)) for location in locations]
+        spotKeys = ['%s%s'%(getKeyForValue(i), j) for i, j in spots]
+        axesGrid = tuple(max(2, len(positions)) if axisName else 1 for axisName, positions in zip(gridNames, gridPositions))
+        extraPositions = [_gridPositions([location[axisName] for location in locations]) for axisName in extraNames]
+        extraAxes = [(axisName, len(positions), sorted(positions)) for axisName, positions in zip(extraNames, extraPositions)]
+        depths = [tuple(positions[location[axisName]] for axisName, positions in zip(extraNames, extraPositions)) for location in locations]
+
+    masters = []
+    for spotKey, depth, location, source in zip(spotKeys, depths, locations, document.sources):
+        ch, j = splitSpotKey(spotKey)
+        weights = tuple(float(location[axisName]) if axisName else float(j+1)*100 for axisName in gridNames)
+        masters.append((spotKey, weights, source.path, depth or None))
+    return {
+        'axesGrid': axesGrid,
+        'extraAxes': extraAxes,
+        'posSize': tuple(lib.get(POSSIZE_KEY, ())) or None,
+        'currentGlyph': lib.get(CURRENT_GLYPH_KEY),
+        'masters': masters
+    }
+
+def compileVariableFont(path, engine, sourceMaster=None):
+    '''
+    Compiles the masters of the matrix into a variable TrueType font saved at path, the source master being the default.
+    Requires ufo2ft (and defcon), raises ImportError otherwise. Variable fonts don’t extrapolate: locations past the masters are clamped.
+    '''
+    from ufo2ft import compileVariableTTF
+    from defcon import Font
+    document = buildDesignSpaceDocument(engine, sourceMaster=sourceMaster)
+    document.loadSourceFonts(Font)
+    variableFont = compileVariableTTF(document)
+    variableFont.save(path)
+    return variableFont
+
+def findIncompatibleGlyphs(document):
+    '''
+    Glyphs common to the sources of a designspace document that a builder can’t interpolate as they are
+    (incompatible, or with contours in another order), against the first source: {glyphName: reasons}.
+    '''
+    from fontParts.world import OpenFont
+    fonts = [OpenFont(source.path, showInterface=False) for source in document.sources]
+    if not fonts:
+        return {}
+    labels = [source.styleName or os.path.basename(source.path) for source in document.sources]
+    glyphNames = set(fonts[0].keys())
+    for font in fonts[1:]:
+        glyphNames &= set(font.keys())
+    incompatibleGlyphs = {}
+    for glyphName in sorted(glyphNames):
+        status, reasons, contourOrders = classifyGlyph([font[glyphName] for font in fonts], labels)
+        if status == INCOMPATIBLE or any(order is not None for order in contourOrders):
+            incompatibleGlyphs[glyphName] = reasons
+    return incompatibleGlyphs
+
+def buildInstance(documentPath, instanceIndex, roundGeometry=True, incompatibleGlyphs=None):
+    '''
+    Builds one instance of a designspace document, in a document of its own (so that jobs can run in parallel).
+    Glyphs in incompatibleGlyphs {glyphName: reasons} (see findIncompatibleGlyphs, checked here if None) are muted.
+    Returns a result dict (spot, path, report, error, seconds) as matrixBatch.generateSpot does.
+    '''
+    start = time.time()
+    document = DesignSpaceDocument.fromfile(documentPath)
+    instance = document.instances[instanceIndex]
+    result = {
+        'spot': instance.styleName,
+        'path': instance.path,
+        'report': [],
+        'error': None
+    }
+    folder = tempfile.mkdtemp(prefix='matrix-designspace-')
+    try:
+        if incompatibleGlyphs is None:
+            incompatibleGlyphs = findIncompatibleGlyphs(document)
+        for glyphName in incompatibleGlyphs:
+            instance.glyphs[glyphName] = {'mute': True}
+        document.instances = [instance]
+        jobPath = os.path.join(folder, os.path.basename(documentPath))
+        document.write(jobPath)
+        buildDesignSpace(jobPath, outputUFOFormatVersion=3, roundGeometry=roundGeometry, verbose=False)
+        result['report'].append(u'*** Built instance %s at %s ***'%(instance.styleName, instance.path))
+        if incompatibleGlyphs:
+            result['report'].append(u'+ Couldn’t interpolate %s glyphs'%(len(incompatibleGlyphs)))
+            result['report'] += reportLines(dict((glyphName, {'status': INCOMPATIBLE, 'reasons': reasons}) for glyphName, reasons in incompatibleGlyphs.items()))
+    except Exception as e:
+        result['error'] = '%s: %s'%(e.__class__.__name__, e)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+def buildInstances(documentPath, workers=1, callback=None):
+    '''
+    Builds every instance of a designspace document, in parallel if workers > 1.
+    Sources are checked once for glyphs to mute (see findIncompatibleGlyphs).
+    callback(result) is called as each instance is done. Returns the results in completion order.
+    '''
+    document = DesignSpaceDocument.fromfile(documentPath)
+    instanceCount = len(document.instances)
+    incompatibleGlyphs = findIncompatibleGlyphs(document) if instanceCount else {}
+    results = []
+    if workers <= 1:
+        for index in range(instanceCount):
+            result = buildInstance(documentPath, index, incompatibleGlyphs=incompatibleGlyphs)
+            results.append(result)
+            if callback is not None:
+                callback(result)
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(buildInstance, documentPath, index, True, incompatibleGlyphs) for index in range(instanceCount)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if callback is not None:
+                callback(result)
+    return results
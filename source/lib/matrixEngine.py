@@ -0,0 +1,1497 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Headless interpolation matrix engine.
+
+Holds the masters, the weights of every matrix spot and the MutatorMath plumbing
+used by the Interpolation Matrix window, without any dependency on vanilla or AppKit,
+so that previews, generation and compatibility reports can also be driven from scripts.
+'''
+
+from mutatorMath.objects.location import Location
+from mutatorMath.objects.mutator import buildMutator
+from fontMath.mathKerning import MathKerning
+
+try:
+    from mojo.roboFont import RGlyph, NewFont, OpenFont
+except ImportError:
+    from fontParts.world import RGlyph, NewFont, OpenFont
+
+from matrixSpot import MatrixMaster, MatrixSpot, getKeyForValue, getValueForKey, getSpotWeight, splitSpotKey
+from baseParameter import ParameterGraph
+from matrixDesignSpace import readDesignSpace
+from glyphVariations import VariationPreviewModel, getOrigin
+from glyphComponents import ComponentInstancer, collectComponentMasters
+from glyphSubset import subsetKerning, subsetGroups
+from glyphRaster import makeContactSheet
+from glyphWriter import BulkGlyphWriter, GlyphBatch
+from glyphCompatibility import classifyGlyph, reorderContours, reportLines, FIXABLE, INCOMPATIBLE
+from masterGeometry import MasterGeometry, FontData
+from glyphHashes import GlyphHashes
+from instancePrefetch import InstanceCache, estimateGlyphSize
+from compatibilityIndex import CompatibilityIndex, getIndexPath, COMPATIBLE, MIXED
+from glyphDetail import simplifyMasters
+from glyphDiagnostics import GlyphDiagnostics
+from spotExpression import SpotGrid, SpotExpressionError, compileSpotExpression, spotsToBitset, bitsetToSpots
+from math import cos, sin, pi
+import time
+import os
+import re
+
+PREVIEW_BACKENDS = ['mutatorMath', 'variations']
+
+def getBaseGlyphNames(font, glyphName, depth=0):
+    '''
+    Base glyphs of a glyph’s components in font, all the way down.
+    '''
+    baseGlyphNames = set()
+    if glyphName in font and depth < 16:
+        for component in font[glyphName].components:
+            if component.baseGlyph not in baseGlyphNames:
+                baseGlyphNames.add(component.baseGlyph)
+                baseGlyphNames |= getBaseGlyphNames(font, component.baseGlyph, depth+1)
+    return baseGlyphNames
+
+def makePreviewGlyph(glyph, fixedWidth=True):
+    if glyph is not None:
+        components = glyph.components
+        font = glyph.font
+        previewGlyph = RGlyph()
+
+        if font is not None:
+            for component in components:
+                base = font[component.baseGlyph]
+                if len(base.components) > 0:
+                    base = makePreviewGlyph(base, False)
+                decomponent = RGlyph()
+                decomponent.appendGlyph(base)
+                decomponent.scaleBy((component.scale[0], component.scale[1]))
+                decomponent.moveBy((component.offset[0], component.offset[1]))
+                previewGlyph.appendGlyph(decomponent)
+            for contour in glyph.contours:
+                previewGlyph.appendContour(contour)
+
+            if fixedWidth:
+                previewGlyph.width = 1000
+                previewGlyph.leftMargin = previewGlyph.rightMargin = (previewGlyph.leftMargin + previewGlyph.rightMargin)/2
+                previewGlyph.scaleBy((.75, .75), (previewGlyph.width/2, 0))
+                previewGlyph.moveBy((0, -50))
+
+            scaleFactor = 1000.0 / font.info.unitsPerEm
+            previewGlyph.scaleBy((scaleFactor, scaleFactor), (previewGlyph.width/2, 0))
+
+            previewGlyph.name = glyph.name
+
+        return previewGlyph
+    return
+
+def errorGlyph():
+    glyph = RGlyph()
+    glyph.width = 500
+    pen = glyph.getPen()
+
+    l = 50
+    p = (220, 150)
+    a = pi/4
+    pen.moveTo(p)
+    px, py = p
+    for i in range(12):
+        x = px+(l*cos(a))
+        y = py+(l*sin(a))
+        pen.lineTo((x, y))
+        px = x
+        py = y
+        if i%3 == 0:
+            a -= pi/2
+        elif i%3 != 0:
+            a += pi/2
+    pen.closePath()
+
+    return glyph
+
+def composeTextGlyph(glyphs, kerning=None, width=1000):
+    '''
+    Sets a glyph run on a single preview glyph, kerning being a {(left, right): value} dict.
+    The run is scaled down to fit the fixed preview width, missing glyphs (None) are drawn as error glyphs.
+    '''
+    textGlyph = RGlyph()
+    if kerning is None:
+        kerning = {}
+    x = 0
+    previousName = None
+    for glyph in glyphs:
+        if glyph is None:
+            glyph = errorGlyph()
+        x += kerning.get((previousName, glyph.name), 0)
+        textGlyph.appendGlyph(glyph, (x, 0))
+        x += glyph.width
+        previousName = glyph.name
+    scale = .75
+    if x > 0:
+        scale = min(scale, (width * .9) / x)
+    textGlyph.scaleBy((scale, scale))
+    textGlyph.moveBy(((width - x * scale) / 2, -50))
+    textGlyph.width = width
+    return textGlyph
+
+def buildMasterMutator(mutatorMasters, rawMasters, tolerance=None, model=None, report=None):
+    '''
+    Mutator for [(location, mathObject)] masters, None if the raw master glyphs aren’t compatible.
+    With a tolerance, master outlines are simplified first (see glyphDetail).
+    With a model (see glyphVariations, built on the same locations), masters are compiled into weighted sums,
+    falling back on MutatorMath if they can’t be.
+    Contours of fixable masters (same contours in another order) are put back in the first master’s order.
+    If a mutator can’t be built, the error is recorded in report {glyphName: {'status', 'reasons'}} if provided
+    (as interpolateGlyphSet reports glyphs), the glyph’s entry being dropped once a mutator is built.
+    '''
+    mutator = None
+    glyphName = getattr(rawMasters[0], 'name', None) if rawMasters else None
+    if mutatorMasters:
+        try:
+            status, reasons, contourOrders = classifyGlyph(rawMasters)
+            if status != INCOMPATIBLE and areComponentsCompatible(rawMasters):
+                if status == FIXABLE:
+                    # master glyphs may be cached, reordered copies are used
+                    mutatorMasters = [(location, reorderContours(glyph.copy(), order) if order is not None else glyph) for (location, glyph), order in zip(mutatorMasters, contourOrders)]
+                if tolerance is not None:
+                    locations = [location for location, glyph in mutatorMasters]
+                    glyphs = simplifyMasters([glyph for location, glyph in mutatorMasters], tolerance)
+                    mutatorMasters = list(zip(locations, glyphs))
+                if model is not None:
+                    mutator = model.buildMutator([glyph for location, glyph in mutatorMasters])
+                if mutator is None:
+                    bias, mutator = buildMutator(mutatorMasters)
+        except Exception as e:
+            if report is not None:
+                report[glyphName] = {'status': INCOMPATIBLE, 'reasons': ['mutator error: %s'%(e)]}
+            return None
+    if report is not None:
+        report.pop(glyphName, None)
+    return mutator
+
+def fontName(font):
+    familyName = font.info.familyName
+    styleName = font.info.styleName
+    if familyName is None:
+        familyName = font.info.familyName = 'Unnamed'
+    if styleName is None:
+        styleName = font.info.styleName = 'Unnamed'
+    return ' > '.join([familyName, styleName])
+
+def areComponentsCompatible(glyphs):
+    componentCombinations = set(tuple(sorted(c.baseGlyph for c in g.components)) for g in glyphs)
+    return len(componentCombinations) == 1
+
+def compareGlyphSets(fonts):
+    fontKeys = [set(font.keys()) for font in fonts]
+    commonGlyphsList = set()
+    strayGlyphs = set()
+    for i, keys in enumerate(fontKeys):
+        if i == 0:
+            commonGlyphsList = keys
+            strayGlyphs = keys
+        elif i > 0:
+            commonGlyphsList = commonGlyphsList & keys
+            strayGlyphs = strayGlyphs - keys
+    return list(commonGlyphsList), list(strayGlyphs)
+
+def interpolateGlyphSet(instanceLocation, glyphSet, masters, targetFont, suffix=None, progress=None, roundGeometry=False, autoUnicodes=False):
+    '''
+    Interpolates glyphSet into targetFont. Master glyphs are classified first (see glyphCompatibility),
+    incompatible glyphs are skipped without building any mutator.
+    Returns {glyphName: {'status', 'reasons'}} for every glyph that wasn’t plainly compatible
+    or whose instance has geometry issues (listed as 'issues', see glyphDiagnostics);
+    glyphs with an 'incompatible' status weren’t interpolated.
+    progress(done, total) is called before each glyph (done being the number of glyphs gone through) and once all are done, if provided.
+    Glyphs are written in one batch (see glyphWriter), rounded and given unicodes on the way if asked to.
+    targetFont can be a GlyphBatch, for work that mustn’t touch fonts: glyphs are then kept as they are
+    (rounding and unicodes being left to GlyphBatch.writeTo).
+    '''
+    report = {}
+    masterFonts = [masterFont for masterLocation, masterFont in masters]
+    labels = ['master %s'%(index) for index in range(len(masterFonts))]
+    total = len(glyphSet)
+
+    if isinstance(targetFont, GlyphBatch):
+        writer = targetFont
+    else:
+        writer = BulkGlyphWriter(targetFont, roundGeometry, autoUnicodes)
+
+    with writer:
+
+        for index, glyphName in enumerate(glyphSet):
+            if progress is not None:
+                progress(index, total)
+            masterRawGlyphs = [masterFont[glyphName] for masterFont in masterFonts]
+            status, reasons, contourOrders = classifyGlyph(masterRawGlyphs, labels)
+
+            if status == INCOMPATIBLE:
+                report[glyphName] = {'status': status, 'reasons': reasons}
+                continue
+
+            masterGlyphs = [(masterLocation, reorderContours(glyph.toMathGlyph(), order)) for (masterLocation, masterFont), glyph, order in zip(masters, masterRawGlyphs, contourOrders)]
+            masterUnicodes = set(tuple(glyph.unicodes) for glyph in masterRawGlyphs)
+
+            if len(masterUnicodes) == 1:
+                unicodes = list(masterUnicodes.pop())
+            else:
+                unicodes = None
+            targetName = glyphName
+            if suffix is not None:
+                targetName += suffix
+            try:
+                bias, gM = buildMutator(masterGlyphs)
+                instanceGlyph = gM.makeInstance(instanceLocation)
+                bounds, issues = GlyphDiagnostics([glyph for masterLocation, glyph in masterGlyphs]).check(instanceGlyph)
+                writer.writeGlyph(targetName, instanceGlyph, unicodes)
+                if status == FIXABLE or issues:
+                    report[glyphName] = {'status': status, 'reasons': reasons, 'issues': issues}
+            except Exception as e:
+                report[glyphName] = {'status': INCOMPATIBLE, 'reasons': reasons + ['interpolation error: %s'%(e)]}
+
+    if progress is not None:
+        progress(total, total)
+    return report
+
+class InstanceData(object):
+
+    '''
+    What makes an instance, interpolated without touching any font (see MatrixEngine.interpolateInstance):
+    names, glyph order, info (MathInfo), kerning (MathKerning), groups, glyphs (GlyphBatch) and report lines.
+    Parts that weren’t interpolated are None, created is False if there’s no font to make at all.
+    '''
+
+    def __init__(self, familyName, styleName):
+        self.familyName = familyName
+        self.styleName = styleName
+        self.created = False
+        self.glyphOrder = None
+        self.info = None
+        self.kerning = None
+        self.groups = None
+        self.glyphs = None
+        self.report = []
+
+def makeInstanceFont(instance, path=None):
+    '''
+    Makes a new font out of an InstanceData (on the main thread if fonts are shown), saved to path if provided.
+    Returns the new font (None if there was nothing to make) and the instance’s report lines.
+    '''
+    report = list(instance.report)
+    if not instance.created:
+        return None, report
+
+    newFont = NewFont(showInterface=False)
+    newFont.info.familyName = instance.familyName
+    newFont.info.styleName = instance.styleName
+    if instance.glyphOrder is not None:
+        newFont.glyphOrder = instance.glyphOrder
+    if instance.info is not None:
+        newFont.info.fromMathInfo(instance.info)
+        newFont.info.familyName = instance.familyName
+        newFont.info.styleName = instance.styleName
+    if instance.kerning is not None:
+        instance.kerning.extractKerning(newFont)
+    if instance.groups is not None:
+        for key, value in instance.groups.items():
+            newFont.groups[key] = value
+    if instance.glyphs is not None:
+        instance.glyphs.writeTo(newFont, roundGeometry=True, autoUnicodes=True)
+
+    if path is not None:
+        folderPath = os.path.dirname(path)
+        if folderPath and not os.path.isdir(folderPath):
+            os.makedirs(folderPath)
+        newFont.save(path)
+        report.append(u'\n—> Saved font to UFO at %s\n'%(path))
+
+    return newFont, report
+
+def countIncompatibleGlyphs(report):
+    return len([glyphName for glyphName, item in report.items() if item['status'] == INCOMPATIBLE])
+
+def countQuestionableGlyphs(report):
+    return len([glyphName for glyphName, item in report.items() if item.get('issues')])
+
+def getInstancesFolder(baseFont):
+    folderPath = None
+    if baseFont.path is not None:
+        s = re.search('(.*)/(.*)(.ufo)', baseFont.path)
+        if s is not None:
+            folderPath = u'%s%s'%(s.group(1), '/matrix-instances')
+    return folderPath
+
+def readMatrixFile(path):
+    '''
+    Parses a saved matrix (.txt) file, returns a dict with axesGrid, extraAxes as a list of
+    (axisName, cellCount, weights or None), posSize, currentGlyph and masters as a list of
+    (spotKey, weights or None, fontPath, depth or None). Returns None if the file isn’t a matrix file.
+    Designspace documents are read as matrices as well (see matrixDesignSpace.readDesignSpace).
+    '''
+    if os.path.splitext(path)[1].lower() == '.designspace':
+        return readDesignSpace(path)
+    with open(path, 'r') as f:
+        matrixTextForm = f.read()
+    matrixValues = matrixTextForm.split('\n')
+    if not (matrixValues and matrixValues[0] == 'Matrix Interpolation File'):
+        return
+    limits = tuple(matrixValues[1].split(','))
+    # axes beyond the grid follow its size, as name=cellCount[/weight/weight…]
+    extraAxes = []
+    for axisValue in limits[2:]:
+        axisName, axisInfo = axisValue.split('=')
+        axisInfo = axisInfo.split('/')
+        weights = [float(weight) for weight in axisInfo[1:]] or None
+        extraAxes.append((axisName, int(axisInfo[0]), weights))
+    masters = []
+    for masterSpot in [value.split(':') for value in matrixValues[4].split(',')]:
+        if len(masterSpot) > 1:
+            spotKey = masterSpot[0]
+            fontPath = masterSpot[-1]
+            weights = None
+            depth = None
+            if len(masterSpot) > 2:
+                weights = tuple(float(weight) for weight in masterSpot[1].split('/'))
+            if len(masterSpot) > 3:
+                depth = tuple(int(index) for index in masterSpot[2].split('.'))
+            if splitSpotKey(spotKey) is not None:
+                masters.append((spotKey, weights, fontPath, depth))
+    return {
+        'axesGrid': (int(limits[0]), int(limits[1])),
+        'extraAxes': extraAxes,
+        'posSize': tuple([float(value) for value in matrixValues[2].split(',')]),
+        'currentGlyph': matrixValues[3],
+        'masters': masters
+    }
+
+def writeMatrixFile(path, engine, posSize, currentGlyph):
+    '''
+    Saves the grid, axes and masters of engine as a matrix (.txt) file, see readMatrixFile.
+    '''
+    limits = ['%s'%(cellCount) for cellCount in engine.getAxesGrid()]
+    for axisName in engine.extraAxes:
+        cellCount = engine.axesGrid[axisName]
+        weights = ['%s'%(engine.getAxisWeight(axisName, index)) for index in range(cellCount)]
+        limits.append('%s=%s'%(axisName, '/'.join(['%s'%(cellCount)] + weights)))
+    masters = []
+    for master in engine.masters:
+        masterSpotKey = master.getSpotKey()
+        values = [masterSpotKey, engine.matrixSpots[masterSpotKey].getWeightsAsString()]
+        if engine.extraAxes:
+            values.append('.'.join(['%s'%(index) for index in master.getDepth()]))
+        values.append(master.getFontPath())
+        masters.append(':'.join(values))
+    matrixTextValues = ['Matrix Interpolation File\n', ','.join(limits), '\n', ','.join([str(value) for value in posSize]), '\n', str(currentGlyph), '\n', ','.join(masters)]
+    with open(path, 'w') as f:
+        f.write(''.join(matrixTextValues))
+
+
+class SparseMatrixSpots(dict):
+
+    '''
+    Matrix spots materialized on demand: a spot missing from the dict
+    is built from the engine’s axis weight tables when first requested.
+    '''
+
+    def __init__(self, engine, *args, **kwargs):
+        super(SparseMatrixSpots, self).__init__(*args, **kwargs)
+        self.engine = engine
+
+    def __missing__(self, spotKey):
+        spot = splitSpotKey(spotKey)
+        if spot is None:
+            raise KeyError(spotKey)
+        matrixSpot = self.engine.makeMatrixSpot(spot)
+        self[spotKey] = matrixSpot
+        return matrixSpot
+
+
+class MatrixEngine(object):
+
+    '''
+    Masters and spot weights of an interpolation matrix,
+    with the methods building previews and instances out of them.
+
+    The grid spans a horizontal and a vertical axis. Extra axes (e.g. optical size) can be added,
+    the grid then shows a slice of the design space: one position (depth) on each extra axis.
+    Masters sit at a spot and a depth, and all of them take part in the interpolation of every slice.
+    '''
+
+    def __init__(self, axesGrid=(3, 1), extraAxes=()):
+        self.axesGrid = {'horizontal': axesGrid[0], 'vertical': axesGrid[1]}
+        self.extraAxes = []
+        self.depthWeights = {}
+        self.sliceDepth = ()
+        self.masters = []
+        # weights of every spot are parameters of a single graph, see baseParameter.ParameterGraph
+        self.parameterGraph = ParameterGraph()
+        self.matrixSpots = SparseMatrixSpots(self)
+        self.axisMutators = {'horizontal': None, 'vertical': None}
+        self.axisWeights = {'horizontal': {}, 'vertical': {}}
+        self.shiftedSpotKeys = set()
+        self.mutatorMasters = []
+        self.rawMasters = []
+        self.textGlyphNames = []
+        self.textMasters = {}
+        self.componentMasters = {}
+        self.kerningMasters = []
+        self.geometry = None
+        # copies of the masters’ info, groups & glyph order in snapshots (see snapshot)
+        self.fontData = None
+        self.glyphHashes = None
+        self.compatibilityCache = {}
+        self.compatibilityIndex = None
+        # matrix file the engine was loaded from or saved to, the compatibility index is kept next to it
+        self.matrixPath = None
+        self.previewCellSize = None
+        self.instanceIssues = {}
+        # {glyphName: {'status', 'reasons'}} of glyphs whose preview mutators couldn’t be built (see buildMasterMutator)
+        self.mutatorReport = {}
+        # cells smaller than detailThreshold (pixels) show masters simplified within detailTolerance (pixels)
+        self.detailThreshold = 120
+        self.detailTolerance = .5
+        self.placedMasters = []
+        self.glyphMutators = {}
+        # preview masters, mutators & instances of glyphs seen or prefetched (see instancePrefetch)
+        self.instanceCache = InstanceCache()
+        self.glyphEntry = None
+        self.textMutators = {}
+        # 'mutatorMath' or 'variations' (weighted sums of compiled masters, see glyphVariations)
+        self.previewBackend = 'mutatorMath'
+        self.variationModels = {}
+        self.setExtraAxes(extraAxes)
+
+    def _getMatrixSpots(self):
+        return self._matrixSpots
+
+    def _setMatrixSpots(self, matrixSpots):
+        # keep spots lazy even when a plain dict is assigned
+        if not isinstance(matrixSpots, SparseMatrixSpots):
+            matrixSpots = SparseMatrixSpots(self, matrixSpots)
+        self._matrixSpots = matrixSpots
+
+    matrixSpots = property(_getMatrixSpots, _setMatrixSpots)
+
+    @classmethod
+    def fromMatrixFile(cls, path, openFont=None, geometryCache=None):
+        '''
+        Builds an engine out of a saved matrix file, master fonts are opened with openFont(path)
+        (headless fontParts fonts by default). Raises ValueError if the file isn’t a matrix file.
+        With a geometryCache (see geometryCache.GeometryCache), master glyphs are read from
+        memory-mapped cached files instead of being parsed from the UFOs.
+        '''
+        matrixInfo = readMatrixFile(path)
+        if matrixInfo is None:
+            raise ValueError('not a valid matrix file: %s' % (path))
+        if openFont is None:
+            openFont = lambda fontPath: OpenFont(fontPath, showInterface=False)
+        engine = cls(matrixInfo['axesGrid'], matrixInfo['extraAxes'])
+        engine.matrixPath = path
+        engine.loadMasters(matrixInfo['masters'], openFont)
+        if geometryCache is not None:
+            engine.setGeometry(geometryCache.getMasterGeometry([master.getFont().path for master in engine.masters]))
+        return engine
+
+    def loadMasters(self, masters, openFont):
+        '''
+        Places masters given as (spotKey, weights or None, fontPath[, depth or None]), fonts being opened with openFont(fontPath).
+        '''
+        self.clear()
+        with self.parameterGraph.batch():
+            for master in masters:
+                spotKey, weights, fontPath = master[:3]
+                depth = master[3] if len(master) > 3 else None
+                spot = splitSpotKey(spotKey)
+                if weights is not None:
+                    matrixSpot = MatrixSpot(spot, graph=self.parameterGraph)
+                    matrixSpot.setWeights(weights)
+                    self.matrixSpots[spotKey] = matrixSpot
+                self.masters.append(MatrixMaster(spot, openFont(fontPath), self.normalizeDepth(depth)))
+        self.reallocateWeights()
+
+    def getAxesGrid(self):
+        return self.axesGrid['horizontal'], self.axesGrid['vertical']
+
+    def setAxesGrid(self, axesGrid):
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = axesGrid
+        self.axesGrid['horizontal'] = nCellsOnHorizontalAxis
+        self.axesGrid['vertical'] = nCellsOnVerticalAxis
+        self.masters = [master for master in self.masters if master.x < nCellsOnHorizontalAxis and master.y < nCellsOnVerticalAxis]
+
+    def setExtraAxes(self, extraAxes):
+        '''
+        Sets the axes beyond the grid as [(axisName, cellCount[, weights])], weights being one per position
+        ((index+1)*100 by default, as on the grid). Masters’ depths are adjusted, the slice goes back to the first positions.
+        '''
+        self.extraAxes = []
+        self.depthWeights = {}
+        for axis in extraAxes:
+            axisName, cellCount = axis[:2]
+            weights = axis[2] if len(axis) > 2 else None
+            if axisName in ['horizontal', 'vertical'] or axisName in self.extraAxes:
+                raise ValueError('duplicate axis: %s'%(axisName))
+            self.extraAxes.append(axisName)
+            self.axesGrid[axisName] = cellCount
+            self.depthWeights[axisName] = dict(enumerate(weights)) if weights else {}
+        for axisName in list(self.axesGrid.keys()):
+            if axisName not in ['horizontal', 'vertical'] and axisName not in self.extraAxes:
+                del self.axesGrid[axisName]
+        self.sliceDepth = self.normalizeDepth(None)
+        for master in self.masters:
+            master.setDepth(self.normalizeDepth(master.getDepth()))
+        self.placedMasters = []
+        self.glyphEntry = None
+
+    def normalizeDepth(self, depth):
+        '''
+        Depth as a tuple of one index per extra axis, depth being a tuple (padded with 0 or cut to fit),
+        a dict {axisName: index} or None (first positions).
+        '''
+        if depth is None:
+            depth = ()
+        if isinstance(depth, dict):
+            depth = [depth.get(axisName, 0) for axisName in self.extraAxes]
+        depth = tuple(depth)[:len(self.extraAxes)]
+        return depth + (0,) * (len(self.extraAxes) - len(depth))
+
+    def setSlice(self, depth):
+        '''
+        Sets the slice of the design space shown on the grid, depth as in normalizeDepth.
+        Raises ValueError for a position out of an axis.
+        '''
+        depth = self.normalizeDepth(depth)
+        for axisName, index in zip(self.extraAxes, depth):
+            if not 0 <= index < self.axesGrid[axisName]:
+                raise ValueError('no position %s on axis %s'%(index+1, axisName))
+        self.sliceDepth = depth
+
+    def getSlice(self):
+        return self.sliceDepth
+
+    def parseSlice(self, expression):
+        '''
+        Depth out of 'axisName=position, …' (positions counted from 1, as lines), for setSlice.
+        '''
+        depth = {}
+        for item in expression.split(','):
+            if not item.strip():
+                continue
+            try:
+                axisName, position = [value.strip() for value in item.split('=')]
+                position = int(position)
+            except ValueError:
+                raise ValueError('invalid slice: %s'%(item.strip()))
+            if axisName not in self.extraAxes:
+                raise ValueError('no axis named %s'%(axisName))
+            depth[axisName] = position - 1
+        return self.normalizeDepth(depth)
+
+    def getSliceName(self):
+        '''
+        Readable name of the current slice (e.g. 'opsz2'), '' without extra axes.
+        '''
+        return ' '.join(['%s%s'%(axisName, index+1) for axisName, index in zip(self.extraAxes, self.sliceDepth)])
+
+    def getInstanceName(self, spot):
+        '''
+        Name of the instance at spot (i, j) in the current slice, e.g. 'B3' or 'B3 opsz2'.
+        '''
+        i, j = spot
+        return ' '.join(name for name in ['%s%s'%(getKeyForValue(i).upper(), j+1), self.getSliceName()] if name)
+
+    def getDepthLocation(self, depth):
+        return dict((axisName, self.getAxisWeight(axisName, index)) for axisName, index in zip(self.extraAxes, depth))
+
+    def setAxisWeight(self, axisName, index, weight):
+        '''
+        Sets the weight of a position on an extra axis.
+        '''
+        self.depthWeights[axisName][index] = weight
+
+    def getAxisWeight(self, axisName, index):
+        '''
+        Weight of a column (horizontal) or line (vertical) of the matrix,
+        interpolated from the masters’ weights, (index+1)*100 when there are no masters to interpolate.
+        Positions on extra axes weigh what was set for them, (index+1)*100 by default.
+        '''
+        if axisName in self.depthWeights:
+            return self.depthWeights[axisName].get(index, (index+1)*100)
+        weights = self.axisWeights[axisName]
+        if index not in weights:
+            mutator = self.axisMutators[axisName]
+            if mutator is not None:
+                weights[index] = mutator.makeInstance(Location(**{axisName: index}))
+            else:
+                weights[index] = (index+1)*100
+        return weights[index]
+
+    def makeMatrixSpot(self, spot):
+        i, j = spot
+        if isinstance(i, str):
+            i = getValueForKey(i)
+        matrixSpot = MatrixSpot((i, j), graph=self.parameterGraph)
+        matrixSpot.setWeights((self.getAxisWeight('horizontal', i), self.getAxisWeight('vertical', j)))
+        return matrixSpot
+
+    def getMatrixSpot(self, spot):
+        i, j = spot
+        if isinstance(i, int):
+            i = getKeyForValue(i)
+        return self.matrixSpots['%s%s'%(i, j)]
+
+    def getSpotWeights(self, spot):
+        '''
+        {'horizontal', 'vertical'} weights of a spot. Spots that aren’t materialized (unshifted) are worked out
+        from the axis weight tables, without building them.
+        '''
+        i, j = spot
+        if isinstance(i, str):
+            i = getValueForKey(i)
+        matrixSpot = self.matrixSpots.get('%s%s'%(getKeyForValue(i), j))
+        if matrixSpot is not None:
+            return matrixSpot.getWeightsAsDict('horizontal', 'vertical')
+        return {
+            'horizontal': getSpotWeight(i, self.getAxisWeight('horizontal', i)),
+            'vertical': getSpotWeight(j, self.getAxisWeight('vertical', j))
+        }
+
+    def getSpots(self, origin=(0, 0), size=None):
+        '''
+        Spots (i, j) of a rectangular region of the matrix, the whole grid by default,
+        clipped to the grid.
+        '''
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.getAxesGrid()
+        oi, oj = origin
+        if size is None:
+            size = nCellsOnHorizontalAxis, nCellsOnVerticalAxis
+        w, h = size
+        return [(i, j) for i in range(max(0, oi), min(oi+w, nCellsOnHorizontalAxis)) for j in range(max(0, oj), min(oj+h, nCellsOnVerticalAxis))]
+
+    def releaseSpots(self, keepSpots=()):
+        '''
+        Drops materialized spots that are neither masters, shifted spots nor in keepSpots,
+        they will be rebuilt from the weight tables if requested again.
+        '''
+        keepSpotKeys = set('%s%s'%(getKeyForValue(i), j) for i, j in keepSpots)
+        keepSpotKeys.update(master.getSpotKey() for master in self.masters)
+        keepSpotKeys.update(self.shiftedSpotKeys)
+        for spotKey in list(self.matrixSpots.keys()):
+            if spotKey not in keepSpotKeys:
+                del self.matrixSpots[spotKey]
+
+    def shiftSpotWeights(self, spot, weights):
+        matrixSpot = self.getMatrixSpot(spot)
+        matrixSpot.shiftWeights(weights)
+        self.shiftedSpotKeys.add(matrixSpot.getSpotKey())
+
+    def getSliceMasters(self):
+        '''
+        Masters of the slice shown on the grid.
+        '''
+        return [master for master in self.masters if master.getDepth() == self.sliceDepth]
+
+    def getMasterSpots(self):
+        return [master.getRaw() for master in self.getSliceMasters()]
+
+    def addMaster(self, spot, font, depth=None):
+        '''
+        Places a master at spot, in the current slice unless a depth is given (see normalizeDepth).
+        '''
+        depth = self.sliceDepth if depth is None else self.normalizeDepth(depth)
+        self.removeMaster(spot, depth)
+        self.geometry = None
+        self.fontData = None
+        master = MatrixMaster(spot, font, depth)
+        self.masters.append(master)
+        return master
+
+    def removeMaster(self, spot, depth=None):
+        depth = self.sliceDepth if depth is None else self.normalizeDepth(depth)
+        for matrixMaster in self.masters:
+            if (spot == matrixMaster.get() or spot == matrixMaster.getRaw()) and matrixMaster.getDepth() == depth:
+                self.masters.remove(matrixMaster)
+                self.geometry = None
+                self.fontData = None
+                return matrixMaster
+
+    def clear(self):
+        self.masters = []
+        self.matrixSpots = {}
+        self.axisMutators = {'horizontal': None, 'vertical': None}
+        self.axisWeights = {'horizontal': {}, 'vertical': {}}
+        self.shiftedSpotKeys = set()
+        self.mutatorMasters = []
+        self.rawMasters = []
+        self.geometry = None
+        self.fontData = None
+        self.placedMasters = []
+        self.glyphEntry = None
+        self.instanceCache.clear()
+
+    def getSpotLocation(self, spot, depth=None):
+        '''
+        Location of a spot, in the current slice unless a depth is given.
+        '''
+        location = self.getSpotWeights(spot)
+        if self.extraAxes:
+            location.update(self.getDepthLocation(self.sliceDepth if depth is None else depth))
+        return Location(**location)
+
+    def getMasterLocation(self, matrixMaster):
+        return self.getSpotLocation(matrixMaster.get(), matrixMaster.getDepth())
+
+    def getMasterLocations(self):
+        masterLocations = []
+        for matrixMaster in self.masters:
+            l = self.getMasterLocation(matrixMaster)
+            masterLocations.append((l, matrixMaster.getFont()))
+        return masterLocations
+
+    def snapshot(self, packGeometry=True):
+        '''
+        Copy of the engine for background work: masters, weights and mutators are copied,
+        master glyphs (with everything instances keep of them) and kerning are packed (see masterGeometry), the masters’ info, groups, feature code
+        and glyph order copied (see FontData), so that fonts can keep being edited meanwhile.
+        To be taken on the main thread, background work then only reads the copies.
+        '''
+        engine = self.__class__(self.getAxesGrid(), [(axisName, self.axesGrid[axisName]) for axisName in self.extraAxes])
+        engine.depthWeights = dict((axisName, dict(weights)) for axisName, weights in self.depthWeights.items())
+        engine.sliceDepth = self.sliceDepth
+        engine.masters = [MatrixMaster(master.getRaw(), master.getFont(), master.getDepth()) for master in self.masters]
+        engine.axisMutators = dict(self.axisMutators)
+        engine.axisWeights = dict((axisName, dict(weights)) for axisName, weights in self.axisWeights.items())
+        engine.shiftedSpotKeys = set(self.shiftedSpotKeys)
+        for spotKey in engine.shiftedSpotKeys | set(master.getSpotKey() for master in self.masters):
+            matrixSpot = self.matrixSpots[spotKey]
+            engine.matrixSpots[spotKey] = MatrixSpot(matrixSpot.getRaw(), matrixSpot.getWeights(), graph=engine.parameterGraph)
+        if packGeometry and len(self.masters):
+            engine.setGeometry(MasterGeometry.fromFonts([master.getFont() for master in self.masters], shared=False))
+        engine.fontData = [FontData(master.getFont()) for master in self.masters]
+        return engine
+
+    def setGeometry(self, geometry):
+        '''
+        Uses packed master geometry (see masterGeometry, one packed font per master, in the same order)
+        instead of the master fonts for glyphs and kerning when generating instances.
+        '''
+        if geometry is not None and len(geometry) != len(self.masters):
+            raise ValueError('packed geometry doesn’t match the masters')
+        self.geometry = geometry
+
+    def getGlyphHashes(self):
+        '''
+        GlyphHashes tracking the glyphs of the masters’ fonts (see glyphHashes), created on first use.
+        '''
+        if self.glyphHashes is None:
+            self.glyphHashes = GlyphHashes()
+        self.glyphHashes.setMasters([master.getFont() for master in self.masters])
+        return self.glyphHashes
+
+    def getMasterGlyphSets(self):
+        '''
+        Returns [(location, glyphSet)], glyphSet being the packed geometry of a master if set, its font otherwise.
+        '''
+        masterLocations = self.getMasterLocations()
+        if self.geometry is None:
+            return masterLocations
+        return [(location, glyphSet) for (location, masterFont), glyphSet in zip(masterLocations, self.geometry)]
+
+    def getMasterFontData(self):
+        '''
+        Returns [(location, fontData)], fontData being the copy of a master’s info & groups in snapshots, its font otherwise.
+        '''
+        masterLocations = self.getMasterLocations()
+        if self.fontData is None:
+            return masterLocations
+        return [(location, fontData) for (location, masterFont), fontData in zip(masterLocations, self.fontData)]
+
+    def reallocateWeights(self, masterSpotKeys=None):
+        '''
+        Rebuilds the axis weight tables from the masters’ weights.
+        Only spots already materialized are updated, others will be built from the tables on request.
+        '''
+        matrixSpots = self.matrixSpots
+        masters = self.masters
+        self.axisWeights = {'horizontal': {}, 'vertical': {}}
+
+        if len(masters) <= 1:
+
+            self.axisMutators = {'horizontal': None, 'vertical': None}
+            self.matrixSpots = {}
+            self.shiftedSpotKeys = set()
+
+        elif len(masters) > 1:
+
+            if masterSpotKeys is None:
+                masterSpotKeys = [master.getSpotKey() for master in masters]
+            hMutatorMasters = []
+            vMutatorMasters = []
+            for master in masters:
+                masterSpotKey = master.getSpotKey()
+                mi, mj = master.getRaw()
+                mhl = Location(horizontal=mi)
+                mvl = Location(vertical=mj)
+                hWeight, vWeight = matrixSpots[masterSpotKey].getWeights()
+                hMutatorMasters.append((mhl, hWeight))
+                vMutatorMasters.append((mvl, vWeight))
+
+            hb, hm = buildMutator(hMutatorMasters)
+            vb, vm = buildMutator(vMutatorMasters)
+            self.axisMutators = {'horizontal': hm, 'vertical': vm}
+
+            # every spot’s weights are set, then each dependent weight is updated once
+            with self.parameterGraph.batch():
+                for spotKey, spot in matrixSpots.items():
+                    if spotKey not in masterSpotKeys:
+                        i, j = spot.getRaw()
+                        spot.setWeights((self.getAxisWeight('horizontal', i), self.getAxisWeight('vertical', j)))
+
+    def placeGlyphMasters(self, glyphName, availableFonts=None):
+        '''
+        Collects the current glyph in every master, returns {spotKey: (masterFont, previewGlyph)} for the current slice.
+        Masters whose font isn’t part of availableFonts anymore are dropped.
+        Masters of all slices are kept for interpolation, another slice only needs setSlice, getPlacedMasters & makeGlyphInstances.
+        '''
+        if availableFonts is not None:
+            self.masters = [matrixMaster for matrixMaster in self.masters if matrixMaster.getFont() in availableFonts]
+        entry = self.collectGlyphMasters(glyphName)
+        self.glyphEntry = entry
+        self.mutatorMasters = entry['mutatorMasters']
+        self.rawMasters = entry['rawMasters']
+        self.placedMasters = entry['placedMasters']
+        self.glyphMutators = entry['mutators']
+        self.instanceIssues = {}
+        return self.getPlacedMasters()
+
+    def getGlyphEntryKey(self, glyphName):
+        # preview masters depend on the masters and where they sit (master locations follow axis weights)
+        masters = tuple((id(matrixMaster), id(matrixMaster.getFont()), tuple(sorted(self.getMasterLocation(matrixMaster).items()))) for matrixMaster in self.masters)
+        return (glyphName, self.getAxesGrid(), masters)
+
+    def collectGlyphMasters(self, glyphName):
+        '''
+        Preview masters of a glyph, as an entry of the instance cache:
+        {'mutatorMasters', 'rawMasters', 'placedMasters', 'mutators', 'instances', …}.
+        Entries are reused for as long as the glyph and its components don’t change in any master.
+        '''
+        key = self.getGlyphEntryKey(glyphName)
+        glyphHashes = self.getGlyphHashes() if glyphName is not None else None
+        entry = self.instanceCache.get(key)
+        if entry is not None and not glyphHashes.changedSince(entry['token'], entry['glyphNames']):
+            return entry
+
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.getAxesGrid()
+        token = glyphHashes.getToken() if glyphHashes is not None else None
+        mutatorMasters = []
+        rawMasters = []
+        placedMasters = []
+        glyphNames = set([glyphName])
+
+        for matrixMaster in self.masters:
+            masterFont = matrixMaster.getFont()
+            i, j = matrixMaster.getRaw()
+            masterGlyph = None
+
+            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis:
+                if (glyphName is not None) and (glyphName in masterFont):
+                    l = self.getMasterLocation(matrixMaster)
+                    masterGlyph = makePreviewGlyph(masterFont[glyphName])
+                    if masterGlyph is not None:
+                        mutatorMasters.append((l, masterGlyph.toMathGlyph()))
+                        rawMasters.append(masterFont[glyphName])
+                        glyphNames.update(getBaseGlyphNames(masterFont, glyphName))
+                placedMasters.append((matrixMaster, masterFont, masterGlyph))
+
+        entry = {
+            'key': key,
+            'token': token,
+            'glyphNames': glyphNames,
+            'mutatorMasters': mutatorMasters,
+            'rawMasters': rawMasters,
+            'placedMasters': placedMasters,
+            'mutators': {},
+            # {(backend, tolerance, location): (instanceGlyph, issues)}
+            'instances': {}
+        }
+        if glyphName is not None:
+            self.instanceCache.put(key, entry, sum(estimateGlyphSize(glyph) for location, glyph in mutatorMasters))
+        return entry
+
+    def prefetchGlyph(self, glyphName, spots, detailSpots=()):
+        '''
+        Computes preview instances of glyphName at spots into the instance cache, leaving the current glyph as it is.
+        Returns True if anything was computed.
+        '''
+        if not self.masters:
+            return False
+        key = self.getGlyphEntryKey(glyphName)
+        cached = self.instanceCache.peek(key)
+        instanceCount = len(cached['instances']) if cached is not None else 0
+        entry = self.collectGlyphMasters(glyphName)
+        self._makeEntryInstances(entry, spots, detailSpots, {})
+        return entry is not cached or len(entry['instances']) > instanceCount
+
+    def getPlacedMasters(self):
+        '''
+        {spotKey: (masterFont, glyph)} for the masters of the current slice, out of the last placeGlyphMasters or placeTextMasters.
+        '''
+        return dict((matrixMaster.getSpotKey(), (masterFont, glyph)) for matrixMaster, masterFont, glyph in self.placedMasters if matrixMaster.getDepth() == self.sliceDepth)
+
+    def buildGlyphMutator(self, tolerance=None):
+        # mutators are kept with the glyph’s preview masters, moving through slices doesn’t rebuild them
+        if tolerance not in self.glyphMutators:
+            self.glyphMutators[tolerance] = self.buildPreviewMutator(self.mutatorMasters, self.rawMasters, tolerance)
+        return self.glyphMutators[tolerance]
+
+    def _buildEntryMutator(self, entry, tolerance=None):
+        mutators = entry['mutators']
+        if tolerance not in mutators:
+            mutators[tolerance] = self.buildPreviewMutator(entry['mutatorMasters'], entry['rawMasters'], tolerance)
+        return mutators[tolerance]
+
+    def setPreviewBackend(self, backend):
+        '''
+        Interpolates previews with MutatorMath ('mutatorMath') or weighted sums of compiled masters ('variations').
+        '''
+        if backend not in PREVIEW_BACKENDS:
+            raise ValueError('unknown preview backend: %s'%(backend))
+        if backend != self.previewBackend:
+            self.previewBackend = backend
+            self.glyphMutators = {}
+            self.textMutators = {}
+            # cached instances are kept by backend, mutators aren’t
+            for entry in self.instanceCache.items.values():
+                entry['mutators'].clear()
+            if self.glyphEntry is not None:
+                self.glyphMutators = self.glyphEntry['mutators']
+
+    def getVariationModel(self, locations):
+        '''
+        Master weights model of master locations (see glyphVariations), kept (with the scalars of every location it served) for as long as masters stay put.
+        None if the locations can’t make a model (e.g. two masters at the same location).
+        '''
+        try:
+            origin = getOrigin(locations)
+        except Exception:
+            return
+        # the origin is the masters’ bias, as in MutatorMath, whatever master comes first
+        key = (tuple(sorted(origin.items())), tuple(tuple(sorted(location.items())) for location in locations))
+        if key not in self.variationModels:
+            if len(self.variationModels) > 8:
+                self.variationModels = {}
+            try:
+                self.variationModels[key] = VariationPreviewModel(locations, origin)
+            except Exception:
+                self.variationModels[key] = None
+        return self.variationModels[key]
+
+    def buildPreviewMutator(self, mutatorMasters, rawMasters, tolerance=None):
+        model = None
+        if self.previewBackend == 'variations' and mutatorMasters:
+            model = self.getVariationModel([location for location, glyph in mutatorMasters])
+        return buildMasterMutator(mutatorMasters, rawMasters, tolerance, model, self.mutatorReport)
+
+    def setPreviewCellSize(self, cellSize):
+        '''
+        Size (width, height) in pixels of the cells previews are shown in, None if unknown.
+        '''
+        self.previewCellSize = cellSize
+
+    def getDetailTolerance(self):
+        '''
+        Tolerance (in preview units) of simplified master outlines for the current cell size, None for full detail.
+        Tolerances are one of a few levels, cell sizes being rounded up to a power of two,
+        so that mutators and instances kept by tolerance survive resizing the window.
+        '''
+        if self.previewCellSize is None:
+            return None
+        cellSize = min(self.previewCellSize)
+        if cellSize <= 0 or cellSize >= self.detailThreshold:
+            return None
+        level = 8
+        while level < cellSize:
+            level *= 2
+        # preview glyphs are drawn on a 1000 units em
+        return self.detailTolerance * 1000 / level
+
+    def makeGlyphInstances(self, spots=None, detailSpots=()):
+        '''
+        Returns {spotKey: instanceGlyph} for every spot that isn’t a master,
+        instanceGlyph being None where the masters couldn’t be interpolated.
+        Only the spots (i, j) listed in spots are computed if provided (e.g. a visible viewport).
+        In small cells, instances are interpolated from simplified masters, except for the spots in detailSpots.
+        Geometry issues of each instance (see glyphDiagnostics) are kept in instanceIssues {spotKey: issues}.
+        Instances computed before (or prefetched) for the same glyph, masters and locations are reused.
+        '''
+        if spots is None:
+            spots = self.getSpots()
+        entry = self.glyphEntry
+        if entry is None:
+            entry = {'mutatorMasters': self.mutatorMasters, 'rawMasters': self.rawMasters, 'mutators': self.glyphMutators, 'instances': {}}
+        return self._makeEntryInstances(entry, spots, detailSpots, self.instanceIssues)
+
+    def _makeEntryInstances(self, entry, spots, detailSpots, instanceIssues):
+        masterSpots = self.getMasterSpots()
+        instances = {}
+        mutatorMasters = entry['mutatorMasters']
+
+        if mutatorMasters:
+
+            tolerance = self.getDetailTolerance()
+            cachedInstances = entry['instances']
+            diagnostics = None
+            addedSize = 0
+
+            for i, j in spots:
+
+                if (i, j) not in masterSpots:
+                    ch = getKeyForValue(i)
+                    spotKey = '%s%s'%(ch, j)
+                    spotTolerance = None if (i, j) in detailSpots else tolerance
+                    location = self.getSpotLocation((ch, j))
+                    instanceKey = (self.previewBackend, spotTolerance, tuple(sorted(location.items())))
+                    if instanceKey not in cachedInstances:
+                        instanceGlyph = None
+                        issues = None
+                        spotMutator = self._buildEntryMutator(entry, spotTolerance)
+                        if spotMutator is not None:
+                            if diagnostics is None:
+                                diagnostics = GlyphDiagnostics([glyph for location, glyph in mutatorMasters])
+                            iGlyph = spotMutator.makeInstance(location)
+                            bounds, issues = diagnostics.check(iGlyph)
+                            instanceGlyph = RGlyph()
+                            instanceGlyph.fromMathGlyph(iGlyph)
+                            addedSize += estimateGlyphSize(iGlyph)
+                        cachedInstances[instanceKey] = (instanceGlyph, issues)
+                    instanceGlyph, issues = cachedInstances[instanceKey]
+                    if instanceGlyph is not None:
+                        instanceIssues[spotKey] = issues
+                    instances[spotKey] = instanceGlyph
+
+            if addedSize:
+                self.instanceCache.grow(entry.get('key'), addedSize)
+
+        return instances
+
+    def placeTextMasters(self, glyphNames, availableFonts=None):
+        '''
+        Collects a glyph run in every master, returns {spotKey: (masterFont, textGlyph)},
+        textGlyph being None if one of the glyphs is missing from a master.
+        Each distinct glyph of the run (and the base glyphs of its components) and the kerning of its pairs
+        are gathered once per master for makeTextInstances.
+        '''
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.getAxesGrid()
+        uniqueNames = []
+        for glyphName in glyphNames:
+            if glyphName not in uniqueNames:
+                uniqueNames.append(glyphName)
+        pairs = set(zip(glyphNames[:-1], glyphNames[1:]))
+        textMasters = dict((glyphName, ([], [])) for glyphName in uniqueNames)
+        kerningMasters = []
+        placedMasters = []
+        masterFonts = []
+
+        for matrixMaster in list(self.masters):
+            masterFont = matrixMaster.getFont()
+            i, j = matrixMaster.getRaw()
+            textGlyph = None
+
+            if (availableFonts is not None) and (masterFont not in availableFonts):
+                self.masters.remove(matrixMaster)
+                continue
+
+            if i < nCellsOnHorizontalAxis and j < nCellsOnVerticalAxis:
+                if len(glyphNames) and all(glyphName in masterFont for glyphName in uniqueNames):
+                    l = self.getMasterLocation(matrixMaster)
+                    scaleFactor = 1000.0 / masterFont.info.unitsPerEm
+                    masterGlyphs = {}
+                    for glyphName in uniqueNames:
+                        masterGlyph = makePreviewGlyph(masterFont[glyphName], False)
+                        masterGlyph.width = masterFont[glyphName].width * scaleFactor
+                        masterGlyphs[glyphName] = masterGlyph
+                        mutatorMasters, rawMasters = textMasters[glyphName]
+                        mutatorMasters.append((l, masterGlyph.toMathGlyph()))
+                        rawMasters.append(masterFont[glyphName])
+                    fontKerning = MathKerning(masterFont.kerning, masterFont.groups)
+                    kerning = dict((pair, fontKerning[pair] * scaleFactor) for pair in pairs)
+                    kerningMasters.append((l, MathKerning(kerning)))
+                    masterFonts.append((l, masterFont))
+                    textGlyph = composeTextGlyph([masterGlyphs[glyphName] for glyphName in glyphNames], kerning)
+                placedMasters.append((matrixMaster, masterFont, textGlyph))
+
+        self.textGlyphNames = list(glyphNames)
+        self.textMasters = textMasters
+        self.componentMasters = collectComponentMasters(uniqueNames, masterFonts)
+        self.kerningMasters = kerningMasters
+        self.placedMasters = placedMasters
+        self.glyphEntry = None
+        self.textMutators = {}
+        self.instanceIssues = {}
+        return self.getPlacedMasters()
+
+    def buildTextMutators(self, tolerance=None):
+        '''
+        Returns (instancer, kerningMutator) for the run set by placeTextMasters, kept until masters are placed again.
+        The instancer (see glyphComponents) interpolates composite glyphs out of shared base glyph instances.
+        '''
+        if tolerance not in self.textMutators:
+            instancer = ComponentInstancer(self.componentMasters, lambda mutatorMasters, rawMasters: self.buildPreviewMutator(mutatorMasters, rawMasters, tolerance))
+            try:
+                bias, kerningMutator = buildMutator(self.kerningMasters)
+            except:
+                kerningMutator = None
+            self.textMutators[tolerance] = instancer, kerningMutator
+        return self.textMutators[tolerance]
+
+    def makeTextInstances(self, spots=None):
+        '''
+        Returns {spotKey: textGlyph} for every spot that isn’t a master, out of the run set by placeTextMasters.
+        Mutators are built once per distinct glyph and shared by all spots, each spot’s location is computed once for the whole run,
+        and base glyphs of composites are interpolated once per spot whatever the number of glyphs using them.
+        textGlyph is None where no glyph of the run could be interpolated.
+        '''
+        if spots is None:
+            spots = self.getSpots()
+        masterSpots = self.getMasterSpots()
+        instances = {}
+
+        if not self.kerningMasters:
+            return instances
+
+        instancer, kerningMutator = self.buildTextMutators(self.getDetailTolerance())
+        diagnostics = {}
+        for glyphName, (mutatorMasters, rawMasters) in self.textMasters.items():
+            diagnostics[glyphName] = GlyphDiagnostics([glyph for location, glyph in mutatorMasters])
+
+        for i, j in spots:
+
+            if (i, j) not in masterSpots:
+                ch = getKeyForValue(i)
+                spotKey = '%s%s'%(ch, j)
+                location = self.getSpotLocation((ch, j))
+                glyphs = {}
+                issues = []
+                for glyphName in self.textMasters:
+                    glyph = None
+                    iGlyph = instancer.makeInstance(glyphName, location)
+                    if iGlyph is not None:
+                        bounds, glyphIssues = diagnostics[glyphName].check(iGlyph)
+                        issues += [issue for issue in glyphIssues if issue not in issues]
+                        glyph = RGlyph()
+                        glyph.fromMathGlyph(iGlyph)
+                        glyph.name = glyphName
+                    glyphs[glyphName] = glyph
+                self.instanceIssues[spotKey] = issues
+                kerning = None
+                if kerningMutator is not None:
+                    kerning = dict(kerningMutator.makeInstance(location).items())
+                textGlyph = None
+                if any(glyph is not None for glyph in glyphs.values()):
+                    textGlyph = composeTextGlyph([glyphs[glyphName] for glyphName in self.textGlyphNames], kerning)
+                instances[spotKey] = textGlyph
+
+        return instances
+
+    def makeContactSheet(self, glyphName, cellSize=(100, 100), origin=(0, 0), size=None, path=None, cache=None):
+        '''
+        Rasterizes masters and instances of glyphName for a region of the matrix (the whole grid by default)
+        into a single PNG, written to path if provided. Returns the PNG data.
+        '''
+        spots = self.getSpots(origin, size)
+        if not spots:
+            return
+        oi = min(i for i, j in spots)
+        oj = min(j for i, j in spots)
+        gridSize = (max(i for i, j in spots) - oi + 1, max(j for i, j in spots) - oj + 1)
+        cells = {}
+        colors = {}
+
+        placedMasters = self.placeGlyphMasters(glyphName)
+        instances = self.makeGlyphInstances(spots)
+        for spotKey, (masterFont, masterGlyph) in placedMasters.items():
+            ch, j = splitSpotKey(spotKey)
+            spot = (getValueForKey(ch) - oi, j - oj)
+            cells[spot] = masterGlyph
+            colors[spot] = (0.4, 0.1, 0.2, 1)
+        for spotKey, instanceGlyph in instances.items():
+            ch, j = splitSpotKey(spotKey)
+            if instanceGlyph is None:
+                instanceGlyph = errorGlyph()
+            cells[(getValueForKey(ch) - oi, j - oj)] = instanceGlyph
+
+        data = makeContactSheet(cells, gridSize, cellSize, cache=cache, colors=colors)
+        if path is not None:
+            with open(path, 'wb') as f:
+                f.write(data)
+        return data
+
+    def getSpotGrid(self):
+        nCellsOnHorizontalAxis, nCellsOnVerticalAxis = self.getAxesGrid()
+        spotWeights = {}
+        for spotKey in self.shiftedSpotKeys | set(master.getSpotKey() for master in self.masters):
+            matrixSpot = self.matrixSpots[spotKey]
+            spotWeights[matrixSpot.getRaw()] = matrixSpot.getWeights()
+        return SpotGrid(nCellsOnHorizontalAxis, nCellsOnVerticalAxis, self.getAxisWeight, spotWeights)
+
+    def selectSpots(self, expression, includeMasters=False):
+        '''
+        Returns the bitset of spots selected by a spot expression (see spotExpression),
+        masters are left out unless includeMasters is True.
+        Raises SpotExpressionError if the expression can’t be parsed.
+        '''
+        grid = self.getSpotGrid()
+        bits = compileSpotExpression(expression).evaluate(grid)
+        if not includeMasters:
+            bits &= ~spotsToBitset(self.getMasterSpots(), grid.columns)
+        return bits
+
+    def parseSpotsList(self, inputSpots):
+        if not inputSpots.strip():
+            return
+        bits = self.selectSpots(inputSpots)
+        return bitsetToSpots(bits, self.axesGrid['horizontal'])
+
+    def parseSpot(self, spotName):
+        try:
+            bits = self.selectSpots(spotName, includeMasters=True)
+        except SpotExpressionError:
+            return
+        spots = bitsetToSpots(bits, self.axesGrid['horizontal'])
+        if len(spots):
+            return spots
+
+    def generateInstanceFont(self, spot, generationInfos, path=None, progress=None):
+        '''
+        Interpolates a whole font at spot (i, j), saved to path if provided.
+        Returns the new font and a list of report lines.
+        progress(done, total) is called as glyphs are interpolated if provided.
+        Only the glyphs listed in generationInfos['glyphNames'] are interpolated if it’s provided (and not None).
+        With a generationInfos['subset'] (see glyphSubset), only the subset’s glyphs, the kerning between them
+        and their groups make it to the instance.
+        '''
+        return makeInstanceFont(self.interpolateInstance(spot, generationInfos, progress), path)
+
+    def interpolateInstance(self, spot, generationInfos, progress=None):
+        '''
+        Interpolates what generateInstanceFont puts in the instance at spot (i, j), without creating any font:
+        returns an InstanceData, made into a font by makeInstanceFont.
+        Only reads packed geometry and copies of the masters’ font data in snapshots (see snapshot),
+        and can then run in the background, the source font in generationInfos being a FontData.
+        '''
+        doGlyphs = bool(generationInfos['interpolateGlyphs'])
+        doKerning = bool(generationInfos['interpolateKerning'])
+        doFontInfos = bool(generationInfos['interpolateFontInfos'])
+        addGroups = bool(generationInfos['addGroups'])
+
+        baseFont = generationInfos['sourceFont'][0]
+        masterFontData = self.getMasterFontData()
+        masterGlyphSets = self.getMasterGlyphSets()
+
+        i, j = spot
+        ch = getKeyForValue(i)
+        instanceLocation = self.getSpotLocation((ch, j))
+        instanceName = self.getInstanceName(spot)
+
+        instance = InstanceData(baseFont.info.familyName, instanceName)
+        report = instance.report
+        report.append(u'\n*** Generating instance %s ***\n'%(instanceName))
+
+        subsetNames = None
+        if generationInfos.get('subset') is not None:
+            subsetNames = set(generationInfos['subset'].resolve([glyphSet for glyphLocation, glyphSet in masterGlyphSets]))
+            report.append(u'+ Subset of %s glyphs (components included)'%(len(subsetNames)))
+
+        if (doGlyphs == True) or (doKerning == True) or (doFontInfos == True) or (addGroups == True):
+
+            instance.created = True
+            try:
+                glyphOrder = baseFont.glyphOrder
+                if subsetNames is not None:
+                    glyphOrder = [glyphName for glyphName in glyphOrder if glyphName in subsetNames]
+                instance.glyphOrder = list(glyphOrder)
+            except:
+                try:
+                    instance.glyphOrder = list(baseFont.lib['public.glyphOrder'])
+                except:
+                    pass
+
+            report.append(u'+ Created new font')
+
+        # interpolate font infos
+
+        if doFontInfos == True:
+            infoMasters = [(infoLocation, fontData.info.toMathInfo()) for infoLocation, fontData in masterFontData]
+            try:
+                bias, iM = buildMutator(infoMasters)
+                instance.info = iM.makeInstance(instanceLocation).round()
+                report.append(u'+ Successfully interpolated font info')
+            except:
+                report.append(u'+ Couldn’t interpolate font info')
+
+        # interpolate kerning
+
+        if doKerning == True:
+            if subsetNames is not None:
+                kerningMasters = [(kerningLocation, MathKerning(subsetKerning(glyphSet.kerning, glyphSet.groups, subsetNames))) for kerningLocation, glyphSet in masterGlyphSets]
+            else:
+                kerningMasters = [(kerningLocation, MathKerning(glyphSet.kerning)) for kerningLocation, glyphSet in masterGlyphSets]
+            try:
+                bias, kM = buildMutator(kerningMasters)
+                instanceKerning = kM.makeInstance(instanceLocation)
+                instanceKerning.round()
+                instance.kerning = instanceKerning
+                report.append(u'+ Successfully interpolated kerning')
+                if addGroups == True:
+                    groups = baseFont.groups if subsetNames is None else subsetGroups(baseFont.groups, subsetNames)
+                    instance.groups = dict((key, list(value)) for key, value in groups.items())
+                    report.append(u'+ Successfully transferred groups')
+            except:
+                report.append(u'+ Couldn’t interpolate kerning')
+
+        # filter compatible glyphs
+
+        if doGlyphs == True:
+
+            glyphList, strayGlyphs = compareGlyphSets([glyphSet for glyphLocation, glyphSet in masterGlyphSets])
+            if generationInfos.get('glyphNames') is not None:
+                commonGlyphs = set(glyphList)
+                glyphList = [glyphName for glyphName in generationInfos['glyphNames'] if glyphName in commonGlyphs]
+            if subsetNames is not None:
+                glyphList = [glyphName for glyphName in glyphList if glyphName in subsetNames]
+            # glyphs are rounded and given unicodes as they’re written into the font, see makeInstanceFont
+            instance.glyphs = GlyphBatch()
+            glyphReport = interpolateGlyphSet(instanceLocation, glyphList, masterGlyphSets, instance.glyphs, progress=progress)
+
+            report.append(u'+ Successfully interpolated %s glyphs'%(len(instance.glyphs)))
+            report.append(u'+ Couldn’t interpolate %s glyphs'%(countIncompatibleGlyphs(glyphReport)))
+            questionableGlyphs = countQuestionableGlyphs(glyphReport)
+            if questionableGlyphs:
+                report.append(u'+ %s glyphs with questionable geometry'%(questionableGlyphs))
+            report += reportLines(glyphReport)
+
+        return instance
+
+    def getCompatibilityIndexPath(self):
+        if self.matrixPath is not None:
+            return getIndexPath(self.matrixPath)
+
+    def loadCompatibilityIndex(self):
+        '''
+        Reads the compatibility index saved next to the matrix file (if any),
+        its results seed the compatibility cache (they’re kept by glyph content).
+        '''
+        path = self.getCompatibilityIndexPath()
+        if path is None:
+            return
+        index = CompatibilityIndex.read(path)
+        if index is not None:
+            for pairKey, result in index.getPairResults():
+                self.compatibilityCache.setdefault(pairKey, result)
+            self.compatibilityIndex = index
+        return index
+
+    def buildCompatibilityIndex(self, reportStream=None, progressInterval=100, failFast=False):
+        '''
+        Checks every glyph common to all masters against the first master, without touching the masters,
+        returns a CompatibilityIndex (kept as compatibilityIndex and saved next to the matrix file if there’s one).
+        Records are written to reportStream as glyphs are checked (see compatibilityReport).
+        With failFast, the check stops at the first glyph that isn’t compatible with every master (as matrixBatch --fail-fast):
+        the index only has the glyphs checked, its stopped attribute is True and it replaces no previous index.
+        '''
+        start = time.time()
+        if self.compatibilityIndex is None:
+            self.loadCompatibilityIndex()
+        masterFonts = [master.getFont() for master in self.masters]
+        glyphList, strayGlyphs = compareGlyphSets(masterFonts)
+        glyphHashes = self.getGlyphHashes()
+        glyphHashes.refresh()
+        glyphList.sort()
+        index = CompatibilityIndex([fontName(font) for font in masterFonts], strayGlyphs)
+        refMasterFont = masterFonts[0]
+        if reportStream is not None:
+            reportStream.write({'type': 'start', 'matrix': self.matrixPath, 'masters': index.masters, 'glyphCount': len(glyphList)})
+
+        for checked, glyphName in enumerate(glyphList, 1):
+            hashes = [glyphHashes.getHash(glyphName, masterIndex) for masterIndex in range(len(masterFonts))]
+            failures = []
+            for masterIndex, masterFont in enumerate(masterFonts[1:], 1):
+                # results are kept by content, unchanged glyphs aren’t checked again in later reports
+                pairKey = (glyphName, hashes[0], hashes[masterIndex])
+                if pairKey not in self.compatibilityCache:
+                    try:
+                        compatible, report = refMasterFont[glyphName].isCompatible(masterFont[glyphName])
+                    except:
+                        report = [u'Compatibility check error']
+                        compatible = False
+                    self.compatibilityCache[pairKey] = (compatible, str(report))
+                compatible, report = self.compatibilityCache[pairKey]
+                if compatible == False:
+                    failures.append((masterIndex, report))
+            index.setEntry(glyphName, hashes, failures)
+            entry = index.getEntry(glyphName)
+            stop = failFast and entry['status'] != COMPATIBLE
+            if reportStream is not None:
+                if entry['status'] != COMPATIBLE:
+                    reportStream.write({'type': 'glyph', 'glyph': glyphName, 'status': entry['status'], 'reasons': entry['reasons'], 'pairs': entry['pairs']})
+                if checked % progressInterval == 0 or checked == len(glyphList) or stop:
+                    reportStream.write({'type': 'progress', 'checked': checked, 'glyphCount': len(glyphList)})
+            if stop:
+                break
+
+        index.stopped = len(index) < len(glyphList)
+        if reportStream is not None:
+            reportStream.write({'type': 'stray', 'glyphs': index.strayGlyphs})
+            reportStream.write({'type': 'summary', 'checked': len(index), 'counts': index.getCounts(), 'stray': len(index.strayGlyphs), 'stopped': index.stopped, 'seconds': round(time.time() - start, 3)})
+        index.inheritMarks(self.compatibilityIndex)
+        if index.stopped:
+            # a partial check doesn’t stand for the masters, the last complete index is kept
+            return index
+        self.compatibilityIndex = index
+        path = self.getCompatibilityIndexPath()
+        if path is not None:
+            try:
+                index.write(path)
+            except (IOError, OSError):
+                pass
+        return index
+
+    def generateCompatibilityReport(self, reportInfo):
+        '''
+        Checks every glyph common to all masters against the first master (see buildCompatibilityIndex),
+        returns a dict summing up compatible, incompatible and stray glyphs.
+        With markGlyphs, glyphs whose status changed since they were last marked get their mark color.
+        With a reportStream, records are streamed to it as glyphs are checked and no digest is put together.
+        With failFast, the check stops at the first glyph that isn’t compatible (see buildCompatibilityIndex), stopped tells whether it did.
+        '''
+        reportStream = reportInfo.get('reportStream')
+        index = self.buildCompatibilityIndex(reportStream, failFast=reportInfo.get('failFast', False))
+        masterFonts = [master.getFont() for master in self.masters]
+        digest = []
+        interpolationReports = set()
+
+        for glyphName in (index.getGlyphs() if reportStream is None else []):
+            for masterIndex, report in index.getFailures(glyphName):
+                names = '%s <X> %s'%(index.masters[0], index.masters[masterIndex])
+                reportID = (names, report)
+                if reportID not in interpolationReports:
+                    digest.append(names)
+                    digest += [u'– %s'%(reportLine) for reportLine in report.split('\n')]
+                    digest.append('\n')
+                    interpolationReports.add(reportID)
+
+        if reportInfo['markGlyphs']:
+            index.applyMarks(masterFonts, {
+                COMPATIBLE: reportInfo['compatibleColor'],
+                INCOMPATIBLE: reportInfo['incompatibleColor'],
+                MIXED: reportInfo['mixedColor']
+            })
+
+        return {
+            'glyphList': index.getGlyphs(),
+            'strayGlyphs': index.strayGlyphs,
+            'incompatibleGlyphs': len(index) - len(index.getGlyphs(COMPATIBLE)),
+            'digest': digest,
+            'stopped': index.stopped,
+            'index': index
+        }
@@ -0,0 +1,204 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Sharded generation: the instances of a run are split into units of work, one per spot and chunk of glyphs,
+in an order that only depends on the run (spots, glyphs, options), so that every shard works out the same plan
+on its own and picks its units (every shardCount-th one) without any shared service.
+
+Each unit is generated as a partial UFO in the shards folder (first chunks also carry font info, kerning and groups),
+and each shard writes a manifest of its units once done. Merging checks that every shard of the same plan is there
+and that no unit is missing, then assembles complete UFOs next to the shards folder:
+
+    units = planUnits(spots, glyphNames, chunkSize)
+    ownUnits = getShardUnits(units, shardIndex, shardCount)
+    …
+    writeManifest(shardFolder, manifest)
+    results = mergeShards(shardFolder)     # raises ShardError if shards or units are missing
+'''
+
+from fontTools.ufoLib.filenames import userNameToFileName
+from fontTools.misc import plistlib
+import hashlib
+import shutil
+import json
+import time
+import os
+import re
+
+SHARD_FOLDER = 'shards'
+MANIFEST_PATTERN = re.compile(r'shard-([0-9]+)-of-([0-9]+)\.json$')
+
+
+class ShardError(ValueError):
+
+    '''
+    Raised when shards can’t be merged: shards or units missing, or manifests of different runs.
+    '''
+
+    pass
+
+
+def getShardFolder(outputFolder):
+    return os.path.join(outputFolder, SHARD_FOLDER)
+
+def getManifestPath(shardFolder, shardIndex, shardCount):
+    return os.path.join(shardFolder, 'shard-%s-of-%s.json'%(shardIndex, shardCount))
+
+def getPartPath(shardFolder, instancePath, chunk):
+    '''
+    Partial UFO of a chunk of the instance saved at instancePath.
+    '''
+    name = os.path.splitext(os.path.basename(instancePath))[0]
+    return os.path.join(shardFolder, '%s.part%04d.ufo'%(name, chunk))
+
+def planUnits(spots, glyphNames=None, chunkSize=500):
+    '''
+    Units of work of a run generating spots [(i, j), …]: [{'index', 'spot', 'chunk', 'glyphNames'}],
+    one per spot and chunk of glyphNames (sorted), spots being taken in order.
+    With glyphNames None (glyphs aren’t interpolated), there’s a single unit per spot.
+    '''
+    if glyphNames is None:
+        chunks = [None]
+    else:
+        glyphNames = sorted(glyphNames)
+        chunkSize = max(1, chunkSize)
+        chunks = [glyphNames[k:k+chunkSize] for k in range(0, len(glyphNames), chunkSize)] or [[]]
+    units = []
+    for spot in sorted(set(tuple(spot) for spot in spots)):
+        for chunk, chunkGlyphNames in enumerate(chunks):
+            units.append({
+                'index': len(units),
+                'spot': spot,
+                'chunk': chunk,
+                'glyphNames': chunkGlyphNames
+            })
+    return units
+
+def getShardUnits(units, shardIndex, shardCount):
+    '''
+    Units of a shard: every shardCount-th unit, starting at shardIndex (0 based).
+    '''
+    if shardCount < 1 or not 0 <= shardIndex < shardCount:
+        raise ValueError('invalid shard %s of %s'%(shardIndex, shardCount))
+    return [unit for unit in units if unit['index'] % shardCount == shardIndex]
+
+def getPlanKey(units, settings):
+    '''
+    Fingerprint of a plan and the settings (generation options, shard count) it’s run with,
+    shards of the same run share it.
+    '''
+    plan = [[list(unit['spot']), unit['chunk'], unit['glyphNames']] for unit in units]
+    data = json.dumps({'units': plan, 'settings': settings}, sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def writeManifest(shardFolder, manifest):
+    '''
+    Saves a shard’s manifest, in one go so that a shard that didn’t finish leaves no manifest behind.
+    '''
+    path = getManifestPath(shardFolder, manifest['shardIndex'], manifest['shardCount'])
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporaryPath, path)
+    return path
+
+def readManifests(shardFolder):
+    manifests = []
+    if os.path.isdir(shardFolder):
+        for fileName in sorted(os.listdir(shardFolder)):
+            if MANIFEST_PATTERN.match(fileName):
+                with open(os.path.join(shardFolder, fileName)) as f:
+                    manifests.append(json.load(f))
+    return manifests
+
+def checkManifests(manifests):
+    '''
+    Units of a complete run out of shard manifests, sorted by index.
+    Raises ShardError if manifests belong to different runs, or if a shard or unit is missing.
+    '''
+    if not manifests:
+        raise ShardError('no shard manifest found')
+    plans = set((manifest['plan'], manifest['shardCount'], manifest['unitCount']) for manifest in manifests)
+    if len(plans) > 1:
+        raise ShardError('manifests of different runs: %s'%(', '.join(sorted(plan[0][:8] for plan in plans))))
+    plan, shardCount, unitCount = plans.pop()
+    missingShards = sorted(set(range(shardCount)) - set(manifest['shardIndex'] for manifest in manifests))
+    if missingShards:
+        raise ShardError('missing shard(s) %s of %s'%(', '.join(str(shardIndex) for shardIndex in missingShards), shardCount))
+    units = dict((unit['index'], unit) for manifest in manifests for unit in manifest['units'])
+    missingUnits = sorted(set(range(unitCount)) - set(units))
+    if missingUnits:
+        raise ShardError('missing unit(s) %s of %s'%(', '.join(str(index) for index in missingUnits), unitCount))
+    return [units[index] for index in range(unitCount)]
+
+def _readContents(glyphsFolder):
+    with open(os.path.join(glyphsFolder, 'contents.plist'), 'rb') as f:
+        return plistlib.load(f)
+
+def mergeGlyphFiles(partPath, path):
+    '''
+    Copies the glyph files of a partial UFO into the UFO at path (default layers), as they are.
+    Returns the number of glyphs in the UFO.
+    '''
+    partFolder = os.path.join(partPath, 'glyphs')
+    glyphsFolder = os.path.join(path, 'glyphs')
+    contents = _readContents(glyphsFolder)
+    fileNames = set(fileName.lower() for fileName in contents.values())
+    for glyphName, partFileName in _readContents(partFolder).items():
+        fileName = partFileName
+        if fileName.lower() in fileNames:
+            fileName = userNameToFileName(glyphName, fileNames, suffix='.glif')
+        fileNames.add(fileName.lower())
+        shutil.copyfile(os.path.join(partFolder, partFileName), os.path.join(glyphsFolder, fileName))
+        contents[glyphName] = fileName
+    with open(os.path.join(glyphsFolder, 'contents.plist'), 'wb') as f:
+        plistlib.dump(contents, f)
+    return len(contents)
+
+def mergeShards(shardFolder, callback=None):
+    '''
+    Assembles the instances of a sharded run out of the partial UFOs and manifests in shardFolder,
+    saved next to it (in the run’s output folder). Raises ShardError if the run isn’t complete (see checkManifests).
+    callback(result) is called as each instance is saved. Returns a result per instance, as matrixBatch.generateSpot does;
+    instances with a failed unit aren’t assembled.
+    '''
+    units = checkManifests(readManifests(shardFolder))
+    outputFolder = os.path.dirname(os.path.abspath(shardFolder))
+    instances = {}
+    for unit in units:
+        instances.setdefault(unit['target'], []).append(unit)
+
+    results = []
+    for target in sorted(instances):
+        start = time.time()
+        instanceUnits = sorted(instances[target], key=lambda unit: unit['chunk'])
+        path = os.path.join(outputFolder, target)
+        result = {
+            'spot': instanceUnits[0]['spot'],
+            'path': None,
+            'report': [u'\n*** Merging instance %s from %s part(s) ***\n'%(instanceUnits[0]['spot'], len(instanceUnits))],
+            'error': None
+        }
+        failedUnits = [unit for unit in instanceUnits if unit['error'] is not None]
+        if failedUnits:
+            result['error'] = 'part %s failed: %s'%(failedUnits[0]['chunk'], failedUnits[0]['error'])
+        else:
+            try:
+                # the first part carries font info, kerning & groups, other parts only add glyphs
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+                shutil.copytree(os.path.join(shardFolder, instanceUnits[0]['path']), path)
+                glyphCount = len(_readContents(os.path.join(path, 'glyphs')))
+                for unit in instanceUnits[1:]:
+                    glyphCount = mergeGlyphFiles(os.path.join(shardFolder, unit['path']), path)
+                result['path'] = path
+                result['report'].append(u'+ Merged %s glyphs'%(glyphCount))
+                result['report'].append(u'\n—> Saved font to UFO at %s\n'%(path))
+            except Exception as e:
+                result['error'] = '%s: %s'%(e.__class__.__name__, e)
+        result['seconds'] = round(time.time() - start, 3)
+        results.append(result)
+        if callback is not None:
+            callback(result)
+    return results
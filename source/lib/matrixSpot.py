@@ -1,22 +1,42 @@
 from __future__ import division
+import re
+
+spotKeyLetters = 'abcdefghijklmnopqrstuvwxyz'
+
+# spot keys are spreadsheet-like: a, b, … z, aa, ab, … az, ba, etc.
 
 def getValueForKey(ch):
-    try: return 'abcdefghijklmnopqrstuvwxyz'.index(ch)
+    try:
+        if not len(ch):
+            return
+        value = 0
+        for letter in ch:
+            value = (value * 26) + spotKeyLetters.index(letter) + 1
+        return value - 1
     except: return
 
 def getKeyForValue(i):
-    try: return 'abcdefghijklmnopqrstuvwxyz'[i]
+    try:
+        if i < 0:
+            return
+        key = ''
+        i += 1
+        while i > 0:
+            i, r = divmod(i-1, 26)
+            key = spotKeyLetters[r] + key
+        return key
     except: return
 
 def splitSpotKey(spotKey):
     try:
-        ch = spotKey[0]
-        j = int(spotKey[1:])
+        s = re.match('([a-z]+)([0-9]+)$', spotKey)
+        ch = s.group(1)
+        j = int(s.group(2))
         return ch, j
     except:
         return None
 
-from baseParameter import SingleValueParameter
+from baseParameter import SingleValueParameter, ParameterGraph, constrainValue, ratioToValue
 
 class baseMatrixSpot(object):
 
@@ -102,14 +122,23 @@ class baseMatrixSpot(object):
 
 class MatrixMaster(baseMatrixSpot):
 
-    def __init__(self, spot, font):
+    # depth: indices on the axes beyond the grid’s horizontal & vertical ones, if any
+
+    def __init__(self, spot, font, depth=()):
         super(MatrixMaster, self).__init__(spot)
         self.font = font
+        self.depth = tuple(depth)
         if (font is not None) and hasattr(font, 'path'):
             self.fontPath = font.path
 
     def __repr__(self):
-        return '<MatrixMaster %s.%s key:%s readable:%s' % (self.x, self.y, self.getSpotKey(), self.getReadableSpot())
+        return '<MatrixMaster %s.%s key:%s readable:%s depth:%s' % (self.x, self.y, self.getSpotKey(), self.getReadableSpot(), self.depth)
+
+    def getDepth(self):
+        return self.depth
+
+    def setDepth(self, depth):
+        self.depth = tuple(depth)
 
     def items(self):
         return self.spot, self.font
@@ -121,11 +150,34 @@ class MatrixMaster(baseMatrixSpot):
         return self.font
 
 
+def normalizeWeight(index, weight):
+    '''
+    (one, weight) of a spot at index (on one axis), one being the weight of a single step to it.
+    '''
+    base = index+1
+    one = weight / base
+    return one, one*base
+
+def getSpotWeight(index, weight):
+    '''
+    Weight an unshifted MatrixSpot at index (on one axis) gets out of an axis weight, worked out without building the spot:
+    the spot’s weight is constrained to its limits, and so is its offset weight following it (ratio 1, same limits).
+    '''
+    one, value = normalizeWeight(index, weight)
+    limits = (value-one, value+one)
+    spotWeight = constrainValue(value, limits, 'int')
+    return constrainValue(ratioToValue(spotWeight, 1), limits, 'int')
+
+
 class MatrixSpot(baseMatrixSpot):
 
-    def __init__(self, spot, weights=None, fontPath=None, familyName=None, styleName=None):
+    def __init__(self, spot, weights=None, fontPath=None, familyName=None, styleName=None, graph=None):
         super(MatrixSpot, self).__init__(spot)
         self.fontPath = fontPath
+        # spots of a matrix share a graph, so that weights of the whole grid can be changed in a single batch
+        if graph is None:
+            graph = ParameterGraph()
+        self.graph = graph
         if weights is None:
             self.xWeight = self._setWeight('x', self.x)
             self.yWeight = self._setWeight('y', self.y)
@@ -147,30 +199,29 @@ class MatrixSpot(baseMatrixSpot):
 
     def _setWeight(self, name, value):
         one, value = self._normalize(name, value)
-        weight = SingleValueParameter(name, value, limits=(value-one, value+one), numType='int')
+        weight = SingleValueParameter(name, value, limits=(value-one, value+one), numType='int', graph=self.graph)
         return weight
 
     def _normalize(self, name, value):
-        base = getattr(self, name)+1
-        one = value / base
-        value = one*base
-        return one, value
+        return normalizeWeight(getattr(self, name), value)
 
     def setWeights(self, weights):
-        for i, name in enumerate(['x', 'y']):
-            value = weights[i]
-            one, value = self._normalize(name, value)
-            weight = getattr(self, '%sWeight'%(name))
-            weight.setLimits((value-one, value+one))
-            weight.set(value)
+        with self.graph.batch():
+            for i, name in enumerate(['x', 'y']):
+                value = weights[i]
+                one, value = self._normalize(name, value)
+                weight = getattr(self, '%sWeight'%(name))
+                weight.setLimits((value-one, value+one))
+                weight.set(value)
 
     def getWeights(self):
         return self.xOffsetWeight.get(), self.yOffsetWeight.get()
 
     def shiftWeights(self, xyWeightShift):
         (xWeightShift, yWeightShift) = xyWeightShift
-        self.xOffsetWeight.set(xWeightShift)
-        self.yOffsetWeight.set(yWeightShift)
+        with self.graph.batch():
+            self.xOffsetWeight.set(xWeightShift)
+            self.yOffsetWeight.set(yWeightShift)
 
     def resetOffsetWeights(self):
         self.xOffsetWeight = SingleValueParameter('xOffset', self.xWeight.get(), limits=self.xWeight.limits, master=self.xWeight, mode='ratio', numType='int')
@@ -0,0 +1,291 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Spot selection expressions, compiled to bitsets over the matrix grid.
+
+Terms are separated by commas (or spaces), and combined as (union of terms) minus (union of ! terms):
+
+    *            every spot
+    B2           a single spot
+    A1:C3        a rectangle of spots
+    B, B:D       whole columns
+    2, 2-5       whole lines (2:5 works too)
+    …/2          a step, for any of the above: A1:E5/2, A:Z/3, */2
+    h>300        spots by weight (h or v, with <, <=, >, >=, =, !=)
+    B:D & 2-3    intersection of several selectors
+    !B2, !h<200  exclusion (an expression made of exclusions only starts from *)
+
+Bit k of a selection is spot (k % columns, k // columns).
+'''
+
+from matrixSpot import getValueForKey
+import re
+
+class SpotExpressionError(Exception):
+
+    def __init__(self, msg, expression):
+        self.msg = msg
+        self.expression = expression
+
+    def __str__(self):
+        return '%s in %r' % (self.msg, self.expression)
+
+_tokenPattern = re.compile(r'\s*(?:(?P<cell>[a-z]+[0-9]+)|(?P<column>[a-z]+)|(?P<number>[0-9]+(?:\.[0-9]+)?)|(?P<operator><=|>=|!=|==|<|>|=)|(?P<symbol>[*,:/&!\-]))')
+
+_operators = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '=': lambda a, b: a == b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+_predicateAxes = {'h': 'horizontal', 'horizontal': 'horizontal', 'v': 'vertical', 'vertical': 'vertical'}
+
+def tokenize(expression):
+    text = expression.lower().strip()
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _tokenPattern.match(text, position)
+        if match is None or match.end() == position:
+            raise SpotExpressionError('Unexpected character %r' % text[position:position+1], expression)
+        kind = match.lastgroup
+        if kind is None:
+            break
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class SpotGrid(object):
+
+    '''
+    Grid dimensions and weights an expression is evaluated against.
+    axisWeight(axisName, index) gives the weight of a column/line,
+    spotWeights maps (i, j) to (h, v) weights for spots that differ from their column/line weights.
+    '''
+
+    def __init__(self, columns, lines, axisWeight=None, spotWeights=None):
+        self.columns = columns
+        self.lines = lines
+        self.axisWeight = axisWeight
+        self.spotWeights = spotWeights or {}
+        self.size = columns * lines
+        self.all = (1 << self.size) - 1
+
+    def linesPattern(self, lines):
+        # one bit at the start of each selected line, multiplied by a row pattern to select rectangles
+        pattern = 0
+        columns = self.columns
+        for j in lines:
+            pattern |= 1 << (j * columns)
+        return pattern
+
+    def rectangle(self, columns, lines):
+        columns = [i for i in columns if 0 <= i < self.columns]
+        lines = [j for j in lines if 0 <= j < self.lines]
+        if not columns or not lines:
+            return 0
+        rowPattern = 0
+        for i in columns:
+            rowPattern |= 1 << i
+        return rowPattern * self.linesPattern(lines)
+
+    def weightOf(self, axisName, index):
+        if self.axisWeight is None:
+            return (index + 1) * 100
+        return int(round(self.axisWeight(axisName, index)))
+
+
+def _span(first, last, step):
+    if last < first:
+        first, last = last, first
+    return range(first, last + 1, step)
+
+def _spotFromCell(text):
+    s = re.match('([a-z]+)([0-9]+)$', text)
+    return getValueForKey(s.group(1)), int(s.group(2)) - 1
+
+
+class _Parser(object):
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset=0):
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind is not None and token[0] != kind) or (value is not None and token[1] != value):
+            raise SpotExpressionError('Expected %s' % (value or kind), self.expression)
+        self.position += 1
+        return token
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return token
+        return None
+
+    def parse(self):
+        includes = []
+        excludes = []
+        while self.peek()[0] is not None:
+            if self.accept('symbol', ','):
+                continue
+            exclude = self.accept('symbol', '!') is not None
+            selector = self.parseIntersection()
+            if exclude:
+                excludes.append(selector)
+            else:
+                includes.append(selector)
+        if not includes and excludes:
+            includes.append(lambda grid: grid.all)
+        return includes, excludes
+
+    def parseIntersection(self):
+        selectors = [self.parseSelector()]
+        while self.accept('symbol', '&'):
+            selectors.append(self.parseSelector())
+        if len(selectors) == 1:
+            return selectors[0]
+        def intersection(grid):
+            bits = grid.all
+            for selector in selectors:
+                bits &= selector(grid)
+            return bits
+        return intersection
+
+    def parseStep(self):
+        if self.accept('symbol', '/'):
+            step = int(float(self.take('number')[1]))
+            if step < 1:
+                raise SpotExpressionError('Steps must be positive', self.expression)
+            return step
+        return 1
+
+    def parseSelector(self):
+        kind, value = self.peek()
+
+        if kind == 'symbol' and value == '*':
+            self.take()
+            step = self.parseStep()
+            if step == 1:
+                return lambda grid: grid.all
+            return lambda grid: grid.rectangle(range(0, grid.columns, step), range(0, grid.lines, step))
+
+        if kind == 'column' and value in _predicateAxes and self.peek(1)[0] == 'operator':
+            self.take()
+            axisName = _predicateAxes[value]
+            compare = _operators[self.take('operator')[1]]
+            sign = -1 if self.accept('symbol', '-') else 1
+            reference = sign * float(self.take('number')[1])
+            return self._predicate(axisName, compare, reference)
+
+        if kind == 'cell':
+            self.take()
+            i0, j0 = i1, j1 = _spotFromCell(value)
+            if self.accept('symbol', ':'):
+                i1, j1 = _spotFromCell(self.take('cell')[1])
+            step = self.parseStep()
+            return lambda grid: grid.rectangle(_span(i0, i1, step), _span(j0, j1, step))
+
+        if kind == 'column':
+            self.take()
+            i0 = i1 = getValueForKey(value)
+            if self.accept('symbol', ':'):
+                i1 = getValueForKey(self.take('column')[1])
+            step = self.parseStep()
+            return lambda grid: grid.rectangle(_span(i0, i1, step), range(grid.lines))
+
+        if kind == 'number':
+            self.take()
+            j0 = j1 = int(float(value)) - 1
+            if self.accept('symbol', '-') or self.accept('symbol', ':'):
+                j1 = int(float(self.take('number')[1])) - 1
+            step = self.parseStep()
+            return lambda grid: grid.rectangle(range(grid.columns), _span(j0, j1, step))
+
+        raise SpotExpressionError('Unexpected %r' % (value,), self.expression)
+
+    def _predicate(self, axisName, compare, reference):
+        def predicate(grid):
+            if axisName == 'horizontal':
+                bits = grid.rectangle([i for i in range(grid.columns) if compare(grid.weightOf(axisName, i), reference)], range(grid.lines))
+            else:
+                bits = grid.rectangle(range(grid.columns), [j for j in range(grid.lines) if compare(grid.weightOf(axisName, j), reference)])
+            # spots with weights of their own
+            for (i, j), (h, v) in grid.spotWeights.items():
+                if 0 <= i < grid.columns and 0 <= j < grid.lines:
+                    weight = h if axisName == 'horizontal' else v
+                    bit = 1 << (j * grid.columns + i)
+                    if compare(weight, reference):
+                        bits |= bit
+                    else:
+                        bits &= ~bit
+            return bits
+        return predicate
+
+
+class SpotExpression(object):
+
+    '''
+    A compiled spot expression, evaluated to a bitset for a given grid.
+    '''
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.includes, self.excludes = _Parser(expression).parse()
+
+    def __repr__(self):
+        return '<SpotExpression %r>' % (self.expression)
+
+    def evaluate(self, grid):
+        bits = 0
+        for selector in self.includes:
+            bits |= selector(grid)
+        for selector in self.excludes:
+            bits &= ~selector(grid)
+        return bits & grid.all
+
+    def spots(self, grid):
+        return bitsetToSpots(self.evaluate(grid), grid.columns)
+
+
+_compiledExpressions = {}
+
+def compileSpotExpression(expression):
+    if expression not in _compiledExpressions:
+        if len(_compiledExpressions) > 256:
+            _compiledExpressions.clear()
+        _compiledExpressions[expression] = SpotExpression(expression)
+    return _compiledExpressions[expression]
+
+def spotsToBitset(spots, columns):
+    bits = 0
+    for i, j in spots:
+        bits |= 1 << (j * columns + i)
+    return bits
+
+def bitsetToSpots(bits, columns):
+    '''
+    Spots (i, j) of a bitset, column by column.
+    '''
+    spots = []
+    while bits:
+        lowest = bits & -bits
+        index = lowest.bit_length() - 1
+        spots.append((index % columns, index // columns))
+        bits ^= lowest
+    spots.sort()
+    return spots
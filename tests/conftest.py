@@ -0,0 +1,46 @@
+# coding=utf-8
+from __future__ import division
+
+'''
+Headless tests of the engine’s modules (requires fontParts, MutatorMath & fontTools), on synthetic masters.
+'''
+
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'source', 'lib'))
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+import pytest
+
+@pytest.fixture(scope='session')
+def masterPaths(tmp_path_factory):
+    from syntheticMasters import buildSyntheticMasters
+    folder = str(tmp_path_factory.mktemp('masters'))
+    return buildSyntheticMasters(folder, mastersCount=4, glyphCount=24, pointsPerGlyph=16, kerningPairs=40)
+
+@pytest.fixture
+def masterFonts(masterPaths):
+    from fontParts.world import OpenFont
+    return [OpenFont(path, showInterface=False) for path in masterPaths]
+
+@pytest.fixture
+def matrixPath(masterPaths, tmp_path):
+    '''
+    Matrix file of the first three masters, at A1, C1 and A3 of a 3×3 grid.
+    '''
+    from fontParts.world import OpenFont
+    from matrixEngine import writeMatrixFile
+    fonts = [OpenFont(path, showInterface=False) for path in masterPaths[:3]]
+    path = str(tmp_path / 'matrix.txt')
+    writeMatrixFile(path, buildEngine(fonts, [(0, 0), (2, 0), (0, 2)]), (0, 0, 1000, 400), None)
+    return path
+
+def buildEngine(fonts, spots, axesGrid=(3, 3)):
+    from matrixEngine import MatrixEngine
+    engine = MatrixEngine(axesGrid)
+    for spot, font in zip(spots, fonts):
+        engine.addMaster(spot, font)
+    engine.reallocateWeights()
+    return engine
@@ -0,0 +1,119 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from baseParameter import SingleValueParameter, ParameterGraph
+
+
+class RecordingParameter(SingleValueParameter):
+
+    def __init__(self, *args, **kwargs):
+        self.recomputed = kwargs.pop('recomputed')
+        super(RecordingParameter, self).__init__(*args, **kwargs)
+
+    def recompute(self):
+        self.recomputed.append(self.name)
+        super(RecordingParameter, self).recompute()
+
+@pytest.fixture
+def parameters():
+    '''
+    a ─┬─ b (ratio) ── d (offset)
+       └─ c (offset) ── e (ratio)
+    '''
+    recomputed = []
+    a = RecordingParameter('a', 100, limits=(0, 1000), recomputed=recomputed)
+    b = RecordingParameter('b', 50, master=a, mode='ratio', recomputed=recomputed)
+    c = RecordingParameter('c', 120, master=a, mode='offset', recomputed=recomputed)
+    d = RecordingParameter('d', 60, master=b, mode='offset', recomputed=recomputed)
+    e = RecordingParameter('e', 60, master=c, mode='ratio', recomputed=recomputed)
+    return dict(a=a, b=b, c=c, d=d, e=e), recomputed
+
+def test_propagation(parameters):
+    parameters, recomputed = parameters
+    a, b, c, d, e = [parameters[name] for name in 'abcde']
+    a.set(200)
+    assert sorted(recomputed) == ['b', 'c', 'd', 'e']
+    assert [b.get(), c.get(), d.get(), e.get()] == [100, 220, 110, 110]
+
+def test_joinedChangesPropagateOnce(parameters):
+    parameters, recomputed = parameters
+    a, b, c, d, e = [parameters[name] for name in 'abcde']
+    graph = a.graph
+    with graph.batch():
+        a.set(200)
+        b.set(80)
+        a.set(300)
+        # nothing propagates before the end of the batch
+        assert recomputed == []
+    # d depends on both changes, and is still recomputed once, after b
+    assert sorted(recomputed) == ['b', 'c', 'd', 'e']
+    assert recomputed.index('b') < recomputed.index('d')
+    assert recomputed.index('c') < recomputed.index('e')
+    assert [b.get(), c.get(), d.get(), e.get()] == [120, 320, 130, 160]
+    assert graph.pending == []
+
+def test_dependentsOrder(parameters):
+    parameters, recomputed = parameters
+    graph = parameters['a'].graph
+    # given deepest first, masters still come before their slaves
+    order = [parameter.name for parameter in graph.getDependents([parameters['b'], parameters['a']])]
+    assert sorted(order) == ['b', 'c', 'd', 'e']
+    assert order.index('b') < order.index('d') and order.index('c') < order.index('e')
+    assert [parameter.name for parameter in graph.getDependents([parameters['c']])] == ['e']
+    assert graph.getDependents([parameters['d']]) == []
+
+def test_nestedBatches(parameters):
+    parameters, recomputed = parameters
+    a, b = parameters['a'], parameters['b']
+    graph = a.graph
+    with graph.batch():
+        with graph.batch():
+            a.set(200)
+        assert graph.batchDepth == 1
+        assert recomputed == []
+        a.set(400)
+    assert graph.batchDepth == 0
+    assert sorted(recomputed) == ['b', 'c', 'd', 'e']
+    assert b.get() == 200
+
+def test_batchFlushesOnError(parameters):
+    parameters, recomputed = parameters
+    a = parameters['a']
+    with pytest.raises(RuntimeError):
+        with a.graph.batch():
+            a.set(200)
+            raise RuntimeError
+    assert a.graph.batchDepth == 0
+    assert parameters['b'].get() == 100
+
+def test_getAfterInvalidate(parameters):
+    parameters, recomputed = parameters
+    a, b, d = parameters['a'], parameters['b'], parameters['d']
+    assert d.get() == 60
+    # values are cached until invalidated
+    a.value = 300
+    assert a.get() == 100 and d.get() == 60
+    a.invalidate()
+    assert a._cachedValue is None and b._cachedValue is None and d._cachedValue is None
+    assert a.get() == 300
+    assert b.get() == 150 and d.get() == 160
+    assert recomputed == []
+
+def test_cachedValuesAreConstrained():
+    a = SingleValueParameter('a', 100, limits=(0, 1000), numType='int')
+    b = SingleValueParameter('b', 500, master=a, mode='ratio')
+    a.set(400)
+    assert b.get() == 1000
+    a.set(100)
+    # b took its constrained value when a changed
+    assert b.get() == 250
+
+def test_separateGraphs():
+    a = SingleValueParameter('a', 100)
+    b = SingleValueParameter('b', 100)
+    assert a.graph is not b.graph
+    graph = ParameterGraph()
+    a.setGraph(graph)
+    c = SingleValueParameter('c', 50, master=a, mode='offset')
+    assert c.graph is graph
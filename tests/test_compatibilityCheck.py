@@ -0,0 +1,57 @@
+# coding=utf-8
+from __future__ import division
+
+import io
+import json
+import os
+import pytest
+from fontParts.world import OpenFont
+from conftest import buildEngine
+from matrixEngine import writeMatrixFile
+from matrixBatch import checkCompatibility
+from compatibilityReport import ReportStream, JSONLinesWriter
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+
+@pytest.fixture
+def brokenMatrix(masterPaths, tmp_path):
+    '''
+    Matrix file of masters copies, three glyphs having a contour less in the second master.
+    Returns the matrix path and the broken glyphs, in glyph order.
+    '''
+    fonts = []
+    for path in masterPaths[:len(SPOTS)]:
+        copyPath = str(tmp_path / os.path.basename(path))
+        OpenFont(path, showInterface=False).save(copyPath)
+        fonts.append(OpenFont(copyPath, showInterface=False))
+    glyphNames = sorted(glyph.name for glyph in fonts[1] if len(glyph.contours))
+    brokenGlyphs = [glyphNames[2], glyphNames[5], glyphNames[9]]
+    for glyphName in brokenGlyphs:
+        fonts[1][glyphName].removeContour(0)
+    fonts[1].save()
+    matrixPath = str(tmp_path / 'matrix.txt')
+    writeMatrixFile(matrixPath, buildEngine(fonts, SPOTS), (0, 0, 1000, 400), None)
+    return matrixPath, brokenGlyphs
+
+def runCheck(matrixPath, workers, failFast):
+    stream = io.StringIO()
+    with ReportStream([JSONLinesWriter(stream)]) as reportStream:
+        checkedGlyphs, strayGlyphs, report = checkCompatibility(matrixPath, workers, reportStream=reportStream, failFast=failFast)
+    return checkedGlyphs, report, [json.loads(line) for line in stream.getvalue().splitlines()]
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_checkStreamsGlyphs(brokenMatrix, workers):
+    matrixPath, brokenGlyphs = brokenMatrix
+    checkedGlyphs, report, records = runCheck(matrixPath, workers, False)
+    assert sorted(report) == brokenGlyphs
+    assert [record['glyph'] for record in records if record['type'] == 'glyph'] == brokenGlyphs
+    assert records[0]['type'] == 'start' and records[-1]['type'] == 'summary'
+    assert records[-1]['checked'] == len(checkedGlyphs) and not records[-1]['stopped']
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_failFastStopsAtFirstIncompatibleGlyph(brokenMatrix, workers):
+    matrixPath, brokenGlyphs = brokenMatrix
+    checkedGlyphs, report, records = runCheck(matrixPath, workers, True)
+    assert checkedGlyphs[-1] == brokenGlyphs[0]
+    assert list(report) == brokenGlyphs[:1]
+    assert records[-1]['stopped'] and records[-1]['checked'] == len(checkedGlyphs)
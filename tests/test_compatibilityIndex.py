@@ -0,0 +1,149 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+from fontParts.world import OpenFont
+from conftest import buildEngine
+from matrixEngine import MatrixEngine, writeMatrixFile
+from compatibilityIndex import CompatibilityIndex, getIndexPath, COMPATIBLE, INCOMPATIBLE, MIXED
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+COLORS = {COMPATIBLE: (0, 1, 0, 1), MIXED: (1, .5, 0, 1), INCOMPATIBLE: (1, 0, 0, 1)}
+
+def makeIndex():
+    index = CompatibilityIndex(['A', 'B', 'C'], ['stray'])
+    index.setEntry('a', ['1', '2', '3'], [])
+    index.setEntry('b', ['4', '5', '6'], [(2, 'b report')])
+    index.setEntry('c', ['7', '8', '9'], [(1, 'c report 1'), (2, 'c report 2')])
+    return index
+
+def test_entries():
+    index = makeIndex()
+    assert [index.getStatus(glyphName) for glyphName in 'abc'] == [COMPATIBLE, MIXED, INCOMPATIBLE]
+    assert index.getStatus('stray') is None and 'stray' not in index
+    assert index.getGlyphs() == ['a', 'b', 'c']
+    assert index.getGlyphs(MIXED) == ['b']
+    assert index.getCounts() == {COMPATIBLE: 1, MIXED: 1, INCOMPATIBLE: 1}
+    assert index.getFailures('c') == [(1, 'c report 1'), (2, 'c report 2')]
+    assert [index.getMasterStatus('b', masterIndex) for masterIndex in range(3)] == [MIXED, MIXED, INCOMPATIBLE]
+    # entries set again keep their place
+    index.setEntry('a', ['1', '2', '0'], [(2, 'a report')])
+    assert index.getGlyphs() == ['a', 'b', 'c'] and index.getStatus('a') == MIXED
+    assert sorted(index.getPairResults()) == [
+        (('a', '1', '0'), (False, 'a report')), (('a', '1', '2'), (True, '')),
+        (('b', '4', '5'), (True, '')), (('b', '4', '6'), (False, 'b report')),
+        (('c', '7', '8'), (False, 'c report 1')), (('c', '7', '9'), (False, 'c report 2'))
+        ]
+
+def test_saveAndRead(tmp_path):
+    assert getIndexPath('/matrices/matrix.txt') == '/matrices/matrix.compatibility.json'
+    index = makeIndex()
+    path = index.write(str(tmp_path / 'index.json'))
+    readIndex = CompatibilityIndex.read(path)
+    assert readIndex.toDict() == index.toDict()
+    assert readIndex.masters == ['A', 'B', 'C'] and readIndex.strayGlyphs == ['stray']
+    assert CompatibilityIndex.read(str(tmp_path / 'missing.json')) is None
+    with open(path, 'w') as f:
+        f.write('{"glyphs": [{"status"')
+    assert CompatibilityIndex.read(path) is None
+
+def test_marksOnlyChanges(masterFonts):
+    fonts = masterFonts[:3]
+    index = CompatibilityIndex(['A', 'B', 'C'])
+    for glyph in fonts[0]:
+        index.setEntry(glyph.name, ['0', '0', '0'], [])
+    index.setEntry('base0001', ['0', '0', '1'], [(2, 'report')])
+    assert index.applyMarks(fonts, COLORS) == len(fonts[0])
+    assert [tuple(font['base0001'].markColor) for font in fonts] == [COLORS[MIXED], COLORS[MIXED], COLORS[INCOMPATIBLE]]
+    assert tuple(fonts[2]['base0002'].markColor) == COLORS[COMPATIBLE]
+    assert index.applyMarks(fonts, COLORS) == 0
+    # a new index of the same masters only marks what changed
+    newIndex = CompatibilityIndex(['A', 'B', 'C'])
+    for glyphName in index.getGlyphs():
+        newIndex.setEntry(glyphName, ['0', '0', '0'], [])
+    newIndex.inheritMarks(index)
+    assert newIndex.applyMarks(fonts, COLORS) == 1
+    assert tuple(fonts[2]['base0001'].markColor) == COLORS[COMPATIBLE]
+    # other colors, every glyph is marked again
+    colors = dict(COLORS, compatible=None)
+    assert newIndex.applyMarks(fonts, colors) == len(fonts[0])
+    assert fonts[1]['base0002'].markColor is None
+
+def test_engineIndex(masterPaths, tmp_path):
+    fonts = []
+    for path in masterPaths[:len(SPOTS)]:
+        copyPath = str(tmp_path / os.path.basename(path))
+        OpenFont(path, showInterface=False).save(copyPath)
+        fonts.append(OpenFont(copyPath, showInterface=False))
+    fonts[2]['base0003'].removeContour(0)
+    matrixPath = str(tmp_path / 'matrix.txt')
+    engine = buildEngine(fonts, SPOTS)
+    engine.matrixPath = matrixPath
+    index = engine.buildCompatibilityIndex()
+    assert index.getGlyphs(MIXED) == ['base0003']
+    assert index.getMasterStatus('base0003', 2) == INCOMPATIBLE
+    assert os.path.exists(getIndexPath(matrixPath))
+
+    # results of unchanged glyphs are kept by content
+    checkedPairs = len(engine.compatibilityCache)
+    fonts[1]['base0003'].removeContour(0)
+    index = engine.buildCompatibilityIndex()
+    assert index.getStatus('base0003') == INCOMPATIBLE
+    assert len(engine.compatibilityCache) == checkedPairs + 1
+
+    # and reused from the saved index
+    fonts[1].save()
+    fonts[2].save()
+    writeMatrixFile(matrixPath, engine, (0, 0, 1000, 400), None)
+    engine = MatrixEngine.fromMatrixFile(matrixPath)
+    assert engine.loadCompatibilityIndex().toDict() == index.toDict()
+    checkedPairs = len(engine.compatibilityCache)
+    assert engine.buildCompatibilityIndex().toDict() == index.toDict()
+    assert len(engine.compatibilityCache) == checkedPairs
+
+class RecordingStream(object):
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+def test_failFast(masterPaths, masterFonts, tmp_path):
+    stream = RecordingStream()
+    index = buildEngine(masterFonts, SPOTS).buildCompatibilityIndex(stream, failFast=True)
+    assert not index.stopped and len(index) == len(masterFonts[0])
+    assert stream.records[-1]['stopped'] is False
+
+    fonts = []
+    for path in masterPaths[:len(SPOTS)]:
+        copyPath = str(tmp_path / os.path.basename(path))
+        OpenFont(path, showInterface=False).save(copyPath)
+        fonts.append(OpenFont(copyPath, showInterface=False))
+    fonts[2]['base0003'].removeContour(0)
+    fonts[1]['base0010'].removeContour(0)
+    matrixPath = str(tmp_path / 'matrix.txt')
+    engine = buildEngine(fonts, SPOTS)
+    engine.matrixPath = matrixPath
+    fullIndex = engine.buildCompatibilityIndex()
+    assert not fullIndex.stopped
+    with open(getIndexPath(matrixPath)) as f:
+        saved = f.read()
+
+    stream = RecordingStream()
+    index = engine.buildCompatibilityIndex(stream, failFast=True)
+    assert index.stopped
+    assert index.getGlyphs() == ['base0000', 'base0001', 'base0002', 'base0003']
+    assert [record['glyph'] for record in stream.records if record['type'] == 'glyph'] == ['base0003']
+    assert [record for record in stream.records if record['type'] == 'progress'][-1] == {'type': 'progress', 'checked': 4, 'glyphCount': len(fullIndex)}
+    summary = stream.records[-1]
+    assert summary['type'] == 'summary' and summary['stopped'] is True and summary['checked'] == 4
+    # the partial index replaces neither the engine’s nor the saved one
+    assert engine.compatibilityIndex is fullIndex
+    with open(getIndexPath(matrixPath)) as f:
+        assert f.read() == saved
+
+    results = engine.generateCompatibilityReport({'markGlyphs': False, 'failFast': True})
+    assert results['stopped'] is True
+    assert results['glyphList'] == index.getGlyphs() and results['incompatibleGlyphs'] == 1
+    assert engine.generateCompatibilityReport({'markGlyphs': False})['stopped'] is False
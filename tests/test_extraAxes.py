@@ -0,0 +1,112 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from fontParts.world import NewFont
+from matrixEngine import MatrixEngine, readMatrixFile, writeMatrixFile
+from test_generation import getGenerationInfos
+
+# (spot, depth, width): the grid’s masters on the first opsz position, one more on the second
+MASTERS = [((0, 0), (0,), 500), ((2, 0), (0,), 600), ((0, 2), (0,), 700), ((0, 0), (1,), 800)]
+
+def makeFont(width):
+    font = NewFont(showInterface=False)
+    font.info.unitsPerEm = 1000
+    font.info.familyName = 'Sliced'
+    glyph = font.newGlyph('o')
+    glyph.width = width
+    pen = glyph.getPen()
+    pen.moveTo((0, 0))
+    pen.lineTo((width, 0))
+    pen.lineTo((width, 100))
+    pen.lineTo((0, 100))
+    pen.closePath()
+    return font
+
+def makeEngine(folder=None):
+    engine = MatrixEngine((3, 3), [('opsz', 2, [10, 30])])
+    for index, (spot, depth, width) in enumerate(MASTERS):
+        font = makeFont(width)
+        if folder is not None:
+            font.save(str(folder / ('master%s.ufo' % (index))))
+        engine.addMaster(spot, font, depth)
+    engine.reallocateWeights()
+    return engine
+
+@pytest.fixture
+def engine():
+    return makeEngine()
+
+def previewWidths(engine, spots):
+    widths = {}
+    for spotKey, glyph in engine.makeGlyphInstances(spots).items():
+        xMin, yMin, xMax, yMax = glyph.bounds
+        # previews are scaled down by .75
+        widths[spotKey] = (xMax - xMin) / .75
+    return widths
+
+def test_axes():
+    engine = MatrixEngine((3, 3), [('opsz', 3), ('wdth', 2, [75, 125])])
+    assert engine.extraAxes == ['opsz', 'wdth']
+    assert [engine.getAxisWeight('opsz', index) for index in range(3)] == [100, 200, 300]
+    assert [engine.getAxisWeight('wdth', index) for index in range(2)] == [75, 125]
+    assert engine.getSlice() == (0, 0)
+    assert engine.normalizeDepth((1,)) == (1, 0)
+    assert engine.normalizeDepth((1, 1, 1)) == (1, 1)
+    assert engine.normalizeDepth({'wdth': 1}) == (0, 1)
+    with pytest.raises(ValueError):
+        MatrixEngine((3, 3), [('opsz', 2), ('opsz', 3)])
+    with pytest.raises(ValueError):
+        MatrixEngine((3, 3), [('horizontal', 2)])
+    engine.setExtraAxes([])
+    assert engine.extraAxes == [] and sorted(engine.axesGrid.keys()) == ['horizontal', 'vertical']
+    assert engine.getSliceName() == '' and engine.getInstanceName((1, 2)) == 'B3'
+
+def test_slices(engine):
+    assert engine.parseSlice('opsz=2') == (1,)
+    assert engine.parseSlice('') == (0,)
+    for expression in ('opsz', 'opsz=x', 'wdth=1'):
+        with pytest.raises(ValueError):
+            engine.parseSlice(expression)
+    for depth in ((2,), (-1,)):
+        with pytest.raises(ValueError):
+            engine.setSlice(depth)
+    assert engine.getSpotLocation(('c', 0))['opsz'] == 10
+    engine.setSlice((1,))
+    assert engine.getSliceName() == 'opsz2'
+    assert engine.getInstanceName((2, 0)) == 'C1 opsz2'
+    assert engine.getSpotLocation(('c', 0))['opsz'] == 30
+    assert engine.getSpotLocation(('c', 0), (0,))['opsz'] == 10
+    assert [master.getRaw() for master in engine.getSliceMasters()] == [(0, 0)]
+
+def test_previewsOfEachSlice(engine):
+    assert sorted(engine.placeGlyphMasters('o').keys()) == ['a0', 'a2', 'c0']
+    assert previewWidths(engine, [(1, 0), (2, 2)]) == {'b0': 550, 'c2': 800}
+    entry = engine.glyphEntry
+    # another slice shows its own masters, from the same preview masters and mutators
+    engine.setSlice((1,))
+    assert sorted(engine.getPlacedMasters().keys()) == ['a0']
+    assert previewWidths(engine, [(0, 0), (2, 0), (2, 2)]) == {'c0': 900, 'c2': 1100}
+    assert engine.glyphEntry is entry
+
+def test_instancesOfEachSlice(engine):
+    sourceFont = engine.masters[0].getFont()
+    instance = engine.generateInstanceFont((2, 0), getGenerationInfos(sourceFont))[0]
+    assert instance['o'].width == 600
+    assert instance.info.styleName == 'C1 opsz1'
+    engine.setSlice((1,))
+    instance = engine.generateInstanceFont((2, 0), getGenerationInfos(sourceFont))[0]
+    assert instance['o'].width == 900
+    assert instance.info.styleName == 'C1 opsz2'
+
+def test_matrixFile(tmp_path):
+    engine = makeEngine(tmp_path)
+    path = str(tmp_path / 'matrix.txt')
+    writeMatrixFile(path, engine, (0, 0, 1000, 400), 'o')
+    matrixInfo = readMatrixFile(path)
+    assert matrixInfo['extraAxes'] == [('opsz', 2, [10, 30])]
+    assert [(spotKey, depth) for spotKey, weights, fontPath, depth in matrixInfo['masters']] == [('a0', (0,)), ('c0', (0,)), ('a2', (0,)), ('a0', (1,))]
+    loaded = MatrixEngine.fromMatrixFile(path)
+    loaded.setSlice(loaded.parseSlice('opsz=2'))
+    instance = loaded.generateInstanceFont((2, 0), getGenerationInfos(loaded.masters[0].getFont()))[0]
+    assert instance['o'].width == 900
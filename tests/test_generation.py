@@ -0,0 +1,110 @@
+# coding=utf-8
+from __future__ import division
+
+from fontParts.world import NewFont
+from conftest import buildEngine
+from masterGeometry import FontData
+from matrixEngine import makeInstanceFont, interpolateGlyphSet
+from glyphWriter import GlyphBatch
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+
+def getGenerationInfos(sourceFont):
+    return {
+        'sourceFont': [sourceFont],
+        'interpolateGlyphs': True,
+        'interpolateKerning': True,
+        'interpolateFontInfos': True,
+        'addGroups': True,
+        'openFonts': False,
+        'report': True
+    }
+
+def fontContent(font):
+    glyphs = dict((glyph.name, (glyph.width, tuple(glyph.unicodes), tuple((tuple(point.position) for contour in glyph for point in contour.points)))) for glyph in font)
+    return font.info.familyName, font.info.styleName, font.info.ascender, list(font.glyphOrder), dict(font.kerning.items()), dict(font.groups.items()), glyphs
+
+def test_snapshotInstanceMatchesLiveFonts(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS)
+    expected = fontContent(engine.generateInstanceFont((1, 1), getGenerationInfos(masterFonts[0]))[0])
+    snapshot = engine.snapshot()
+    instance = snapshot.interpolateInstance((1, 1), getGenerationInfos(FontData(masterFonts[0])))
+    assert fontContent(makeInstanceFont(instance)[0]) == expected
+
+def test_snapshotIgnoresLaterEdits(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS)
+    snapshot = engine.snapshot()
+    sourceFont = FontData(masterFonts[0])
+    expected = fontContent(makeInstanceFont(snapshot.interpolateInstance((1, 1), getGenerationInfos(sourceFont)))[0])
+    # masters edited while the background job runs
+    for font in masterFonts:
+        font.info.familyName = 'Edited'
+        font.info.ascender += 100
+        font.glyphOrder = list(reversed(font.glyphOrder))
+        font.groups.clear()
+        for glyph in font:
+            glyph.width += 10
+    instance = snapshot.interpolateInstance((1, 1), getGenerationInfos(sourceFont))
+    assert instance.glyphs is not None and len(instance.glyphs)
+    assert fontContent(makeInstanceFont(instance)[0]) == expected
+
+def glyphData(glyph):
+    points = tuple((point.name, point.identifier) for contour in glyph for point in contour.points)
+    guidelines = tuple((guideline.position, guideline.angle, guideline.name, guideline.color, guideline.identifier) for guideline in glyph.guidelines)
+    anchors = tuple((anchor.name, anchor.position, anchor.color, anchor.identifier) for anchor in glyph.anchors)
+    return glyph.height, dict(glyph.lib), glyph.note, guidelines, anchors, points, tuple(contour.identifier for contour in glyph)
+
+def addGlyphData(fonts, glyphName):
+    for font in fonts:
+        glyph = font[glyphName]
+        glyph.height = 705
+        glyph.lib['x'] = 1
+        glyph.note = 'n'
+        glyph.appendGuideline((10, 20), 30, name='guide', color=(1, 0, 0, 1))
+        glyph.appendAnchor('top', (5, 5), color=(0, 1, 0, 1))
+        naked = glyph.naked()
+        if len(naked):
+            naked[0].identifier = 'contour0'
+            naked[0][0].name = 'start'
+            naked[0][0].identifier = 'point0'
+        for k, component in enumerate(naked.components):
+            component.identifier = 'component%s' % (k)
+
+def test_snapshotKeepsGlyphData(masterFonts):
+    addGlyphData(masterFonts, 'base0000')
+    engine = buildEngine(masterFonts, SPOTS)
+    expected = engine.generateInstanceFont((1, 1), getGenerationInfos(masterFonts[0]))[0]['base0000']
+    instance = engine.snapshot().generateInstanceFont((1, 1), getGenerationInfos(masterFonts[0]))[0]['base0000']
+    data = glyphData(instance)
+    assert data == glyphData(expected)
+    assert data[:3] == (705, {'x': 1}, 'n')
+    assert data[5][0] == ('start', 'point0') and data[6][0] == 'contour0'
+
+def glyphContent(glyph):
+    components = tuple((component.baseGlyph, component.transformation, component.identifier) for component in glyph.components)
+    return glyph.width, tuple(glyph.unicodes), tuple((point.type, tuple(point.position)) for contour in glyph for point in contour.points), components, glyphData(glyph)
+
+def test_windowGenerationMatchesLiveFonts(masterFonts):
+    # instances and glyph sets generated from the window run on a snapshot, with packed geometry
+    addGlyphData(masterFonts, 'base0000')
+    addGlyphData(masterFonts, 'comp0001')
+    engine = buildEngine(masterFonts, SPOTS)
+    expected = engine.generateInstanceFont((1, 1), getGenerationInfos(masterFonts[0]))[0]
+    snapshot = engine.snapshot()
+    assert snapshot.geometry is not None
+    instance = makeInstanceFont(snapshot.interpolateInstance((1, 1), getGenerationInfos(FontData(masterFonts[0]))))[0]
+    assert sorted(instance.keys()) == sorted(expected.keys())
+    for glyph in expected:
+        assert glyphContent(instance[glyph.name]) == glyphContent(glyph)
+
+    glyphList = ['base0000', 'comp0001', 'base0005']
+    location = engine.getSpotLocation(('b', 1))
+    glyphSets = []
+    for masterGlyphSets in (engine.getMasterGlyphSets(), snapshot.getMasterGlyphSets()):
+        batch = GlyphBatch()
+        interpolateGlyphSet(location, glyphList, masterGlyphSets, batch, '.alt')
+        font = NewFont(showInterface=False)
+        batch.writeTo(font)
+        glyphSets.append(dict((glyph.name, glyphContent(glyph)) for glyph in font))
+    assert len(glyphSets[0]) == len(glyphList)
+    assert glyphSets[0] == glyphSets[1]
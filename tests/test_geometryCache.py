@@ -0,0 +1,128 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import shutil
+import pytest
+from fontParts.world import OpenFont
+from conftest import buildEngine
+from geometryCache import GeometryCache
+from masterGeometry import MAGIC
+from test_generation import getGenerationInfos, glyphData
+
+@pytest.fixture
+def ufoPaths(masterPaths, tmp_path):
+    '''
+    Copies of the first three masters, to be edited.
+    '''
+    paths = []
+    for path in masterPaths[:3]:
+        copyPath = str(tmp_path / os.path.basename(path))
+        shutil.copytree(path, copyPath)
+        paths.append(copyPath)
+    return paths
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeometryCache(str(tmp_path / 'cache'))
+
+def getGlifPath(ufoPath, glyphName):
+    from fontTools.ufoLib import UFOReader
+    glyphSet = UFOReader(ufoPath, validate=False).getGlyphSet()
+    return os.path.join(ufoPath, 'glyphs', glyphSet.contents[glyphName])
+
+def editGlif(ufoPath, glyphName, width):
+    path = getGlifPath(ufoPath, glyphName)
+    with open(path) as f:
+        text = f.read()
+    start = text.index('<advance width="')
+    end = text.index('"', start + len('<advance width="'))
+    with open(path, 'w') as f:
+        f.write(text[:start] + '<advance width="%s' % (width) + text[end:])
+    # mtimes can be too coarse to tell two quick writes apart
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+def readWidth(cache, ufoPath, glyphName):
+    geometry, fileMap = cache.getFontGeometry(ufoPath)
+    width = geometry[glyphName].width
+    geometry.release()
+    fileMap.close()
+    return width
+
+def test_stamps(cache, ufoPaths):
+    geometry, fileMap = cache.getFontGeometry(ufoPaths[0])
+    stamps = geometry.stamps
+    glifStat = os.stat(getGlifPath(ufoPaths[0], 'base0000'))
+    assert stamps['glyphs']['base0000'] == [glifStat.st_mtime_ns, glifStat.st_size]
+    assert stamps['groups'] is not None and stamps['kerning'] is not None
+    assert len(stamps['glyphs']) == len(geometry)
+    geometry.release()
+    fileMap.close()
+    assert cache.stats == {'hits': 0, 'updates': 1, 'parsedGlyphs': len(stamps['glyphs'])}
+    # nothing changed on disk
+    readWidth(cache, ufoPaths[0], 'base0000')
+    assert cache.stats['hits'] == 1 and cache.stats['updates'] == 1
+
+def test_onlyEditedGlyphsAreParsed(cache, ufoPaths):
+    width = readWidth(cache, ufoPaths[0], 'base0001')
+    parsedGlyphs = cache.stats['parsedGlyphs']
+    editGlif(ufoPaths[0], 'base0000', 321)
+    assert readWidth(cache, ufoPaths[0], 'base0000') == 321
+    assert cache.stats['updates'] == 2
+    assert cache.stats['parsedGlyphs'] == parsedGlyphs + 1
+    # unchanged glyphs are copied over from the previous file
+    assert readWidth(cache, ufoPaths[0], 'base0001') == width
+    assert cache.stats['hits'] == 1
+
+def test_invalidFileIsReplaced(cache, ufoPaths):
+    os.makedirs(cache.folder)
+    cachePath = cache.getCachePath(ufoPaths[0])
+    for data in (b'', b'not a cache file', MAGIC + b'\xff' * 16):
+        with open(cachePath, 'wb') as f:
+            f.write(data)
+        assert readWidth(cache, ufoPaths[0], 'base0000') == OpenFont(ufoPaths[0], showInterface=False)['base0000'].width
+        with open(cachePath, 'rb') as f:
+            assert f.read(len(MAGIC)) == MAGIC
+    assert cache.stats['updates'] == 3
+
+def test_foreignFileIsReplaced(cache, ufoPaths):
+    # file of another UFO (same stamps for copied glyphs) at the UFO’s cache path
+    readWidth(cache, ufoPaths[1], 'base0000')
+    shutil.copy(cache.getCachePath(ufoPaths[1]), cache.getCachePath(ufoPaths[0]))
+    parsedGlyphs = cache.stats['parsedGlyphs']
+    geometry, fileMap = cache.getFontGeometry(ufoPaths[0])
+    font = OpenFont(ufoPaths[0], showInterface=False)
+    assert geometry.path == os.path.abspath(ufoPaths[0])
+    assert geometry['base0000'].width == font['base0000'].width
+    assert cache.stats['parsedGlyphs'] == parsedGlyphs + len(font)
+    geometry.release()
+    fileMap.close()
+
+def test_uncachedMasters(cache, ufoPaths, tmp_path):
+    assert cache.getMasterGeometry([ufoPaths[0], None]) is None
+    assert cache.getMasterGeometry([ufoPaths[0], str(tmp_path / 'missing.ufo')]) is None
+    assert cache.updatePaths([ufoPaths[0], None]) == [cache.getCachePath(ufoPaths[0]), None]
+    geometry = cache.getMasterGeometry(ufoPaths)
+    assert len(geometry) == 3
+    geometry.close()
+
+def test_cachedInstanceMatchesLiveFonts(cache, ufoPaths):
+    fonts = [OpenFont(path, showInterface=False) for path in ufoPaths]
+    for font in fonts:
+        glyph = font['base0000']
+        glyph.height = 705
+        glyph.lib['x'] = 1
+        glyph.note = 'n'
+        glyph.appendGuideline((10, 20), 30, name='guide', color=(1, 0, 0, 1))
+        glyph.appendAnchor('top', (5, 5), color=(0, 1, 0, 1))
+        glyph.naked()[0][0].name = 'start'
+        font.save()
+    engine = buildEngine(fonts, [(0, 0), (2, 0), (0, 2)])
+    expected = engine.generateInstanceFont((1, 1), getGenerationInfos(fonts[0]))[0]
+    engine.setGeometry(cache.getMasterGeometry(ufoPaths))
+    instance = engine.generateInstanceFont((1, 1), getGenerationInfos(fonts[0]))[0]
+    for glyphName in ('base0000', 'comp0000'):
+        assert glyphData(instance[glyphName]) == glyphData(expected[glyphName])
+    assert glyphData(instance['base0000'])[:3] == (705, {'x': 1}, 'n')
+    engine.geometry.close()
@@ -0,0 +1,137 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from fontParts.world import NewFont
+from mutatorMath.objects.location import Location
+from mutatorMath.objects.mutator import buildMutator
+from fontMath.mathGlyph import MathGlyph
+from fontTools.pens.recordingPen import DecomposingRecordingPointPen
+from glyphComponents import ComponentInstancer, collectComponentMasters, scaleMathGlyph, transformContours, MAX_DEPTH
+from matrixEngine import buildMasterMutator
+
+def drawRectangle(glyph, xMin, yMin, xMax, yMax):
+    pen = glyph.getPen()
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMax, yMin))
+    pen.lineTo((xMax, yMax))
+    pen.lineTo((xMin, yMax))
+    pen.closePath()
+
+def makeMasters():
+    '''
+    Two masters on a 2000 units em: an 'eacute' made of an 'e' and a scaled 'acute' (itself a component of 'dot')
+    with a contour of its own, and a glyph made of one that doesn’t exist.
+    '''
+    masters = []
+    for weight, grow in ((0, 0), (1, 100)):
+        font = NewFont(showInterface=False)
+        font.info.unitsPerEm = 2000
+        drawRectangle(font.newGlyph('dot'), 0, 0, 40 + grow, 40)
+        font.newGlyph('acute').appendComponent('dot', (200, 1000))
+        drawRectangle(font.newGlyph('e'), 0, 0, 800 + grow, 1000)
+        eacute = font.newGlyph('eacute')
+        eacute.appendComponent('e')
+        eacute.appendComponent('acute', (300 + grow, 0), (1.5, 1.5))
+        drawRectangle(eacute, 0, -200, 100, -100 + grow)
+        font.newGlyph('broken').appendComponent('missing')
+        masters.append((Location(weight=weight), font))
+    return masters
+
+def getContours(glyph):
+    return sorted(tuple((round(x, 6), round(y, 6)) for segmentType, (x, y), smooth, name, identifier in contour['points']) for contour in glyph.contours)
+
+def decomposedInstance(masters, glyphName, location):
+    # reference: masters decomposed first, then interpolated
+    mutatorMasters = []
+    for masterLocation, font in masters:
+        pen = DecomposingRecordingPointPen(font)
+        font[glyphName].drawPoints(pen)
+        glyph = NewFont(showInterface=False).newGlyph(glyphName)
+        glyph.width = font[glyphName].width
+        pen.replay(glyph.getPointPen())
+        mutatorMasters.append((masterLocation, scaleMathGlyph(glyph.toMathGlyph(), .5)))
+    bias, mutator = buildMutator(mutatorMasters)
+    return mutator.makeInstance(location)
+
+@pytest.fixture
+def masters():
+    return makeMasters()
+
+def test_collectComponentMasters(masters):
+    masterGlyphs = collectComponentMasters(['eacute', 'broken'], masters)
+    assert sorted(masterGlyphs.keys()) == ['acute', 'broken', 'dot', 'e', 'eacute']
+    mutatorMasters, rawMasters = masterGlyphs['acute']
+    assert [glyph.name for glyph in rawMasters] == ['acute', 'acute']
+    # scaled to a 1000 units em, component offsets but not their scale
+    assert mutatorMasters[1][1].components[0]['transformation'] == (1, 0, 0, 1, 100, 500)
+    assert collectComponentMasters(['eacute'], masters)['eacute'][0][1][1].components[1]['transformation'] == (1.5, 0, 0, 1.5, 200, 0)
+
+@pytest.mark.parametrize('weight', [0, .25, 1, 1.5])
+def test_instancesMatchDecomposedGlyphs(masters, weight):
+    location = Location(weight=weight)
+    instancer = ComponentInstancer(collectComponentMasters(['eacute'], masters), buildMasterMutator)
+    instance = instancer.makeInstance('eacute', location)
+    expected = decomposedInstance(masters, 'eacute', location)
+    assert instance.components == []
+    assert len(instance.contours) == 3
+    assert getContours(instance) == getContours(expected)
+    assert instance.width == expected.width
+    # base glyphs first, then the glyph’s own contours
+    assert instance.contours[-1]['points'][0][1] == (0, -100)
+
+def test_baseGlyphsAreShared(masters):
+    built = []
+    def countingMutator(mutatorMasters, rawMasters):
+        built.append(rawMasters[0].name)
+        return buildMasterMutator(mutatorMasters, rawMasters)
+    instancer = ComponentInstancer(collectComponentMasters(['eacute', 'acute'], masters), countingMutator)
+    location = Location(weight=.5)
+    eacute = instancer.makeInstance('eacute', location)
+    acute = instancer.makeInstance('acute', location)
+    assert instancer.makeInstance('eacute', location) is eacute
+    assert instancer.instances['acute'] is acute
+    assert sorted(built) == ['acute', 'dot', 'e', 'eacute']
+    # another location: instances are made again, mutators are kept
+    other = instancer.makeInstance('eacute', Location(weight=1))
+    assert other is not eacute and sorted(instancer.instances.keys()) == ['acute', 'dot', 'e', 'eacute']
+    assert len(built) == 4
+
+def test_uninterpolableGlyphs(masters):
+    masterGlyphs = collectComponentMasters(['eacute', 'broken'], masters)
+    instancer = ComponentInstancer(masterGlyphs, buildMasterMutator)
+    location = Location(weight=.5)
+    assert instancer.makeInstance('broken', location) is None
+    assert instancer.makeInstance('unknown', location) is None
+    # a base glyph that can’t be interpolated takes its composites with it
+    noDot = ComponentInstancer(masterGlyphs, lambda mutatorMasters, rawMasters: None if rawMasters[0].name == 'dot' else buildMasterMutator(mutatorMasters, rawMasters))
+    assert noDot.makeInstance('eacute', location) is None
+    assert noDot.makeInstance('e', location) is not None
+
+def test_componentCycles():
+    # fonts can’t hold glyphs made of each other, their math glyphs can
+    masterGlyphs = {}
+    for glyphName, baseGlyph in (('loop1', 'loop2'), ('loop2', 'loop1')):
+        mutatorMasters = []
+        for weight in (0, 1):
+            glyph = MathGlyph(None)
+            glyph.width, glyph.height = 500, 0
+            glyph.components.append(dict(baseGlyph=baseGlyph, transformation=(1, 0, 0, 1, weight * 10, 0), identifier=None))
+            mutatorMasters.append((Location(weight=weight), glyph))
+        masterGlyphs[glyphName] = (mutatorMasters, [])
+    built = []
+    def mutator(mutatorMasters, rawMasters):
+        built.append(mutatorMasters)
+        return buildMutator(mutatorMasters)[1]
+    instancer = ComponentInstancer(masterGlyphs, mutator)
+    assert instancer.makeInstance('loop1', Location(weight=.5)) is None
+    assert len(built) == 2
+    assert MAX_DEPTH > 2
+
+def test_transformContours(masters):
+    contours = masters[0][1]['e'].toMathGlyph().contours
+    assert transformContours(contours, (1, 0, 0, 1, 0, 0)) == contours
+    moved = transformContours(contours, (1, 0, 0, 1, 10, 20))
+    assert moved[0]['points'][0][1] == (10, 20)
+    scaled = transformContours(contours, (2, 0, 0, 3, 10, 0))
+    assert [point[1] for point in scaled[0]['points'] if point[0] is not None] == [(10, 0), (1610, 0), (1610, 3000), (10, 3000)]
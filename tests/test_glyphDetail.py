@@ -0,0 +1,89 @@
+# coding=utf-8
+from __future__ import division
+
+from fontParts.world import NewFont
+from mutatorMath.objects.location import Location
+from mutatorMath.objects.mutator import buildMutator
+from conftest import buildEngine
+from glyphDetail import simplifyMasters
+
+def structure(glyph):
+    return [[point[0] for point in contour['points']] for contour in glyph.contours]
+
+def pointTypes(glyph):
+    return [[point.type for point in contour.points] for contour in glyph.contours]
+
+def makeFont(points):
+    '''
+    Font with an 'a' of one closed contour out of [(segmentType, (x, y))], segmentType None for off curves.
+    '''
+    font = NewFont(showInterface=False)
+    font.info.unitsPerEm = 1000
+    glyph = font.newGlyph('a')
+    glyph.width = 200
+    pen = glyph.getPointPen()
+    pen.beginPath()
+    for segmentType, pt in points:
+        pen.addPoint(pt, segmentType)
+    pen.endPath()
+    return font
+
+def makeGlyph(points):
+    # as the engine gets them, lines being turned into curves
+    return makeFont(points)['a'].toMathGlyph()
+
+def square(middleX=0, handleOffset=0):
+    # a square with a point in the middle of its left edge, and a (flat unless offset) curve on top
+    return [
+        ('line', (0, 0)), ('line', (100, 0)), ('line', (100, 100)),
+        (None, (66, 100 + handleOffset)), (None, (33, 100)), ('curve', (0, 100)),
+        ('line', (middleX, 50))
+        ]
+
+SQUARE = [['line', 'line', 'line', 'line']]
+
+def test_pointsAreDroppedInEveryMaster():
+    glyphs = [makeGlyph(square()), makeGlyph(square())]
+    simplified = simplifyMasters(glyphs, .5)
+    assert structure(simplified[0]) == structure(simplified[1]) == SQUARE
+    # masters aren’t touched
+    assert structure(glyphs[0]) == [['curve', None, None] * 5]
+
+def test_pointsKeptIfOneMasterNeedsThem():
+    # the second master’s top is a real curve and its left edge is bent
+    glyphs = [makeGlyph(square()), makeGlyph(square(middleX=20, handleOffset=30))]
+    simplified = simplifyMasters(glyphs, 2)
+    assert structure(simplified[0]) == structure(simplified[1]) == [['line', 'line', 'line', None, None, 'curve', 'line']]
+    simplified = simplifyMasters(glyphs, 40)
+    assert structure(simplified[0]) == structure(simplified[1]) == SQUARE
+
+def test_incompatibleMastersAreLeftAlone():
+    glyphs = [makeGlyph(square()), makeGlyph(square()[:-1])]
+    simplified = simplifyMasters(glyphs, 10)
+    assert [structure(glyph) for glyph in simplified] == [structure(glyph) for glyph in glyphs]
+
+def test_simplifiedMastersInterpolate(masterFonts):
+    locations = [Location(weight=index) for index in range(len(masterFonts))]
+    for glyphName in ['base0000', 'base0007', 'base0013']:
+        glyphs = [font[glyphName].toMathGlyph() for font in masterFonts]
+        for tolerance in (1, 10, 100):
+            simplified = simplifyMasters(glyphs, tolerance)
+            assert all(structure(glyph) == structure(simplified[0]) for glyph in simplified)
+            bias, mutator = buildMutator(list(zip(locations, simplified)))
+            instance = mutator.makeInstance(Location(weight=1.5))
+            assert structure(instance) == structure(simplified[0])
+
+def test_lowDetailPreviews():
+    fonts = [makeFont(square()), makeFont(square(middleX=2)), makeFont(square(handleOffset=2))]
+    engine = buildEngine(fonts, [(0, 0), (2, 0), (0, 2)])
+    engine.setPreviewCellSize((20, 20))
+    assert engine.getDetailTolerance() is not None
+    engine.placeGlyphMasters('a')
+    previews = engine.makeGlyphInstances([(1, 1), (2, 1)], detailSpots=[(2, 1)])
+    # instances are drawn back with the masters’ lines
+    fullDetail = [['line', 'line', 'line', 'offcurve', 'offcurve', 'curve', 'line']]
+    assert pointTypes(previews['b1']) == SQUARE
+    assert pointTypes(previews['c1']) == fullDetail
+    # full detail in larger cells
+    engine.setPreviewCellSize((400, 400))
+    assert pointTypes(engine.makeGlyphInstances([(1, 1)])['b1']) == fullDetail
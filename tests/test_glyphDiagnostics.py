@@ -0,0 +1,66 @@
+# coding=utf-8
+from __future__ import division
+
+from fontParts.world import NewFont
+from mutatorMath.objects.location import Location
+from glyphDiagnostics import GlyphDiagnostics, measureGlyph, QUESTIONABLE, NEGATIVE_WIDTH, INVERTED_CONTOUR, DEGENERATE_CONTOUR, COORDINATE_OVERFLOW
+from glyphCompatibility import summarizeReasons
+from glyphWriter import GlyphBatch
+from matrixEngine import interpolateGlyphSet
+
+def drawRectangles(glyph, rectangles):
+    pen = glyph.getPen()
+    for xMin, yMin, xMax, yMax in rectangles:
+        # counter-clockwise when xMin < xMax and yMin < yMax
+        pen.moveTo((xMin, yMin))
+        pen.lineTo((xMax, yMin))
+        pen.lineTo((xMax, yMax))
+        pen.lineTo((xMin, yMax))
+        pen.closePath()
+
+def makeGlyph(rectangles, width=500):
+    glyph = NewFont(showInterface=False).newGlyph('a')
+    glyph.width = width
+    drawRectangles(glyph, rectangles)
+    return glyph.toMathGlyph()
+
+def test_measureGlyph():
+    bounds, areas = measureGlyph(makeGlyph([(0, 0, 100, 50), (200, -10, 100, 40)]))
+    assert bounds == (0, -10, 200, 50)
+    assert areas == [5000, -5000]
+    assert measureGlyph(makeGlyph([])) == (None, [])
+
+def test_cleanInstance():
+    diagnostics = GlyphDiagnostics([makeGlyph([(0, 0, 100, 100)]), makeGlyph([(0, 0, 200, 200)], 700)])
+    assert diagnostics.check(makeGlyph([(0, 0, 150, 150)], 600)) == ((0, 0, 150, 150), [])
+
+def test_issues():
+    diagnostics = GlyphDiagnostics([makeGlyph([(0, 0, 100, 100), (300, 0, 400, 100)]), makeGlyph([(0, 0, 200, 200), (300, 0, 500, 200)])])
+    assert diagnostics.check(makeGlyph([(0, 0, 100, 100), (300, 0, 400, 100)], -1))[1] == [NEGATIVE_WIDTH]
+    assert diagnostics.check(makeGlyph([(100, 0, 0, 100), (300, 0, 400, 100)]))[1] == [INVERTED_CONTOUR]
+    # under 1% of the smallest master area (10000)
+    assert diagnostics.check(makeGlyph([(0, 0, 100, .5), (300, 0, 400, 100)]))[1] == [DEGENERATE_CONTOUR]
+    assert diagnostics.check(makeGlyph([(0, 0, 100, 100), (300, 0, 400, 40000)]))[1] == [COORDINATE_OVERFLOW]
+    assert diagnostics.check(makeGlyph([(0, 0, 100, 100), (300, 0, 400, 100)], 40000))[1] == [COORDINATE_OVERFLOW]
+    # contours that don’t match the masters aren’t compared to them
+    assert diagnostics.check(makeGlyph([(100, 0, 0, 100)]))[1] == []
+
+def test_mixedDirectionsArentInverted():
+    diagnostics = GlyphDiagnostics([makeGlyph([(0, 0, 100, 100)]), makeGlyph([(100, 0, 0, 100)])])
+    assert diagnostics.check(makeGlyph([(100, 0, 0, 100)]))[1] == []
+    assert diagnostics.check(makeGlyph([(0, 0, 100, 100)]))[1] == []
+
+def test_extrapolatedGlyphsAreQuestionable():
+    masters = []
+    for weight, rectangle, width in ((0, (0, 0, 100, 100), 500), (1, (40, 0, 60, 100), 100)):
+        font = NewFont(showInterface=False)
+        drawRectangles(font.newGlyph('a'), [rectangle])
+        font['a'].width = width
+        drawRectangles(font.newGlyph('b'), [(0, 0, 100, 100)])
+        masters.append((Location(weight=weight), font))
+    # past the second master, the square is mirrored and the width negative
+    report = interpolateGlyphSet(Location(weight=3), ['a', 'b'], masters, GlyphBatch())
+    assert list(report.keys()) == ['a']
+    assert report['a']['issues'] == [NEGATIVE_WIDTH, INVERTED_CONTOUR]
+    assert summarizeReasons(report) == [(QUESTIONABLE, INVERTED_CONTOUR, ['a']), (QUESTIONABLE, NEGATIVE_WIDTH, ['a'])]
+    assert interpolateGlyphSet(Location(weight=.5), ['a', 'b'], masters, GlyphBatch()) == {}
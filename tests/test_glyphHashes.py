@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+from fontParts.world import OpenFont
+from glyphHashes import GlyphHashes, hashGlyph
+
+def test_hashGlyph(masterFonts):
+    glyph = masterFonts[0]['base0000']
+    glyphHash = hashGlyph(glyph)
+    assert glyphHash == hashGlyph(glyph.naked())
+    # marks don’t matter to interpolation
+    glyph.markColor = (1, 0, 0, 1)
+    assert hashGlyph(glyph) == glyphHash
+    glyph.contours[0].points[0].x += 1
+    assert hashGlyph(glyph) != glyphHash
+    assert hashGlyph(masterFonts[1]['base0000']) != hashGlyph(masterFonts[0]['base0000'])
+
+def test_fontChanges(masterFonts):
+    hashes = GlyphHashes(masterFonts[:2])
+    token = hashes.getToken()
+    assert hashes.changedSince(token) == set()
+    firstHashes = hashes.getGlyphHashes('base0001')
+    masterFonts[1]['base0001'].width += 10
+    masterFonts[0]['base0002'].markColor = (0, 1, 0, 1)
+    assert hashes.changedSince(token) == {'base0001'}
+    assert hashes.changedSince(token, ['base0000', 'base0001']) == {'base0001'}
+    assert hashes.getGlyphHashes('base0001')[0] == firstHashes[0]
+    assert hashes.getGlyphHashes('base0001')[1] != firstHashes[1]
+    # a change undone before the next query isn’t recorded
+    token = hashes.getToken()
+    glyph = masterFonts[0]['base0003']
+    glyph.width += 10
+    glyph.width -= 10
+    assert hashes.changedSince(token) == set()
+    # glyphs added, deleted and renamed
+    masterFonts[0].newGlyph('added')
+    del masterFonts[1]['base0004']
+    masterFonts[0]['base0005'].name = 'renamed'
+    assert hashes.changedSince(token) == {'added', 'base0004', 'base0005', 'renamed'}
+    assert hashes.getHash('base0004', 1) is None
+    hashes.close()
+
+def test_masterChanges(masterFonts):
+    hashes = GlyphHashes(masterFonts[:2])
+    token = hashes.getToken()
+    hashes.setMasters(masterFonts[:2])
+    assert hashes.changedSince(token) == set()
+    hashes.setMasters(list(reversed(masterFonts[:2])))
+    assert hashes.changedSince(token, ['base0000', 'comp0000']) == {'base0000', 'comp0000'}
+    assert 'base0000' in hashes.changedSince(token)
+    assert hashes.changedSince(None, ['base0000']) == {'base0000'}
+    hashes.close()
+
+def test_ufoChanges(masterPaths, tmp_path):
+    path = str(tmp_path / 'master.ufo')
+    OpenFont(masterPaths[0], showInterface=False).save(path)
+    hashes = GlyphHashes([path])
+    token = hashes.getToken()
+    glyphHash = hashes.getHash('base0000')
+    font = OpenFont(path, showInterface=False)
+    font['base0000'].contours[0].points[0].y += 10
+    font.save()
+    # a .glif written again without changes only costs hashing it again
+    glifPath = os.path.join(path, 'glyphs', 'base0001.glif')
+    stat = os.stat(glifPath)
+    os.utime(glifPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert hashes.changedSince(token) == {'base0000'}
+    assert hashes.getHash('base0000') != glyphHash
+    hashes.close()
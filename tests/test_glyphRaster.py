@@ -0,0 +1,103 @@
+# coding=utf-8
+from __future__ import division
+
+import struct
+import zlib
+import pytest
+from fontParts.world import NewFont
+from conftest import buildEngine
+from glyphRaster import ThumbnailCache, rasterizeGlyph, glyphFingerprint, coverageToRGBA, makePNG, makeContactSheet
+
+def makeGlyph(xMin, yMin, xMax, yMax, width=1000):
+    font = NewFont(showInterface=False)
+    glyph = font.newGlyph('box')
+    glyph.width = width
+    pen = glyph.getPen()
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMax, yMin))
+    pen.lineTo((xMax, yMax))
+    pen.lineTo((xMin, yMax))
+    pen.closePath()
+    return glyph
+
+def readPNG(data):
+    '''
+    (width, height, rows of RGBA bytes) of a PNG written by makePNG.
+    '''
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', data[16:24])
+    length = struct.unpack('>I', data[33:37])[0]
+    assert data[37:41] == b'IDAT'
+    raw = zlib.decompress(data[41:41+length])
+    rowLength = width * 4 + 1
+    rows = [raw[row*rowLength+1:(row+1)*rowLength] for row in range(height)]
+    assert all(raw[row*rowLength] == 0 for row in range(height))
+    return width, height, rows
+
+def test_rasterizeGlyph():
+    # the frame is 1000 units high (-250 to 750), a 10 pixel thumbnail has 100 units pixels
+    glyph = makeGlyph(0, -250, 500, 750)
+    coverage = rasterizeGlyph(glyph, (10, 10))
+    assert len(coverage) == 100
+    for row in range(10):
+        assert list(coverage[row*10:row*10+10]) == [255] * 5 + [0] * 5
+    # half a pixel covered
+    coverage = rasterizeGlyph(makeGlyph(0, -250, 450, 750), (10, 10))
+    assert coverage[4] == 128 and coverage[3] == 255
+    # glyphs are centered on their advance width
+    coverage = rasterizeGlyph(makeGlyph(0, -250, 500, 750, width=500), (10, 10))
+    assert list(coverage[:10]) == [0, 0, 128, 255, 255, 255, 255, 128, 0, 0]
+    assert rasterizeGlyph(None, (4, 3)) == bytearray(12)
+
+def test_coverageToRGBA():
+    assert coverageToRGBA(bytearray([0, 255]), (1, 0, 0, 1)) == bytearray([255, 0, 0, 0, 255, 0, 0, 255])
+    assert coverageToRGBA(bytearray([0, 255]), (1, 0, 0, 1), background=(1, 1, 1, 1)) == bytearray([255, 255, 255, 255, 255, 0, 0, 255])
+
+def test_makePNG():
+    pixels = bytearray(range(2 * 3 * 4))
+    width, height, rows = readPNG(makePNG((2, 3), pixels))
+    assert (width, height) == (2, 3)
+    assert b''.join(rows) == bytes(pixels)
+
+def test_thumbnailCache():
+    cache = ThumbnailCache(maxItems=3)
+    glyph = makeGlyph(0, 0, 500, 500)
+    fingerprint = glyphFingerprint(glyph)
+    thumbnail = cache.getThumbnail(glyph, (10, 10))
+    # coverage & thumbnail are kept
+    assert len(cache) == 2
+    assert cache.getThumbnail(glyph, (10, 10)) is thumbnail
+    assert cache.getThumbnail(glyph, (10, 10), color=(1, 0, 0, 1)) is not thumbnail
+    assert len(cache) == 3
+    # outlines changed, rasterized again; least recently used items are dropped first
+    # (the coverage was used again for the red thumbnail)
+    glyph.moveBy((10, 0))
+    assert glyphFingerprint(glyph) != fingerprint
+    cache.getCoverage(glyph, (10, 10))
+    assert len(cache) == 3
+    assert (fingerprint, (10, 10), (0, 0, 0, 1)) not in cache.items
+    assert (fingerprint, (10, 10), None) in cache.items
+
+def test_contactSheet(masterFonts):
+    engine = buildEngine(masterFonts, [(0, 0), (2, 0), (0, 2)])
+    cache = ThumbnailCache()
+    data = engine.makeContactSheet('base0000', cellSize=(20, 20), cache=cache)
+    width, height, rows = readPNG(data)
+    # 3 by 3 cells of 20 pixels with 2 pixel gaps
+    assert (width, height) == (3 * 22 + 2, 3 * 22 + 2)
+    assert len(cache) == 9
+    # masters & instances are inked, empty cells aren’t
+    sheet = makeContactSheet({(0, 0): masterFonts[0]['base0000'], (1, 0): None}, (2, 1), (20, 20), cache=cache)
+    width, height, rows = readPNG(sheet)
+    cellPixels = lambda left: set(bytes(row[left*4:(left+20)*4]) for row in rows[2:22])
+    assert len(cellPixels(2)) > 1
+    assert cellPixels(24) == {b'\xff\xff\xff\xff' * 20}
+
+def test_imageThumbnails():
+    pytest.importorskip('AppKit')
+    from glyphRaster import ImageThumbnailCache
+    cache = ImageThumbnailCache()
+    glyph = makeGlyph(0, 0, 500, 500)
+    image = cache.getThumbnail(glyph, (10, 10))
+    assert tuple(image.size()) == (10, 10)
+    assert cache.getThumbnail(glyph, (10, 10)) is image
@@ -0,0 +1,66 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from fontParts.world import NewFont
+from glyphSubset import GlyphSubset, parseUnicodeRanges, textToGlyphNames, getCharacterMapping, componentClosure, subsetKerning, subsetGroups
+
+def makeFont(components):
+    '''
+    Font of glyphs {glyphName: [baseGlyph, …]}, glyph k having unicode 0x41+k.
+    '''
+    font = NewFont(showInterface=False)
+    for k, glyphName in enumerate(sorted(components)):
+        glyph = font.newGlyph(glyphName)
+        glyph.unicode = 0x41 + k
+        for baseGlyph in components[glyphName]:
+            glyph.appendComponent(baseGlyph)
+    return font
+
+def test_parseUnicodeRanges():
+    assert parseUnicodeRanges('U+0020-007E, U+00E9, 20AC') == [(0x20, 0x7E), (0xE9, 0xE9), (0x20AC, 0x20AC)]
+    for expression in ['U+007E-0020', 'U+GG', 'latin']:
+        with pytest.raises(ValueError):
+            parseUnicodeRanges(expression)
+
+def test_fromExpression():
+    subset = GlyphSubset.fromExpression('U+0041-0042, *.sc, "Ab/a.alt c", comp?')
+    assert subset.unicodeRanges == [(0x41, 0x42)]
+    assert subset.namePatterns == ['*.sc', 'comp?']
+    assert subset.text == 'Ab/a.alt c'
+    assert GlyphSubset.fromExpression('') is None
+    assert GlyphSubset.fromExpression(None) is None
+
+def test_textToGlyphNames():
+    cmap = {0x41: ['A'], 0x62: ['b']}
+    assert textToGlyphNames('Ab/a.alt b/c/d', cmap) == ['A', 'b', 'a.alt', 'b', 'c', 'd']
+    assert textToGlyphNames('Az', cmap) == ['A']
+
+def test_componentClosure():
+    # aacute > a, acute; Aring > A > (nothing); ringacute > ring, acute, nested through a composite
+    first = makeFont({'a': [], 'acute': [], 'aacute': ['a', 'acute'], 'ring': [], 'ringacute': ['ring', 'acuteComb'], 'acuteComb': ['acute'], 'x': []})
+    # the second master has an extra component
+    second = makeFont({'a': [], 'acute': [], 'aacute': ['a', 'acute', 'dot'], 'dot': [], 'ring': [], 'ringacute': ['ring', 'acuteComb'], 'acuteComb': ['acute'], 'x': []})
+    assert componentClosure(['aacute'], [first]) == {'aacute', 'a', 'acute'}
+    assert componentClosure(['aacute'], [first, second]) == {'aacute', 'a', 'acute', 'dot'}
+    assert componentClosure(['ringacute'], [first]) == {'ringacute', 'ring', 'acuteComb', 'acute'}
+    subset = GlyphSubset(namePatterns=['*acute'])
+    assert subset.resolve([first, second]) == ['a', 'aacute', 'acute', 'acuteComb', 'dot', 'ring', 'ringacute']
+    # glyphs are picked in the first master only
+    assert getCharacterMapping(first)[first['x'].unicode] == ['x']
+    subset = GlyphSubset(text=chr(first['x'].unicode))
+    assert subset.resolve([first, second]) == ['x']
+    assert GlyphSubset(namePatterns=['dot']).resolve([first, second]) == []
+
+def test_subsetKerningAndGroups():
+    groups = {'public.kern1.o': ['o', 'oacute'], 'public.kern2.v': ['v', 'w']}
+    kerning = {('public.kern1.o', 'public.kern2.v'): -20, ('o', 'x'): -10, ('x', 'v'): 5, ('T', 'o'): -50}
+    glyphNames = {'oacute', 'v', 'T', 'o'}
+    assert subsetKerning(kerning, groups, glyphNames) == {('public.kern1.o', 'public.kern2.v'): -20, ('T', 'o'): -50}
+    assert subsetGroups(groups, {'oacute', 'v'}) == {'public.kern1.o': ['oacute'], 'public.kern2.v': ['v']}
+    assert subsetGroups(groups, {'x'}) == {}
+
+def test_syntheticSubset(masterFonts):
+    # comp0000 is made of base0000 & base0001
+    subset = GlyphSubset.fromExpression('comp0000, U+E002')
+    assert subset.resolve(masterFonts) == ['base0000', 'base0001', 'base0002', 'comp0000']
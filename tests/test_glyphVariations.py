@@ -0,0 +1,65 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from conftest import buildEngine
+from glyphVariations import VariationPreviewModel, CompiledGlyph, getOrigin, flattenGlyph
+
+LAYOUTS = [
+    [(0, 0), (2, 0), (0, 2)],
+    # first master away from the masters’ bias
+    [(1, 1), (0, 0), (2, 0), (0, 2)],
+    [(1, 0), (0, 0), (2, 2)],
+    [(1, 2), (0, 0), (2, 1), (2, 2)],
+]
+
+def _maxDifference(first, second):
+    difference = abs(first.width - second.width)
+    for firstContour, secondContour in zip(first.contours, second.contours):
+        for firstPoint, secondPoint in zip(firstContour.points, secondContour.points):
+            difference = max(difference, abs(firstPoint.x - secondPoint.x), abs(firstPoint.y - secondPoint.y))
+    return difference
+
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_backendsAgree(masterFonts, layout):
+    engine = buildEngine(masterFonts, layout)
+    for glyphName in sorted(masterFonts[0].keys())[:6]:
+        instances = {}
+        for backend in ['mutatorMath', 'variations']:
+            engine.setPreviewBackend(backend)
+            engine.placeGlyphMasters(glyphName)
+            instances[backend] = engine.makeGlyphInstances()
+        for spotKey, instance in instances['mutatorMath'].items():
+            other = instances['variations'][spotKey]
+            assert (instance is None) == (other is None)
+            if instance is not None:
+                assert len(instance.contours) == len(other.contours)
+                assert _maxDifference(instance, other) < 1e-9, (glyphName, spotKey)
+
+def test_originIsBias():
+    locations = [dict(horizontal=200, vertical=100), dict(horizontal=100, vertical=100), dict(horizontal=300, vertical=300)]
+    assert getOrigin(locations) == dict(horizontal=100, vertical=100)
+    model = VariationPreviewModel(locations)
+    assert model.getScalars(locations[1]) == [0, 1, 0]
+    # along the horizontal axis, past the last master on it
+    assert model.getScalars(dict(horizontal=300, vertical=100)) == [2, -1, 0]
+
+def test_incompatibleStructures(masterFonts):
+    glyphs = [font['base0000'].toMathGlyph() for font in masterFonts[:2]]
+    glyphs[1].contours.pop()
+    model = VariationPreviewModel([dict(horizontal=0), dict(horizontal=100)])
+    assert flattenGlyph(glyphs[0])[0] != flattenGlyph(glyphs[1])[0]
+    assert model.buildMutator(glyphs) is None
+
+def test_weightedSums(masterFonts):
+    glyphs = [font['base0000'].toMathGlyph() for font in masterFonts[:2]]
+    model = VariationPreviewModel([dict(horizontal=0), dict(horizontal=100)])
+    compiledGlyph = model.buildMutator(glyphs)
+    assert isinstance(compiledGlyph, CompiledGlyph)
+    # one list of values per master, weighted by its scalar
+    assert compiledGlyph.masterValues == [flattenGlyph(glyph)[1] for glyph in glyphs]
+    assert model.getScalars(dict(horizontal=25)) == [.75, .25]
+    instance = compiledGlyph.makeInstance(dict(horizontal=25))
+    expected = [.75 * first + .25 * second for first, second in zip(*compiledGlyph.masterValues)]
+    assert flattenGlyph(instance)[1] == pytest.approx(expected)
+    assert flattenGlyph(compiledGlyph.makeInstance(dict(horizontal=100)))[1] == compiledGlyph.masterValues[1]
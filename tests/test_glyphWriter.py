@@ -0,0 +1,118 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from fontParts.world import NewFont
+from fontParts.fontshell import RFont, RGlyph, RLayer
+from fontTools.misc.roundTools import otRound
+from glyphWriter import BulkGlyphWriter, GlyphBatch, hasOutsideObservers, implementsAutoUnicodes, unicodesForName
+
+
+class AutoUnicodesGlyph(RGlyph):
+
+    # stands for glyphs of fonts open in the UI, which implement autoUnicodes()
+    def _autoUnicodes(self):
+        self.unicodes = [0xF000]
+
+class AutoUnicodesLayer(RLayer):
+    glyphClass = AutoUnicodesGlyph
+
+class AutoUnicodesFont(RFont):
+    layerClass = AutoUnicodesLayer
+
+
+class GlyphAddedObserver(object):
+
+    def __init__(self, font):
+        self.added = []
+        font.naked().layers.defaultLayer.addObserver(self, 'glyphAdded', 'Layer.GlyphAdded')
+
+    def glyphAdded(self, notification):
+        self.added.append(notification.data['name'])
+
+
+@pytest.fixture
+def mathGlyph():
+    font = NewFont(showInterface=False)
+    glyph = font.newGlyph('source')
+    glyph.width = 250.5
+    pen = glyph.getPen()
+    pen.moveTo((0.4, 0))
+    pen.lineTo((100.5, 0.2))
+    pen.curveTo((100.5, 50.7), (80.3, 100.5), (40.6, 100.5))
+    pen.closePath()
+    glyph.appendAnchor('top', (50.5, 700.4))
+    return glyph.toMathGlyph()
+
+def isHeld(font):
+    return font.naked().dispatcher.areNotificationsHeld()
+
+def test_headlessFontsArentHeld(mathGlyph):
+    font = NewFont(showInterface=False)
+    assert not hasOutsideObservers(font.naked())
+    with BulkGlyphWriter(font, chunkSize=2) as writer:
+        writer.writeGlyph('a', mathGlyph)
+        assert not isHeld(font)
+    assert writer.written == ['a']
+    assert font['a'].width == 250.5
+
+def test_observedFontsAreHeldPerChunk(mathGlyph):
+    font = NewFont(showInterface=False)
+    observer = GlyphAddedObserver(font)
+    assert hasOutsideObservers(font.naked())
+    announced = []
+    with BulkGlyphWriter(font, chunkSize=2) as writer:
+        for k in range(5):
+            writer.writeGlyph('g%s' % (k), mathGlyph)
+            assert isHeld(font)
+            announced.append(len(observer.added))
+    assert not isHeld(font)
+    # held notifications are released once per chunk of two glyphs, and the rest at the end
+    assert announced == [0, 0, 2, 2, 4]
+    assert observer.added == ['g0', 'g1', 'g2', 'g3', 'g4']
+
+def test_rounding(mathGlyph):
+    font = NewFont(showInterface=False)
+    with BulkGlyphWriter(font, roundGeometry=True) as writer:
+        writer.writeGlyph('rounded', mathGlyph)
+    with BulkGlyphWriter(font) as writer:
+        writer.writeGlyph('unrounded', mathGlyph)
+    rounded, unrounded = font['rounded'], font['unrounded']
+    assert rounded.width == otRound(unrounded.width) == 251
+    points = [point.position for contour in rounded for point in contour.points]
+    assert points == [(otRound(x), otRound(y)) for contour in unrounded for x, y in (point.position for point in contour.points)]
+    assert all(isinstance(value, int) for point in points for value in point)
+    assert rounded.anchors[0].position == (51, 700)
+
+def test_autoUnicodesFallback(mathGlyph):
+    font = NewFont(showInterface=False)
+    assert not implementsAutoUnicodes(font)
+    with BulkGlyphWriter(font, autoUnicodes=True) as writer:
+        for glyphName in ('A', 'uni0410', 'A.alt', 'f_i', 'custom'):
+            writer.writeGlyph(glyphName, mathGlyph)
+        writer.writeGlyph('B', mathGlyph, [0x42, 0xE000])
+    assert [font[glyphName].unicodes for glyphName in ('A', 'uni0410', 'A.alt', 'f_i', 'custom', 'B')] == [(0x41,), (0x410,), (), (), (), (0x42, 0xE000)]
+    assert unicodesForName('A.alt') == []
+    with BulkGlyphWriter(font) as writer:
+        writer.writeGlyph('C', mathGlyph)
+    assert font['C'].unicodes == ()
+
+def test_autoUnicodesFontMethod(mathGlyph):
+    font = AutoUnicodesFont(showInterface=False)
+    assert implementsAutoUnicodes(font)
+    with BulkGlyphWriter(font, autoUnicodes=True) as writer:
+        writer.writeGlyph('A', mathGlyph)
+    # the font’s own autoUnicodes() rather than the AGL name
+    assert font['A'].unicodes == (0xF000,)
+
+def test_glyphBatch(mathGlyph):
+    batch = GlyphBatch()
+    with batch:
+        batch.writeGlyph('A', mathGlyph)
+        batch.writeGlyph('b', mathGlyph, [0x62])
+    font = NewFont(showInterface=False)
+    observer = GlyphAddedObserver(font)
+    assert batch.writeTo(font, roundGeometry=True, autoUnicodes=True) == ['A', 'b']
+    assert observer.added == ['A', 'b']
+    assert font['A'].unicodes == (0x41,) and font['b'].unicodes == (0x62,)
+    assert font['A'].width == 251
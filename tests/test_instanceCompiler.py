@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import pytest
+from fontTools.ttLib import TTFont, newTable
+from fontParts.world import NewFont
+from instanceCompiler import FeatureCache, compileSubstitutions, compileInstance, COMPILE_FORMATS
+
+GLYPH_ORDER = ['.notdef', 'f', 'i', 'f_i']
+LIGATURES = 'languagesystem DFLT dflt;\nfeature liga { sub f i by f_i; } liga;\n'
+POSITIONING = 'languagesystem DFLT dflt;\nfeature kern { pos f i -10; } kern;\n'
+
+def decompileSubstitutions(data, glyphOrder=GLYPH_ORDER):
+    font = TTFont()
+    font.setGlyphOrder(glyphOrder)
+    table = newTable('GSUB')
+    table.decompile(data, font)
+    return table.table
+
+def test_compileSubstitutions():
+    table = decompileSubstitutions(compileSubstitutions(LIGATURES, GLYPH_ORDER))
+    assert [record.FeatureTag for record in table.FeatureList.FeatureRecord] == ['liga']
+    assert table.LookupList.Lookup[0].SubTable[0].ligatures['f'][0].LigGlyph == 'f_i'
+    assert compileSubstitutions('languagesystem DFLT dflt;\n', GLYPH_ORDER) == b''
+    # anything but substitutions, or code that can’t be compiled, is left to each instance
+    assert compileSubstitutions(POSITIONING, GLYPH_ORDER) is None
+    assert compileSubstitutions('feature liga { sub f i by missing; } liga;', GLYPH_ORDER) is None
+
+def test_featureCache():
+    cache = FeatureCache()
+    substitutions = cache.getSubstitutions(LIGATURES, GLYPH_ORDER)
+    assert cache.getSubstitutions(LIGATURES, GLYPH_ORDER) is substitutions
+    assert cache.hits == 1
+    # another glyph order compiles again
+    otherOrder = ['.notdef', 'i', 'f', 'f_i']
+    assert decompileSubstitutions(cache.getSubstitutions(LIGATURES, otherOrder), otherOrder).LookupList.Lookup[0].SubTable[0].ligatures['f'][0].LigGlyph == 'f_i'
+    assert cache.getSubstitutions(POSITIONING, GLYPH_ORDER) is None
+    assert cache.getSubstitutions(POSITIONING, GLYPH_ORDER) is None
+    assert cache.hits == 2 and len(cache.substitutions) == 3
+
+def makeInstance(width=500):
+    font = NewFont(showInterface=False)
+    font.info.familyName = 'Compiled'
+    font.info.styleName = 'B2'
+    font.info.unitsPerEm = 1000
+    font.info.ascender = 750
+    font.info.descender = -250
+    for glyphName in GLYPH_ORDER:
+        glyph = font.newGlyph(glyphName)
+        glyph.width = width
+        pen = glyph.getPen()
+        pen.moveTo((50, 0))
+        pen.lineTo((width - 50, 0))
+        pen.lineTo((width - 50, 700))
+        pen.lineTo((50, 700))
+        pen.closePath()
+    font['f'].unicode = 0x66
+    font['i'].unicode = 0x69
+    font.glyphOrder = GLYPH_ORDER
+    font.kerning[('f', 'i')] = -20
+    return font
+
+@pytest.fixture
+def compiler():
+    pytest.importorskip('ufo2ft')
+
+def getGSUB(path):
+    font = TTFont(path)
+    return font['GSUB'].compile(font)
+
+def test_compileInstance(compiler, tmp_path):
+    font = makeInstance()
+    font.features.text = '# own features\n'
+    paths = compileInstance(font, str(tmp_path / 'Compiled-B2'), COMPILE_FORMATS, LIGATURES)
+    assert paths == [str(tmp_path / 'Compiled-B2.otf'), str(tmp_path / 'Compiled-B2.ttf')]
+    assert 'CFF ' in TTFont(paths[0]) and 'glyf' in TTFont(paths[1])
+    assert TTFont(paths[0]).getGlyphOrder() == GLYPH_ORDER
+    # the instance keeps its own feature code
+    assert font.features.text == '# own features\n'
+    with pytest.raises(ValueError):
+        compileInstance(font, str(tmp_path / 'Compiled-B2'), ['woff'])
+
+def test_cachedSubstitutions(compiler, tmp_path):
+    cache = FeatureCache()
+    expected = compileInstance(makeInstance(), str(tmp_path / 'uncached'), ['otf'], LIGATURES)[0]
+    for index, width in enumerate((500, 600)):
+        path = compileInstance(makeInstance(width), str(tmp_path / ('cached%s' % (index))), ['otf'], LIGATURES, cache)[0]
+        assert getGSUB(path) == getGSUB(expected)
+        # kerning is still generated per instance
+        assert 'GPOS' in TTFont(path)
+    assert cache.hits == 1
+
+def test_positioningFallsBack(compiler, tmp_path):
+    cache = FeatureCache()
+    path = compileInstance(makeInstance(), str(tmp_path / 'positioned'), ['otf'], POSITIONING, cache)[0]
+    assert 'GPOS' in TTFont(path)
+    assert os.path.exists(path)
+    assert list(cache.substitutions.values()) == [None]
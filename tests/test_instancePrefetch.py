@@ -0,0 +1,138 @@
+# coding=utf-8
+from __future__ import division
+
+from fontParts.world import NewFont
+from instancePrefetch import InstanceCache, GlyphPrefetcher, getNeighbourGlyphs, getComponentRelatives, estimateGlyphSize, GLYPH_COST, POINT_COST
+from conftest import buildEngine
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+
+def makeFont():
+    '''
+    a b c d e f g: 'd' and 'f' are made of 'b', 'g' of 'b' and 'c'.
+    '''
+    font = NewFont(showInterface=False)
+    for glyphName in 'abcdefg':
+        font.newGlyph(glyphName)
+    for glyphName, baseGlyphs in (('d', 'b'), ('f', 'b'), ('g', 'bc')):
+        for baseGlyph in baseGlyphs:
+            font[glyphName].appendComponent(baseGlyph)
+    font.glyphOrder = list('abcdefg')
+    return font
+
+
+class RecordingEngine(object):
+
+    def __init__(self, budget=1000):
+        self.instanceCache = InstanceCache(budget)
+        self.prefetched = []
+
+    def prefetchGlyph(self, glyphName, spots):
+        self.prefetched.append(glyphName)
+        self.instanceCache.put(glyphName, {}, 250)
+        return True
+
+def test_budget():
+    cache = InstanceCache(1000)
+    for key in 'abc':
+        cache.put(key, key.upper(), 300)
+    assert cache.size == 900 and not cache.isFull()
+    # a use makes 'a' the most recent, 'b' goes first
+    assert cache.get('a') == 'A' and cache.hits == 1
+    cache.put('d', 'D', 300)
+    assert list(cache.items.keys()) == ['c', 'a', 'd'] and cache.size == 900
+    # peeking isn’t a use
+    assert cache.peek('c') == 'C' and cache.hits == 1
+    cache.put('e', 'E', 300)
+    assert 'c' not in cache and list(cache.items.keys()) == ['a', 'd', 'e']
+    # putting a key again replaces its entry and size
+    cache.put('a', 'A2', 100)
+    assert cache.get('a') == 'A2' and cache.size == 700
+    assert cache.get('missing') is None and cache.hits == 2
+
+def test_grow():
+    cache = InstanceCache(1000)
+    for key in 'abc':
+        cache.put(key, key, 200)
+    cache.get('a')
+    # instances added to 'c' push out the least recently used entries, never 'c' itself
+    cache.grow('c', 500)
+    assert list(cache.items.keys()) == ['c', 'a'] and cache.size == 900
+    # growing doesn’t count as a use: past the budget, 'c' is the oldest entry and is kept
+    cache.grow('c', 500)
+    assert list(cache.items.keys()) == ['c', 'a'] and cache.size == 1400 and cache.isFull()
+    cache.get('c')
+    cache.grow('c', 100)
+    assert list(cache.items.keys()) == ['c'] and cache.size == 1300
+    cache.grow('unknown', 500)
+    assert cache.size == 1300
+    cache.discard('c')
+    assert len(cache) == 0 and cache.size == 0 and cache.sizes == {}
+
+def test_estimateGlyphSize(masterFonts):
+    glyph = masterFonts[0]['base0000'].toMathGlyph()
+    assert estimateGlyphSize(glyph) == GLYPH_COST + POINT_COST * sum(len(contour['points']) for contour in glyph.contours)
+    assert estimateGlyphSize(None) == 0
+
+def test_neighbours():
+    order = list('abcdefg')
+    assert getNeighbourGlyphs('d', order) == ['e', 'c', 'f', 'b']
+    assert getNeighbourGlyphs('a', order, 3) == ['b', 'c', 'd']
+    assert getNeighbourGlyphs('g', order, 1) == ['f']
+    assert getNeighbourGlyphs('missing', order) == []
+
+def test_componentRelatives():
+    font = makeFont()
+    # base glyphs first, then other composites of them
+    assert getComponentRelatives('g', font) == ['b', 'c', 'd', 'f']
+    assert getComponentRelatives('g', font, 3) == ['b', 'c', 'd']
+    assert getComponentRelatives('b', font) == ['d', 'f', 'g']
+    assert getComponentRelatives('a', font) == []
+    assert getComponentRelatives('missing', font) == []
+
+def test_candidateOrder():
+    font = makeFont()
+    prefetcher = GlyphPrefetcher(RecordingEngine(), radius=1)
+    assert prefetcher.getCandidates('f', font) == ['g', 'e', 'b', 'd']
+    for glyphName in ('a', 'c'):
+        prefetcher.viewed(glyphName, font, SPOTS)
+    # neighbours, then component relatives, then recently viewed glyphs, latest first, each once
+    prefetcher.viewed('f', font, SPOTS)
+    assert prefetcher.queue == ['g', 'e', 'b', 'd', 'c', 'a']
+    assert list(prefetcher.recent) == ['a', 'c', 'f']
+    prefetcher.viewed('a', font, SPOTS)
+    assert prefetcher.queue == ['b', 'f', 'c']
+    assert list(prefetcher.recent) == ['c', 'f', 'a']
+    prefetcher.viewed(None, font, SPOTS)
+    assert prefetcher.isIdle()
+
+def test_steps():
+    font = makeFont()
+    engine = RecordingEngine(1000)
+    prefetcher = GlyphPrefetcher(engine, radius=1)
+    prefetcher.viewed('f', font, SPOTS)
+    assert prefetcher.step() and engine.prefetched == ['g']
+    prefetcher.cancel()
+    assert not prefetcher.step() and engine.prefetched == ['g']
+    # stops once the cache is full
+    prefetcher.viewed('f', font, SPOTS)
+    while prefetcher.step():
+        pass
+    assert engine.prefetched == ['g', 'g', 'e', 'b', 'd'] and engine.instanceCache.isFull()
+    assert prefetcher.prefetched == 5 and prefetcher.isIdle()
+
+def test_enginePrefetch(masterFonts):
+    engine = buildEngine(masterFonts[:3], SPOTS)
+    font = masterFonts[0]
+    prefetcher = GlyphPrefetcher(engine)
+    prefetcher.viewed('base0005', font, [(1, 1)])
+    candidates = list(prefetcher.queue)
+    assert candidates[:4] == ['base0006', 'base0004', 'base0007', 'base0003']
+    while prefetcher.step():
+        pass
+    assert prefetcher.prefetched == len(candidates)
+    # prefetched entries are used as they are, with their instances
+    entry = engine.instanceCache.peek(engine.getGlyphEntryKey('base0006'))
+    assert len(entry['instances']) == 1
+    assert engine.collectGlyphMasters('base0006') is entry
+    assert not engine.prefetchGlyph('base0006', [(1, 1)])
@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import division
+
+import json
+import os
+import pytest
+from fontParts.world import OpenFont
+from matrixEngine import MatrixEngine
+from matrixBatch import main, findSourceMaster, getInstancePath
+
+@pytest.mark.parametrize('arguments', [
+    ['-s', 'A1:'],
+    ['-s', ''],
+    ['-s', 'Z9'],
+    ['--slice', 'opsz=2'],
+    ['--source-master', 'B2'],
+    ['--source-master', '7'],
+    ['--shard-index', '0'],
+    ['--shard-index', '2', '--shard-count', '2'],
+    ['--compile', 'woff3'],
+    ['--compile', 'otf', '--backend', 'designspace'],
+    ['--subset', 'U+0041', '--backend', 'designspace'],
+    ])
+def test_invalidArguments(matrixPath, tmp_path, arguments, capsys):
+    assert main([matrixPath, '-o', str(tmp_path / 'out'), '-q', '--no-cache'] + arguments) == 2
+    assert 'Interpolation matrix — ' in capsys.readouterr().err
+    assert not os.path.exists(str(tmp_path / 'out'))
+
+def test_missingMatrix(tmp_path):
+    assert main([str(tmp_path / 'missing.txt')]) == 2
+
+def test_sourceMaster(matrixPath):
+    engine = MatrixEngine.fromMatrixFile(matrixPath)
+    assert findSourceMaster(engine) is engine.masters[0]
+    assert findSourceMaster(engine, 'c1') is engine.masters[1]
+    assert findSourceMaster(engine, '2') is engine.masters[2]
+    assert findSourceMaster(engine, 'B2') is None
+    baseFont = engine.masters[0].getFont()
+    assert getInstancePath('out', baseFont, (1, 2)) == os.path.join('out', 'Synthetic-B3.ufo')
+    assert getInstancePath('out', baseFont, (1, 2), 'opsz 2') == os.path.join('out', 'Synthetic-B3-opsz-2.ufo')
+
+def test_generate(matrixPath, tmp_path, capsys):
+    outputFolder = str(tmp_path / 'out')
+    reportPath = str(tmp_path / 'report.json')
+    arguments = [matrixPath, '-s', 'A1:B2, !A2', '-o', outputFolder, '-w', '1', '--cache-dir', str(tmp_path / 'cache'), '--report-file', reportPath]
+    assert main(arguments + ['--no-info', '--source-master', 'C1']) == 0
+    assert 'Generated instances: 2' in capsys.readouterr().out
+    # masters are left out
+    assert sorted(os.listdir(outputFolder)) == ['Synthetic-B1.ufo', 'Synthetic-B2.ufo']
+    with open(reportPath) as f:
+        report = json.load(f)
+    assert sorted(result['spot'] for result in report['results']) == ['B1', 'B2']
+    assert all(result['error'] is None for result in report['results'])
+    font = OpenFont(os.path.join(outputFolder, 'Synthetic-B2.ufo'), showInterface=False)
+    sourceFont = MatrixEngine.fromMatrixFile(matrixPath).masters[1].getFont()
+    assert len(font) == 24 and len(font.kerning) > 0
+    # groups are the source master’s, font info isn’t interpolated
+    assert dict(font.groups) == dict(sourceFont.groups)
+    assert font.info.xHeight is None
+
+    assert main(arguments + ['-s', 'B2', '--no-glyphs', '--no-kerning', '-q']) == 0
+    font = OpenFont(os.path.join(outputFolder, 'Synthetic-B2.ufo'), showInterface=False)
+    assert len(font) == 0 and len(font.kerning) == 0 and font.info.xHeight is not None
+
+def test_subset(matrixPath, tmp_path):
+    outputFolder = str(tmp_path / 'out')
+    assert main([matrixPath, '-s', 'B2', '-o', outputFolder, '-w', '1', '-q', '--no-cache', '--subset', 'comp0000']) == 0
+    font = OpenFont(os.path.join(outputFolder, 'Synthetic-B2.ufo'), showInterface=False)
+    assert sorted(font.keys()) == ['base0000', 'base0001', 'comp0000']
+    assert all(first in font.keys() | set(font.groups.keys()) for first, second in font.kerning.keys())
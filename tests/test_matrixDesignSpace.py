@@ -0,0 +1,34 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+from fontParts.world import OpenFont
+from conftest import buildEngine
+from matrixDesignSpace import writeDesignSpace, buildInstances, findIncompatibleGlyphs
+from fontTools.designspaceLib import DesignSpaceDocument
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+
+def test_incompatibleGlyphsAreMuted(masterPaths, tmp_path):
+    fonts = []
+    for index, path in enumerate(masterPaths[:len(SPOTS)]):
+        font = OpenFont(path, showInterface=False)
+        copyPath = str(tmp_path / os.path.basename(path))
+        font.save(copyPath)
+        fonts.append(OpenFont(copyPath, showInterface=False))
+    glyphName = sorted(glyph.name for glyph in fonts[1] if len(glyph.contours))[0]
+    # a contour less in one master
+    fonts[1][glyphName].removeContour(0)
+    fonts[1].save()
+
+    engine = buildEngine(fonts, SPOTS)
+    documentPath = str(tmp_path / 'matrix.designspace')
+    writeDesignSpace(documentPath, engine, [(1, 1)], outputFolder=str(tmp_path / 'instances'))
+    assert list(findIncompatibleGlyphs(DesignSpaceDocument.fromfile(documentPath))) == [glyphName]
+
+    results = buildInstances(documentPath)
+    assert len(results) == 1 and results[0]['error'] is None
+    assert any(glyphName in line for line in results[0]['report'])
+    instance = OpenFont(results[0]['path'], showInterface=False)
+    assert glyphName not in instance
+    assert len(instance) == len(fonts[0]) - 1
@@ -0,0 +1,66 @@
+# coding=utf-8
+from __future__ import division
+
+import os
+import pytest
+from fontParts.world import OpenFont
+from matrixBatch import main
+from matrixShards import ShardError, planUnits, getShardUnits, getPlanKey, getShardFolder, mergeShards
+from glyphHashes import hashGlyph
+
+def test_planUnits():
+    glyphNames = ['c', 'a', 'e', 'b', 'd']
+    units = planUnits([(1, 1), (0, 1), (1, 1)], glyphNames, chunkSize=2)
+    assert [(unit['index'], unit['spot'], unit['chunk'], unit['glyphNames']) for unit in units] == [
+        (0, (0, 1), 0, ['a', 'b']), (1, (0, 1), 1, ['c', 'd']), (2, (0, 1), 2, ['e']),
+        (3, (1, 1), 0, ['a', 'b']), (4, (1, 1), 1, ['c', 'd']), (5, (1, 1), 2, ['e'])
+        ]
+    # every shard works out the same plan on its own
+    assert units == planUnits([(0, 1), (1, 1)], list(reversed(glyphNames)), chunkSize=2)
+    assert getPlanKey(units, {'shardCount': 2}) == getPlanKey(planUnits([(1, 1), (0, 1)], glyphNames, 2), {'shardCount': 2})
+    assert getPlanKey(units, {'shardCount': 2}) != getPlanKey(units, {'shardCount': 3})
+    shards = [getShardUnits(units, shardIndex, 4) for shardIndex in range(4)]
+    assert sorted(unit['index'] for shard in shards for unit in shard) == list(range(6))
+    assert [unit['index'] for unit in shards[1]] == [1, 5]
+    assert planUnits([(0, 0), (1, 0)]) == [{'index': 0, 'spot': (0, 0), 'chunk': 0, 'glyphNames': None}, {'index': 1, 'spot': (1, 0), 'chunk': 0, 'glyphNames': None}]
+    with pytest.raises(ValueError):
+        getShardUnits(units, 2, 2)
+
+def fontContent(path):
+    font = OpenFont(path, showInterface=False)
+    glyphs = dict((glyph.name, hashGlyph(glyph)) for glyph in font)
+    return font.info.familyName, font.info.styleName, font.info.xHeight, dict(font.kerning.items()), dict(font.groups.items()), glyphs
+
+def listInstances(folder):
+    return sorted(fileName for fileName in os.listdir(folder) if fileName.endswith('.ufo'))
+
+def test_shardsMergeRoundTrip(matrixPath, tmp_path):
+    arguments = [matrixPath, '-s', 'B1:C2', '-w', '1', '-q', '--no-cache']
+    expectedFolder = str(tmp_path / 'expected')
+    assert main(arguments + ['-o', expectedFolder]) == 0
+
+    shardedFolder = str(tmp_path / 'sharded')
+    shardArguments = arguments + ['-o', shardedFolder, '--chunk-size', '10', '--shard-count', '3']
+    for shardIndex in (0, 2):
+        assert main(shardArguments + ['--shard-index', str(shardIndex)]) == 0
+    # a shard is missing
+    with pytest.raises(ShardError):
+        mergeShards(getShardFolder(shardedFolder))
+    assert main(arguments + ['-o', shardedFolder, '--merge']) == 2
+    assert main(shardArguments + ['--shard-index', '1']) == 0
+    assert main(arguments + ['-o', shardedFolder, '--merge']) == 0
+
+    # C1 is a master, it isn’t generated
+    instances = listInstances(expectedFolder)
+    assert instances == ['Synthetic-B1.ufo', 'Synthetic-B2.ufo', 'Synthetic-C2.ufo']
+    assert listInstances(shardedFolder) == instances
+    for fileName in instances:
+        assert fontContent(os.path.join(shardedFolder, fileName)) == fontContent(os.path.join(expectedFolder, fileName))
+
+def test_shardsOfDifferentRuns(matrixPath, tmp_path):
+    outputFolder = str(tmp_path / 'sharded')
+    arguments = [matrixPath, '-s', 'B1', '-w', '1', '-q', '--no-cache', '-o', outputFolder, '--shard-count', '2']
+    assert main(arguments + ['--shard-index', '0']) == 0
+    assert main(arguments + ['--shard-index', '1', '--chunk-size', '10']) == 0
+    with pytest.raises(ShardError):
+        mergeShards(getShardFolder(outputFolder))
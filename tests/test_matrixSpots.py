@@ -0,0 +1,34 @@
+# coding=utf-8
+from __future__ import division
+
+from conftest import buildEngine
+from matrixSpot import MatrixSpot, getSpotWeight, getKeyForValue
+
+SPOTS = [(0, 0), (6, 1), (2, 4)]
+
+def test_spotWeight():
+    for index in range(12):
+        for weight in (-730.4, 0, 0.49, 1.5, 87.25, 333.3333, 1000.0000000000001):
+            matrixSpot = MatrixSpot((index, 0))
+            matrixSpot.setWeights((weight, 0))
+            assert getSpotWeight(index, weight) == matrixSpot.getWeights()[0]
+
+def test_spotLocations(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS, axesGrid=(7, 5))
+    engine.shiftSpotWeights((3, 3), (40, -25))
+    spotKeys = set(engine.matrixSpots.keys())
+    spots = engine.getSpots()
+    locations = dict((spot, engine.getSpotLocation(spot)) for spot in spots)
+    # unshifted spots aren’t materialized to get their locations
+    assert set(engine.matrixSpots.keys()) == spotKeys
+    for spot in spots:
+        spotKey = '%s%s'%(getKeyForValue(spot[0]), spot[1])
+        assert dict(locations[spot]) == engine.matrixSpots[spotKey].getWeightsAsDict('horizontal', 'vertical')
+
+def test_previewsDontMaterializeSpots(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS, axesGrid=(7, 5))
+    spotKeys = set(engine.matrixSpots.keys())
+    engine.placeGlyphMasters(masterFonts[0].glyphOrder[0])
+    instances = engine.makeGlyphInstances(engine.getSpots())
+    assert len(instances) == 35 - len(SPOTS)
+    assert set(engine.matrixSpots.keys()) == spotKeys
@@ -0,0 +1,106 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from fontParts.world import NewFont
+from conftest import buildEngine
+from matrixEngine import interpolateGlyphSet
+from glyphWriter import GlyphBatch
+from glyphCompatibility import INCOMPATIBLE
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+
+def drawRectangle(pen, xMin, yMin, xMax, yMax):
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMax, yMin))
+    pen.lineTo((xMax, yMax))
+    pen.lineTo((xMin, yMax))
+    pen.closePath()
+
+def drawTriangle(pen, xMin, yMin, xMax, yMax):
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMax, yMin))
+    pen.lineTo(((xMin + xMax) / 2, yMax))
+    pen.closePath()
+
+def makeMasters(swapped=False):
+    '''
+    Masters of an 'o' (a rectangle & a triangle) on top of a 'dot' component, the second master’s contours in the other order if swapped.
+    '''
+    fonts = []
+    for index in range(len(SPOTS)):
+        font = NewFont(showInterface=False)
+        font.info.unitsPerEm = 1000
+        grow = index * 40
+        dot = font.newGlyph('dot')
+        drawRectangle(dot.getPen(), 200, 600, 260 + grow, 660)
+        glyph = font.newGlyph('o')
+        glyph.width = 500 + grow
+        contours = [(drawRectangle, (50, 0, 450 + grow, 500)), (drawTriangle, (150, 100, 350 + grow, 400))]
+        if swapped and index == 1:
+            contours.reverse()
+        pen = glyph.getPen()
+        for draw, bounds in contours:
+            draw(pen, *bounds)
+        glyph.appendComponent('dot')
+        fonts.append(font)
+    return fonts
+
+def getPreviews(fonts, backend):
+    engine = buildEngine(fonts, SPOTS)
+    engine.setPreviewBackend(backend)
+    engine.placeGlyphMasters('o')
+    return engine.makeGlyphInstances([(1, 1), (2, 2)])
+
+def outline(glyph):
+    return [[tuple(point.position) for point in contour.points] for contour in glyph]
+
+@pytest.mark.parametrize('backend', ['mutatorMath', 'variations'])
+def test_fixablePreviews(backend):
+    expected = getPreviews(makeMasters(), backend)
+    previews = getPreviews(makeMasters(swapped=True), backend)
+    for spotKey, glyph in expected.items():
+        assert glyph is not None
+        assert previews[spotKey] is not None
+        assert outline(previews[spotKey]) == outline(glyph)
+
+def test_detailToleranceLevels():
+    engine = buildEngine(makeMasters(), SPOTS)
+    engine.setPreviewCellSize((90, 100))
+    tolerance = engine.getDetailTolerance()
+    engine.placeGlyphMasters('o')
+    engine.makeGlyphInstances([(1, 1)])
+    mutators = dict(engine.glyphMutators)
+    # resizing within a level keeps the tolerance, mutators aren’t built again
+    engine.setPreviewCellSize((110, 100))
+    assert engine.getDetailTolerance() == tolerance
+    engine.makeGlyphInstances([(1, 1)])
+    assert engine.glyphMutators == mutators
+    engine.setPreviewCellSize((60, 60))
+    assert engine.getDetailTolerance() > tolerance
+    engine.setPreviewCellSize((200, 200))
+    assert engine.getDetailTolerance() is None
+
+def test_mutatorErrorsAreReported():
+    fonts = makeMasters()
+    engine = buildEngine(fonts, SPOTS)
+    rawMasters = [font['o'] for font in fonts[:2]]
+    # two masters at the same location can’t make a mutator
+    location = engine.getSpotLocation((0, 0))
+    mutatorMasters = [(location, glyph.toMathGlyph()) for glyph in rawMasters]
+    assert engine.buildPreviewMutator(mutatorMasters, rawMasters) is None
+    assert engine.mutatorReport['o']['status'] == INCOMPATIBLE
+    assert engine.mutatorReport['o']['reasons'][0].startswith('mutator error: ')
+    # until a mutator is built again
+    engine.placeGlyphMasters('o')
+    assert engine.makeGlyphInstances([(1, 1)])['b1'] is not None
+    assert engine.mutatorReport == {}
+
+def test_glyphSetProgress():
+    fonts = makeMasters()
+    engine = buildEngine(fonts, SPOTS)
+    calls = []
+    batch = GlyphBatch()
+    interpolateGlyphSet(engine.getSpotLocation((1, 1)), ['dot', 'o'], engine.getMasterLocations(), batch, progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(0, 2), (1, 2), (2, 2)]
+    assert [name for name, glyph, unicodes in batch] == ['dot', 'o']
@@ -0,0 +1,67 @@
+# coding=utf-8
+from __future__ import division
+
+import pytest
+from conftest import buildEngine
+from spotExpression import SpotGrid, SpotExpressionError, compileSpotExpression, spotsToBitset, bitsetToSpots
+
+# 5 columns (A to E) by 4 lines, default weights: (index+1)*100
+GRID = SpotGrid(5, 4)
+
+def select(expression, grid=GRID):
+    return compileSpotExpression(expression).spots(grid)
+
+def rectangle(columns, lines):
+    return sorted((i, j) for i in columns for j in lines)
+
+@pytest.mark.parametrize('expression, spots', [
+    ('*', rectangle(range(5), range(4))),
+    ('B2', [(1, 1)]),
+    ('b2', [(1, 1)]),
+    ('A1:C2', rectangle(range(3), range(2))),
+    ('C2:A1', rectangle(range(3), range(2))),
+    ('B', rectangle([1], range(4))),
+    ('B:D', rectangle([1, 2, 3], range(4))),
+    ('2', rectangle(range(5), [1])),
+    ('2-3', rectangle(range(5), [1, 2])),
+    ('2:3', rectangle(range(5), [1, 2])),
+    ('A1:E4/2', rectangle([0, 2, 4], [0, 2])),
+    ('A:E/3', rectangle([0, 3], range(4))),
+    ('*/2', rectangle([0, 2, 4], [0, 2])),
+    ('h>300', rectangle([3, 4], range(4))),
+    ('v<=200', rectangle(range(5), [0, 1])),
+    ('h=100', rectangle([0], range(4))),
+    ('B:D & 2-3', rectangle([1, 2, 3], [1, 2])),
+    ('A1, E4', [(0, 0), (4, 3)]),
+    ('A1 E4', [(0, 0), (4, 3)]),
+    ('A1:B2, !A1', [(0, 1), (1, 0), (1, 1)]),
+    ('!B:E', rectangle([0], range(4))),
+    ('!h>100, !2-4', [(0, 0)]),
+    ('Z9', []),
+    ('D3:Z9', rectangle([3, 4], [2, 3])),
+    ])
+def test_grammar(expression, spots):
+    assert select(expression) == spots
+
+@pytest.mark.parametrize('expression', ['A1:', 'A1:B', '*/0', 'h>', '?', '2-', 'B2 &'])
+def test_invalidExpressions(expression):
+    with pytest.raises(SpotExpressionError):
+        compileSpotExpression(expression)
+
+def test_spotWeights():
+    # a shifted spot is selected by its own weights, not by its column’s
+    grid = SpotGrid(5, 4, spotWeights={(0, 0): (900, 100), (4, 0): (100, 100)})
+    assert select('h>400', grid) == [(0, 0)] + rectangle([4], [1, 2, 3])
+    assert select('h>400 & 1', grid) == [(0, 0)]
+
+def test_bitsets():
+    spots = [(0, 0), (2, 1), (4, 3), (1, 3)]
+    bits = spotsToBitset(spots, 5)
+    assert bits == (1 << 0) | (1 << 7) | (1 << 19) | (1 << 16)
+    assert bitsetToSpots(bits, 5) == sorted(spots)
+    assert compileSpotExpression('*').evaluate(GRID) == GRID.all == (1 << 20) - 1
+
+def test_engineSelection(masterFonts):
+    engine = buildEngine(masterFonts, [(0, 0), (2, 0), (0, 2)])
+    assert bitsetToSpots(engine.selectSpots('A1:C1'), 3) == [(1, 0)]
+    assert bitsetToSpots(engine.selectSpots('A1:C1', includeMasters=True), 3) == [(0, 0), (1, 0), (2, 0)]
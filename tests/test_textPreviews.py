@@ -0,0 +1,81 @@
+# coding=utf-8
+from __future__ import division
+
+from fontParts.world import NewFont
+from conftest import buildEngine
+from matrixEngine import composeTextGlyph
+
+SPOTS = [(0, 0), (2, 0), (0, 2)]
+RUN = ['base0000', 'comp0000', 'base0001']
+
+def points(glyph):
+    return [tuple(point.position) for contour in glyph for point in contour.points]
+
+def makeGlyph(name, width, xMax):
+    font = NewFont(showInterface=False)
+    glyph = font.newGlyph(name)
+    glyph.width = width
+    pen = glyph.getPen()
+    pen.moveTo((0, 0))
+    pen.lineTo((xMax, 0))
+    pen.lineTo((xMax, 100))
+    pen.closePath()
+    return glyph
+
+def test_composeTextGlyph():
+    glyphs = [makeGlyph('a', 300, 100), makeGlyph('b', 300, 100)]
+    textGlyph = composeTextGlyph(glyphs)
+    # the run is scaled by .75 and centered on a 1000 units width
+    assert textGlyph.width == 1000
+    assert points(textGlyph)[:3] == [(275, -50), (350, -50), (350, 25)]
+    assert points(textGlyph)[3] == (500, -50)
+    kerned = composeTextGlyph(glyphs, {('a', 'b'): -100})
+    assert points(kerned)[0] == (312.5, -50)
+    assert points(kerned)[3] == (462.5, -50)
+    # long runs are scaled to fit, missing glyphs are drawn as error glyphs
+    assert composeTextGlyph([makeGlyph('a', 3000, 100)]).bounds[0] == 50
+    assert len(composeTextGlyph([None]).contours) == 1
+
+def test_placeTextMasters(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS)
+    placed = engine.placeTextMasters(RUN)
+    assert sorted(placed) == ['a0', 'a2', 'c0']
+    masterFont, textGlyph = placed['a0']
+    assert masterFont is masterFonts[0]
+    # composites are decomposed, each glyph of the run is kept once per master
+    assert len(textGlyph.contours) == 2 + 4 + 2
+    assert sorted(engine.textMasters) == ['base0000', 'base0001', 'comp0000']
+    assert all(len(mutatorMasters) == 3 for mutatorMasters, rawMasters in engine.textMasters.values())
+    # a master missing a glyph of the run has no text glyph
+    masterFonts[1].removeGlyph('base0001')
+    placed = engine.placeTextMasters(RUN)
+    assert placed['c0'][1] is None and placed['a0'][1] is not None
+
+def test_textInstances(masterFonts):
+    engine = buildEngine(masterFonts, SPOTS)
+    placed = engine.placeTextMasters(RUN)
+    instances = engine.makeTextInstances()
+    assert sorted(instances) == ['a1', 'b0', 'b1', 'b2', 'c1', 'c2']
+    assert all(len(glyph.contours) == 8 for glyph in instances.values())
+    # runs fit without scaling down further, B1 is halfway between the A1 & C1 masters
+    first, second = points(placed['a0'][1]), points(placed['c0'][1])
+    for (x, y), (x0, y0), (x1, y1) in zip(points(instances['b0']), first, second):
+        assert abs(x - (x0 + x1) / 2) < 1 and abs(y - (y0 + y1) / 2) < 1
+    # only requested spots
+    assert sorted(engine.makeTextInstances([(1, 1), (0, 0)])) == ['b1']
+
+def test_textKerning(masterFonts):
+    # short enough a run not to be scaled down further than .75
+    run = ['base0000', 'base0001']
+    for font in masterFonts:
+        font.kerning[tuple(run)] = -200
+    engine = buildEngine(masterFonts, SPOTS)
+    engine.placeTextMasters(run)
+    kerned = engine.makeTextInstances([(1, 1)])['b1']
+    for font in masterFonts:
+        font.kerning[tuple(run)] = 0
+    engine.placeTextMasters(run)
+    plain = engine.makeTextInstances([(1, 1)])['b1']
+    # the run is centered: the first glyph moves right by half the kerning, the second one left
+    assert abs((points(kerned)[0][0] - points(plain)[0][0]) - 75) < .01
+    assert abs((points(kerned)[-1][0] - points(plain)[-1][0]) + 75) < .01